@@ -1,50 +1,356 @@
-# add_sample_data.py
-from app import app, db
-from models import Transacao, Usuario
-from datetime import datetime, timedelta
-
-with app.app_context():
-    # Pegar usuário admin
-    admin = Usuario.query.filter_by(username='admin').first()
-    
-    if admin:
-        # Adicionar transações de exemplo
-        categorias = ['fixas', 'pessoal', 'operacionais', 'vendas', 'investimentos']
-        fornecedores = ['Empresa A', 'Empresa B', 'Empresa C', 'Fornecedor X', 'Fornecedor Y']
-        
-        # Transações do mês atual
-        hoje = datetime.now().date()
-        for i in range(20):
-            data = hoje - timedelta(days=i)
-            
-            # Despesa
-            despesa = Transacao(
-                descricao=f'Despesa {i+1}',
-                valor=100.00 * (i+1),
-                data=data,
-                data_vencimento=data + timedelta(days=30),
-                categoria=categorias[i % len(categorias)],
-                tipo='despesa',
-                status='pago' if i % 2 == 0 else 'pendente',
-                fornecedor=fornecedores[i % len(fornecedores)],
-                forma_pagamento='Transferência' if i % 2 == 0 else 'Boleto',
-                observacoes=f'Observação {i+1}',
-                usuario_id=admin.id
-            )
-            db.session.add(despesa)
-            
-            # Receita
-            receita = Transacao(
-                descricao=f'Receita {i+1}',
-                valor=200.00 * (i+1),
-                data=data,
-                categoria='vendas',
-                tipo='receita',
-                status='pago',
-                fornecedor=f'Cliente {i+1}',
-                usuario_id=admin.id
-            )
-            db.session.add(receita)
-        
-        db.session.commit()
-        print(f"✅ Adicionadas {40} transações de exemplo para o usuário admin")
\ No newline at end of file
+"""
+Gerador de Dados Sintéticos
+Popula o banco com usuários, centros de custo, transações, logs de auditoria,
+relatórios e cálculos de precificação realistas, em escala de milhões de linhas.
+
+Tudo sai de um gerador aleatório com semente (a mesma semente gera os mesmos
+dados) e é inserido pelo Core em lotes grandes, numa única transação, com os
+pragmas do SQLite relaxados durante a carga. Como o Core não passa pelos ganchos
+do ORM, as colunas derivadas (as chaves de categoria, fornecedor e forma de
+pagamento e a impressão das duplicatas) são calculadas no próprio lote, e as contagens da sugestão de
+categoria (frequencias_categoria) são somadas no fim.
+
+Uso:
+    python add_sample_data.py                          # 40 transações para o admin
+    python add_sample_data.py --transacoes 1000000 --usuarios 500 --semente 7
+    python add_sample_data.py --transacoes 5000000 --banco /tmp/grande.db
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from collections import Counter
+from itertools import accumulate
+
+
+# Perfis de lançamento: (descrição, categoria, tipo, fornecedores, valor médio, peso)
+PERFIS = [
+    ('Aluguel', 'fixas', 'despesa', ['Imobiliária ABC', 'Imobiliária Central'], 1500, 3),
+    ('Energia Elétrica', 'fixas', 'despesa', ['Companhia Elétrica'], 350, 3),
+    ('Água e Esgoto', 'fixas', 'despesa', ['Saneamento Municipal'], 120, 2),
+    ('Internet', 'fixas', 'despesa', ['Provedor Net', 'Fibra Já'], 150, 2),
+    ('Salários', 'pessoal', 'despesa', ['Funcionários'], 5000, 2),
+    ('Vale Transporte', 'pessoal', 'despesa', ['Funcionários'], 400, 2),
+    ('Material de Escritório', 'operacionais', 'despesa', ['Papelaria XYZ', 'Kalunga'], 250, 6),
+    ('Manutenção', 'operacionais', 'despesa', ['Fornecedor X', 'Fornecedor Y', 'Empresa A'], 600, 5),
+    ('Matéria-prima', 'operacionais', 'despesa', ['Empresa A', 'Empresa B', 'Empresa C'], 2200, 10),
+    ('Frete', 'operacionais', 'despesa', ['Transportadora Rápida', 'Correios'], 180, 8),
+    ('Impostos', 'impostos', 'despesa', ['Receita Federal', 'Prefeitura'], 900, 3),
+    ('Marketing', 'marketing', 'despesa', ['Agência Criativa', 'Google Ads'], 700, 4),
+    ('Equipamentos', 'investimentos', 'despesa', ['Empresa B', 'Loja Tech'], 3500, 1),
+    ('Venda Produto A', 'vendas', 'receita', ['Cliente 1', 'Cliente 2', 'Cliente 3'], 5000, 12),
+    ('Venda Produto B', 'vendas', 'receita', ['Cliente 4', 'Cliente 5', 'Cliente 6'], 2500, 12),
+    ('Serviço Consultoria', 'servicos', 'receita', ['Cliente 2', 'Cliente 7'], 3000, 6),
+    ('Rendimento Aplicação', 'financeiras', 'receita', ['Banco Digital'], 200, 2),
+]
+FORMAS_PAGAMENTO = ['Boleto', 'Transferência', 'Cartão', 'PIX', 'Dinheiro']
+PESOS_FORMAS = [30, 30, 20, 18, 2]
+CENTROS_CUSTO = ['Administrativo', 'Comercial', 'Produção', 'TI', 'Financeiro',
+                 'Logística', 'Marketing', 'Recursos Humanos', 'Jurídico', 'Compras']
+DEPARTAMENTOS = ['financeiro', 'comercial', 'ti', 'rh', 'operacoes']
+ACOES_LOG = ['login', 'logout', 'criar', 'editar', 'excluir', 'exportar']
+LOTE_PADRAO = 50000
+TAMANHO_TABELA_VALORES = 8192
+# Posições dos textos das dimensões nas linhas geradas (viram as chaves no fim da linha)
+TEXTOS = ((4, 'categoria'), (7, 'fornecedor'), (8, 'forma_pagamento'))
+
+
+def _pragmas_carga(conn):
+    """Relaxa a durabilidade do SQLite durante a carga em massa"""
+    conn.exec_driver_sql('PRAGMA synchronous = OFF')
+    conn.exec_driver_sql('PRAGMA journal_mode = MEMORY')
+    conn.exec_driver_sql('PRAGMA temp_store = MEMORY')
+    conn.exec_driver_sql('PRAGMA cache_size = -262144')  # 256 MB
+    conn.commit()
+
+
+def _insert(conn, tabela, colunas, linhas):
+    """executemany direto no driver com tuplas (sem montar dicionários por linha)"""
+    if not linhas:
+        return
+    sql = f'INSERT INTO {tabela} ({", ".join(colunas)}) VALUES ({", ".join("?" * len(colunas))})'
+    conn.exec_driver_sql(sql, linhas)
+
+
+def _criar_usuarios(conn, rng, quantidade, senha_hash, agora):
+    """Cria os usuários que faltam para chegar à quantidade pedida; retorna (ids, pesos)"""
+    existentes = [r[0] for r in conn.exec_driver_sql('SELECT id FROM usuarios ORDER BY id')]
+    faltam = max(0, quantidade - len(existentes))
+    if faltam:
+        inicio = conn.exec_driver_sql('SELECT coalesce(max(id), 0) FROM usuarios').scalar() + 1
+        _insert(conn, 'usuarios',
+                ('nome', 'username', 'email', 'senha_hash', 'perfil', 'departamento', 'status', 'data_criacao'),
+                [(f'Usuário Gerado {i}', f'gerado{i}', f'gerado{i}@exemplo.com', senha_hash,
+                  'gerente' if rng.random() < 0.1 else 'usuario', rng.choice(DEPARTAMENTOS),
+                  'ativo' if rng.random() < 0.95 else 'inativo', agora)
+                 for i in range(inicio, inicio + faltam)])
+    ids = [r[0] for r in conn.exec_driver_sql('SELECT id FROM usuarios ORDER BY id')][:max(quantidade, 1)]
+
+    # Poucos usuários concentram a maior parte dos lançamentos
+    pesos = [rng.paretovariate(1.2) for _ in ids]
+    return ids, list(accumulate(pesos))
+
+
+def _codificar(conn, chaves, linhas):
+    """Troca os textos de categoria, fornecedor e forma de pagamento das linhas pelas
+    chaves, criando nas dimensões as que faltam
+
+    `chaves` guarda, entre lotes, (campo, usuario_id, texto) -> id.
+    """
+    from dimensoes import DIMENSOES, chave
+
+    posicoes = {posicao for posicao, _ in TEXTOS}
+
+    for posicao, campo in TEXTOS:
+        tabela = DIMENSOES[campo][0].__tablename__
+        novos = {(linha[9], linha[posicao]) for linha in linhas if (campo, linha[9], linha[posicao]) not in chaves}
+        if not novos:
+            continue
+        por_chave = {(usuario_id, chave(campo, texto)): texto for usuario_id, texto in novos}
+        conn.exec_driver_sql(f'INSERT OR IGNORE INTO {tabela} (usuario_id, nome, chave) VALUES (?, ?, ?)',
+                             [(usuario_id, texto, c) for (usuario_id, c), texto in por_chave.items()])
+        usuarios = sorted({usuario_id for usuario_id, _ in novos})
+        ids = dict(((u, c), id_) for u, c, id_ in conn.exec_driver_sql(
+            f'SELECT usuario_id, chave, id FROM {tabela} WHERE usuario_id IN ({", ".join("?" * len(usuarios))})',
+            tuple(usuarios)
+        ))
+        for usuario_id, texto in novos:
+            chaves[(campo, usuario_id, texto)] = ids[(usuario_id, chave(campo, texto))]
+
+    return [tuple(valor for posicao, valor in enumerate(linha) if posicao not in posicoes)
+            + tuple(chaves[(campo, linha[9], linha[posicao])] for posicao, campo in TEXTOS)
+            for linha in linhas]
+
+
+def _contar_categorias(conn, combinacoes):
+    """Soma em frequencias_categoria as contagens de {(usuario, tipo, categoria, descricao, fornecedor): n}"""
+    from categorizacao import tokens
+
+    contagens = Counter()
+    for (usuario_id, tipo, categoria, descricao, fornecedor), n in combinacoes.items():
+        for token in tokens(descricao, fornecedor):
+            contagens[(usuario_id, tipo, token, categoria)] += n
+    conn.exec_driver_sql(
+        'INSERT INTO frequencias_categoria (usuario_id, tipo, token, categoria, contagem) VALUES (?, ?, ?, ?, ?) '
+        'ON CONFLICT (usuario_id, tipo, token, categoria) DO UPDATE SET contagem = contagem + excluded.contagem',
+        [(*chave, n) for chave, n in contagens.items()]
+    )
+
+
+def _criar_centros(conn, quantidade):
+    existentes = conn.exec_driver_sql('SELECT count(*) FROM centros_custo').scalar()
+    if existentes < quantidade:
+        _insert(conn, 'centros_custo', ('nome', 'descricao', 'orcamento', 'tipo'),
+                [(CENTROS_CUSTO[i % len(CENTROS_CUSTO)] + (f' {i // len(CENTROS_CUSTO) + 1}' if i >= len(CENTROS_CUSTO) else ''),
+                  'Gerado automaticamente', 10000.0 * (1 + i % 5), 'custo' if i % 3 else 'receita')
+                 for i in range(existentes, quantidade)])
+    return [r[0] for r in conn.exec_driver_sql('SELECT id FROM centros_custo ORDER BY id')] or [None]
+
+
+def _lotes_transacoes(rng, total, lote, usuarios, pesos_usuarios, centros, hoje, dias_historico):
+    """Gera as transações em lotes de tuplas, coluna a coluna"""
+    from duplicatas import impressao
+
+    # Eixo de datas pré-formatado: índice 0 = hoje - dias_historico; inclui 90 dias futuros
+    inicio = hoje - timedelta(days=dias_historico)
+    datas = [inicio + timedelta(days=i) for i in range(dias_historico + 90 + 61)]
+    eixo = [d.isoformat() for d in datas]
+    indice_hoje = dias_historico
+    dias_possiveis = range(dias_historico + 90)
+    pesos_perfis = list(accumulate(p[5] for p in PERFIS))
+    pesos_formas = list(accumulate(PESOS_FORMAS))
+    agora = datetime.utcnow().isoformat(' ')
+    prazos = (0, 0, 5, 10, 15, 30, 60)
+
+    # Valores sorteados uma vez por perfil (distribuição normal em torno da média);
+    # por linha resta só indexar a tabela, bem mais barato que um gauss() por linha
+    valores = [
+        [round(max(1.0, p[4] * (1 + 0.25 * rng.gauss(0, 1))), 2) for _ in range(TAMANHO_TABELA_VALORES)]
+        for p in PERFIS
+    ]
+    posicoes = range(TAMANHO_TABELA_VALORES)
+
+    gerados = 0
+    while gerados < total:
+        n = min(lote, total - gerados)
+        perfis = rng.choices(range(len(PERFIS)), cum_weights=pesos_perfis, k=n)
+        dias = rng.choices(dias_possiveis, k=n)
+        prazo = rng.choices(prazos, k=n)
+        posicoes_valor = rng.choices(posicoes, k=n)
+        usuarios_lote = rng.choices(usuarios, cum_weights=pesos_usuarios, k=n)
+        formas = rng.choices(FORMAS_PAGAMENTO, cum_weights=pesos_formas, k=n)
+        centros_lote = rng.choices(centros, k=n)
+        sorteios = [rng.random() for _ in range(n)]
+
+        linhas = []
+        for i in range(n):
+            perfil = perfis[i]
+            descricao, categoria, tipo, fornecedores, _, _ = PERFIS[perfil]
+            dia = dias[i]
+            sorteio = sorteios[i]
+            vencimento = dia + prazo[i]
+            if vencimento < indice_hoje:
+                status = 'pago' if sorteio < 0.92 else ('pendente' if sorteio < 0.98 else 'cancelado')
+            else:
+                status = 'pendente' if sorteio < 0.9 else 'pago'
+            valor = valores[perfil][posicoes_valor[i]]
+            fornecedor = fornecedores[int(sorteio * len(fornecedores))]
+            linhas.append((
+                descricao,
+                valor,
+                eixo[dia],
+                eixo[vencimento],
+                categoria,
+                tipo,
+                status,
+                fornecedor,
+                formas[i],
+                usuarios_lote[i],
+                centros_lote[i],
+                agora,
+                agora,
+                impressao(usuarios_lote[i], valor, datas[dia], fornecedor, descricao)
+            ))
+        gerados += n
+        yield linhas
+
+
+def gerar(engine, transacoes=40, usuarios=1, semente=42, lote=LOTE_PADRAO, centros=10,
+          logs=None, relatorios=None, calculos=None, dias_historico=730, senha_hash=None, saida=print):
+    """Gera todos os dados em uma única transação e retorna as contagens e a vazão"""
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(semente)
+    hoje = date.today()
+    agora = datetime.utcnow().isoformat(' ')
+    logs = transacoes // 10 if logs is None else logs
+    relatorios = transacoes // 1000 if relatorios is None else relatorios
+    calculos = transacoes // 1000 if calculos is None else calculos
+    senha_hash = senha_hash or generate_password_hash('senha123')  # um único hash para todos
+
+    colunas = ('descricao', 'valor', 'data', 'data_vencimento', 'tipo', 'status', 'usuario_id', 'centro_custo_id',
+               'data_criacao', 'data_atualizacao', 'impressao', 'categoria_id', 'fornecedor_id', 'forma_pagamento_id')
+
+    inicio = time.perf_counter()
+    conn = engine.connect()
+    try:
+        _pragmas_carga(conn)
+
+        # Índices são reconstruídos uma vez no final em vez de atualizados linha a linha
+        from models import Transacao
+        indices = list(Transacao.__table__.indexes) if transacoes >= 100000 else []
+
+        with conn.begin():
+            for indice in indices:
+                indice.drop(conn, checkfirst=True)
+
+            ids_usuarios, pesos = _criar_usuarios(conn, rng, usuarios, senha_hash, agora)
+            ids_centros = _criar_centros(conn, centros)
+
+            inseridas = 0
+            chaves = {}
+            combinacoes = Counter()
+            for linhas in _lotes_transacoes(rng, transacoes, lote, ids_usuarios, pesos,
+                                            ids_centros, hoje, dias_historico):
+                _insert(conn, 'transacoes', colunas, _codificar(conn, chaves, linhas))
+                combinacoes.update((l[9], l[5], l[4], l[0], l[7]) for l in linhas)
+                inseridas += len(linhas)
+                if inseridas % (lote * 10) == 0:
+                    decorrido = time.perf_counter() - inicio
+                    saida(f'  {inseridas:,} transações ({inseridas / decorrido:,.0f} linhas/s)')
+            if combinacoes:
+                _contar_categorias(conn, combinacoes)
+
+            _insert(conn, 'logs_auditoria', ('acao', 'recurso', 'detalhes', 'ip', 'data', 'usuario_id'), [
+                (rng.choice(ACOES_LOG), 'transacoes', None, f'10.0.{rng.randrange(256)}.{rng.randrange(256)}',
+                 (datetime.utcnow() - timedelta(minutes=rng.randrange(60 * 24 * 90))).isoformat(' '),
+                 rng.choice(ids_usuarios))
+                for _ in range(logs)
+            ])
+
+            _insert(conn, 'relatorios', ('nome', 'tipo', 'formato', 'tamanho', 'data_geracao', 'usuario_id'), [
+                (f'Relatório de {tipo.capitalize()}', tipo, formato, rng.randrange(1024, 1024 * 500),
+                 (datetime.utcnow() - timedelta(days=rng.randrange(365))).isoformat(' '), rng.choice(ids_usuarios))
+                for tipo, formato in ((rng.choice(('despesas', 'receitas', 'fluxo')),
+                                       rng.choice(('pdf', 'excel', 'csv'))) for _ in range(relatorios))
+            ])
+
+            linhas_calculos = []
+            for i in range(calculos):
+                custo = round(rng.uniform(5, 500), 2)
+                adicionais, mult, impostos, comissao, desconto = (
+                    rng.choice((0, 5, 10)), rng.choice((1.5, 2.0, 2.5, 3.0)), rng.choice((6, 8, 12)),
+                    rng.choice((0, 3, 5)), rng.choice((0, 0, 5, 10))
+                )
+                ct = custo * (1 + adicionais / 100)
+                pv = ct * mult
+                pf = pv * (1 - desconto / 100)
+                enc = pf * (impostos + comissao) / 100
+                lucro = pf - enc - ct
+                linhas_calculos.append((
+                    f'Produto {i + 1}', custo, adicionais, mult, impostos, comissao, desconto,
+                    round(ct, 2), round(pv, 2), round(pf, 2), round(lucro, 2),
+                    round(pv / ct, 2), round(lucro / ct, 2),
+                    round((pv - ct) / pv * 100, 1), round(lucro / pf * 100, 1) if pf else 0,
+                    agora, rng.choice(ids_usuarios)
+                ))
+            _insert(conn, 'calculos_precificacao', (
+                'nome_produto', 'custo_produto', 'custos_adicionais_pct', 'multiplicador', 'impostos_pct',
+                'comissao_pct', 'desconto_pct', 'custo_total', 'preco_venda', 'preco_final', 'lucro_unidade',
+                'markup_bruto', 'markup_liquido', 'margem_bruta', 'margem_liquida', 'data_criacao', 'usuario_id'
+            ), linhas_calculos)
+
+            carga = time.perf_counter() - inicio
+            linhas = len(ids_usuarios) + transacoes + logs + relatorios + calculos
+            for indice in indices:
+                indice.create(conn)
+    finally:
+        # A conexão saiu com pragmas relaxados: descarta em vez de devolver ao pool
+        conn.invalidate()
+        conn.close()
+
+    total = time.perf_counter() - inicio
+    return {
+        'usuarios': len(ids_usuarios),
+        'transacoes': transacoes,
+        'logs': logs,
+        'relatorios': relatorios,
+        'calculos': calculos,
+        'segundos': round(total, 2),
+        'linhas_por_segundo': round(linhas / carga) if carga else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transacoes', type=int, default=40)
+    parser.add_argument('--usuarios', type=int, default=1, help='total de usuários (inclui o admin)')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--lote', type=int, default=LOTE_PADRAO)
+    parser.add_argument('--centros', type=int, default=10, help='centros de custo')
+    parser.add_argument('--logs', type=int, help='logs de auditoria (padrão: transações / 10)')
+    parser.add_argument('--relatorios', type=int, help='relatórios (padrão: transações / 1000)')
+    parser.add_argument('--calculos', type=int, help='cálculos de precificação (padrão: transações / 1000)')
+    parser.add_argument('--banco', help='arquivo SQLite de destino (padrão: o banco da aplicação)')
+    args = parser.parse_args()
+
+    if args.banco:
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(args.banco)}'
+
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    with app.app_context():
+        resultado = gerar(db.engine, args.transacoes, args.usuarios, args.semente, args.lote, args.centros,
+                          args.logs, args.relatorios, args.calculos)
+
+    print(f"✅ {resultado['transacoes']:,} transações para {resultado['usuarios']} usuário(s), "
+          f"{resultado['logs']:,} logs, {resultado['relatorios']:,} relatórios e "
+          f"{resultado['calculos']:,} cálculos em {resultado['segundos']}s "
+          f"({resultado['linhas_por_segundo']:,} linhas/s)")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,572 @@
+"""
+Arquivamento de Transações Antigas
+Transações fechadas anteriores ao horizonte (ARQUIVO_HORIZONTE_MESES, padrão 24
+meses) saem da tabela `transacoes` e vão para arquivos colunares compactados, um
+por usuário e ano, em ARQUIVO_DIR. Contas em aberto (pendentes ou atrasadas) e os
+modelos de recorrência continuam no banco.
+
+Junto com cada arquivo o job grava em `resumos_arquivados` os totais por mês, tipo,
+categoria, status e centro de custo: comparativos e o saldo da previsão somam os
+resumos sem abrir os arquivos. A listagem de transações só lê os arquivos quando o
+período pedido alcança a parte arquivada.
+
+Formato (.tcol): cabeçalho JSON com as colunas e, para cada coluna, um bloco
+comprimido com zlib. Inteiros, datas (em dias) e datas/horas (em microssegundos)
+viram int64, valores float64 e textos um dicionário de valores distintos com os
+índices de cada linha. A leitura descomprime só as colunas pedidas, e os filtros
+por texto comparam índices do dicionário.
+
+    flask --app wsgi arquivo executar [--meses N] [--usuario ID] | listar | restaurar USUARIO ANO
+"""
+import json
+import math
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+import click
+import sqlalchemy as sa
+from flask import current_app
+from flask.cli import AppGroup
+
+import dimensoes
+import inquilinos
+import metricas
+from extensions import db
+from models import (
+    STATUS_ABERTOS, TEXTOS_DIMENSAO, Usuario, Transacao, RegraRecorrencia, Notificacao, ArquivoTransacoes,
+    ResumoArquivado
+)
+from recorrencia import fim_do_mes, mesclar_pagina, somar_meses
+from serializacao import CAMPOS_TRANSACAO
+
+
+HORIZONTE_PADRAO = 24  # meses mantidos na tabela transacoes
+HORIZONTE_MINIMO = 12  # a previsão aprende padrões dos últimos meses
+ARQUIVOS_EM_CACHE = 16
+LOTE_EXCLUSAO = 500
+
+MAGIA = b'TCOL1\n'
+NULO = -2 ** 63
+EPOCA = datetime(1970, 1, 1)
+
+
+# ========== FORMATO COLUNAR ==========
+def _codificacao(coluna):
+    tipo = coluna.type
+    if isinstance(tipo, sa.DateTime):
+        return 'momento'
+    if isinstance(tipo, sa.Date):
+        return 'dias'
+    if isinstance(tipo, sa.Float):
+        return 'real'
+    if isinstance(tipo, sa.Integer):
+        return 'inteiro'
+    return 'texto'
+
+
+# Colunas da tabela e, por extenso, os textos das dimensões: o arquivo se lê sozinho
+COLUNAS = tuple(Transacao.__table__.columns) + tuple(getattr(Transacao, campo) for campo in TEXTOS_DIMENSAO)
+CODIFICACOES = {c.name: _codificacao(c) for c in COLUNAS}
+
+
+def _bytes(valores, tipo):
+    vetor = array(tipo, valores)
+    if sys.byteorder == 'big':
+        vetor.byteswap()
+    return vetor.tobytes()
+
+
+def _vetor(dados, tipo):
+    vetor = array(tipo)
+    vetor.frombytes(dados)
+    if sys.byteorder == 'big':
+        vetor.byteswap()
+    return vetor
+
+
+def _codificar_coluna(codificacao, valores):
+    """Bloco (bytes) da coluna e se ele guarda deltas"""
+    if codificacao == 'texto':
+        dicionario, indices = {}, []
+        for valor in valores:
+            indices.append(dicionario.setdefault(valor, len(dicionario)))
+        cabecalho = json.dumps(list(dicionario), ensure_ascii=False).encode('utf-8')
+        return struct.pack('<I', len(cabecalho)) + cabecalho + _bytes(indices, 'I'), False
+    if codificacao == 'real':
+        return _bytes([math.nan if v is None else v for v in valores], 'd'), False
+
+    if codificacao == 'dias':
+        inteiros = [NULO if v is None else v.toordinal() for v in valores]
+    elif codificacao == 'momento':
+        inteiros = [NULO if v is None else (v - EPOCA) // timedelta(microseconds=1) for v in valores]
+    else:
+        inteiros = [NULO if v is None else v for v in valores]
+    if inteiros and NULO not in inteiros:
+        # Coluna sem nulos (ex.: data, já ordenada): deltas pequenos comprimem melhor
+        return _bytes([b - a for a, b in zip([0] + inteiros, inteiros)], 'q'), True
+    return _bytes(inteiros, 'q'), False
+
+
+def gravar_colunas(caminho, linhas):
+    """Grava as linhas (dicts com as colunas de Transacao) em `caminho` de forma atômica"""
+    blocos, colunas, posicao = [], [], 0
+    for coluna in COLUNAS:
+        codificacao = CODIFICACOES[coluna.name]
+        bloco, delta = _codificar_coluna(codificacao, [linha.get(coluna.name) for linha in linhas])
+        bloco = zlib.compress(bloco, 9)
+        colunas.append({'nome': coluna.name, 'codificacao': codificacao, 'delta': delta,
+                        'inicio': posicao, 'tamanho': len(bloco)})
+        blocos.append(bloco)
+        posicao += len(bloco)
+
+    cabecalho = json.dumps({'linhas': len(linhas), 'colunas': colunas}).encode('utf-8')
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(MAGIA + struct.pack('<I', len(cabecalho)) + cabecalho)
+        for bloco in blocos:
+            arquivo.write(bloco)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+    return os.path.getsize(caminho)
+
+
+class ArquivoColunar:
+    """Leitura preguiçosa de um .tcol: cada coluna é descomprimida na primeira vez que é pedida"""
+
+    def __init__(self, conteudo):
+        if not conteudo.startswith(MAGIA):
+            raise ValueError('Arquivo de transações inválido')
+        tamanho, = struct.unpack_from('<I', conteudo, len(MAGIA))
+        inicio = len(MAGIA) + 4
+        cabecalho = json.loads(conteudo[inicio:inicio + tamanho])
+        self.linhas = cabecalho['linhas']
+        self._colunas = {c['nome']: c for c in cabecalho['colunas']}
+        self._dados = memoryview(conteudo)[inicio + tamanho:]
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _bloco(self, nome):
+        coluna = self._colunas[nome]
+        return coluna, zlib.decompress(self._dados[coluna['inicio']:coluna['inicio'] + coluna['tamanho']])
+
+    def codigos(self, nome):
+        """(dicionário, índices) de uma coluna de texto; filtros comparam só os índices"""
+        chave = ('codigos', nome)
+        if chave not in self._cache:
+            if nome not in self._colunas:
+                return [None], array('I', [0]) * self.linhas
+            _, bloco = self._bloco(nome)
+            tamanho, = struct.unpack_from('<I', bloco)
+            dicionario = json.loads(bloco[4:4 + tamanho])
+            with self._lock:
+                self._cache[chave] = (dicionario, _vetor(bloco[4 + tamanho:], 'I'))
+        return self._cache[chave]
+
+    def inteiros(self, nome):
+        """Valores int64 crus de uma coluna de inteiros, dias ou momentos (nulos = NULO)"""
+        chave = ('inteiros', nome)
+        if chave not in self._cache:
+            if nome not in self._colunas:
+                return array('q', [NULO]) * self.linhas
+            coluna, bloco = self._bloco(nome)
+            vetor = _vetor(bloco, 'q')
+            if coluna['delta']:
+                acumulado = 0
+                for i, delta in enumerate(vetor):
+                    acumulado += delta
+                    vetor[i] = acumulado
+            with self._lock:
+                self._cache[chave] = vetor
+        return self._cache[chave]
+
+    def valores(self, nome):
+        """Coluna decodificada como lista de valores Python"""
+        chave = ('valores', nome)
+        if chave in self._cache:
+            return self._cache[chave]
+        codificacao = self._colunas[nome]['codificacao'] if nome in self._colunas else CODIFICACOES.get(nome)
+        if codificacao == 'texto':
+            dicionario, indices = self.codigos(nome)
+            valores = [dicionario[i] for i in indices]
+        elif codificacao == 'real':
+            if nome in self._colunas:
+                valores = [None if math.isnan(v) else v for v in _vetor(self._bloco(nome)[1], 'd')]
+            else:
+                valores = [None] * self.linhas
+        else:
+            inteiros = self.inteiros(nome)
+            if codificacao == 'dias':
+                valores = [None if v == NULO else date.fromordinal(v) for v in inteiros]
+            elif codificacao == 'momento':
+                valores = [None if v == NULO else EPOCA + timedelta(microseconds=v) for v in inteiros]
+            else:
+                valores = [None if v == NULO else v for v in inteiros]
+        with self._lock:
+            self._cache[chave] = valores
+        return valores
+
+    def todas(self):
+        """Todas as linhas como dicts (usado ao regravar o ano e ao restaurar)"""
+        colunas = {c.name: self.valores(c.name) for c in COLUNAS}
+        return [{nome: valores[i] for nome, valores in colunas.items()} for i in range(self.linhas)]
+
+
+# ========== ARQUIVOS POR USUÁRIO E ANO ==========
+_cache = OrderedDict()  # caminho -> (mtime_ns, ArquivoColunar)
+_lock = threading.Lock()
+
+
+def pasta(app):
+    """Pasta dos arquivos (ARQUIVO_DIR); vale também sem o init_app, quando o
+    módulo é carregado só para ler os arquivos de um usuário"""
+    return app.config.get('ARQUIVO_DIR') or os.environ.get('ARQUIVO_DIR') or os.path.join(app.instance_path, 'arquivo')
+
+
+def caminho(usuario_id, ano):
+    return os.path.join(pasta(current_app), str(usuario_id), f'{ano}.tcol')
+
+
+def abrir(usuario_id, ano):
+    """Arquivo do usuário no ano (None se não existir); os arquivos lidos ficam em um LRU"""
+    destino = caminho(usuario_id, ano)
+    try:
+        versao = os.stat(destino).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _lock:
+        entrada = _cache.get(destino)
+        if entrada is not None and entrada[0] == versao:
+            _cache.move_to_end(destino)
+            metricas.incrementar('cache_consultas_total', cache='arquivo', resultado='acerto')
+            return entrada[1]
+
+    metricas.incrementar('cache_consultas_total', cache='arquivo', resultado='falha')
+    with open(destino, 'rb') as arquivo:
+        lido = ArquivoColunar(arquivo.read())
+    with _lock:
+        _cache[destino] = (versao, lido)
+        _cache.move_to_end(destino)
+        while len(_cache) > ARQUIVOS_EM_CACHE:
+            _cache.popitem(last=False)
+    return lido
+
+
+corte = ArquivoTransacoes.corte
+
+
+def _selecionar(lido, inicio, fim, tipo=None, categoria=None, status=None, busca=None):
+    """Posições das linhas do arquivo que passam pelos filtros"""
+    datas = lido.inteiros('data')
+    minimo = inicio.toordinal() if inicio else NULO + 1
+    maximo = fim.toordinal() if fim else -NULO
+    posicoes = [i for i, d in enumerate(datas) if minimo <= d <= maximo]
+
+    for nome, valor in (('tipo', tipo), ('categoria', categoria), ('status', status)):
+        if valor is None or not posicoes:
+            continue
+        dicionario, indices = lido.codigos(nome)
+        aceitos = {i for i, v in enumerate(dicionario) if v == valor}
+        posicoes = [p for p in posicoes if indices[p] in aceitos]
+
+    if busca and posicoes:
+        termo = busca.lower()
+        candidatos = []
+        for nome in ('descricao', 'fornecedor'):
+            dicionario, indices = lido.codigos(nome)
+            aceitos = {i for i, v in enumerate(dicionario) if v and termo in v.lower()}
+            candidatos.append((indices, aceitos))
+        posicoes = [p for p in posicoes if any(indices[p] in aceitos for indices, aceitos in candidatos)]
+    return posicoes
+
+
+def linhas(usuario_id, inicio, fim, tipo=None, categoria=None, status=None, busca=None):
+    """Transações arquivadas do período como tuplas de CAMPOS_TRANSACAO, data desc"""
+    ate = corte(usuario_id)
+    if ate is None or (inicio and inicio > ate):
+        return []
+    fim = min(fim or ate, ate)
+    resultado = []
+    for ano in range(inicio.year if inicio else _primeiro_ano(usuario_id), fim.year + 1):
+        lido = abrir(usuario_id, ano)
+        if lido is None:
+            continue
+        posicoes = _selecionar(lido, inicio, fim, tipo, categoria, status, busca)
+        if not posicoes:
+            continue
+        colunas = [lido.valores(campo) for campo in CAMPOS_TRANSACAO]
+        resultado.extend(tuple(coluna[p] for coluna in colunas) for p in posicoes)
+    resultado.sort(key=lambda linha: (linha[3], linha[0]), reverse=True)
+    return resultado
+
+
+def _primeiro_ano(usuario_id):
+    return db.session.query(db.func.min(ArquivoTransacoes.ano)).filter(
+        ArquivoTransacoes.usuario_id == usuario_id
+    ).scalar() or date.today().year
+
+
+def somar(usuario_id, tipo, inicio, fim, ate=None):
+    """Soma dos valores arquivados do tipo no período
+
+    Meses inteiros vêm de resumos_arquivados; só os meses das pontas, se o período
+    começar ou terminar no meio deles, são lidos dos arquivos.
+    """
+    ate = ate or corte(usuario_id)
+    if ate is None or inicio > ate:
+        return 0.0
+    fim = min(fim, ate)
+    primeiro = inicio if inicio.day == 1 else fim_do_mes(inicio) + timedelta(days=1)
+    ultimo = fim if fim == fim_do_mes(fim) else fim.replace(day=1) - timedelta(days=1)
+
+    total = 0.0
+    if primeiro <= ultimo:
+        total += db.session.query(db.func.sum(ResumoArquivado.total)).filter(
+            ResumoArquivado.usuario_id == usuario_id,
+            ResumoArquivado.tipo == tipo,
+            ResumoArquivado.mes >= primeiro.strftime('%Y-%m'),
+            ResumoArquivado.mes <= ultimo.strftime('%Y-%m')
+        ).scalar() or 0.0
+        pontas = [(inicio, primeiro - timedelta(days=1)), (ultimo + timedelta(days=1), fim)]
+    else:
+        pontas = [(inicio, fim)]
+
+    for de, ate_ponta in pontas:
+        if de > ate_ponta:
+            continue
+        for ano in range(de.year, ate_ponta.year + 1):
+            lido = abrir(usuario_id, ano)
+            if lido is not None:
+                valores = lido.valores('valor')
+                total += sum(valores[p] or 0 for p in _selecionar(lido, de, ate_ponta, tipo))
+    return total
+
+
+def mesclar_arquivadas(query, projetadas, arquivadas, ate, offset, limite, serializar):
+    """Página (data desc) das transações do banco, das projetadas e das arquivadas
+
+    As arquivadas são todas anteriores a `ate`; no banco, antes dessa data, só
+    restam contas em aberto, poucas, que são intercaladas em memória.
+    """
+    if not arquivadas:
+        return mesclar_pagina(query, projetadas, offset, limite, serializar)
+
+    recentes = query.filter(Transacao.data > ate)
+    quantidade = recentes.count() + len(projetadas)
+    pagina = []
+    if offset < quantidade:
+        pagina = mesclar_pagina(recentes, projetadas, offset, limite, serializar)
+
+    restantes = limite - len(pagina)
+    if restantes > 0:
+        antigas = {linha[0]: tuple(linha) for linha in query.filter(Transacao.data <= ate).all()}
+        # Uma linha no banco e no arquivo (arquivamento interrompido) aparece uma vez só
+        antigas.update((linha[0], linha) for linha in arquivadas if linha[0] not in antigas)
+        ordenadas = sorted(antigas.values(), key=lambda linha: (linha[3], linha[0]), reverse=True)
+        inicio = max(0, offset - quantidade)
+        pagina.extend(serializar(linha) for linha in ordenadas[inicio:inicio + restantes])
+    return pagina
+
+
+# ========== ARQUIVAMENTO ==========
+def _resumir(usuario_id, linhas_ano):
+    """Soma os totais das linhas arquivadas em resumos_arquivados (sessão corrente)"""
+    somas = {}
+    for linha in linhas_ano:
+        chave = (linha['data'].strftime('%Y-%m'), linha['tipo'], linha['categoria'],
+                 linha['status'], linha['centro_custo_id'])
+        total, quantidade = somas.get(chave, (0.0, 0))
+        somas[chave] = (total + (linha['valor'] or 0), quantidade + 1)
+
+    existentes = {
+        (r.mes, r.tipo, r.categoria, r.status, r.centro_custo_id): r
+        for r in ResumoArquivado.query.filter(
+            ResumoArquivado.usuario_id == usuario_id,
+            ResumoArquivado.mes.in_(sorted({chave[0] for chave in somas}))
+        )
+    }
+    for chave, (total, quantidade) in somas.items():
+        resumo = existentes.get(chave)
+        if resumo is None:
+            mes, tipo, categoria, status, centro_custo_id = chave
+            db.session.add(ResumoArquivado(usuario_id=usuario_id, mes=mes, tipo=tipo, categoria=categoria,
+                                           status=status, centro_custo_id=centro_custo_id,
+                                           total=total, quantidade=quantidade))
+        else:
+            resumo.total += total
+            resumo.quantidade += quantidade
+
+
+def _arquivar_ano(usuario_id, ano, filtros, ate):
+    colunas = [getattr(Transacao, c.name) for c in COLUNAS]
+    novas = [
+        dict(zip((c.name for c in COLUNAS), linha))
+        for linha in db.session.query(*colunas).filter(
+            *filtros, Transacao.data >= date(ano, 1, 1), Transacao.data <= date(ano, 12, 31)
+        )
+    ]
+    if not novas:
+        return 0
+
+    destino = caminho(usuario_id, ano)
+    anterior = None
+    if os.path.exists(destino):
+        with open(destino, 'rb') as arquivo:
+            anterior = arquivo.read()
+        mescladas = {linha['id']: linha for linha in ArquivoColunar(anterior).todas()}
+    else:
+        mescladas = {}
+    mescladas.update((linha['id'], linha) for linha in novas)
+    ordenadas = sorted(mescladas.values(), key=lambda linha: (linha['data'], linha['id']))
+
+    # O arquivo vai para o disco antes do commit; se o commit falhar, volta o anterior
+    tamanho = gravar_colunas(destino, ordenadas)
+    try:
+        ids = [linha['id'] for linha in novas]
+        for i in range(0, len(ids), LOTE_EXCLUSAO):
+            lote = ids[i:i + LOTE_EXCLUSAO]
+            Notificacao.query.filter(Notificacao.transacao_id.in_(lote)).delete(synchronize_session=False)
+            Transacao.query.filter(Transacao.id.in_(lote)).delete(synchronize_session=False)
+        _resumir(usuario_id, novas)
+
+        cobertura = min(ate, date(ano, 12, 31))
+        registro = ArquivoTransacoes.query.filter_by(usuario_id=usuario_id, ano=ano).first()
+        if registro is None:
+            registro = ArquivoTransacoes(usuario_id=usuario_id, ano=ano, arquivado_ate=cobertura)
+            db.session.add(registro)
+        registro.quantidade = len(ordenadas)
+        registro.tamanho = tamanho
+        registro.arquivado_ate = max(registro.arquivado_ate, cobertura)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if anterior is None:
+            os.remove(destino)
+        else:
+            with open(destino, 'wb') as arquivo:
+                arquivo.write(anterior)
+        raise
+    return len(novas)
+
+
+def arquivar_usuario(usuario_id, limite):
+    """Move para os arquivos as transações fechadas do usuário anteriores a `limite`
+
+    `limite` é o primeiro dia de um mês, então os meses arquivados ficam inteiros.
+    Cada ano é gravado e confirmado separadamente. Se o processo cair entre a
+    gravação do arquivo e o commit, as linhas ficam nos dois lugares e a próxima
+    execução completa a mudança (o id da transação é a chave no arquivo).
+    """
+    ate = limite - timedelta(days=1)
+    modelos = db.session.query(RegraRecorrencia.transacao_id).filter(RegraRecorrencia.usuario_id == usuario_id)
+    filtros = (
+        Transacao.usuario_id == usuario_id,
+        Transacao.data < limite,
+        Transacao.status.notin_(STATUS_ABERTOS),
+        Transacao.id.notin_(modelos)
+    )
+    ano = db.func.cast(db.func.strftime('%Y', Transacao.data), db.Integer)
+    anos = sorted(a for a, in db.session.query(ano).filter(*filtros).distinct())
+    db.session.commit()
+    return sum(_arquivar_ano(usuario_id, a, filtros, ate) for a in anos)
+
+
+def limite_do_horizonte(meses, hoje=None):
+    """Primeiro dia do mês a partir do qual as transações ficam no banco"""
+    if meses < HORIZONTE_MINIMO:
+        raise ValueError(f'O horizonte mínimo é de {HORIZONTE_MINIMO} meses')
+    return somar_meses((hoje or date.today()).replace(day=1), -meses)
+
+
+def arquivar(meses=None, usuario_id=None, hoje=None):
+    """Arquiva as transações antigas de todos os usuários (ou de um), inquilino a inquilino
+
+    Retorna {usuario_id: quantidade arquivada}.
+    """
+    limite = limite_do_horizonte(meses or current_app.config['ARQUIVO_HORIZONTE_MESES'], hoje)
+    filtros = [Usuario.id == usuario_id] if usuario_id is not None else []
+    arquivadas = {}
+    for nome, usuarios in inquilinos.usuarios_por_inquilino(*filtros).items():
+        with inquilinos.usando(nome if inquilinos.roteador.ativo else None):
+            for uid in usuarios:
+                arquivadas[uid] = arquivar_usuario(uid, limite)
+    return arquivadas
+
+
+def restaurar(usuario_id, ano):
+    """Devolve à tabela transacoes as linhas do arquivo do ano e apaga o arquivo"""
+    destino = caminho(usuario_id, ano)
+    lido = abrir(usuario_id, ano)
+    if lido is None:
+        return 0
+    linhas_ano = lido.todas()
+    existentes = {
+        i for i, in db.session.query(Transacao.id).filter(Transacao.id.in_([linha['id'] for linha in linhas_ano]))
+    }
+    novas = [linha for linha in linhas_ano if linha['id'] not in existentes]
+    if novas:
+        # As chaves saem dos textos: arquivos gravados antes das dimensões só têm o texto
+        db.session.execute(Transacao.__table__.insert(), dimensoes.codificar_linhas(db.session, usuario_id, novas))
+    ResumoArquivado.query.filter(
+        ResumoArquivado.usuario_id == usuario_id,
+        ResumoArquivado.mes >= f'{ano}-01',
+        ResumoArquivado.mes <= f'{ano}-12'
+    ).delete(synchronize_session=False)
+    ArquivoTransacoes.query.filter_by(usuario_id=usuario_id, ano=ano).delete(synchronize_session=False)
+    db.session.commit()
+    os.remove(destino)
+    return len(linhas_ano)
+
+
+# ========== FLASK ==========
+grupo = AppGroup('arquivo', help='Arquivamento de transações antigas')
+
+
+@grupo.command('executar')
+@click.option('--meses', type=int, help='Meses mantidos no banco (padrão: ARQUIVO_HORIZONTE_MESES)')
+@click.option('--usuario', type=int, help='Só este usuário')
+def comando_executar(meses, usuario):
+    """Move as transações fechadas anteriores ao horizonte para os arquivos"""
+    try:
+        arquivadas = arquivar(meses, usuario)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--meses')
+    print(f'✅ {sum(arquivadas.values())} transações arquivadas de {len(arquivadas)} usuários')
+
+
+@grupo.command('listar')
+def comando_listar():
+    """Arquivos por usuário e ano"""
+    for nome in inquilinos.conhecidos() if inquilinos.roteador.ativo else [None]:
+        with inquilinos.usando(nome):
+            for r in ArquivoTransacoes.query.order_by(ArquivoTransacoes.usuario_id, ArquivoTransacoes.ano):
+                print(f'usuário {r.usuario_id:6} {r.ano}  {r.quantidade:8} transações  '
+                      f'{(r.tamanho or 0) / 1024:.0f} KB  até {r.arquivado_ate.isoformat()}')
+
+
+@grupo.command('restaurar')
+@click.argument('usuario', type=int)
+@click.argument('ano', type=int)
+def comando_restaurar(usuario, ano):
+    """Devolve ao banco as transações arquivadas do usuário no ano"""
+    nome = None
+    if inquilinos.roteador.ativo:
+        nome = inquilinos.inquilino_de(db.session.get(Usuario, usuario))
+    with inquilinos.usando(nome):
+        print(f'✅ {restaurar(usuario, ano)} transações restauradas')
+
+
+def init_app(app):
+    """Lê a pasta e o horizonte do arquivamento e registra o comando `arquivo`"""
+    app.config.setdefault('ARQUIVO_DIR', pasta(app))
+    app.config.setdefault(
+        'ARQUIVO_HORIZONTE_MESES', int(os.environ.get('ARQUIVO_HORIZONTE_MESES', HORIZONTE_PADRAO))
+    )
+    app.cli.add_command(grupo)
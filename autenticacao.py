@@ -0,0 +1,269 @@
+"""
+Autenticação sob Carga
+O hash de senha (PBKDF2/scrypt) é o trecho mais caro do login. Aqui ele roda em
+um pool limitado de threads por processo: o hashlib libera o GIL durante o
+cálculo, então um worker gthread usa vários núcleos, e a fila tem tamanho máximo.
+Quando está cheia o pedido é recusado na hora (503 + Retry-After) em vez de
+esperar atrás de centenas de hashes.
+
+Antes de qualquer hash, cada tentativa consome uma ficha de dois baldes (token
+bucket): um por IP e um por conta. Os baldes ficam em um SQLite local
+(instance/limites.db), compartilhado por todos os workers da máquina.
+
+Se o método de hash configurado (SENHA_METODO) mudar, a senha é refeita de forma
+transparente no próximo login bem-sucedido.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TempoEsgotado
+
+from flask import current_app, request
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+import metricas
+
+
+METODO_PADRAO = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+LIMITE_IP_PADRAO = '100/60'     # fichas/segundos: rajada de 100, repõe 100 por minuto
+LIMITE_CONTA_PADRAO = '5/60'
+FRACAO_LIMPEZA = 0.01           # fração das consultas que também apaga baldes cheios
+
+
+class Sobrecarga(Exception):
+    """Fila de hashing cheia ou resposta demorada demais: recusar com 503"""
+
+
+class LimiteExcedido(Exception):
+    """Sem fichas no balde do IP ou da conta: recusar com 429"""
+
+    def __init__(self, espera):
+        super().__init__(f'Tente novamente em {espera} s')
+        self.espera = espera
+
+
+# ========== MÉTODO DE HASH ==========
+def normalizar_metodo(metodo):
+    """Método completo como aparece no hash ('pbkdf2' -> 'pbkdf2:sha256:600000')"""
+    partes = metodo.split(':')
+    if partes[0] == 'pbkdf2':
+        padrao = ['pbkdf2', 'sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    elif partes[0] == 'scrypt':
+        padrao = ['scrypt', str(2 ** 15), '8', '1']
+    else:
+        return metodo
+    return ':'.join(partes + padrao[len(partes):])
+
+
+def precisa_rehash(senha_hash, metodo):
+    return senha_hash.split('$', 1)[0] != normalizar_metodo(metodo)
+
+
+# ========== EXECUTOR LIMITADO ==========
+class ExecutorHash:
+    """Pool de threads para hashing com admissão limitada (threads + fila)"""
+
+    def __init__(self):
+        self.threads = 0
+        self.fila = 0
+        self._pool = None
+        self._vagas = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._descartar)
+
+    def configurar(self, threads, fila):
+        with self._lock:
+            self.threads = threads
+            self.fila = fila
+            self._descartar()
+
+    def _descartar(self):
+        # Threads não sobrevivem ao fork: cada processo cria o próprio pool
+        self._pool = None
+        self._vagas = None
+
+    def _garantir_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._vagas = threading.BoundedSemaphore(self.threads + self.fila)
+                    self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix='hash-senha')
+        return self._pool
+
+    def executar(self, funcao, *args, timeout=None):
+        """Roda `funcao(*args)` no pool; levanta Sobrecarga se não houver vaga ou estourar o timeout"""
+        if self.threads <= 0:
+            return funcao(*args)
+
+        pool = self._garantir_pool()
+        vagas = self._vagas
+        if not vagas.acquire(blocking=False):
+            raise Sobrecarga('Fila de autenticação cheia')
+        metricas.ajustar('login_hash_pendentes', 1)
+
+        def liberar(_):
+            metricas.ajustar('login_hash_pendentes', -1)
+            vagas.release()
+
+        try:
+            futuro = pool.submit(funcao, *args)
+        except BaseException:
+            liberar(None)
+            raise
+        futuro.add_done_callback(liberar)
+        try:
+            return futuro.result(timeout)
+        except TempoEsgotado:
+            raise Sobrecarga('Tempo de autenticação esgotado')
+
+
+executor = ExecutorHash()
+
+
+# ========== TOKEN BUCKET ==========
+def _parse_limite(texto):
+    fichas, segundos = texto.split('/')
+    capacidade = float(fichas)
+    return capacidade, capacidade / float(segundos)
+
+
+class Limitador:
+    """Baldes de fichas por chave em um SQLite local compartilhado entre processos"""
+
+    def __init__(self):
+        self.caminho = None
+        self._local = threading.local()
+
+    def configurar(self, caminho):
+        self.caminho = caminho
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with self._conexao() as conexao:
+            conexao.execute(
+                'CREATE TABLE IF NOT EXISTS baldes ('
+                'chave TEXT PRIMARY KEY, fichas REAL NOT NULL, atualizado REAL NOT NULL, cheio_em REAL NOT NULL)'
+            )
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None or self._local.pid != os.getpid() or self._local.caminho != self.caminho:
+            conexao = sqlite3.connect(self.caminho, timeout=5, isolation_level=None, check_same_thread=False)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexao, self._local.pid, self._local.caminho = conexao, os.getpid(), self.caminho
+        return conexao
+
+    def consumir(self, baldes):
+        """Tira uma ficha de cada balde [(chave, capacidade, taxa)] ou de nenhum
+
+        Levanta LimiteExcedido com a espera (s) até haver ficha em todos.
+        """
+        agora = time.time()
+        conexao = self._conexao()
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            marcadores = ','.join('?' * len(baldes))
+            atuais = {
+                chave: (fichas, atualizado) for chave, fichas, atualizado in conexao.execute(
+                    f'SELECT chave, fichas, atualizado FROM baldes WHERE chave IN ({marcadores})',
+                    [chave for chave, _, _ in baldes]
+                )
+            }
+            novos = []
+            espera = 0.0
+            for chave, capacidade, taxa in baldes:
+                fichas, atualizado = atuais.get(chave, (capacidade, agora))
+                fichas = min(capacidade, fichas + (agora - atualizado) * taxa)
+                if fichas < 1:
+                    espera = max(espera, (1 - fichas) / taxa)
+                novos.append((chave, fichas - 1, agora, agora + (capacidade - fichas + 1) / taxa))
+
+            if espera:
+                conexao.execute('ROLLBACK')
+                raise LimiteExcedido(max(1, int(espera + 0.999)))
+
+            conexao.executemany('INSERT OR REPLACE INTO baldes VALUES (?, ?, ?, ?)', novos)
+            if random.random() < FRACAO_LIMPEZA:
+                # Balde que já estaria cheio equivale a não existir
+                conexao.execute('DELETE FROM baldes WHERE cheio_em < ?', (agora,))
+            conexao.execute('COMMIT')
+        except sqlite3.Error:
+            conexao.execute('ROLLBACK')
+            raise
+
+    def limpar(self):
+        with self._conexao() as conexao:
+            conexao.execute('DELETE FROM baldes')
+
+
+limitador = Limitador()
+
+
+# ========== LOGIN ==========
+def ip_cliente():
+    """IP de quem fez o pedido, saltando os LOGIN_PROXIES proxies confiáveis na frente do app"""
+    proxies = current_app.config['LOGIN_PROXIES']
+    rota = request.access_route
+    if proxies and len(rota) >= proxies:
+        return rota[-proxies]
+    return request.remote_addr
+
+
+def verificar_tentativa(ip, email):
+    """Consome as fichas do IP e da conta antes do hash; levanta LimiteExcedido"""
+    baldes = []
+    for prefixo, chave, limite in (
+        ('ip', ip, current_app.config['LOGIN_LIMITE_IP']),
+        ('conta', (email or '').strip().lower(), current_app.config['LOGIN_LIMITE_CONTA'])
+    ):
+        if limite and chave:
+            capacidade, taxa = _parse_limite(limite)
+            baldes.append((f'{prefixo}:{chave}', capacidade, taxa))
+    if not baldes:
+        return
+    try:
+        limitador.consumir(baldes)
+    except sqlite3.Error as e:
+        # Sem o arquivo de limites o login continua funcionando, só sem throttle
+        current_app.logger.warning(f'Limitador de login indisponível: {e}')
+
+
+def autenticar(usuario, senha):
+    """Confere a senha no pool limitado e refaz o hash se o método mudou
+
+    Retorna True/False; levanta Sobrecarga se não houver vaga no pool.
+    """
+    timeout = current_app.config['LOGIN_TIMEOUT']
+    if not executor.executar(check_password_hash, usuario.senha_hash, senha, timeout=timeout):
+        return False
+
+    if precisa_rehash(usuario.senha_hash, current_app.config['SENHA_METODO']):
+        try:
+            definir_senha(usuario, senha)
+        except Sobrecarga:
+            pass  # fica para o próximo login
+    return True
+
+
+def definir_senha(usuario, senha):
+    """Gera o hash pelo pool limitado com o método configurado; levanta Sobrecarga"""
+    usuario.senha_hash = executor.executar(
+        generate_password_hash, senha, current_app.config['SENHA_METODO'],
+        timeout=current_app.config['LOGIN_TIMEOUT']
+    )
+
+
+def init_app(app):
+    """Lê a configuração do pool, dos limites e do método de hash"""
+    app.config.setdefault('SENHA_METODO', os.environ.get('SENHA_METODO', METODO_PADRAO))
+    app.config.setdefault('LOGIN_THREADS', int(os.environ.get('LOGIN_THREADS', min(4, os.cpu_count() or 1))))
+    app.config.setdefault('LOGIN_FILA', int(os.environ.get('LOGIN_FILA', 32)))
+    app.config.setdefault('LOGIN_TIMEOUT', float(os.environ.get('LOGIN_TIMEOUT', 10)))
+    app.config.setdefault('LOGIN_LIMITE_IP', os.environ.get('LOGIN_LIMITE_IP', LIMITE_IP_PADRAO))
+    app.config.setdefault('LOGIN_LIMITE_CONTA', os.environ.get('LOGIN_LIMITE_CONTA', LIMITE_CONTA_PADRAO))
+    app.config.setdefault('LOGIN_PROXIES', int(os.environ.get('LOGIN_PROXIES', 0)))
+    app.config.setdefault('LIMITES_DB', os.environ.get('LIMITES_DB') or os.path.join(app.instance_path, 'limites.db'))
+
+    executor.configurar(app.config['LOGIN_THREADS'], app.config['LOGIN_FILA'])
+    limitador.configurar(app.config['LIMITES_DB'])
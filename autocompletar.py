@@ -0,0 +1,283 @@
+"""
+Autocompletar com Tolerância a Erros de Digitação
+Índice de trigramas por usuário sobre os valores distintos de `fornecedor` e
+`descricao` (normalizados: minúsculas, sem acentos nem pontuação), no estilo do
+pg_trgm: cada palavra vira os trigramas de "  palavra ". Uma busca soma, por valor,
+quantos trigramas da consulta ele contém; "kalnuga" ainda acha "Kalunga".
+
+Layout em memória: os valores ficam em listas paralelas (texto normalizado, texto
+exibido, campo, frequência e número de trigramas, as três últimas em `array`) e
+cada trigrama aponta para um `array('I')` com os índices dos valores. As listas de
+postagem são lidas da mais rara para a mais comum, parando em LIMITE_POSTAGENS;
+os melhores candidatos são pontuados pelos trigramas em comum e pela frequência de
+uso.
+
+O índice é montado na primeira busca do usuário (uma consulta agrupada por
+campo) e mantido por AUTOCOMPLETAR_CACHE_TTL segundos; inserções, edições e
+exclusões de transações do próprio processo são aplicadas ao confirmar. O índice
+guarda o carimbo de versão do usuário (veja eventos.py) e o confere no máximo a
+cada VERSOES_VERIFICACAO segundos: se outro worker gravou, é remontado.
+"""
+import heapq
+import math
+import os
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from operator import itemgetter
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import eventos
+import metricas
+from extensions import db
+from models import Transacao, Fornecedor
+from textos import normalizar_texto
+
+
+CAMPOS = ('fornecedor', 'descricao')
+TTL_PADRAO = 300
+USUARIOS_EM_CACHE = 200
+TAMANHO_MAXIMO = 100          # caracteres indexados de cada valor
+LIMITE_POSTAGENS = 20000      # entradas de postagem lidas por busca
+CANDIDATOS = 32               # melhores contagens parciais pontuadas de verdade
+COBERTURA_MINIMA = 0.4        # fração dos trigramas da consulta presentes no valor
+PESO_FREQUENCIA = 0.1
+SUGESTOES_PADRAO = 8
+SUGESTOES_MAXIMAS = 20
+
+_cache = OrderedDict()  # usuario_id -> {'indice', 'versao', 'criado_em', 'verificado_em'}
+_lock = threading.Lock()
+
+
+# ========== TRIGRAMAS ==========
+def trigramas(texto):
+    """Trigramas de um texto já normalizado (cada palavra com dois espaços antes e um depois)"""
+    resultado = set()
+    for palavra in texto.split():
+        palavra = f'  {palavra} '
+        resultado.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return resultado
+
+
+class Indice:
+    """Valores distintos de um usuário e as listas de postagem por trigrama"""
+
+    def __init__(self):
+        self.textos = []              # texto normalizado
+        self.exibicao = []            # como foi digitado (o mais recente)
+        self.campos = array('B')      # posição em CAMPOS
+        self.frequencias = array('l')
+        self.tamanhos = array('H')    # número de trigramas do valor
+        self.posicoes = {}            # (campo, texto normalizado) -> índice
+        self.postagens = {}           # trigrama -> array('I') de índices
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.textos)
+
+    def somar(self, campo, texto, delta):
+        """Soma `delta` usos ao valor, criando-o se for novo"""
+        normalizado = normalizar_texto(texto)[:TAMANHO_MAXIMO]
+        if not normalizado:
+            return
+        chave = (CAMPOS.index(campo), normalizado)
+        posicao = self.posicoes.get(chave)
+        if posicao is None:
+            if delta <= 0:
+                return
+            posicao = len(self.textos)
+            tris = trigramas(normalizado)
+            self.textos.append(normalizado)
+            self.exibicao.append(texto.strip())
+            self.campos.append(chave[0])
+            self.frequencias.append(0)
+            self.tamanhos.append(len(tris))
+            self.posicoes[chave] = posicao
+            for trigrama in tris:
+                lista = self.postagens.get(trigrama)
+                if lista is None:
+                    lista = self.postagens[trigrama] = array('I')
+                lista.append(posicao)
+        elif delta > 0:
+            self.exibicao[posicao] = texto.strip()
+        # Valores sem uso ficam no índice (postagens só crescem) e são ignorados na busca
+        self.frequencias[posicao] = max(0, self.frequencias[posicao] + delta)
+
+    def buscar(self, consulta, limite=SUGESTOES_PADRAO, campo=None):
+        """[(pontuação, índice, cobertura)] dos valores mais parecidos com a consulta"""
+        normalizado = normalizar_texto(consulta)[:TAMANHO_MAXIMO]
+        tris = trigramas(normalizado)
+        if not tris:
+            return []
+        listas = sorted((self.postagens[t] for t in tris if t in self.postagens), key=len)
+        contagens = Counter()
+        lidas, completas = 0, True
+        for lista in listas:
+            if lidas and lidas + len(lista) > LIMITE_POSTAGENS:
+                completas = False
+                break
+            contagens.update(lista)
+            lidas += len(lista)
+
+        # Filtra antes de escolher os candidatos: valores do outro campo (ou sem uso) não
+        # podem ocupar as vagas dos que servem
+        filtro = None if campo is None else CAMPOS.index(campo)
+        candidatos = (
+            item for item in contagens.items()
+            if self.frequencias[item[0]] > 0 and (filtro is None or self.campos[item[0]] == filtro)
+        )
+        resultados = []
+        for posicao, comuns in heapq.nlargest(CANDIDATOS, candidatos, key=itemgetter(1)):
+            if not completas:
+                # Listas comuns ficaram de fora: conta os trigramas em comum de verdade
+                comuns = len(tris & trigramas(self.textos[posicao]))
+            cobertura = comuns / len(tris)
+            if cobertura < COBERTURA_MINIMA:
+                continue
+            jaccard = comuns / (len(tris) + self.tamanhos[posicao] - comuns)
+            prefixo = 0.1 if self.textos[posicao].startswith(normalizado) else 0.0
+            pontuacao = (0.7 * cobertura + 0.3 * jaccard + prefixo) * (
+                1 + PESO_FREQUENCIA * math.log1p(self.frequencias[posicao])
+            )
+            resultados.append((pontuacao, posicao, cobertura))
+        return heapq.nlargest(limite, resultados)
+
+
+# ========== ÍNDICE POR USUÁRIO ==========
+def _construir(usuario_id):
+    indice = Indice()
+    for texto, quantidade in db.session.query(Fornecedor.nome, db.func.count(Transacao.id)).join(
+        Transacao, Transacao.fornecedor_id == Fornecedor.id
+    ).filter(Transacao.usuario_id == usuario_id).group_by(Fornecedor.id):
+        indice.somar('fornecedor', texto, quantidade)
+    for texto, quantidade in db.session.query(Transacao.descricao, db.func.count(Transacao.id)).filter(
+        Transacao.usuario_id == usuario_id, Transacao.descricao != None, Transacao.descricao != ''
+    ).group_by(Transacao.descricao):
+        indice.somar('descricao', texto, quantidade)
+    return indice
+
+
+def _indice(usuario_id):
+    ttl = current_app.config.get('AUTOCOMPLETAR_CACHE_TTL', TTL_PADRAO)
+    intervalo = current_app.config.get('VERSOES_VERIFICACAO', eventos.VERIFICACAO_PADRAO)
+    agora = time.monotonic()
+    versao = None
+    with _lock:
+        entrada = _cache.get(usuario_id)
+    if entrada is not None and agora - entrada['criado_em'] < ttl:
+        valida = agora - entrada['verificado_em'] < intervalo
+        if not valida:
+            versao = eventos.versao(usuario_id)
+            with _lock:
+                # Um commit local pode ter avançado a versão da entrada enquanto lia o carimbo
+                valida = entrada['versao'] >= versao
+                if valida:
+                    entrada['verificado_em'] = agora
+        if valida:
+            with _lock:
+                if _cache.get(usuario_id) is entrada:
+                    _cache.move_to_end(usuario_id)
+            metricas.incrementar('cache_consultas_total', cache='autocompletar', resultado='acerto')
+            return entrada['indice']
+
+    metricas.incrementar('cache_consultas_total', cache='autocompletar', resultado='falha')
+    # Lida antes dos dados: uma escrita no meio da montagem deixa o índice já vencido
+    if versao is None:
+        versao = eventos.versao(usuario_id)
+    indice = _construir(usuario_id)
+    agora = time.monotonic()
+    with _lock:
+        atual = _cache.get(usuario_id)
+        if atual is None or atual['versao'] <= versao:
+            _cache[usuario_id] = {'indice': indice, 'versao': versao, 'criado_em': agora, 'verificado_em': agora}
+            _cache.move_to_end(usuario_id)
+        while len(_cache) > USUARIOS_EM_CACHE:
+            _cache.popitem(last=False)
+    return indice
+
+
+def _descartar():
+    _cache.clear()
+
+
+os.register_at_fork(after_in_child=_descartar)
+
+
+def sugerir(usuario_id, consulta, limite=SUGESTOES_PADRAO, campo=None):
+    """Valores de fornecedor/descrição parecidos com a consulta, dos mais prováveis"""
+    indice = _indice(usuario_id)
+    with indice.lock:
+        encontrados = indice.buscar(consulta, limite, campo)
+        return [{
+            'texto': indice.exibicao[posicao],
+            'campo': CAMPOS[indice.campos[posicao]],
+            'frequencia': indice.frequencias[posicao],
+            'similaridade': round(cobertura, 3)
+        } for _, posicao, cobertura in encontrados]
+
+
+# ========== ATUALIZAÇÃO INCREMENTAL ==========
+def _registrar(target, sinal, anterior=False):
+    alteracoes = db.inspect(target).session.info.setdefault('autocompletar_alteracoes', [])
+    for campo in CAMPOS:
+        texto = target.anterior(campo) if anterior else getattr(target, campo)
+        if texto:
+            alteracoes.append((target.usuario_id, campo, texto, sinal))
+
+
+@event.listens_for(Transacao, 'after_insert')
+def _apos_inserir(mapper, connection, target):
+    _registrar(target, 1)
+
+
+@event.listens_for(Transacao, 'after_update')
+def _apos_atualizar(mapper, connection, target):
+    if any(target.alterado(campo) for campo in CAMPOS):
+        _registrar(target, -1, anterior=True)
+        _registrar(target, 1)
+
+
+@event.listens_for(Transacao, 'after_delete')
+def _apos_excluir(mapper, connection, target):
+    _registrar(target, -1, anterior=True)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apos_commit(session):
+    alteracoes = session.info.pop('autocompletar_alteracoes', None) or []
+    versoes = eventos.versoes_gravadas(session)
+    if not alteracoes and not versoes:
+        return
+    indices = {}
+    with _lock:
+        for usuario_id in {*versoes, *(a[0] for a in alteracoes)}:
+            entrada = _cache.get(usuario_id)
+            if entrada is None:
+                continue
+            versao = versoes.get(usuario_id)
+            if versao is not None:
+                # Só dá para aplicar em cima da versão imediatamente anterior à deste commit
+                if entrada['versao'] != versao - 1:
+                    del _cache[usuario_id]
+                    continue
+                entrada['versao'] = versao
+            indices[usuario_id] = entrada['indice']
+    for usuario_id, campo, texto, sinal in alteracoes:
+        indice = indices.get(usuario_id)
+        if indice is not None:
+            with indice.lock:
+                indice.somar(campo, texto, sinal)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _apos_rollback(session):
+    session.info.pop('autocompletar_alteracoes', None)
+
+
+def init_app(app):
+    """Lê o TTL dos índices em memória"""
+    app.config.setdefault('AUTOCOMPLETAR_CACHE_TTL', float(os.environ.get('AUTOCOMPLETAR_CACHE_TTL', TTL_PADRAO)))
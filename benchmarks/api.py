@@ -0,0 +1,342 @@
+"""
+Benchmark da API
+Popula um banco na escala pedida (com o gerador do add_sample_data.py, milhares
+de usuários e milhões de transações) e mede todos os endpoints /api/*:
+
+  - em processo, pelo test client do Flask (com contagem de consultas SQL)
+  - opcionalmente por um gunicorn real (--gunicorn), com clientes concorrentes
+
+Para cada endpoint são registrados p50/p95/p99, vazão e consultas por pedido.
+O resultado é gravado em JSON para comparar execuções (--comparar).
+
+Uso (na raiz do projeto):
+    python benchmarks/api.py --transacoes 10000 --usuarios 10
+    python benchmarks/api.py --transacoes 1000000 --usuarios 1000 --banco /tmp/bench.db --gunicorn
+    python benchmarks/api.py --comparar benchmarks/resultados/base.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+LIMIAR_REGRESSAO = 1.20  # p95 20% maior que a base
+DIFERENCA_MINIMA_MS = 1.0  # abaixo disso a variação é ruído de medição
+
+
+# ========== ENDPOINTS ==========
+# (método, url, corpo); {id} é uma transação do usuário logado
+ENDPOINTS = [
+    ('GET', '/api/dashboard/estatisticas', None),
+    ('GET', '/api/transacoes?limite=20', None),
+    ('GET', '/api/transacoes?limite=500&data_inicio=2000-01-01&data_fim={hoje}', None),
+    ('GET', '/api/transacoes?busca=Empresa', None),
+    ('GET', '/api/transacoes/{id}', None),
+    ('PUT', '/api/transacoes/{id}', {'observacoes': 'benchmark'}),
+    ('POST', '/api/transacoes', {'descricao': 'Benchmark', 'valor': 10.5, 'data': '{hoje}',
+                                 'categoria': 'operacionais', 'data_vencimento': '{hoje}'}),
+    ('GET', '/api/previsao/fluxo-caixa?dias=90', None),
+    ('GET', '/api/notificacoes', None),
+    ('POST', '/api/notificacoes/lidas', {'todas': True}),
+    ('GET', '/api/recorrencias', None),
+    ('POST', '/api/precificacao/calcular', {'custo_produto': 100, 'custos_adicionais_pct': 10,
+                                            'multiplicador': 2, 'impostos_pct': 8}),
+    ('GET', '/api/analise/indicadores', None),
+    ('GET', '/api/analise/comparativo', None),
+    ('GET', '/api/analise/comparativo?granularidade=trimestral&inicio=2020-01&dimensao=categoria', None),
+    ('POST', '/api/analise/exportar', {'formato': 'pdf'}),
+    ('GET', '/api/relatorios/historico', None),
+    ('POST', '/api/relatorios/gerar', {'tipo': 'despesas', 'formato': 'csv'}),
+    ('POST', '/api/relatorios/agendar', {'tipo': 'despesas', 'formato': 'pdf',
+                                         'data_agendamento': '{hoje}', 'frequencia': 'mensal'}),
+    ('GET', '/api/transacoes/exportar/csv', None),
+    ('GET', '/api/auditoria/exportar?dias=30', None),
+    ('GET', '/api/admin/logs', None),
+    ('GET', '/api/admin/usuarios', None),
+    ('GET', '/api/admin/usuarios/1', None),
+    ('GET', '/api/admin/backup', None),
+    ('GET', '/api/backup', None),
+    ('GET', '/api/configuracoes', None),
+    ('GET', '/api/admin/configuracoes', None),
+]
+
+# Rotas /api que ficam de fora de propósito ('MÉTODO regra': motivo)
+EXCLUIDOS = {
+    'GET /api/eventos': 'stream SSE sem fim',
+    'DELETE /api/transacoes/<int:id>': 'destrutivo, não repetível',
+    'DELETE /api/admin/usuarios/<int:id>': 'destrutivo, não repetível',
+    'PUT /api/admin/usuarios/<int:id>': 'altera o usuário logado',
+    'POST /api/admin/usuarios': 'cria usuário (e-mail único, não repetível)',
+    'POST /api/admin/backup': 'cria usuário (e-mail único, não repetível)',
+    'POST /api/backup': 'altera a lista de backups',
+    'PUT /api/configuracoes': 'mesmo caminho do GET',
+    'PUT /api/admin/configuracoes': 'altera a configuração global de todos os usuários',
+    'POST /api/transacoes/<int:id>/recorrencia': 'só uma recorrência ativa por transação',
+    'DELETE /api/recorrencias/<int:id>': 'destrutivo, não repetível',
+    'PUT /api/recorrencias/<int:id>/ocorrencias/<data>': 'depende de recorrência existente',
+}
+
+
+# ========== POPULAR BANCO ==========
+def popular(app, transacoes, usuarios, semente=42, lote=50000):
+    """Popula o banco com o gerador do add_sample_data.py (mesma semente, mesmos dados)"""
+    from add_sample_data import gerar
+    from extensions import db
+    from models import Usuario
+
+    with app.app_context():
+        admin = Usuario.query.filter_by(username='admin').first()
+        db.session.remove()
+        # mesmo hash do admin para todos: evita milhares de PBKDF2
+        gerar(db.engine, transacoes, usuarios, semente, lote, senha_hash=admin.senha_hash,
+              saida=lambda *_: None)
+
+
+# ========== MEDIÇÃO ==========
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def _resumo(latencias, duracao, erros, consultas=None):
+    latencias = sorted(latencias)
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        'pedidos': len(latencias),
+        'erros': erros,
+        'p50_ms': ms(_percentil(latencias, 50)),
+        'p95_ms': ms(_percentil(latencias, 95)),
+        'p99_ms': ms(_percentil(latencias, 99)),
+        'vazao_rps': round(len(latencias) / duracao, 1) if duracao else None,
+        'consultas_por_pedido': round(statistics.mean(consultas), 1) if consultas else None
+    }
+
+
+def _preparar(url, corpo, contexto):
+    url = url.format(**contexto)
+    if corpo is not None:
+        corpo = {k: v.format(**contexto) if isinstance(v, str) else v for k, v in corpo.items()}
+    return url, corpo
+
+
+def medir_em_processo(app, repeticoes, contexto):
+    """Mede cada endpoint pelo test client, contando as consultas SQL"""
+    from instrumentacao import contar_consultas
+
+    cliente = app.test_client()
+    cliente.post('/login', data={'email': 'admin@sistema.com', 'senha': 'admin123'})
+
+    resultados = {}
+    for metodo, url, corpo in ENDPOINTS:
+        url, dados = _preparar(url, corpo, contexto)
+        latencias, consultas, erros = [], [], 0
+        for i in range(repeticoes + 2):
+            with contar_consultas() as estatisticas:
+                inicio = time.perf_counter()
+                resposta = cliente.open(url, method=metodo, json=dados)
+                resposta.get_data()
+                decorrido = time.perf_counter() - inicio
+            if i < 2:
+                continue  # aquecimento
+            if resposta.status_code >= 400:
+                erros += 1
+            latencias.append(decorrido)
+            consultas.append(estatisticas.consultas)
+        resultados[f'{metodo} {url}'] = _resumo(latencias, sum(latencias), erros, consultas)
+    return resultados
+
+
+def medir_gunicorn(env, repeticoes, concorrencia, contexto):
+    """Mede cada endpoint por um gunicorn real com clientes concorrentes"""
+    import http.client
+    from carga_workers import _aguardar, _login, _porta_livre
+
+    porta = _porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{porta}', 'wsgi:app'],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    resultados = {}
+    try:
+        _aguardar(porta, processo, limite=60)
+        cookie = _login(porta)
+
+        for metodo, url, corpo in ENDPOINTS:
+            url, dados = _preparar(url, corpo, contexto)
+            payload = json.dumps(dados) if dados is not None else None
+            cabecalhos = {'Cookie': cookie, 'Content-Type': 'application/json'}
+            latencias, erros = [], []
+            lock = threading.Lock()
+            restantes = iter(range(repeticoes))
+
+            def cliente():
+                conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=60)
+                while True:
+                    with lock:
+                        if next(restantes, None) is None:
+                            break
+                    inicio = time.perf_counter()
+                    try:
+                        conexao.request(metodo, url, payload, cabecalhos)
+                        resposta = conexao.getresponse()
+                        resposta.read()
+                        if resposta.status >= 400:
+                            erros.append(resposta.status)
+                        latencias.append(time.perf_counter() - inicio)
+                    except Exception:
+                        erros.append(0)
+                        conexao.close()
+                        conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=60)
+                conexao.close()
+
+            threads = [threading.Thread(target=cliente) for _ in range(concorrencia)]
+            inicio = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            resultados[f'{metodo} {url}'] = _resumo(latencias, time.perf_counter() - inicio, len(erros))
+    finally:
+        processo.terminate()
+        processo.wait(timeout=15)
+    return resultados
+
+
+def rotas_sem_cobertura(app, contexto):
+    """Rotas /api registradas (por método) que não estão em ENDPOINTS nem em EXCLUIDOS"""
+    adaptador = app.url_map.bind('localhost')
+    cobertas = set()
+    for metodo, url, corpo in ENDPOINTS:
+        caminho = _preparar(url, corpo, contexto)[0].split('?')[0]
+        regra, _ = adaptador.match(caminho, method=metodo, return_rule=True)
+        cobertas.add(f'{metodo} {regra.rule}')
+
+    faltando = set()
+    for regra in app.url_map.iter_rules():
+        if not regra.rule.startswith('/api/'):
+            continue
+        for metodo in regra.methods - {'HEAD', 'OPTIONS'}:
+            chave = f'{metodo} {regra.rule}'
+            if chave not in cobertas and chave not in EXCLUIDOS:
+                faltando.add(chave)
+    return sorted(faltando)
+
+
+# ========== COMPARAÇÃO ==========
+def comparar(atual, base, limiar=LIMIAR_REGRESSAO):
+    """Lista os endpoints cujo p95 (ou número de consultas) piorou em relação à base"""
+    regressoes = []
+    for modo in ('em_processo', 'gunicorn'):
+        for endpoint, medida in atual.get(modo, {}).items():
+            anterior = base.get(modo, {}).get(endpoint)
+            if not anterior or not anterior.get('p95_ms') or not medida.get('p95_ms'):
+                continue
+            razao = medida['p95_ms'] / anterior['p95_ms']
+            if medida['p95_ms'] - anterior['p95_ms'] < DIFERENCA_MINIMA_MS:
+                razao = 1.0
+            consultas_antes = anterior.get('consultas_por_pedido')
+            consultas_agora = medida.get('consultas_por_pedido')
+            if razao > limiar or (consultas_antes is not None and consultas_agora is not None
+                                           and consultas_agora > consultas_antes):
+                regressoes.append({
+                    'modo': modo, 'endpoint': endpoint,
+                    'p95_ms': [anterior['p95_ms'], medida['p95_ms']],
+                    'consultas_por_pedido': [consultas_antes, consultas_agora]
+                })
+    return regressoes
+
+
+def _imprimir(titulo, resultados):
+    print(f'\n== {titulo} ==')
+    print(f'{"endpoint":62} {"p50":>8} {"p95":>8} {"p99":>8} {"rps":>8} {"sql":>6} {"erros":>5}')
+    for endpoint, m in resultados.items():
+        print(f'{endpoint[:62]:62} {m["p50_ms"]:>8} {m["p95_ms"]:>8} {m["p99_ms"]:>8} '
+              f'{m["vazao_rps"]:>8} {str(m["consultas_por_pedido"]):>6} {m["erros"]:>5}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transacoes', type=int, default=10000)
+    parser.add_argument('--usuarios', type=int, default=10)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--banco', help='arquivo SQLite (reaproveitado se já estiver populado)')
+    parser.add_argument('--gunicorn', action='store_true', help='medir também por um gunicorn real')
+    parser.add_argument('--concorrencia', type=int, default=8)
+    parser.add_argument('--saida', help='arquivo JSON de resultado')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para detectar regressões')
+    parser.add_argument('--limiar', type=float, default=LIMIAR_REGRESSAO,
+                        help='razão de p95 considerada regressão (padrão 1.2)')
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    banco = os.path.abspath(args.banco or os.path.join(pasta, 'bench.db'))
+    reaproveitar = os.path.exists(banco)
+    os.environ['DATABASE_URL'] = f'sqlite:///{banco}'
+
+    from app import create_app
+    from extensions import db
+    from models import Transacao, Usuario
+
+    app = create_app()
+    if not reaproveitar:
+        inicio = time.perf_counter()
+        popular(app, args.transacoes, args.usuarios, args.semente)
+        print(f'Banco populado em {time.perf_counter() - inicio:.1f}s: {banco}')
+
+    with app.app_context():
+        admin_id = Usuario.query.filter_by(username='admin').first().id
+        amostra = db.session.query(Transacao.id).filter_by(usuario_id=admin_id).first()
+        contexto = {'id': amostra[0] if amostra else 1, 'hoje': date.today().isoformat()}
+        total = db.session.query(db.func.count(Transacao.id)).scalar()
+
+    faltando = rotas_sem_cobertura(app, contexto)
+    if faltando:
+        print('Rotas /api sem cobertura no benchmark:', ', '.join(faltando))
+
+    resultado = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {'python': platform.python_version(), 'plataforma': platform.platform()},
+        'escala': {'transacoes': total, 'usuarios': args.usuarios, 'semente': args.semente},
+        'repeticoes': args.repeticoes,
+        'em_processo': medir_em_processo(app, args.repeticoes, contexto)
+    }
+    _imprimir('Em processo (test client)', resultado['em_processo'])
+
+    if args.gunicorn:
+        resultado['gunicorn'] = medir_gunicorn(dict(os.environ), args.repeticoes * args.concorrencia,
+                                               args.concorrencia, contexto)
+        _imprimir(f'Gunicorn ({args.concorrencia} clientes)', resultado['gunicorn'])
+
+    saida = args.saida or os.path.join(
+        RAIZ, 'benchmarks', 'resultados', f'api_{datetime.now():%Y%m%d_%H%M%S}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    print(f'\nResultado gravado em {saida}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), args.limiar)
+        for r in regressoes:
+            print(f"REGRESSÃO [{r['modo']}] {r['endpoint']}: p95 {r['p95_ms'][0]} -> {r['p95_ms'][1]} ms, "
+                  f"consultas {r['consultas_por_pedido'][0]} -> {r['consultas_por_pedido'][1]}")
+        if regressoes:
+            sys.exit(1)
+        print('Sem regressões em relação à base.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark do Autocompletar por Trigramas
+Monta o índice de um usuário com N valores distintos (fornecedores e descrições
+sintéticos) e busca com consultas digitadas com erro (letra trocada, faltando ou
+invertida) e com prefixos. Mede:
+
+  - construcao_s e memoria_mb (tracemalloc) do índice
+  - latência da busca (p50/p95/máximo, ms)
+  - acerto@5: o valor original aparece entre as 5 primeiras sugestões
+  - incremental_us: custo de somar um valor novo (o que cada escrita faz)
+
+Uso (na raiz do projeto):
+    python benchmarks/autocompletar.py [--valores 100000] [--consultas 2000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+SILABAS = ['ka', 'lu', 'ga', 'ce', 'mi', 'vi', 'vo', 'tel', 'fri', 'to', 'sul', 'bra', 'sil', 'ma', 'ter',
+           'pa', 'pel', 'lim', 'pe', 'za', 'nor', 'te', 'im', 'ob', 'ra', 'fer', 'ro', 'do', 'cam', 'pos']
+SUFIXOS = ['Ltda', 'ME', 'Comércio', 'Serviços', 'Distribuidora', 'S.A.', '']
+PALAVRAS = ['Conta', 'Energia', 'Internet', 'Aluguel', 'Material', 'Manutenção', 'Frete', 'Licença',
+            'Serviço', 'Compra', 'Pagamento', 'Mensalidade', 'Reembolso', 'Taxa', 'Seguro']
+
+
+def _nome(aleatorio):
+    palavra = ''.join(aleatorio.choice(SILABAS) for _ in range(aleatorio.randint(2, 4))).capitalize()
+    return f'{palavra} {aleatorio.choice(SUFIXOS)}'.strip()
+
+
+def _gerar(valores, aleatorio):
+    vistos, gerados = set(), []
+    while len(gerados) < valores:
+        if aleatorio.random() < 0.5:
+            campo, texto = 'fornecedor', _nome(aleatorio)
+        else:
+            campo, texto = 'descricao', f'{aleatorio.choice(PALAVRAS)} {_nome(aleatorio)} {aleatorio.randint(1, 99)}'
+        if (campo, texto.lower()) not in vistos:
+            vistos.add((campo, texto.lower()))
+            gerados.append((campo, texto, aleatorio.randint(1, 50)))
+    return gerados
+
+
+def _erro(texto, aleatorio):
+    """Uma letra trocada, removida ou invertida com a vizinha, em uma palavra do texto"""
+    palavras = texto.split()
+    i = max(range(len(palavras)), key=lambda j: len(palavras[j]))
+    palavra = palavras[i]
+    if len(palavra) < 4:
+        return texto
+    p = aleatorio.randint(1, len(palavra) - 2)
+    operacao = aleatorio.choice(('troca', 'remove', 'inverte'))
+    if operacao == 'troca':
+        palavra = palavra[:p] + aleatorio.choice('aeioulmnrst') + palavra[p + 1:]
+    elif operacao == 'remove':
+        palavra = palavra[:p] + palavra[p + 1:]
+    else:
+        palavra = palavra[:p] + palavra[p + 1] + palavra[p] + palavra[p + 2:]
+    palavras[i] = palavra
+    return ' '.join(palavras)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--valores', type=int, default=100000)
+    parser.add_argument('--consultas', type=int, default=2000)
+    parser.add_argument('--semente', type=int, default=7)
+    args = parser.parse_args()
+
+    from autocompletar import Indice
+    aleatorio = random.Random(args.semente)
+    valores = _gerar(args.valores, aleatorio)
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    indice = Indice()
+    for campo, texto, frequencia in valores:
+        indice.somar(campo, texto, frequencia)
+    construcao = time.perf_counter() - inicio
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    consultas = []
+    for campo, texto, _ in aleatorio.sample(valores, args.consultas):
+        if aleatorio.random() < 0.25:
+            consultas.append((texto, texto[:max(4, len(texto) // 2)]))  # prefixo, como ao digitar
+        else:
+            consultas.append((texto, _erro(texto, aleatorio)))
+
+    tempos, acertos = [], 0
+    for original, consulta in consultas:
+        inicio = time.perf_counter()
+        encontrados = indice.buscar(consulta, 5)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        if any(indice.exibicao[posicao] == original for _, posicao, _ in encontrados):
+            acertos += 1
+    tempos.sort()
+
+    novos = _gerar(1000, random.Random(args.semente + 1))
+    inicio = time.perf_counter()
+    for campo, texto, _ in novos:
+        indice.somar(campo, texto + ' novo', 1)
+    incremental = (time.perf_counter() - inicio) / len(novos)
+
+    print(json.dumps({
+        'valores': len(indice),
+        'trigramas': len(indice.postagens),
+        'construcao_s': round(construcao, 2),
+        'memoria_mb': round(memoria / 2 ** 20, 1),
+        'busca_p50_ms': round(statistics.median(tempos), 3),
+        'busca_p95_ms': round(tempos[int(len(tempos) * 0.95)], 3),
+        'busca_max_ms': round(tempos[-1], 3),
+        'acerto_5': round(acertos / len(consultas), 4),
+        'incremental_us': round(incremental * 1e6, 1)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
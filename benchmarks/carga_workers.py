@@ -0,0 +1,272 @@
+"""
+Teste de carga dos modos de worker do Gunicorn
+Sobe o gunicorn em cada modo (sync, gthread e, se instalado, gevent), mantém
+várias conexões SSE abertas (/api/eventos) e mede quantas foram atendidas e a
+latência dos pedidos comuns enquanto elas seguem abertas.
+
+Também verifica que o db.session é isolado por pedido com threads e greenlets.
+
+Sem --workers/--threads valem os padrões do gunicorn.conf.py, inclusive o limite
+de streams SSE por processo (EVENTOS_MAX_CONEXOES): conexões acima dele recebem
+503 e aparecem como recusadas, que é o comportamento esperado em produção.
+
+Uso (na raiz do projeto):
+    python benchmarks/carga_workers.py [--conexoes 50] [--workers N] [--threads N] [--modos sync,gthread,gevent]
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+# ========== VERIFICAÇÃO DO ESCOPO DE SESSÃO ==========
+def verificar_sessoes(concorrencia=16):
+    """Executa pedidos simultâneos no processo atual e confere que cada um tem sua sessão"""
+    from app import create_app
+    from extensions import db
+    from models import LogAuditoria
+
+    app = create_app()
+    barreira = threading.Barrier(concorrencia)
+    sessoes, erros = [], []
+
+    def pedido(i):
+        try:
+            with app.test_request_context(f'/verificacao/{i}'):
+                sessao = db.session()
+                barreira.wait(timeout=10)  # todos os pedidos vivos ao mesmo tempo
+                sessoes.append(id(sessao))
+                db.session.add(LogAuditoria(acao='verificacao', recurso=str(i)))
+                db.session.commit()
+                db.session.remove()
+        except Exception as e:
+            erros.append(repr(e))
+
+    if 'gevent' in sys.modules:
+        import gevent
+        gevent.joinall([gevent.spawn(pedido, i) for i in range(concorrencia)])
+    else:
+        threads = [threading.Thread(target=pedido, args=(i,)) for i in range(concorrencia)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    return {
+        'pedidos': concorrencia,
+        'sessoes_distintas': len(set(sessoes)),
+        'erros': erros,
+        'ok': not erros and len(set(sessoes)) == concorrencia
+    }
+
+
+def _verificar_em_subprocesso(modo, env):
+    codigo = (
+        ('from gevent import monkey; monkey.patch_all()\n' if modo == 'gevent' else '')
+        + 'import json, sys\n'
+        + f'sys.path.insert(0, {RAIZ!r}); sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})\n'
+        + 'from carga_workers import verificar_sessoes\n'
+        + 'print(json.dumps(verificar_sessoes()))\n'
+    )
+    saida = subprocess.run([sys.executable, '-c', codigo], env=env, cwd=RAIZ,
+                           capture_output=True, text=True, timeout=120)
+    if saida.returncode != 0:
+        return {'ok': False, 'erros': [saida.stderr.strip().splitlines()[-1]]}
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+# ========== CLIENTE HTTP ==========
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _login(porta):
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=10)
+    corpo = urllib.parse.urlencode({'email': 'admin@sistema.com', 'senha': 'admin123'})
+    conexao.request('POST', '/login', corpo, {'Content-Type': 'application/x-www-form-urlencoded'})
+    resposta = conexao.getresponse()
+    resposta.read()
+    cookie = resposta.getheader('Set-Cookie', '').split(';')[0]
+    conexao.close()
+    return cookie
+
+
+def _aguardar(porta, processo, limite=20):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if processo.poll() is not None:
+            raise RuntimeError('gunicorn encerrou durante a inicialização')
+        try:
+            socket.create_connection(('127.0.0.1', porta), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn não respondeu a tempo')
+
+
+def _abrir_sse(porta, cookie, abertas, falhas, parar):
+    """Abre um stream SSE e o mantém até o fim da medição"""
+    try:
+        conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=5)
+        conexao.request('GET', '/api/eventos', headers={'Cookie': cookie})
+        resposta = conexao.getresponse()
+        if resposta.status != 200:
+            raise ConnectionError(resposta.status)  # 503: limite de streams do processo
+        while True:
+            linha = resposta.fp.readline()
+            if not linha:
+                raise ConnectionError('stream encerrado')
+            if linha.startswith(b'event:'):
+                break
+        abertas.append(conexao)
+        parar.wait()
+        conexao.close()
+    except Exception:
+        falhas.append(1)
+
+
+def _medir_pedidos(porta, cookie, total, concorrencia):
+    """Latência de GET /api/dashboard/estatisticas com `concorrencia` clientes"""
+    latencias, erros = [], []
+    restantes = iter(range(total))
+    lock = threading.Lock()
+
+    def cliente():
+        while True:
+            with lock:
+                if next(restantes, None) is None:
+                    return
+            inicio = time.perf_counter()
+            try:
+                conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=3)
+                conexao.request('GET', '/api/dashboard/estatisticas', headers={'Cookie': cookie})
+                resposta = conexao.getresponse()
+                resposta.read()
+                conexao.close()
+                if resposta.status != 200:
+                    raise RuntimeError(resposta.status)
+                latencias.append(time.perf_counter() - inicio)
+            except Exception:
+                erros.append(1)
+
+    threads = [threading.Thread(target=cliente) for _ in range(concorrencia)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencias, len(erros), time.perf_counter() - inicio
+
+
+def _ambiente(env, modo, workers, threads):
+    """Variáveis do gunicorn para o modo; None deixa o padrão do gunicorn.conf.py"""
+    env = dict(env, GUNICORN_WORKER_CLASS=modo)
+    if workers is not None:
+        env['GUNICORN_WORKERS'] = str(workers)
+    if threads is not None:
+        env['GUNICORN_THREADS'] = str(threads)
+    return env
+
+
+def configuracao_efetiva(env):
+    """Workers, threads e limite de SSE que o gunicorn.conf.py resolve para o ambiente"""
+    codigo = (
+        'import json, os, runpy\n'
+        'c = runpy.run_path("gunicorn.conf.py")\n'
+        'print(json.dumps({"workers": c["workers"], "threads": c.get("threads"),'
+        ' "sse_por_worker": int(os.environ["EVENTOS_MAX_CONEXOES"])}))\n'
+    )
+    saida = subprocess.run([sys.executable, '-c', codigo], env=env, cwd=RAIZ,
+                           capture_output=True, text=True, check=True)
+    return json.loads(saida.stdout)
+
+
+def medir_modo(modo, env, conexoes, workers, threads, pedidos):
+    """Sobe o gunicorn no modo indicado e mede a capacidade de conexões"""
+    porta = _porta_livre()
+    env = _ambiente(env, modo, workers, threads)
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{porta}', 'wsgi:app'],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _aguardar(porta, processo)
+        cookie = _login(porta)
+
+        abertas, falhas, parar = [], [], threading.Event()
+        streams = [threading.Thread(target=_abrir_sse, args=(porta, cookie, abertas, falhas, parar))
+                   for _ in range(conexoes)]
+        for t in streams:
+            t.start()
+        time.sleep(6)  # tempo para todas as conexões serem atendidas ou expirarem
+
+        latencias, erros, duracao = _medir_pedidos(porta, cookie, pedidos, concorrencia=10)
+
+        parar.set()
+        for t in streams:
+            t.join()
+
+        latencias.sort()
+        return {
+            'modo': modo,
+            **configuracao_efetiva(env),
+            'conexoes_sse_atendidas': len(abertas),
+            'conexoes_sse_recusadas': len(falhas),
+            'pedidos_ok': len(latencias),
+            'pedidos_com_erro': erros,
+            'p50_ms': round(statistics.median(latencias) * 1000, 1) if latencias else None,
+            'p95_ms': round(latencias[int(len(latencias) * 0.95) - 1] * 1000, 1) if latencias else None,
+            'vazao_rps': round(len(latencias) / duracao, 1) if duracao else None
+        }
+    finally:
+        processo.terminate()
+        processo.wait(timeout=15)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conexoes', type=int, default=50, help='conexões SSE simultâneas')
+    parser.add_argument('--workers', type=int, help='padrão: o do gunicorn.conf.py')
+    parser.add_argument('--threads', type=int, help='threads por worker no modo gthread (padrão: gunicorn.conf.py)')
+    parser.add_argument('--pedidos', type=int, default=100, help='pedidos comuns medidos durante a carga')
+    parser.add_argument('--modos', default='sync,gthread,gevent')
+    args = parser.parse_args()
+
+    modos = args.modos.split(',')
+    if 'gevent' in modos and importlib.util.find_spec('gevent') is None:
+        print('gevent não instalado: modo gevent ignorado')
+        modos.remove('gevent')
+
+    with tempfile.TemporaryDirectory() as pasta:
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(pasta, "carga.db")}')
+
+        # Cria o esquema uma única vez, antes de subir os workers
+        subprocess.run([sys.executable, '-c', 'from app import create_app; create_app()'],
+                       cwd=RAIZ, env=env, check=True, capture_output=True)
+
+        print('== Escopo do db.session ==')
+        for modo in ('threads', 'gevent') if 'gevent' in modos else ('threads',):
+            print(modo, _verificar_em_subprocesso(modo, env))
+
+        print(f'\n== Capacidade ({args.conexoes} conexões SSE) ==')
+        for modo in modos:
+            print(json.dumps(medir_modo(modo, env, args.conexoes, args.workers, args.threads, args.pedidos)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark de Compressão
+Para respostas reais do sistema (página de transações, exportação de auditoria,
+logs do admin, HTML do dashboard), mede para cada codificação disponível e nível:
+
+  - razão de compressão e bytes economizados
+  - CPU gasta comprimindo (ms) e vazão (MB/s)
+  - tempo total estimado (CPU + transferência) em links de 10 e 100 Mbit/s,
+    comparado a mandar sem compressão
+
+e, pelo test client, a CPU por pedido com e sem Accept-Encoding.
+
+Uso (na raiz do projeto):
+    python benchmarks/compressao.py [--transacoes 20000] [--logs 20000] [--repeticoes 10]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+LINKS_MBIT = (10, 100)
+NIVEIS_TESTADOS = {'gzip': (1, 6, 9), 'br': (1, 4, 11), 'zstd': (1, 3, 19)}
+
+RESPOSTAS = [
+    ('transacoes_1000', '/api/transacoes?limite=1000&data_inicio=2000-01-01'),
+    ('transacoes_colunar', '/api/transacoes?limite=1000&data_inicio=2000-01-01&formato=colunar'),
+    ('auditoria_csv', '/api/auditoria/exportar?dias=3650'),
+    ('admin_logs', '/api/admin/logs?dias=3650'),
+    ('dashboard_html', '/dashboard'),
+]
+
+
+def _cpu_ms(funcao, repeticoes):
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.process_time()
+        resultado = funcao()
+        tempos.append(time.process_time() - inicio)
+    return statistics.median(tempos) * 1000, resultado
+
+
+def _transferencia_ms(tamanho, mbit):
+    return tamanho * 8 / (mbit * 1_000_000) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transacoes', type=int, default=20000)
+    parser.add_argument('--logs', type=int, default=20000)
+    parser.add_argument('--repeticoes', type=int, default=10)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(pasta, "compressao.db")}'
+    os.environ.setdefault('METRICAS_DIR', os.path.join(pasta, 'metricas'))
+
+    from app import create_app
+    from add_sample_data import gerar
+    from extensions import db
+    from models import Usuario
+    import compressao
+
+    app = create_app()
+    with app.app_context():
+        admin = Usuario.query.filter_by(username='admin').first()
+        db.session.remove()
+        gerar(db.engine, args.transacoes, 1, logs=args.logs, senha_hash=admin.senha_hash, saida=lambda *_: None)
+
+    cliente = app.test_client()
+    cliente.post('/login', data={'email': 'admin@sistema.com', 'senha': 'admin123'})
+    corpos = {nome: cliente.get(url).data for nome, url in RESPOSTAS}
+
+    codificacoes = compressao.codificacoes_disponiveis()
+    print(f'Codificações disponíveis: {", ".join(codificacoes)}')
+    links = ''.join(f'{f"{m}Mbit ms":>12}' for m in LINKS_MBIT)
+    print(f'\n{"resposta":20} {"codif.":7} {"nível":>5} {"bytes":>9} {"razão":>6} {"CPU ms":>8} {"MB/s":>8}{links}')
+    for nome, corpo in corpos.items():
+        base = ''.join(f'{_transferencia_ms(len(corpo), m):12.1f}' for m in LINKS_MBIT)
+        print(f'{nome:20} {"-":7} {"-":>5} {len(corpo):9} {1:6.2f} {0:8.2f} {"-":>8}{base}')
+        for codificacao in codificacoes:
+            for nivel in NIVEIS_TESTADOS[codificacao]:
+                ms, comprimido = _cpu_ms(lambda: compressao.comprimir(corpo, codificacao, nivel), args.repeticoes)
+                vazao = len(corpo) / 1e6 / (ms / 1000) if ms else float('inf')
+                total = ''.join(f'{ms + _transferencia_ms(len(comprimido), m):12.1f}' for m in LINKS_MBIT)
+                print(f'{"":20} {codificacao:7} {nivel:5} {len(comprimido):9} '
+                      f'{len(corpo) / len(comprimido):6.2f} {ms:8.2f} {vazao:8.1f}{total}')
+
+    print(f'\n== CPU por pedido pelo test client (mediana de {args.repeticoes}) ==')
+    for nome, url in RESPOSTAS[:3]:
+        for cabecalho in [None] + codificacoes:
+            headers = {'Accept-Encoding': cabecalho} if cabecalho else {}
+            # get_data consome o corpo: respostas em stream são comprimidas durante a leitura
+            ms, corpo = _cpu_ms(lambda: cliente.get(url, headers=headers).get_data(), args.repeticoes)
+            print(f'{nome:20} {cabecalho or "identity":9} {ms:8.2f} ms {len(corpo):>9} bytes')
+
+
+if __name__ == '__main__':
+    main()
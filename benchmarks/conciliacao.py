@@ -0,0 +1,170 @@
+"""
+Benchmark de Conciliação Bancária
+Gera N transações em aberto para um usuário e um extrato de M linhas: a maior parte
+corresponde a uma transação (data deslocada alguns dias, descrição no estilo do
+banco) e o resto é ruído. Mede:
+
+  - indice_s: leitura das transações em aberto e montagem do índice
+  - conciliacao_s: casamento de todas as linhas (aplicar=False)
+  - http_s: o mesmo pelo POST /api/conciliacao (inclui JSON e validação)
+  - marcacao_s: UPDATEs em lote para status='pago'
+  - ingenuo_estimado_s: comparação de cada linha com todas as transações (O(n·m)),
+    medida em uma amostra de linhas e extrapolada
+
+e a precisão/cobertura dos casamentos contra o gabarito.
+
+Uso (na raiz do projeto):
+    python benchmarks/conciliacao.py [--transacoes 100000] [--linhas 100000] [--janela 3]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+DESCRICOES = ['Conta de energia', 'Internet fibra', 'Aluguel sala', 'Fornecedor ABC', 'Material de escritório',
+              'Manutenção ar condicionado', 'Venda cliente', 'Serviço de limpeza', 'Frete', 'Licença software']
+FORNECEDORES = ['CEMIG', 'Vivo', 'Imobiliária Sul', 'ABC Ltda', 'Kalunga', None, 'Frio Total', 'Limpa Bem']
+
+
+def _gerar(transacoes, linhas, janela, semente):
+    aleatorio = random.Random(semente)
+    hoje = date.today()
+    abertas = []
+    for i in range(transacoes):
+        descricao = aleatorio.choice(DESCRICOES)
+        abertas.append({
+            'descricao': f'{descricao} {i % 97}',
+            'valor': aleatorio.randint(1, 5000) * 5 / 100 + aleatorio.choice((0, 10, 100, 1000)),
+            'data': hoje - timedelta(days=aleatorio.randint(0, 365)),
+            'data_vencimento': hoje + timedelta(days=aleatorio.randint(-60, 60)),
+            'categoria': 'operacionais',
+            'tipo': aleatorio.choice(('despesa', 'despesa', 'receita')),
+            'status': 'pendente',
+            'fornecedor': aleatorio.choice(FORNECEDORES),
+        })
+
+    extrato, gabarito = [], []
+    casaveis = aleatorio.sample(range(transacoes), min(transacoes, int(linhas * 0.9)))
+    for indice in casaveis:
+        t = abertas[indice]
+        sinal = -1 if t['tipo'] == 'despesa' else 1
+        extrato.append({
+            'data': (t['data_vencimento'] + timedelta(days=aleatorio.randint(-janela, janela))).isoformat(),
+            'valor': sinal * t['valor'],
+            'descricao': f'PAG*{(t["fornecedor"] or "")} {t["descricao"].upper()}'[:40]
+        })
+        gabarito.append(indice)
+    while len(extrato) < linhas:
+        extrato.append({'data': (hoje - timedelta(days=aleatorio.randint(0, 90))).isoformat(),
+                        'valor': -aleatorio.randint(1, 10 ** 6) / 100 - 0.01, 'descricao': 'TARIFA'})
+        gabarito.append(None)
+    return abertas, extrato, gabarito
+
+
+def _ingenuo(abertas, extrato, janela):
+    """Para cada linha percorre todas as transações (o que o índice evita)"""
+    from textos import normalizar_texto, similaridade
+    textos = [normalizar_texto(f'{t["descricao"]} {t["fornecedor"] or ""}') for t in abertas]
+    for linha in extrato:
+        dia = date.fromisoformat(linha['data'])
+        valor = abs(linha['valor'])
+        texto = normalizar_texto(linha['descricao'])
+        melhor = None
+        for t, descricao in zip(abertas, textos):
+            if abs(t['valor'] - valor) < 0.005 and abs((t['data_vencimento'] - dia).days) <= janela:
+                pontuacao = similaridade(texto, descricao)
+                if melhor is None or pontuacao > melhor:
+                    melhor = pontuacao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transacoes', type=int, default=100000)
+    parser.add_argument('--linhas', type=int, default=100000)
+    parser.add_argument('--janela', type=int, default=3)
+    parser.add_argument('--amostra', type=int, default=50, help='linhas usadas na estimativa do O(n·m)')
+    parser.add_argument('--semente', type=int, default=7)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    os.environ.update(
+        DATABASE_URL=f'sqlite:///{os.path.join(pasta, "conciliacao.db")}',
+        METRICAS_DIR=os.path.join(pasta, 'metricas'),
+        LIMITES_DB=os.path.join(pasta, 'limites.db'),
+        SQL_CONSULTA_LENTA_MS='100000'
+    )
+    from app import create_app
+    from extensions import db
+    from models import Usuario, Transacao
+    import conciliacao
+    import dimensoes
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    abertas, extrato, gabarito = _gerar(args.transacoes, args.linhas, args.janela, args.semente)
+
+    with app.app_context():
+        usuario = Usuario(nome='Conciliação', username='conciliacao', email='conciliacao@exemplo.com',
+                          status='ativo', senha_hash='-')
+        db.session.add(usuario)
+        db.session.commit()
+        usuario_id = usuario.id
+        primeiro = (db.session.query(db.func.max(Transacao.id)).scalar() or 0) + 1
+        db.session.execute(Transacao.__table__.insert(), dimensoes.codificar_linhas(
+            db.session, usuario_id, [dict(t, usuario_id=usuario_id) for t in abertas]
+        ))
+        db.session.commit()
+        ids = [primeiro + i for i in range(len(abertas))]  # insert em lote: ids em sequência
+
+        resultados = {'transacoes': args.transacoes, 'linhas': args.linhas}
+        inicio = time.perf_counter()
+        conciliacao._carregar(usuario_id)
+        resultados['indice_s'] = round(time.perf_counter() - inicio, 2)
+
+        linhas = conciliacao.validar(extrato)
+        inicio = time.perf_counter()
+        resultado = conciliacao.conciliar(usuario_id, linhas, args.janela, aplicar=False)
+        resultados['conciliacao_s'] = round(time.perf_counter() - inicio, 2)
+
+        esperado = {numero: ids[indice] for numero, indice in enumerate(gabarito, 1) if indice is not None}
+        corretas = sum(1 for c in resultado['conciliadas'] if esperado.get(c['linha']) == c['transacao_id'])
+        resultados['conciliadas'] = len(resultado['conciliadas'])
+        resultados['precisao'] = round(corretas / max(1, len(resultado['conciliadas'])), 4)
+        resultados['cobertura'] = round(corretas / max(1, len(esperado)), 4)
+        resultados['ambiguas'] = resultado['resumo']['ambiguas']
+
+    corpo = json.dumps({'linhas': extrato, 'janela_dias': args.janela, 'aplicar': False})
+    with app.test_client() as cliente:
+        with cliente.session_transaction() as sessao:
+            sessao['_user_id'] = str(usuario_id)  # sessão do Flask-Login, sem passar pelo hash de senha
+        inicio = time.perf_counter()
+        resposta = cliente.post('/api/conciliacao', data=corpo, content_type='application/json')
+        resultados['http_s'] = round(time.perf_counter() - inicio, 2)
+        assert resposta.status_code == 200, resposta.get_data(as_text=True)[:200]
+
+    with app.app_context():
+        inicio = time.perf_counter()
+        marcadas = conciliacao.marcar_pagas(usuario_id, [c['transacao_id'] for c in resultado['conciliadas']])
+        resultados['marcacao_s'] = round(time.perf_counter() - inicio, 2)
+        resultados['marcadas_pagas'] = marcadas
+
+    amostra = random.Random(args.semente).sample(extrato, min(args.amostra, len(extrato)))
+    inicio = time.perf_counter()
+    _ingenuo(abertas, amostra, args.janela)
+    por_linha = (time.perf_counter() - inicio) / max(1, len(amostra))
+    resultados['ingenuo_estimado_s'] = round(por_linha * len(extrato), 1)
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark das Dimensões de Categoria, Fornecedor e Forma de Pagamento
+Gera N transações numa tabela no formato antigo, com categoria, fornecedor e forma
+de pagamento repetidos em texto em cada linha (e digitados de jeitos diferentes:
+"Empresa A", "empresa a.", "EMPRESA  A"), e compara antes e depois da migração do
+esquema (migracoes.atualizar_esquema → dimensoes.migrar_textos):
+
+  - tamanho (dbstat) da tabela transacoes e do índice de agrupamento: texto em
+    (usuario_id, fornecedor) contra o inteiro em (usuario_id, fornecedor_id), mais
+    as tabelas de dimensão; a migração remove as colunas de texto, então a tabela
+    encolhe (medida depois do VACUUM, que devolve as páginas liberadas)
+  - arquivo_kb: o banco inteiro
+  - GROUP BY por fornecedor (soma por fornecedor de um usuário) pelo texto e pela chave
+  - grupos distintos: variações do mesmo fornecedor separadas no texto, unidas na chave
+  - migracao_s: a migração das linhas existentes
+  - ranking_ms: dimensoes.ranking (top 10 do último ano)
+
+Uso (na raiz do projeto):
+    python benchmarks/dimensoes.py [--transacoes 200000] [--usuarios 20] [--fornecedores 500]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+FORMAS = ['Boleto', 'boleto', 'BOLETO', 'Pix', 'PIX', 'Cartão', 'cartao', 'Transferência', 'transferencia']
+CATEGORIAS = ['operacionais', 'fixas', 'variaveis', 'impostos', 'pessoal']
+TEXTOS = (('categoria', 'VARCHAR(50)'), ('fornecedor', 'VARCHAR(100)'), ('forma_pagamento', 'VARCHAR(50)'))
+
+
+def _variacao(aleatorio, nome):
+    return aleatorio.choice((nome, nome.lower(), nome.upper(), nome + '.', nome.replace(' ', '  ')))
+
+
+def _gerar(transacoes, usuarios, fornecedores, semente):
+    aleatorio = random.Random(semente)
+    hoje = date.today()
+    nomes = [f'Fornecedor {i} Comércio Ltda' for i in range(fornecedores)]
+    return [{
+        'descricao': f'Lançamento {i}',
+        'valor': aleatorio.randint(100, 500000) / 100,
+        'data': (hoje - timedelta(days=aleatorio.randint(0, 700))).isoformat(),
+        'categoria': aleatorio.choice(CATEGORIAS),
+        'tipo': 'despesa',
+        'status': aleatorio.choice(('pago', 'pago', 'pendente')),
+        'fornecedor': _variacao(aleatorio, aleatorio.choice(nomes)),
+        'forma_pagamento': aleatorio.choice(FORMAS),
+        'usuario_id': 1 + i % usuarios
+    } for i in range(transacoes)]
+
+
+def _tamanho(db, *nomes):
+    """Bytes ocupados pelas tabelas/índices (tabela virtual dbstat do SQLite)"""
+    consulta = db.text('SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name = :nome')
+    return sum(db.session.execute(consulta, {'nome': nome}).scalar() for nome in nomes)
+
+
+def _medir(db, sql, usuarios, repeticoes):
+    inicio = time.perf_counter()
+    grupos = 0
+    for _ in range(repeticoes):
+        for usuario_id in range(1, usuarios + 1):
+            grupos += len(db.session.execute(db.text(sql), {'u': usuario_id}).all())
+    return round((time.perf_counter() - inicio) / (repeticoes * usuarios) * 1000, 3), grupos // repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transacoes', type=int, default=200000)
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--fornecedores', type=int, default=500)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--semente', type=int, default=7)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    os.environ.update(
+        DATABASE_URL=f'sqlite:///{os.path.join(pasta, "dimensoes.db")}',
+        METRICAS_DIR=os.path.join(pasta, 'metricas'),
+        LIMITES_DB=os.path.join(pasta, 'limites.db'),
+        SQL_CONSULTA_LENTA_MS='100000'
+    )
+    from app import create_app
+    from extensions import db
+    from migracoes import atualizar_esquema
+    from models import Usuario, Transacao
+    import dimensoes
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    resultados = {'transacoes': args.transacoes, 'usuarios': args.usuarios}
+
+    with app.app_context():
+        for i in range(args.usuarios - Usuario.query.count()):
+            db.session.add(Usuario(nome=f'Usuário {i}', username=f'dim{i}', email=f'dim{i}@exemplo.com',
+                                   status='ativo', senha_hash='-'))
+        db.session.commit()
+        # A tabela volta ao formato anterior às dimensões: as colunas de texto e só elas preenchidas
+        for campo, tipo in TEXTOS:
+            db.session.execute(db.text(f'ALTER TABLE transacoes ADD COLUMN {campo} {tipo}'))
+        linhas = _gerar(args.transacoes, args.usuarios, args.fornecedores, args.semente)
+        db.session.execute(db.text(
+            f'INSERT INTO transacoes ({", ".join(linhas[0])}) VALUES ({", ".join(":" + c for c in linhas[0])})'
+        ), linhas)
+        db.session.execute(db.text('CREATE INDEX ix_bench_usuario_fornecedor_texto '
+                                   'ON transacoes (usuario_id, fornecedor)'))
+        db.session.commit()
+        db.session.execute(db.text('ANALYZE'))
+
+        texto, grupos_texto = _medir(
+            db, 'SELECT fornecedor, SUM(valor) FROM transacoes WHERE usuario_id = :u GROUP BY fornecedor',
+            args.usuarios, args.repeticoes
+        )
+        resultados['antes'] = {
+            'tabela_kb': _tamanho(db, 'transacoes') // 1024,
+            'indice_kb': _tamanho(db, 'ix_bench_usuario_fornecedor_texto') // 1024,
+            'arquivo_kb': os.path.getsize(db.engine.url.database) // 1024,
+            'group_by_ms': texto,
+            'grupos': grupos_texto
+        }
+
+        # O índice do texto sai antes: o SQLite não remove coluna indexada
+        db.session.execute(db.text('DROP INDEX ix_bench_usuario_fornecedor_texto'))
+        db.session.commit()
+        inicio = time.perf_counter()
+        atualizar_esquema(db.engine, [Transacao.__table__])
+        resultados['migracao_s'] = round(time.perf_counter() - inicio, 2)
+
+        db.session.execute(db.text('VACUUM'))
+        db.session.execute(db.text('ANALYZE'))
+        chaves, grupos_chave = _medir(
+            db, 'SELECT f.nome, t.total FROM (SELECT fornecedor_id, SUM(valor) AS total FROM transacoes '
+                'WHERE usuario_id = :u AND fornecedor_id IS NOT NULL GROUP BY fornecedor_id) t '
+                'JOIN fornecedores f ON f.id = t.fornecedor_id',
+            args.usuarios, args.repeticoes
+        )
+        resultados['depois'] = {
+            'tabela_kb': _tamanho(db, 'transacoes') // 1024,
+            'dimensoes_kb': _tamanho(db, 'categorias', 'fornecedores', 'formas_pagamento',
+                                     'sqlite_autoindex_categorias_1', 'sqlite_autoindex_fornecedores_1',
+                                     'sqlite_autoindex_formas_pagamento_1') // 1024,
+            'indice_kb': _tamanho(db, 'ix_transacoes_usuario_fornecedor') // 1024,
+            'arquivo_kb': os.path.getsize(db.engine.url.database) // 1024,
+            'group_by_ms': chaves,
+            'grupos': grupos_chave
+        }
+
+        inicio = time.perf_counter()
+        for usuario_id in range(1, args.usuarios + 1):
+            dimensoes.ranking(usuario_id)
+        resultados['ranking_ms'] = round((time.perf_counter() - inicio) / args.usuarios * 1000, 2)
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
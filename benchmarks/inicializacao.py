@@ -0,0 +1,136 @@
+"""
+Benchmark de Inicialização
+Mede, cada caso em um interpretador novo:
+
+  - o tempo de `import app`
+  - create_app() sem inicialização (o que cada worker faz)
+  - create_app() com inicialização em banco existente e em banco novo
+  - o gunicorn do início do processo até o primeiro pedido atendido por todos os
+    workers, com e sem preload_app, e a memória (PSS) somada dos processos
+
+Uso (na raiz do projeto):
+    python benchmarks/inicializacao.py [--repeticoes 5] [--workers 4] [--sem-gunicorn]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from carga_workers import _aguardar, _porta_livre  # noqa: E402
+
+
+CASOS = {
+    'import_app': 'inicio = time.perf_counter(); import app',
+    'create_app_sem_inicializar': 'import app; inicio = time.perf_counter(); app.create_app(inicializar=False)',
+    'create_app_banco_existente': 'import app; inicio = time.perf_counter(); app.create_app(inicializar=True)',
+    'create_app_banco_novo': 'import app; inicio = time.perf_counter(); app.create_app(inicializar=True)',
+}
+
+
+def medir_caso(caso, env, pasta):
+    banco = os.path.join(pasta, 'novo.db' if caso == 'create_app_banco_novo' else 'existente.db')
+    if caso == 'create_app_banco_novo' and os.path.exists(banco):
+        os.remove(banco)
+    codigo = f'import time\n{CASOS[caso]}\nprint(time.perf_counter() - inicio)\n'
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, check=True,
+                           env=dict(env, DATABASE_URL=f'sqlite:///{banco}'))
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def _pss_kb(pid):
+    """Memória proporcional (PSS) do processo; páginas compartilhadas contam uma vez no total"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as arquivo:
+            for linha in arquivo:
+                if linha.startswith('Pss:'):
+                    return int(linha.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _filhos(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as arquivo:
+            return [int(p) for p in arquivo.read().split()]
+    except OSError:
+        return []
+
+
+def medir_gunicorn(env, workers, preload):
+    """Tempo até todos os workers atenderem e memória somada do master e dos workers"""
+    import http.client
+
+    porta = _porta_livre()
+    env = dict(env, GUNICORN_WORKERS=str(workers), GUNICORN_PRELOAD='1' if preload else '0')
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{porta}', 'wsgi:app'],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _aguardar(porta, processo, limite=60)
+        primeiro = None
+        while len(_filhos(processo.pid)) < workers:
+            time.sleep(0.01)
+        # Todos os workers já existem; alguns pedidos seguidos para passar pelos que acabaram de subir
+        respostas = 0
+        while respostas < workers * 4:
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=10)
+            conexao.request('GET', '/login')
+            resposta = conexao.getresponse()
+            resposta.read()
+            conexao.close()
+            if resposta.status == 200:
+                respostas += 1
+                primeiro = primeiro or time.perf_counter() - inicio
+        pronto = time.perf_counter() - inicio
+
+        pids = [processo.pid] + _filhos(processo.pid)
+        pss = [_pss_kb(pid) for pid in pids]
+        return {
+            'preload': preload,
+            'workers': workers,
+            'primeira_resposta_s': round(primeiro, 3),
+            'todos_prontos_s': round(pronto, 3),
+            'pss_total_mb': round(sum(pss) / 1024, 1) if None not in pss else None
+        }
+    finally:
+        processo.terminate()
+        processo.wait(timeout=15)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--sem-gunicorn', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        env = dict(os.environ, METRICAS_DIR=os.path.join(pasta, 'metricas'))
+        medir_caso('create_app_banco_existente', env, pasta)  # cria o banco "existente"
+
+        print(f'== Tempo em processo novo (mediana de {args.repeticoes}) ==')
+        for caso in CASOS:
+            tempos = [medir_caso(caso, env, pasta) for _ in range(args.repeticoes)]
+            print(f'{caso:32} {statistics.median(tempos) * 1000:8.1f} ms')
+
+        if not args.sem_gunicorn:
+            print(f'\n== Gunicorn ({args.workers} workers) ==')
+            env['DATABASE_URL'] = f'sqlite:///{os.path.join(pasta, "gunicorn.db")}'
+            subprocess.run([sys.executable, '-m', 'flask', '--app', 'wsgi', 'inicializar-banco'],
+                           cwd=RAIZ, env=env, check=True, capture_output=True)
+            for preload in (False, True):
+                print(json.dumps(medir_gunicorn(env, args.workers, preload)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark de Escrita por Inquilino
+Vários processos gravam transações ao mesmo tempo, um commit por transação (como
+o POST /api/transacoes). Compara:
+
+  - unico: todos no banco principal, disputando o mesmo lock de escrita do SQLite
+  - por_inquilino: INQUILINOS=1, cada processo em um departamento (arquivo) próprio
+
+Mede commits por segundo somados, latência do commit (p50/p95) e quantos commits
+falharam com "database is locked".
+
+Uso (na raiz do projeto):
+    python benchmarks/inquilinos.py [--processos 1,2,4,8] [--commits 300]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def _escritor(indice, commits, barreira, fila):
+    from app import create_app
+    from extensions import db
+    from models import Usuario, Transacao
+    import inquilinos
+
+    logging.disable(logging.WARNING)  # a espera pelo lock vira "Consulta lenta" no log
+    app = create_app(inicializar=False)
+    with app.app_context():
+        usuario = Usuario.query.filter_by(username=f'escritor{indice}').first()
+        nome = inquilinos.inquilino_de(usuario) if app.config['INQUILINOS'] else None
+        usuario_id = usuario.id
+        db.session.commit()
+        tempos, travados = [], 0
+        with inquilinos.usando(nome):
+            Transacao.query.filter_by(usuario_id=usuario_id).first()  # abre o arquivo antes de medir
+            db.session.commit()
+            barreira.wait()
+            for i in range(commits):
+                inicio = time.perf_counter()
+                db.session.add(Transacao(descricao=f'Lançamento {i}', valor=10.0 + i, data=date.today(),
+                                         categoria='operacionais', tipo='despesa', usuario_id=usuario_id))
+                try:
+                    db.session.commit()
+                    tempos.append(time.perf_counter() - inicio)
+                except Exception as e:
+                    db.session.rollback()
+                    if 'locked' not in str(e):
+                        raise
+                    travados += 1
+        fila.put((tempos, travados))
+
+
+def medir(modo, processos, commits):
+    pasta = tempfile.mkdtemp()
+    os.environ.update(
+        DATABASE_URL=f'sqlite:///{os.path.join(pasta, "principal.db")}',
+        METRICAS_DIR=os.path.join(pasta, 'metricas'),
+        LIMITES_DB=os.path.join(pasta, 'limites.db'),
+        INQUILINOS='1' if modo == 'por_inquilino' else '0',
+        INQUILINOS_DIR=os.path.join(pasta, 'inquilinos')
+    )
+    from app import create_app
+    from extensions import db
+    from models import Usuario
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    with app.app_context():
+        senha_hash = Usuario.query.filter_by(username='admin').first().senha_hash
+        for i in range(processos):
+            db.session.add(Usuario(nome=f'Escritor {i}', username=f'escritor{i}', email=f'escritor{i}@exemplo.com',
+                                   senha_hash=senha_hash, departamento=f'Empresa {i}', status='ativo'))
+        db.session.commit()
+        db.engine.dispose()
+
+    contexto = multiprocessing.get_context('spawn')
+    barreira, fila = contexto.Barrier(processos + 1), contexto.Queue()
+    filhos = [contexto.Process(target=_escritor, args=(i, commits, barreira, fila)) for i in range(processos)]
+    for filho in filhos:
+        filho.start()
+    barreira.wait()
+    inicio = time.perf_counter()
+    resultados = [fila.get() for _ in filhos]
+    duracao = time.perf_counter() - inicio
+    for filho in filhos:
+        filho.join()
+
+    tempos = sorted(t for r, _ in resultados for t in r)
+    travados = sum(t for _, t in resultados)
+    return {
+        'commits_por_s': round(len(tempos) / duracao, 1),
+        'p50_ms': round(tempos[len(tempos) // 2] * 1000, 2) if tempos else None,
+        'p95_ms': round(tempos[int(len(tempos) * 0.95)] * 1000, 2) if tempos else None,
+        'travados': travados
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processos', default='1,2,4,8')
+    parser.add_argument('--commits', type=int, default=300, help='commits por processo')
+    args = parser.parse_args()
+
+    print(f'{"modo":15} {"processos":>9} {"commits/s":>10} {"p50 ms":>8} {"p95 ms":>8} {"travados":>9}')
+    for processos in (int(p) for p in args.processos.split(',')):
+        for modo in ('unico', 'por_inquilino'):
+            r = medir(modo, processos, args.commits)
+            print(f'{modo:15} {processos:9} {r["commits_por_s"]:10} {r["p50_ms"]:8} {r["p95_ms"]:8} {r["travados"]:9}')
+
+
+if __name__ == '__main__':
+    main()
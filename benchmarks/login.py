@@ -0,0 +1,154 @@
+"""
+Benchmark de Login em Rajada
+Simula o início de um turno: centenas de usuários distintos fazem login ao mesmo
+tempo contra um gunicorn real. Em cada cenário mede a vazão de logins, a
+latência (p50/p95/p99), os status devolvidos (302 ok, 200 conta inativa,
+429 limitado, 503 sobrecarga) e a latência de um pedido leve (GET /login) durante a rajada, que
+mostra se o hashing está sufocando o resto do servidor.
+
+Cenários:
+  - inline: hash na própria thread do pedido (LOGIN_THREADS=0), como antes
+  - pool: hash no pool limitado (LOGIN_THREADS por worker, fila LOGIN_FILA)
+  - pool_limites: pool com os limites padrão por IP/conta (tudo vem de 127.0.0.1)
+
+Uso (na raiz do projeto):
+    python benchmarks/login.py [--usuarios 300] [--concorrencia 100] [--workers 2] [--threads 8]
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import Counter
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from carga_workers import _aguardar, _porta_livre  # noqa: E402
+
+SENHA_GERADOS = 'senha123'  # senha dos usuários criados pelo add_sample_data.py
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))] * 1000, 1)
+
+
+def _login(porta, email):
+    inicio = time.perf_counter()
+    try:
+        conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=60)
+        corpo = urllib.parse.urlencode({'email': email, 'senha': SENHA_GERADOS})
+        conexao.request('POST', '/login', corpo, {'Content-Type': 'application/x-www-form-urlencoded'})
+        resposta = conexao.getresponse()
+        resposta.read()
+        conexao.close()
+        return resposta.status, time.perf_counter() - inicio
+    except OSError:
+        return 'erro', time.perf_counter() - inicio
+
+
+def _sondar(porta, parar, latencias):
+    """Pedidos leves seguidos enquanto a rajada acontece"""
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        try:
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=60)
+            conexao.request('GET', '/login')
+            conexao.getresponse().read()
+            conexao.close()
+            latencias.append(time.perf_counter() - inicio)
+        except OSError:
+            pass
+        time.sleep(0.05)
+
+
+def medir_cenario(nome, env, usuarios, concorrencia, workers, threads):
+    porta = _porta_livre()
+    env = dict(env, GUNICORN_WORKER_CLASS='gthread', GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads))
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{porta}', 'wsgi:app'],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _aguardar(porta, processo, limite=60)
+        # O gerador cria gerado2..gerado{usuarios} (o id 1 é o admin)
+        emails = iter(f'gerado{i}@exemplo.com' for i in range(2, usuarios + 1))
+        lock = threading.Lock()
+        resultados = []
+
+        def cliente():
+            while True:
+                with lock:
+                    email = next(emails, None)
+                if email is None:
+                    return
+                resultados.append(_login(porta, email))
+
+        parar, sondagens = threading.Event(), []
+        sonda = threading.Thread(target=_sondar, args=(porta, parar, sondagens))
+        sonda.start()
+        inicio = time.perf_counter()
+        clientes = [threading.Thread(target=cliente) for _ in range(concorrencia)]
+        for t in clientes:
+            t.start()
+        for t in clientes:
+            t.join()
+        duracao = time.perf_counter() - inicio
+        parar.set()
+        sonda.join()
+
+        status = Counter(s for s, _ in resultados)
+        ok = sorted(t for s, t in resultados if s == 302)
+        sondagens.sort()
+        return {
+            'cenario': nome,
+            'status': dict(status),
+            'logins_por_s': round(len(ok) / duracao, 1),
+            'duracao_s': round(duracao, 2),
+            'login_p50_ms': _percentil(ok, 50),
+            'login_p95_ms': _percentil(ok, 95),
+            'login_p99_ms': _percentil(ok, 99),
+            'pedido_leve_p95_ms': _percentil(sondagens, 95)
+        }
+    finally:
+        processo.terminate()
+        processo.wait(timeout=15)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=300)
+    parser.add_argument('--concorrencia', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='threads gthread por worker')
+    parser.add_argument('--login-threads', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--fila', type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        banco = os.path.join(pasta, 'login.db')
+        base = dict(os.environ, DATABASE_URL=f'sqlite:///{banco}', METRICAS_DIR=os.path.join(pasta, 'metricas'))
+        subprocess.run([sys.executable, 'add_sample_data.py', '--banco', banco, '--usuarios', str(args.usuarios),
+                        '--transacoes', str(args.usuarios)], cwd=RAIZ, env=base, check=True, capture_output=True)
+
+        sem_limites = {'LOGIN_LIMITE_IP': '', 'LOGIN_LIMITE_CONTA': ''}
+        cenarios = [
+            ('inline', dict(sem_limites, LOGIN_THREADS='0')),
+            ('pool', dict(sem_limites, LOGIN_THREADS=str(args.login_threads), LOGIN_FILA=str(args.fila))),
+            ('pool_limites', {'LOGIN_THREADS': str(args.login_threads), 'LOGIN_FILA': str(args.fila)}),
+        ]
+        print(f'== {args.usuarios} logins, {args.concorrencia} clientes, {args.workers} workers x {args.threads} threads ==')
+        for nome, extra in cenarios:
+            env = dict(base, LIMITES_DB=os.path.join(pasta, f'limites_{nome}.db'), **extra)
+            print(json.dumps(medir_cenario(nome, env, args.usuarios, args.concorrencia, args.workers, args.threads)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark de Serialização de Listas
+Compara, para páginas de /api/transacoes de vários tamanhos, o tempo de CPU e os
+bytes por linha de:
+
+  - orm_jsonify: objetos ORM + transacao_para_dict + jsonify (caminho anterior)
+  - tuplas_<codificador>: só as colunas da API como tuplas, formato objetos
+  - colunar_<codificador>: tuplas no formato colunar (nomes dos campos uma vez)
+
+onde <codificador> é orjson (se instalado) e json da biblioteca padrão. Também
+mede o endpoint inteiro pelo test client nos dois formatos.
+
+Uso (na raiz do projeto):
+    python benchmarks/serializacao.py [--transacoes 20000] [--limites 100,500,1000] [--repeticoes 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def _cpu_ms(funcao, repeticoes):
+    """Mediana do tempo de CPU (ms) e o último resultado"""
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.process_time()
+        resultado = funcao()
+        tempos.append(time.process_time() - inicio)
+    return statistics.median(tempos) * 1000, resultado
+
+
+def casos(limite, usuario_id):
+    """Funções que montam e codificam uma página de `limite` transações (bytes)"""
+    from flask import jsonify
+    import serializacao
+    from models import Transacao
+    from recorrencia import mesclar_pagina
+    from rotas.comum import transacao_para_dict
+
+    query = Transacao.query.filter_by(usuario_id=usuario_id, tipo='despesa')
+    tuplas = query.with_entities(*serializacao.COLUNAS_TRANSACAO)
+
+    def orm_jsonify():
+        pagina = mesclar_pagina(query, [], 0, limite, transacao_para_dict)
+        return jsonify({'success': True, 'despesas': pagina}).get_data()
+
+    def tuplas_objetos():
+        pagina = mesclar_pagina(tuplas, [], 0, limite, serializacao.linha_para_dict)
+        return serializacao.codificar({'success': True, 'despesas': pagina})
+
+    def tuplas_colunar():
+        pagina = mesclar_pagina(tuplas, [], 0, limite, serializacao.linha_para_lista)
+        return serializacao.codificar({'success': True, 'despesas': serializacao.colunar(pagina)})
+
+    return {'orm_jsonify': orm_jsonify, 'tuplas': tuplas_objetos, 'colunar': tuplas_colunar}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transacoes', type=int, default=20000)
+    parser.add_argument('--limites', default='100,500,1000')
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+    limites = [int(v) for v in args.limites.split(',')]
+
+    pasta = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(pasta, "serializacao.db")}'
+    os.environ.setdefault('METRICAS_DIR', os.path.join(pasta, 'metricas'))
+
+    from app import create_app
+    from add_sample_data import gerar
+    from extensions import db
+    from models import Usuario
+    import serializacao
+
+    app = create_app()
+    with app.app_context():
+        admin = Usuario.query.filter_by(username='admin').first()
+        db.session.remove()
+        gerar(db.engine, args.transacoes, 1, senha_hash=admin.senha_hash, saida=lambda *_: None)
+
+    orjson = serializacao.orjson
+    codificadores = [('orjson', orjson)] if orjson is not None else []
+    codificadores.append(('json', None))
+    if orjson is None:
+        print('orjson não instalado: medindo só o json da biblioteca padrão')
+
+    print(f'== Camada de serialização (mediana de {args.repeticoes}, CPU) ==')
+    print(f'{"caso":22} {"limite":>6} {"ms/página":>10} {"µs/linha":>9} {"bytes/linha":>12}')
+    with app.test_request_context():
+        for limite in limites:
+            funcoes = casos(limite, admin.id)
+            medidas = [('orm_jsonify', funcoes['orm_jsonify'])]
+            for nome, modulo in codificadores:
+                medidas += [(f'tuplas_{nome}', funcoes['tuplas'], modulo), (f'colunar_{nome}', funcoes['colunar'], modulo)]
+            for caso, funcao, *modulo in medidas:
+                if modulo:
+                    serializacao.orjson = modulo[0]
+                ms, corpo = _cpu_ms(funcao, args.repeticoes)
+                linhas = min(limite, args.transacoes)
+                print(f'{caso:22} {limite:6} {ms:10.2f} {ms * 1000 / linhas:9.1f} {len(corpo) / linhas:12.1f}')
+                db.session.remove()
+            serializacao.orjson = orjson
+
+    print(f'\n== Endpoint GET /api/transacoes (test client, mediana de {args.repeticoes}, CPU) ==')
+    cliente = app.test_client()
+    cliente.post('/login', data={'email': 'admin@sistema.com', 'senha': 'admin123'})
+    for limite in limites:
+        for formato in ('objetos', 'colunar'):
+            url = f'/api/transacoes?limite={limite}&data_inicio=2000-01-01&formato={formato}'
+            ms, resposta = _cpu_ms(lambda: cliente.get(url), args.repeticoes)
+            print(f'{formato:22} {limite:6} {ms:10.2f} {len(resposta.data):>10} bytes')
+
+
+if __name__ == '__main__':
+    main()
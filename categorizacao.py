@@ -0,0 +1,281 @@
+"""
+Sugestão de Categoria
+Aprende com o histórico de cada usuário quais categorias acompanham cada palavra
+da descrição e cada fornecedor. As contagens token → categoria ficam na tabela
+`frequencias_categoria` e são atualizadas na mesma transação de cada escrita de
+Transacao (inserção, edição e exclusão), com um UPSERT por flush.
+
+Cada processo guarda em memória o índice dos usuários consultados, lido em uma
+única consulta e mantido por CATEGORIAS_CACHE_TTL segundos; as escritas do próprio
+processo são aplicadas no índice ao confirmar a transação. A sugestão só soma as
+contagens dos tokens do texto, sem consultar o banco.
+
+Leituras nunca gravam: transações anteriores à tabela (ou carregadas sem passar
+pelo ORM) só entram nas contagens pelo comando abaixo. Até lá o usuário tem um
+índice vazio, que fica em cache como qualquer outro.
+
+    flask --app wsgi categorias reconstruir [--usuario ID]
+"""
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+import inquilinos
+import metricas
+from extensions import db
+from models import Usuario, Transacao, FrequenciaCategoria
+from textos import normalizar_texto
+
+
+TTL_PADRAO = 300          # segundos até reler o índice (escritas de outros workers)
+USUARIOS_EM_CACHE = 1000
+PESO_FORNECEDOR = 2.0     # o fornecedor inteiro diz mais que uma palavra solta
+TAMANHO_MINIMO_TOKEN = 3
+PALAVRAS_IGNORADAS = frozenset({'das', 'dos', 'para', 'com', 'por', 'pela', 'pelo', 'ref', 'pgto', 'pag'})
+SUGESTOES_PADRAO = 3
+LOTE_RECONSTRUCAO = 5000
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+# ========== TOKENS ==========
+def tokens(descricao, fornecedor=None):
+    """Tokens (com peso) de uma transação: palavras da descrição e o fornecedor inteiro"""
+    pesos = {}
+    for palavra in normalizar_texto(descricao).split():
+        if len(palavra) >= TAMANHO_MINIMO_TOKEN and not palavra.isdigit() and palavra not in PALAVRAS_IGNORADAS:
+            pesos[palavra[:100]] = 1.0
+    fornecedor = normalizar_texto(fornecedor)
+    if fornecedor:
+        pesos['@' + fornecedor[:99]] = PESO_FORNECEDOR
+    return pesos
+
+
+def _contagens(tipo, categoria, descricao, fornecedor):
+    """Chaves (tipo, token, categoria) que uma transação conta no índice"""
+    if not tipo or not categoria:
+        return []
+    return [(tipo, token, categoria) for token in tokens(descricao, fornecedor)]
+
+
+# ========== ÍNDICE EM MEMÓRIA ==========
+def _carregar(usuario_id):
+    indice = {}
+    linhas = db.session.query(
+        FrequenciaCategoria.tipo, FrequenciaCategoria.token,
+        FrequenciaCategoria.categoria, FrequenciaCategoria.contagem
+    ).filter(FrequenciaCategoria.usuario_id == usuario_id, FrequenciaCategoria.contagem > 0).all()
+    for tipo, token, categoria, contagem in linhas:
+        indice.setdefault(tipo, {}).setdefault(token, {})[categoria] = contagem
+    return indice
+
+
+def _indice(usuario_id):
+    """Índice {tipo: {token: {categoria: contagem}}} do usuário, do cache ou do banco"""
+    ttl = current_app.config.get('CATEGORIAS_CACHE_TTL', TTL_PADRAO)
+    with _lock:
+        entrada = _cache.get(usuario_id)
+        if entrada is not None and time.monotonic() - entrada[0] < ttl:
+            _cache.move_to_end(usuario_id)
+            metricas.incrementar('cache_consultas_total', cache='categorias', resultado='acerto')
+            return entrada[1]
+
+    metricas.incrementar('cache_consultas_total', cache='categorias', resultado='falha')
+    indice = _carregar(usuario_id)
+    with _lock:
+        _cache[usuario_id] = (time.monotonic(), indice)
+        while len(_cache) > USUARIOS_EM_CACHE:
+            _cache.popitem(last=False)
+    return indice
+
+
+def _descartar():
+    _cache.clear()
+
+
+os.register_at_fork(after_in_child=_descartar)
+
+
+# ========== SUGESTÃO ==========
+def _pontuar(indice, descricao, fornecedor):
+    consulta = tokens(descricao, fornecedor)
+    if not fornecedor:
+        # Extratos e importações costumam trazer o fornecedor dentro da descrição
+        for palavra in [t for t in consulta if not t.startswith('@')]:
+            consulta['@' + palavra] = PESO_FORNECEDOR
+    pontos = {}
+    for token, peso in consulta.items():
+        contagens = indice.get(token)
+        if not contagens:
+            continue
+        contagens = tuple(contagens.items())  # cópia: o commit de outra thread pode alterar o dict
+        total = sum(contagem for _, contagem in contagens)
+        for categoria, contagem in contagens:
+            pontos[categoria] = pontos.get(categoria, 0.0) + peso * contagem / total
+    return pontos
+
+
+def sugerir(usuario_id, descricao, fornecedor=None, tipo='despesa', limite=SUGESTOES_PADRAO):
+    """Categorias mais prováveis para o texto: [{'categoria', 'confianca'}], da maior confiança"""
+    pontos = _pontuar(_indice(usuario_id).get(tipo, {}), descricao, fornecedor)
+    soma = sum(pontos.values())
+    melhores = sorted(pontos.items(), key=lambda item: (-item[1], item[0]))[:limite]
+    return [{'categoria': categoria, 'confianca': round(p / soma, 3)} for categoria, p in melhores]
+
+
+def categorizar(usuario_id, linhas, confianca_minima=0.0):
+    """Preenche 'categoria_sugerida' nas linhas (dicts com descricao, fornecedor e tipo) de uma importação
+
+    Lê o índice uma vez para todas as linhas; sem sugestão (ou abaixo da confiança
+    mínima) o campo fica None. Retorna as próprias linhas.
+    """
+    indice = _indice(usuario_id)
+    for linha in linhas:
+        por_tipo = indice.get(linha.get('tipo') or 'despesa', {})
+        pontos = _pontuar(por_tipo, linha.get('descricao'), linha.get('fornecedor'))
+        linha['categoria_sugerida'] = None
+        if pontos:
+            categoria, p = min(pontos.items(), key=lambda item: (-item[1], item[0]))
+            if p / sum(pontos.values()) >= confianca_minima:
+                linha['categoria_sugerida'] = categoria
+    return linhas
+
+
+# ========== ATUALIZAÇÃO INCREMENTAL ==========
+def _estado(target, anterior=False):
+    """(usuario, tipo, categoria, descricao, fornecedor) atual ou anterior ao flush"""
+    ler = target.anterior if anterior else lambda nome: getattr(target, nome)
+    return tuple(ler(nome) for nome in ('usuario_id', 'tipo', 'categoria', 'descricao', 'fornecedor'))
+
+
+def _registrar(session, estado, sinal):
+    deltas = session.info.setdefault('categorias_deltas', Counter())
+    usuario_id = estado[0]
+    for chave in _contagens(*estado[1:]):
+        deltas[(usuario_id, *chave)] += sinal
+
+
+@event.listens_for(Transacao, 'after_insert')
+def _apos_inserir(mapper, connection, target):
+    _registrar(db.inspect(target).session, _estado(target), 1)
+
+
+@event.listens_for(Transacao, 'after_update')
+def _apos_atualizar(mapper, connection, target):
+    antes, depois = _estado(target, anterior=True), _estado(target)
+    if antes != depois:
+        session = db.inspect(target).session
+        _registrar(session, antes, -1)
+        _registrar(session, depois, 1)
+
+
+@event.listens_for(Transacao, 'after_delete')
+def _apos_excluir(mapper, connection, target):
+    _registrar(db.inspect(target).session, _estado(target, anterior=True), -1)
+
+
+@event.listens_for(Session, 'after_flush')
+def _gravar(session, contexto):
+    """Soma os deltas do flush em frequencias_categoria, na mesma transação"""
+    deltas = session.info.pop('categorias_deltas', None)
+    if not deltas:
+        return
+    linhas = [
+        {'usuario_id': u, 'tipo': tipo, 'token': token, 'categoria': categoria, 'contagem': delta}
+        for (u, tipo, token, categoria), delta in deltas.items() if delta
+    ]
+    if not linhas:
+        return
+    tabela = FrequenciaCategoria.__table__
+    comando = insert(tabela)
+    session.execute(comando.on_conflict_do_update(
+        index_elements=['usuario_id', 'tipo', 'token', 'categoria'],
+        set_={'contagem': tabela.c.contagem + comando.excluded.contagem}
+    ), linhas)
+    session.info.setdefault('categorias_aplicar', []).extend(linhas)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apos_commit(session):
+    linhas = session.info.pop('categorias_aplicar', None)
+    if not linhas:
+        return
+    with _lock:
+        for linha in linhas:
+            entrada = _cache.get(linha['usuario_id'])
+            if entrada is None:
+                continue
+            contagens = entrada[1].setdefault(linha['tipo'], {}).setdefault(linha['token'], {})
+            contagem = contagens.get(linha['categoria'], 0) + linha['contagem']
+            if contagem > 0:
+                contagens[linha['categoria']] = contagem
+            else:
+                contagens.pop(linha['categoria'], None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _apos_rollback(session):
+    session.info.pop('categorias_deltas', None)
+    session.info.pop('categorias_aplicar', None)
+
+
+# ========== RECONSTRUÇÃO ==========
+def reconstruir_usuario(usuario_id):
+    """Refaz as contagens do usuário a partir das transações (inclusive as arquivadas); retorna quantas leu"""
+    import arquivamento  # carregado só por quem lê os arquivos frios
+
+    contagens = Counter()
+    lidas = 0
+    consulta = db.session.query(
+        Transacao.tipo, Transacao.categoria, Transacao.descricao, Transacao.fornecedor
+    ).filter(Transacao.usuario_id == usuario_id)
+    for tipo, categoria, descricao, fornecedor in consulta.yield_per(LOTE_RECONSTRUCAO):
+        contagens.update(_contagens(tipo, categoria, descricao, fornecedor))
+        lidas += 1
+    for linha in arquivamento.linhas(usuario_id, None, None):
+        contagens.update(_contagens(linha[6], linha[5], linha[1], linha[8]))
+        lidas += 1
+
+    FrequenciaCategoria.query.filter_by(usuario_id=usuario_id).delete(synchronize_session=False)
+    if contagens:
+        db.session.execute(FrequenciaCategoria.__table__.insert(), [
+            {'usuario_id': usuario_id, 'tipo': tipo, 'token': token, 'categoria': categoria, 'contagem': n}
+            for (tipo, token, categoria), n in contagens.items()
+        ])
+    db.session.commit()
+    with _lock:
+        _cache.pop(usuario_id, None)
+    return lidas
+
+
+# ========== FLASK ==========
+grupo = AppGroup('categorias', help='Índice de sugestão de categorias')
+
+
+@grupo.command('reconstruir')
+@click.option('--usuario', type=int, help='Só este usuário')
+def comando_reconstruir(usuario):
+    """Refaz as contagens token → categoria a partir do histórico"""
+    filtros = [Usuario.id == usuario] if usuario is not None else []
+    usuarios = lidas = 0
+    for nome, ids in inquilinos.usuarios_por_inquilino(*filtros).items():
+        with inquilinos.usando(nome if inquilinos.roteador.ativo else None):
+            for uid in ids:
+                lidas += reconstruir_usuario(uid)
+                usuarios += 1
+    print(f'✅ Índice refeito para {usuarios} usuários ({lidas} transações)')
+
+
+def init_app(app):
+    """Lê o TTL do índice em memória e registra o comando `categorias`"""
+    app.config.setdefault('CATEGORIAS_CACHE_TTL', float(os.environ.get('CATEGORIAS_CACHE_TTL', TTL_PADRAO)))
+    app.cli.add_command(grupo)
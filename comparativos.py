@@ -0,0 +1,300 @@
+"""
+Comparativos por Período
+Séries por tipo, categoria e centro de custo com variação sobre o período anterior
+(mês a mês, trimestre a trimestre), variação anual (YoY) e média móvel.
+
+Uma única consulta agrupada por (mês, tipo, categoria, centro de custo) alimenta
+todas as séries, mais uma nos totais mensais dos meses já arquivados
+(resumos_arquivados, veja arquivamento.py); o restante é feito sobre vetores
+alinhados ao eixo de períodos, sem consultas por período.
+
+O resultado fica em cache por (usuário, intervalo, granularidade, janela). Escritas
+em Transacao descartam só as entradas do usuário cujo intervalo (incluindo o
+histórico usado no YoY) contém o mês alterado; as demais continuam válidas.
+O cache de cada usuário guarda o carimbo de versão dele (veja eventos.py) e o
+confere no máximo a cada VERSOES_VERIFICACAO segundos: se outro worker gravou,
+todas as entradas do usuário são descartadas.
+"""
+import threading
+import time
+from datetime import date, datetime
+from itertools import accumulate
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import eventos
+import metricas
+from extensions import db
+from models import Transacao, Categoria, CentroCusto, ResumoArquivado
+from recorrencia import fim_do_mes
+
+
+GRANULARIDADES = {'mensal': 1, 'trimestral': 3, 'anual': 12}  # meses por período
+DIMENSOES = ('tipo', 'categoria', 'centro_custo')
+MESES_MAXIMOS = 120
+JANELA_PADRAO = 3
+JANELA_MAXIMA = 12
+ENTRADAS_POR_USUARIO = 32
+SEM_CENTRO = 'Sem centro de custo'
+
+_cache = {}  # usuario_id -> {'versao', 'verificado_em', 'entradas': {chave: entrada}}
+_lock = threading.Lock()
+
+
+# ========== EIXO DE PERÍODOS ==========
+def indice_mes(valor):
+    """'AAAA-MM' (ou date) para um índice contínuo de meses"""
+    if isinstance(valor, str):
+        try:
+            ano, mes = (int(p) for p in valor.split('-')[:2])
+            if not 1 <= mes <= 12:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f'Mês inválido: {valor} (use AAAA-MM)')
+        return ano * 12 + mes - 1
+    return valor.year * 12 + valor.month - 1
+
+
+def _data_do_indice(indice):
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _rotulo(periodo, passo):
+    indice = periodo * passo
+    ano = indice // 12
+    if passo == 12:
+        return str(ano)
+    if passo == 3:
+        return f'{ano}-T{indice % 12 // 3 + 1}'
+    return f'{ano}-{indice % 12 + 1:02d}'
+
+
+def _variacao(atual, anterior):
+    if not anterior:
+        return None
+    return round((atual - anterior) / abs(anterior) * 100, 2)
+
+
+# ========== CÁLCULO ==========
+def _series(vetores, primeiro, por_ano, janela):
+    """Deriva variações e média móvel de cada vetor; só devolve a partir de `primeiro`"""
+    series = []
+    for (tipo, chave, identificador), valores in vetores.items():
+        n = len(valores)
+        somas = list(accumulate(valores, initial=0.0))
+        visiveis = valores[primeiro:]
+        serie = {
+            'chave': chave,
+            'tipo': tipo,
+            'valores': [round(v, 2) for v in visiveis],
+            'variacao_periodo': [_variacao(valores[i], valores[i - 1]) for i in range(primeiro, n)],
+            'variacao_anual': [
+                _variacao(valores[i], valores[i - por_ano]) if i >= por_ano else None for i in range(primeiro, n)
+            ],
+            'media_movel': [round((somas[i + 1] - somas[i + 1 - janela]) / janela, 2) for i in range(primeiro, n)],
+            'total': round(sum(visiveis), 2)
+        }
+        if identificador is not None:
+            serie['id'] = identificador
+        series.append(serie)
+    series.sort(key=lambda s: s['total'], reverse=True)
+    return series
+
+
+def _calcular(usuario_id, inicio, fim, passo, janela):
+    """Monta as séries de todas as dimensões para os meses [inicio, fim] (índices)"""
+    por_ano = 12 // passo
+    p_inicio, p_fim = inicio // passo, fim // passo
+    # Histórico antes do intervalo para a variação anual, a do período e a média móvel
+    p_zero = p_inicio - max(por_ano, janela - 1, 1)
+    n = p_fim - p_zero + 1
+    mes_min = p_zero * passo
+
+    mes = db.func.strftime('%Y-%m', Transacao.data)
+    linhas = db.session.query(
+        mes, Transacao.tipo, Categoria.nome, Transacao.centro_custo_id, CentroCusto.nome,
+        db.func.sum(Transacao.valor)
+    ).outerjoin(Categoria, Categoria.id == Transacao.categoria_id).outerjoin(
+        CentroCusto, CentroCusto.id == Transacao.centro_custo_id
+    ).filter(
+        Transacao.usuario_id == usuario_id,
+        Transacao.data >= _data_do_indice(mes_min),
+        Transacao.data <= fim_do_mes(_data_do_indice(fim))
+    ).group_by(mes, Transacao.tipo, Transacao.categoria_id, Transacao.centro_custo_id).all()
+    linhas += db.session.query(
+        ResumoArquivado.mes, ResumoArquivado.tipo, ResumoArquivado.categoria, ResumoArquivado.centro_custo_id,
+        CentroCusto.nome, db.func.sum(ResumoArquivado.total)
+    ).outerjoin(CentroCusto, CentroCusto.id == ResumoArquivado.centro_custo_id).filter(
+        ResumoArquivado.usuario_id == usuario_id,
+        ResumoArquivado.mes >= _data_do_indice(mes_min).strftime('%Y-%m'),
+        ResumoArquivado.mes <= _data_do_indice(fim).strftime('%Y-%m')
+    ).group_by(
+        ResumoArquivado.mes, ResumoArquivado.tipo, ResumoArquivado.categoria, ResumoArquivado.centro_custo_id,
+        CentroCusto.nome
+    ).all()
+
+    vetores = {dimensao: {} for dimensao in DIMENSOES}
+    for mes_str, tipo, categoria, centro_id, centro_nome, total in linhas:
+        posicao = indice_mes(mes_str) // passo - p_zero
+        for dimensao, chave in (
+            ('tipo', (tipo, tipo, None)),
+            ('categoria', (tipo, categoria, None)),
+            ('centro_custo', (tipo, centro_nome or SEM_CENTRO, centro_id))
+        ):
+            vetor = vetores[dimensao].get(chave)
+            if vetor is None:
+                vetor = vetores[dimensao][chave] = [0.0] * n
+            vetor[posicao] += total or 0
+
+    # Saldo = receitas - despesas, período a período
+    receitas = vetores['tipo'].get(('receita', 'receita', None), [0.0] * n)
+    despesas = vetores['tipo'].get(('despesa', 'despesa', None), [0.0] * n)
+    vetores['tipo'][('saldo', 'saldo', None)] = [r - d for r, d in zip(receitas, despesas)]
+
+    primeiro = p_inicio - p_zero
+    return {
+        'periodos': [_rotulo(p, passo) for p in range(p_inicio, p_fim + 1)],
+        'dimensoes': {d: _series(vetores[d], primeiro, por_ano, janela) for d in DIMENSOES}
+    }, (mes_min, fim)
+
+
+def comparar(usuario_id, inicio=None, fim=None, granularidade='mensal', janela=JANELA_PADRAO):
+    """Séries comparativas do usuário entre os meses `inicio` e `fim` ('AAAA-MM')
+
+    Padrão: os últimos 12 meses até o atual. Levanta ValueError com mensagem para
+    o usuário se os parâmetros forem inválidos.
+    """
+    if granularidade not in GRANULARIDADES:
+        raise ValueError(f'Granularidade inválida (use: {", ".join(GRANULARIDADES)})')
+    if not 1 <= janela <= JANELA_MAXIMA:
+        raise ValueError(f'Janela da média móvel deve estar entre 1 e {JANELA_MAXIMA}')
+    passo = GRANULARIDADES[granularidade]
+
+    fim = indice_mes(fim) if fim else indice_mes(datetime.now().date())
+    inicio = indice_mes(inicio) if inicio else fim - 11
+    # Alinha ao início/fim do período (trimestre ou ano)
+    inicio -= inicio % passo
+    fim += passo - 1 - fim % passo
+    if inicio > fim:
+        raise ValueError('Início posterior ao fim')
+    if fim - inicio + 1 > MESES_MAXIMOS:
+        raise ValueError(f'Intervalo máximo de {MESES_MAXIMOS} meses')
+
+    chave = (inicio, fim, granularidade, janela)
+    ttl = current_app.config.get('COMPARATIVOS_CACHE_TTL', 300)
+    intervalo = current_app.config.get('VERSOES_VERIFICACAO', eventos.VERIFICACAO_PADRAO)
+    with _lock:
+        do_usuario = _cache.get(usuario_id)
+        entrada = do_usuario['entradas'].get(chave) if do_usuario else None
+    agora = time.monotonic()
+    if do_usuario is not None and agora - do_usuario['verificado_em'] < intervalo:
+        versao = do_usuario['versao']
+    else:
+        # Lida antes do cálculo: uma escrita no meio deixa o resultado já vencido
+        versao = eventos.versao(usuario_id)
+        with _lock:
+            if do_usuario is not None and do_usuario['versao'] == versao:
+                do_usuario['verificado_em'] = agora
+    if entrada is not None and do_usuario['versao'] == versao and agora - entrada['criado_em'] < ttl:
+        metricas.incrementar('cache_consultas_total', cache='comparativos', resultado='acerto')
+        return entrada['resultado']
+
+    metricas.incrementar('cache_consultas_total', cache='comparativos', resultado='falha')
+    resultado, cobertos = _calcular(usuario_id, inicio, fim, passo, janela)
+    resultado.update(
+        inicio=_data_do_indice(inicio).strftime('%Y-%m'),
+        fim=_data_do_indice(fim).strftime('%Y-%m'),
+        granularidade=granularidade,
+        janela_media=janela
+    )
+    with _lock:
+        do_usuario = _cache.get(usuario_id)
+        if do_usuario is None or do_usuario['versao'] < versao:
+            # Carimbo novo (ou primeira consulta): as entradas de versões anteriores não valem mais
+            do_usuario = _cache[usuario_id] = {'versao': versao, 'verificado_em': agora, 'entradas': {}}
+        if do_usuario['versao'] == versao:
+            entradas = do_usuario['entradas']
+            entradas.pop(chave, None)
+            if len(entradas) >= ENTRADAS_POR_USUARIO:
+                entradas.pop(next(iter(entradas)))
+            entradas[chave] = {'resultado': resultado, 'meses': cobertos, 'criado_em': time.monotonic()}
+    return resultado
+
+
+# ========== INVALIDAÇÃO POR MÊS ==========
+def invalidar(usuario_id, meses, versao=None):
+    """Descarta as entradas do usuário cujo intervalo contém algum dos meses (índices)
+
+    Com a versão gravada pelo commit, as demais entradas passam a valer nela; se o
+    cache não estava na versão imediatamente anterior, tudo do usuário é descartado.
+    """
+    with _lock:
+        do_usuario = _cache.get(usuario_id)
+        if not do_usuario:
+            return
+        if versao is not None:
+            if do_usuario['versao'] != versao - 1:
+                del _cache[usuario_id]
+                return
+            do_usuario['versao'] = versao
+        entradas = do_usuario['entradas']
+        for chave in [
+            c for c, e in entradas.items()
+            if any(e['meses'][0] <= m <= e['meses'][1] for m in meses)
+        ]:
+            del entradas[chave]
+
+
+def _mes_afetado(target, anterior=False):
+    atributos = db.inspect(target).attrs
+
+    def ler(nome):
+        historico = atributos[nome].history
+        if anterior and historico.deleted:
+            return historico.deleted[0]
+        return getattr(target, nome)
+
+    usuario_id, data = ler('usuario_id'), ler('data')
+    if usuario_id is None or data is None:
+        return None
+    if isinstance(data, str):
+        data = datetime.strptime(data[:10], '%Y-%m-%d').date()
+    return usuario_id, indice_mes(data)
+
+
+def _registrar(target, *estados):
+    afetados = db.inspect(target).session.info.setdefault('comparativos_meses', set())
+    afetados.update(e for e in estados if e is not None)
+
+
+@event.listens_for(Transacao, 'after_insert')
+def _apos_inserir(mapper, connection, target):
+    _registrar(target, _mes_afetado(target))
+
+
+@event.listens_for(Transacao, 'after_update')
+def _apos_atualizar(mapper, connection, target):
+    _registrar(target, _mes_afetado(target, anterior=True), _mes_afetado(target))
+
+
+@event.listens_for(Transacao, 'after_delete')
+def _apos_excluir(mapper, connection, target):
+    _registrar(target, _mes_afetado(target, anterior=True))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apos_commit(session):
+    afetados = session.info.pop('comparativos_meses', None) or set()
+    versoes = eventos.versoes_gravadas(session)
+    por_usuario = {usuario_id: set() for usuario_id in versoes}
+    for usuario_id, mes in afetados:
+        por_usuario.setdefault(usuario_id, set()).add(mes)
+    for usuario_id, meses in por_usuario.items():
+        invalidar(usuario_id, meses, versoes.get(usuario_id))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _apos_rollback(session):
+    session.info.pop('comparativos_meses', None)
@@ -0,0 +1,204 @@
+"""
+Compressão de Respostas
+Comprime respostas de texto (JSON, CSV, HTML...) conforme o Accept-Encoding do
+cliente: zstd e brotli quando os módulos estão instalados (`pip install zstandard
+brotli`, opcionais) e gzip sempre. Respostas abaixo de COMPRESSAO_MINIMO bytes
+saem como estão.
+
+Respostas em stream (ex.: exportação de auditoria) são comprimidas pedaço a
+pedaço, sem juntar o corpo inteiro na memória. SSE (text/event-stream) não é
+comprimido, para cada evento chegar na hora.
+
+Os arquivos de static/ e js/ são pré-comprimidos (`flask --app wsgi
+precomprimir-estaticos`, também rodado pelo master do gunicorn ao iniciar) e a
+rota static entrega a variante .zst/.br/.gz pronta, sem gastar CPU por pedido.
+"""
+import gzip
+import mimetypes
+import os
+import zlib
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+PASTAS_ESTATICAS = ('static', 'js')
+TAMANHO_MINIMO_PADRAO = 1024
+
+TIPOS_COMPRIMIVEIS = {
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+    'text/csv', 'text/css', 'text/html', 'text/javascript', 'text/plain', 'text/xml'
+}
+
+# Níveis por pedido (rápidos) e para pré-compressão (máximos, feitos uma vez)
+NIVEIS = {'zstd': 3, 'br': 4, 'gzip': 6}
+NIVEIS_ESTATICOS = {'zstd': 19, 'br': 11, 'gzip': 9}
+EXTENSOES = {'zstd': '.zst', 'br': '.br', 'gzip': '.gz'}
+
+
+def codificacoes_disponiveis():
+    """Codificações suportadas neste ambiente, na ordem de preferência do servidor"""
+    disponiveis = []
+    if zstandard is not None:
+        disponiveis.append('zstd')
+    if brotli is not None:
+        disponiveis.append('br')
+    disponiveis.append('gzip')
+    return disponiveis
+
+
+class _Brotli:
+    def __init__(self, nivel):
+        self._compressor = brotli.Compressor(quality=nivel)
+
+    def compress(self, dados):
+        return self._compressor.process(dados)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+def compressor(codificacao, nivel=None):
+    """Compressor incremental com compress(bytes) e flush() no fim"""
+    nivel = NIVEIS[codificacao] if nivel is None else nivel
+    if codificacao == 'gzip':
+        return zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if codificacao == 'br':
+        return _Brotli(nivel)
+    if codificacao == 'zstd':
+        return zstandard.ZstdCompressor(level=nivel).compressobj()
+    raise ValueError(f'Codificação não suportada: {codificacao}')
+
+
+def comprimir(dados, codificacao, nivel=None):
+    c = compressor(codificacao, nivel)
+    return c.compress(dados) + c.flush()
+
+
+def comprimir_fluxo(pedacos, codificacao, nivel=None):
+    """Comprime um iterável de pedaços, repassando o que o compressor já liberou"""
+    c = compressor(codificacao, nivel)
+    for pedaco in pedacos:
+        if isinstance(pedaco, str):
+            pedaco = pedaco.encode('utf-8')
+        saida = c.compress(pedaco)
+        if saida:
+            yield saida
+    yield c.flush()
+
+
+# ========== PRÉ-COMPRESSÃO ==========
+def _comprimivel(caminho):
+    tipo = mimetypes.guess_type(caminho)[0]
+    return tipo in TIPOS_COMPRIMIVEIS
+
+
+def precomprimir(pastas=None, minimo=TAMANHO_MINIMO_PADRAO):
+    """Grava as variantes .zst/.br/.gz ao lado dos arquivos; pula as que já estão em dia"""
+    pastas = pastas or [os.path.join(RAIZ, p) for p in PASTAS_ESTATICAS]
+    gravados = 0
+    for pasta in pastas:
+        for base, _, arquivos in os.walk(pasta):
+            for nome in arquivos:
+                caminho = os.path.join(base, nome)
+                if not _comprimivel(caminho) or os.path.getsize(caminho) < minimo:
+                    continue
+                modificado = os.path.getmtime(caminho)
+                dados = None
+                for codificacao in codificacoes_disponiveis():
+                    destino = caminho + EXTENSOES[codificacao]
+                    if os.path.exists(destino) and os.path.getmtime(destino) >= modificado:
+                        continue
+                    if dados is None:
+                        with open(caminho, 'rb') as arquivo:
+                            dados = arquivo.read()
+                    if codificacao == 'gzip':
+                        # mtime=0: mesmo conteúdo, mesmo .gz (builds reproduzíveis)
+                        comprimido = gzip.compress(dados, NIVEIS_ESTATICOS['gzip'], mtime=0)
+                    else:
+                        comprimido = comprimir(dados, codificacao, NIVEIS_ESTATICOS[codificacao])
+                    if len(comprimido) >= len(dados):
+                        continue
+                    with open(destino, 'wb') as arquivo:
+                        arquivo.write(comprimido)
+                    gravados += 1
+    return gravados
+
+
+# ========== FLASK ==========
+def _estatico_precomprimido(app):
+    """Entrega a variante pré-comprimida de um arquivo de static/, se houver uma em dia"""
+    nome = (request.view_args or {}).get('filename')
+    if not nome:
+        return None
+    origem = os.path.join(app.static_folder, nome)
+    if not os.path.isfile(origem):
+        return None
+    for codificacao in codificacoes_disponiveis():
+        if request.accept_encodings[codificacao] <= 0:
+            continue
+        variante = origem + EXTENSOES[codificacao]
+        if os.path.isfile(variante) and os.path.getmtime(variante) >= os.path.getmtime(origem):
+            resposta = send_from_directory(
+                app.static_folder, nome + EXTENSOES[codificacao],
+                mimetype=mimetypes.guess_type(origem)[0] or 'application/octet-stream'
+            )
+            resposta.headers['Content-Encoding'] = codificacao
+            resposta.vary.add('Accept-Encoding')
+            return resposta
+    return None
+
+
+def init_app(app):
+    """Liga a compressão das respostas e o comando de pré-compressão"""
+    app.config.setdefault('COMPRESSAO', os.environ.get('COMPRESSAO', '1') != '0')
+    app.config.setdefault('COMPRESSAO_MINIMO', int(os.environ.get('COMPRESSAO_MINIMO', TAMANHO_MINIMO_PADRAO)))
+    codificacoes = codificacoes_disponiveis()
+
+    @app.cli.command('precomprimir-estaticos')
+    def comando_precomprimir():
+        """Grava as versões comprimidas de static/ e js/"""
+        print(f'✅ {precomprimir(minimo=app.config["COMPRESSAO_MINIMO"])} arquivos comprimidos '
+              f'({", ".join(codificacoes)})')
+
+    @app.before_request
+    def _servir_precomprimido():
+        if app.config['COMPRESSAO'] and request.endpoint == 'static':
+            return _estatico_precomprimido(app)
+
+    @app.after_request
+    def _comprimir(response):
+        if not app.config['COMPRESSAO'] or response.mimetype not in TIPOS_COMPRIMIVEIS:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers or response.direct_passthrough):
+            return response
+
+        codificacao = request.accept_encodings.best_match(codificacoes)
+        if codificacao is None:
+            return response
+
+        if response.is_streamed:
+            response.response = comprimir_fluxo(response.response, codificacao)
+            response.headers.pop('Content-Length', None)
+        else:
+            dados = response.get_data()
+            if len(dados) < app.config['COMPRESSAO_MINIMO']:
+                return response
+            comprimido = comprimir(dados, codificacao)
+            if len(comprimido) >= len(dados):
+                return response
+            response.set_data(comprimido)
+        response.headers['Content-Encoding'] = codificacao
+        return response
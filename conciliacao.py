@@ -0,0 +1,255 @@
+"""
+Conciliação Bancária
+Casa as linhas de um extrato com as transações em aberto (pendentes ou atrasadas)
+do usuário pelo valor, por uma janela de datas e pela semelhança da descrição.
+
+As transações em aberto são lidas uma vez, como tuplas, e agrupadas por (tipo,
+valor em centavos); cada grupo fica ordenado pela data de referência (vencimento,
+ou a data da transação). Cada linha do extrato acha o grupo pelo hash e a janela
+de datas por busca binária, então só os candidatos com o mesmo valor e data
+próxima passam pela comparação de texto, que é a parte cara.
+
+As transações casadas viram status='pago' em UPDATEs em lote. Valores negativos
+no extrato são saídas (despesas) e positivos, entradas (receitas).
+"""
+import csv
+import io
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+from extensions import db
+from models import STATUS_ABERTOS, Transacao
+from textos import normalizar_texto, similaridade
+import eventos
+import notificacoes
+import previsao
+
+
+JANELA_PADRAO = 3       # dias para cada lado da data do extrato
+JANELA_MAXIMA = 30
+LINHAS_MAXIMAS = 200000
+PESO_DESCRICAO = 0.6    # o restante da pontuação vem da proximidade das datas
+MARGEM_AMBIGUA = 0.05   # segundo candidato a esta distância da melhor pontuação
+LOTE_ATUALIZACAO = 500
+FORMATOS_DATA = ('%Y-%m-%d', '%d/%m/%Y', '%d/%m/%y')
+
+
+# ========== LEITURA DO EXTRATO ==========
+def _data(texto):
+    if isinstance(texto, date):
+        return texto
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(str(texto).strip(), formato).date()
+        except ValueError:
+            continue
+    raise ValueError
+
+
+def _valor(texto):
+    if isinstance(texto, (int, float)):
+        return float(texto)
+    texto = str(texto).strip().replace('R$', '').replace(' ', '')
+    if ',' in texto:
+        # Formato brasileiro: 1.234,56
+        texto = texto.replace('.', '').replace(',', '.')
+    return float(texto)
+
+
+def validar(linhas):
+    """Normaliza as linhas do extrato ({data, valor, descricao}); levanta ValueError"""
+    if not isinstance(linhas, list) or not linhas:
+        raise ValueError('Envie as linhas do extrato')
+    if len(linhas) > LINHAS_MAXIMAS:
+        raise ValueError(f'Máximo de {LINHAS_MAXIMAS} linhas por extrato')
+
+    normalizadas = []
+    for numero, linha in enumerate(linhas, 1):
+        if not isinstance(linha, dict):
+            raise ValueError(f'Linha {numero}: formato inválido')
+        try:
+            data = _data(linha.get('data'))
+        except ValueError:
+            raise ValueError(f'Linha {numero}: data inválida')
+        try:
+            valor = _valor(linha.get('valor'))
+        except (TypeError, ValueError):
+            raise ValueError(f'Linha {numero}: valor inválido')
+        if not valor:
+            raise ValueError(f'Linha {numero}: valor zerado')
+        tipo = linha.get('tipo') or ('despesa' if valor < 0 else 'receita')
+        if tipo not in ('despesa', 'receita'):
+            raise ValueError(f'Linha {numero}: tipo inválido')
+        normalizadas.append({
+            'data': data,
+            'valor': abs(valor),
+            'tipo': tipo,
+            'descricao': str(linha.get('descricao') or '')[:200]
+        })
+    return normalizadas
+
+
+def ler_csv(conteudo):
+    """Linhas de um extrato CSV com cabeçalho data, descricao e valor (',' ou ';')"""
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            conteudo = conteudo.decode('latin-1')
+    try:
+        dialeto = csv.Sniffer().sniff(conteudo[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(io.StringIO(conteudo), dialect=dialeto)
+    campos = {normalizar_texto(c): c for c in leitor.fieldnames or []}
+    if not {'data', 'valor'} <= set(campos):
+        raise ValueError('O CSV precisa das colunas data, descricao e valor')
+    return [
+        {chave: registro.get(campos[chave]) for chave in ('data', 'valor', 'descricao', 'tipo') if chave in campos}
+        for registro in leitor
+    ]
+
+
+# ========== ÍNDICE ==========
+class IndiceAbertas:
+    """Transações em aberto por (tipo, centavos), cada grupo ordenado pela data de referência"""
+
+    def __init__(self, linhas):
+        grupos = {}
+        for id_, tipo, valor, dia, descricao, fornecedor in linhas:
+            grupos.setdefault((tipo, round(valor * 100)), []).append(
+                (dia, id_, normalizar_texto(f'{descricao or ""} {fornecedor or ""}'))
+            )
+        self._grupos = {}
+        for chave, itens in grupos.items():
+            itens.sort()
+            self._grupos[chave] = ([dia for dia, _, _ in itens], itens)
+        self.usados = set()
+        self.tamanho = len(linhas)
+
+    def candidatos(self, tipo, centavos, dia, janela):
+        """Itens (dia, id, texto) ainda livres com o valor exato e a data dentro da janela
+
+        Retorna None se nenhuma transação em aberto tiver o valor.
+        """
+        grupo = self._grupos.get((tipo, centavos))
+        if grupo is None:
+            return None
+        dias, itens = grupo
+        inicio, fim = bisect_left(dias, dia - janela), bisect_right(dias, dia + janela)
+        return [item for item in itens[inicio:fim] if item[1] not in self.usados]
+
+    def livres(self, inicio, fim):
+        """Ids das transações não casadas com data de referência no intervalo (dias)"""
+        return sorted(
+            id_ for dias, itens in self._grupos.values()
+            for dia, id_, _ in itens[bisect_left(dias, inicio):bisect_right(dias, fim)]
+            if id_ not in self.usados
+        )
+
+
+def _carregar(usuario_id):
+    data_ref = db.func.coalesce(Transacao.data_vencimento, Transacao.data)
+    linhas = db.session.query(
+        Transacao.id, Transacao.tipo, Transacao.valor, data_ref, Transacao.descricao, Transacao.fornecedor
+    ).filter(
+        Transacao.usuario_id == usuario_id,
+        Transacao.status.in_(STATUS_ABERTOS)
+    ).all()
+    return IndiceAbertas([
+        (id_, tipo, valor or 0, _data(dia).toordinal(), descricao, fornecedor)
+        for id_, tipo, valor, dia, descricao, fornecedor in linhas
+    ])
+
+
+# ========== CONCILIAÇÃO ==========
+def conciliar(usuario_id, linhas, janela=JANELA_PADRAO, aplicar=True):
+    """Casa as linhas (já validadas) com as transações em aberto do usuário
+
+    Cada transação casa com no máximo uma linha: entre os candidatos livres vence a
+    maior pontuação (descrição e proximidade da data). Com `aplicar`, as casadas
+    viram status='pago' e a alteração é confirmada.
+    """
+    if not 0 <= janela <= JANELA_MAXIMA:
+        raise ValueError(f'A janela deve estar entre 0 e {JANELA_MAXIMA} dias')
+    indice = _carregar(usuario_id)
+
+    conciliadas, nao_conciliadas = [], []
+    for numero, linha in enumerate(linhas, 1):
+        dia = linha['data'].toordinal()
+        candidatos = indice.candidatos(linha['tipo'], round(linha['valor'] * 100), dia, janela)
+        if not candidatos:
+            nao_conciliadas.append({
+                'linha': numero,
+                'data': linha['data'].isoformat(),
+                'valor': linha['valor'],
+                'tipo': linha['tipo'],
+                'descricao': linha['descricao'],
+                'motivo': 'valor_nao_encontrado' if candidatos is None else 'fora_da_janela'
+            })
+            continue
+
+        texto = normalizar_texto(linha['descricao'])
+        pontuados = sorted((
+            (
+                PESO_DESCRICAO * similaridade(texto, descricao)
+                + (1 - PESO_DESCRICAO) * (1 - abs(candidato_dia - dia) / (janela + 1)),
+                -abs(candidato_dia - dia), id_, candidato_dia
+            )
+            for candidato_dia, id_, descricao in candidatos
+        ), reverse=True)
+        pontuacao, _, id_, candidato_dia = pontuados[0]
+        indice.usados.add(id_)
+        conciliadas.append({
+            'linha': numero,
+            'transacao_id': id_,
+            'pontuacao': round(pontuacao, 3),
+            'diferenca_dias': candidato_dia - dia,
+            'ambigua': len(pontuados) > 1 and pontuacao - pontuados[1][0] < MARGEM_AMBIGUA
+        })
+
+    dias = [linha['data'].toordinal() for linha in linhas]
+    sem_extrato = indice.livres(min(dias) - janela, max(dias) + janela)
+
+    marcadas = 0
+    if aplicar and conciliadas:
+        marcadas = marcar_pagas(usuario_id, [c['transacao_id'] for c in conciliadas])
+
+    return {
+        'conciliadas': conciliadas,
+        'nao_conciliadas': nao_conciliadas,
+        'transacoes_sem_extrato': sem_extrato,
+        'marcadas_pagas': marcadas,
+        'resumo': {
+            'linhas': len(linhas),
+            'conciliadas': len(conciliadas),
+            'nao_conciliadas': len(nao_conciliadas),
+            'ambiguas': sum(1 for c in conciliadas if c['ambigua']),
+            'transacoes_em_aberto': indice.tamanho
+        }
+    }
+
+
+def marcar_pagas(usuario_id, ids):
+    """Marca as transações como pagas em UPDATEs em lote e confirma; retorna quantas mudaram
+
+    O UPDATE direto não passa pelos eventos do ORM, então o evento do SSE e o
+    descarte do cache da previsão são feitos aqui.
+    """
+    agora = datetime.utcnow()
+    marcadas = 0
+    for i in range(0, len(ids), LOTE_ATUALIZACAO):
+        marcadas += db.session.execute(
+            db.update(Transacao).where(
+                Transacao.id.in_(ids[i:i + LOTE_ATUALIZACAO]),
+                Transacao.usuario_id == usuario_id,
+                Transacao.status.in_(STATUS_ABERTOS)
+            ).values(status='pago', data_atualizacao=agora),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+    eventos.publicar(db.session, {usuario_id})
+    previsao.descartar_no_commit(db.session, usuario_id)
+    db.session.commit()
+    # Avisos de vencimento das contas pagas saem já, sem esperar a próxima varredura
+    notificacoes.varrer_usuario(usuario_id)
+    return marcadas
@@ -0,0 +1,328 @@
+"""
+Configurações Tipadas
+Cada chave tem tipo, valor padrão e escopo declarados em ESQUEMA. O valor global
+fica em `configuracoes`; chaves de escopo 'usuario' podem ser sobrescritas por
+usuário em `configuracoes_usuario`. A leitura cai do usuário para o global e
+depois para o padrão.
+
+As leituras vêm de um snapshot em memória do processo, então formatar moeda ou
+conferir o limite de alerta não faz consulta. Toda escrita incrementa um carimbo
+de versão (chave `_versao` em `configuracoes`) na mesma transação; cada worker
+confere o carimbo no máximo a cada CONFIGURACOES_VERIFICACAO segundos e, se
+mudou, descarta o snapshot. O próprio processo que gravou descarta na hora.
+"""
+import json
+import os
+import re
+import threading
+import time
+from zoneinfo import ZoneInfo
+
+from flask import current_app, has_request_context
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Configuracao, ConfiguracaoUsuario
+
+
+CHAVE_VERSAO = '_versao'
+VERIFICACAO_PADRAO = 1.0  # segundos entre leituras do carimbo de versão
+USUARIOS_MAXIMOS = 10000  # usuários mantidos no snapshot de cada processo
+TAMANHO_MAXIMO_TEXTO = 200
+
+MOEDAS = {'BRL': 'R$', 'USD': 'US$', 'EUR': '€'}
+FORMATOS_DATA = ('dd/mm/yyyy', 'mm/dd/yyyy', 'yyyy-mm-dd')
+EMAIL_VALIDO = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+# ========== ESQUEMA ==========
+class Definicao:
+    """Tipo ('texto', 'numero', 'booleano' ou 'json'), padrão e escopo de uma chave
+
+    Escopos: 'usuario' (global com sobrescrita por usuário), 'global' (só o admin
+    altera) e 'interno' (usado pelo sistema, fora das APIs de configuração).
+    """
+
+    def __init__(self, tipo, padrao=None, escopo='global', opcoes=None, minimo=None, validar=None):
+        self.tipo = tipo
+        self.padrao = padrao
+        self.escopo = escopo
+        self.opcoes = opcoes
+        self.minimo = minimo
+        self.validar = validar
+
+
+def _validar_fuso(valor):
+    try:
+        ZoneInfo(valor)
+    except (ValueError, KeyError, OSError):
+        raise ValueError(f'Fuso horário desconhecido: {valor}')
+
+
+def _validar_email(valor):
+    if valor and not EMAIL_VALIDO.match(valor):
+        raise ValueError(f'E-mail inválido: {valor}')
+
+
+ESQUEMA = {
+    # Preferências do usuário (o admin define o padrão global)
+    'moeda': Definicao('texto', 'BRL', 'usuario', opcoes=tuple(MOEDAS)),
+    'fuso_horario': Definicao('texto', 'America/Sao_Paulo', 'usuario', validar=_validar_fuso),
+    'formato_data': Definicao('texto', 'dd/mm/yyyy', 'usuario', opcoes=FORMATOS_DATA),
+    'email_notificacao': Definicao('texto', '', 'usuario', validar=_validar_email),
+    'limite_alerta': Definicao('numero', None, 'usuario', minimo=0),
+    # Empresa e metas
+    'empresa_nome': Definicao('texto', ''),
+    'empresa_cnpj': Definicao('texto', ''),
+    'meta_faturamento': Definicao('numero', None, minimo=0),
+    'meta_lucro': Definicao('numero', None),
+    'meta_despesas': Definicao('numero', None, minimo=0),
+    'notificacoes_despesas': Definicao('booleano', True),
+    'notificacoes_backup': Definicao('booleano', True),
+    'notificacoes_relatorios': Definicao('booleano', False),
+    'notificacoes_sistema': Definicao('booleano', False),
+    # Estado do perfilador (ligado pelo admin em /api/admin/perfilador)
+    'perfilador': Definicao('json', None, 'interno'),
+}
+
+VERDADEIROS = {'true', '1', 'sim', 'on'}
+FALSOS = {'false', '0', 'nao', 'não', 'off', ''}
+
+
+def converter(chave, valor):
+    """Valor vindo da API no tipo da chave; None remove a configuração
+
+    Levanta ValueError com mensagem para o usuário.
+    """
+    definicao = ESQUEMA[chave]
+    if valor is None:
+        return None
+    if definicao.tipo == 'texto':
+        valor = str(valor).strip()
+        if len(valor) > TAMANHO_MAXIMO_TEXTO:
+            raise ValueError(f'{chave}: máximo de {TAMANHO_MAXIMO_TEXTO} caracteres')
+    elif definicao.tipo == 'numero':
+        if isinstance(valor, str) and not valor.strip():
+            return None
+        try:
+            valor = float(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f'{chave}: número inválido')
+        if definicao.minimo is not None and valor < definicao.minimo:
+            raise ValueError(f'{chave}: deve ser no mínimo {definicao.minimo}')
+    elif definicao.tipo == 'booleano':
+        if isinstance(valor, str):
+            texto = valor.strip().lower()
+            if texto not in VERDADEIROS | FALSOS:
+                raise ValueError(f'{chave}: use true ou false')
+            valor = texto in VERDADEIROS
+        else:
+            valor = bool(valor)
+
+    if definicao.opcoes and valor not in definicao.opcoes:
+        raise ValueError(f'{chave}: use um de {", ".join(definicao.opcoes)}')
+    if definicao.validar:
+        definicao.validar(valor)
+    return valor
+
+
+def _codificar(definicao, valor):
+    if definicao.tipo == 'texto':
+        return valor
+    if definicao.tipo == 'booleano':
+        return 'true' if valor else 'false'
+    return json.dumps(valor)
+
+
+def _decodificar(chave, texto):
+    definicao = ESQUEMA.get(chave)
+    if definicao is None or texto is None:
+        return None
+    try:
+        if definicao.tipo == 'texto':
+            return texto
+        if definicao.tipo == 'booleano':
+            return texto in VERDADEIROS
+        valor = json.loads(texto)
+        return float(valor) if definicao.tipo == 'numero' else valor
+    except (TypeError, ValueError):
+        return None  # valor corrompido vale como ausente
+
+
+# ========== SNAPSHOT POR PROCESSO ==========
+_lock = threading.Lock()
+_estado = {'snapshot': None, 'verificado_em': float('-inf')}
+
+
+def _descartar():
+    _estado.update(snapshot=None, verificado_em=float('-inf'))
+
+
+os.register_at_fork(after_in_child=_descartar)
+
+
+def _ler_versao():
+    valor = db.session.query(Configuracao.valor).filter(Configuracao.chave == CHAVE_VERSAO).scalar()
+    return int(valor or 0)
+
+
+def _carregar_global():
+    globais = {}
+    versao = 0
+    for chave, texto in db.session.query(Configuracao.chave, Configuracao.valor).all():
+        if chave == CHAVE_VERSAO:
+            versao = int(texto or 0)
+            continue
+        valor = _decodificar(chave, texto)
+        if valor is not None:
+            globais[chave] = valor
+    return {'versao': versao, 'global': globais, 'usuarios': {}}
+
+
+def _snapshot():
+    """Snapshot em vigor; confere o carimbo de versão no máximo a cada intervalo"""
+    intervalo = current_app.config.get('CONFIGURACOES_VERIFICACAO', VERIFICACAO_PADRAO)
+    snapshot = _estado['snapshot']
+    if snapshot is not None and time.monotonic() - _estado['verificado_em'] < intervalo:
+        return snapshot
+
+    with _lock:
+        snapshot = _estado['snapshot']
+        agora = time.monotonic()
+        if snapshot is not None and agora - _estado['verificado_em'] < intervalo:
+            return snapshot
+        if snapshot is None or _ler_versao() != snapshot['versao']:
+            snapshot = _carregar_global()
+        _estado.update(snapshot=snapshot, verificado_em=agora)
+        return snapshot
+
+
+def _do_usuario(snapshot, usuario_id):
+    valores = snapshot['usuarios'].get(usuario_id)
+    if valores is not None:
+        return valores
+
+    linhas = db.session.query(ConfiguracaoUsuario.chave, ConfiguracaoUsuario.valor).filter(
+        ConfiguracaoUsuario.usuario_id == usuario_id
+    ).all()
+    valores = {}
+    for chave, texto in linhas:
+        valor = _decodificar(chave, texto)
+        if valor is not None and ESQUEMA[chave].escopo == 'usuario':
+            valores[chave] = valor
+    with _lock:
+        usuarios = snapshot['usuarios']
+        if len(usuarios) >= USUARIOS_MAXIMOS:
+            usuarios.pop(next(iter(usuarios)))
+        usuarios[usuario_id] = valores
+    return valores
+
+
+# ========== LEITURA ==========
+def obter(chave, usuario_id=None):
+    """Valor em vigor da chave para o usuário (ou o global, sem usuário)"""
+    definicao = ESQUEMA[chave]
+    snapshot = _snapshot()
+    if usuario_id is not None and definicao.escopo == 'usuario':
+        valor = _do_usuario(snapshot, usuario_id).get(chave)
+        if valor is not None:
+            return valor
+    return snapshot['global'].get(chave, definicao.padrao)
+
+
+def do_usuario_atual(chave):
+    """Valor para o usuário logado; fora de um pedido autenticado, o global"""
+    usuario_id = None
+    if has_request_context() and current_user.is_authenticated:
+        usuario_id = current_user.id
+    return obter(chave, usuario_id)
+
+
+def valores(usuario_id=None, escopos=('usuario',)):
+    """Todas as chaves dos escopos pedidos com o valor em vigor"""
+    return {
+        chave: obter(chave, usuario_id)
+        for chave, definicao in ESQUEMA.items() if definicao.escopo in escopos
+    }
+
+
+# ========== ESCRITA ==========
+def _marcar_alteracao(session):
+    """Incrementa o carimbo na transação corrente; o snapshot local cai no commit"""
+    session.execute(
+        insert(Configuracao).values(chave=CHAVE_VERSAO, valor='1').on_conflict_do_update(
+            index_elements=['chave'],
+            set_={'valor': db.cast(db.cast(Configuracao.valor, db.Integer) + 1, db.Text)}
+        )
+    )
+    session.info['configuracoes_alteradas'] = True
+
+
+def definir(dados, usuario_id=None, escopos=('usuario', 'global')):
+    """Grava as chaves de `dados` (global, ou sobrescritas do usuário) e faz commit
+
+    None (ou texto vazio em número) remove a chave, que volta a cair no global/padrão.
+    Levanta ValueError com mensagem para o usuário; nada é gravado nesse caso.
+    """
+    if not isinstance(dados, dict):
+        raise ValueError('Envie um objeto JSON com as configurações')
+    if usuario_id is not None:
+        escopos = ('usuario',)
+    convertidos = {}
+    for chave, valor in dados.items():
+        definicao = ESQUEMA.get(chave)
+        if definicao is None or definicao.escopo not in escopos:
+            raise ValueError(f'Configuração desconhecida: {chave}')
+        convertidos[chave] = converter(chave, valor)
+
+    if usuario_id is None:
+        modelo, filtro, indice = Configuracao, {}, ['chave']
+    else:
+        modelo, filtro, indice = ConfiguracaoUsuario, {'usuario_id': usuario_id}, ['usuario_id', 'chave']
+
+    for chave, valor in convertidos.items():
+        if valor is None:
+            modelo.query.filter_by(chave=chave, **filtro).delete(synchronize_session=False)
+            continue
+        texto = _codificar(ESQUEMA[chave], valor)
+        db.session.execute(
+            insert(modelo).values(chave=chave, valor=texto, **filtro).on_conflict_do_update(
+                index_elements=indice, set_={'valor': texto}
+            )
+        )
+    _marcar_alteracao(db.session)
+    db.session.commit()
+    return convertidos
+
+
+def excluir_usuario(usuario_id):
+    """Remove as sobrescritas do usuário na sessão corrente (o commit fica com quem chamou)"""
+    ConfiguracaoUsuario.query.filter_by(usuario_id=usuario_id).delete(synchronize_session=False)
+    _marcar_alteracao(db.session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apos_commit(session):
+    if session.info.pop('configuracoes_alteradas', False):
+        _descartar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _apos_rollback(session):
+    session.info.pop('configuracoes_alteradas', None)
+
+
+# ========== FLASK ==========
+def init_app(app):
+    """Lê o intervalo de verificação e expõe a moeda do usuário aos templates"""
+    app.config.setdefault(
+        'CONFIGURACOES_VERIFICACAO',
+        float(os.environ.get('CONFIGURACOES_VERIFICACAO', VERIFICACAO_PADRAO))
+    )
+
+    @app.context_processor
+    def _moeda():
+        return {'moeda': do_usuario_atual('moeda')}
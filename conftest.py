@@ -0,0 +1,118 @@
+"""
+Fixtures dos Testes (pytest)
+A sessão de testes usa um SQLite temporário e um único app em modo testing, então
+o orçamento de consultas das rotas (@orcamento_consultas) derruba o pedido que
+passar do limite. Cada teste ganha um usuário novo, o que isola os dados sem
+recriar o banco.
+
+    python -m pytest -q
+"""
+import itertools
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+_PASTA = tempfile.mkdtemp(prefix='testes-financeiro-')
+os.environ.update(
+    DATABASE_URL=f'sqlite:///{os.path.join(_PASTA, "testes.db")}',
+    METRICAS_DIR=os.path.join(_PASTA, 'metricas'),
+    LIMITES_DB=os.path.join(_PASTA, 'limites.db'),
+    SQL_CONSULTA_LENTA_MS='100000',
+    ARQUIVO_DIR=os.path.join(_PASTA, 'arquivo')
+)
+
+# Scripts manuais: test_apis.py pede um servidor rodando e test_simple.py cria um banco avulso
+collect_ignore = ['test_apis.py', 'test_simple.py']
+
+_sequencia = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+
+    app = create_app()
+    app.config.update(
+        TESTING=True,
+        NOTIFICACOES_INTERVALO=0,   # sem thread de varredura: os testes chamam a varredura direto
+        EVENTOS_KEEPALIVE=0.05,
+        # Conferências periódicas de carimbo fora do caminho: a contagem de consultas não
+        # depende do relógio (os testes de carimbo ajustam os intervalos por conta própria)
+        CONFIGURACOES_VERIFICACAO=3600,
+        VERSOES_VERIFICACAO=3600
+    )
+    return app
+
+
+@pytest.fixture
+def contexto(app):
+    with app.app_context():
+        yield
+
+
+def criar_usuario(app, **campos):
+    """Grava um usuário novo e devolve o id"""
+    from extensions import db
+    from models import Usuario
+
+    n = next(_sequencia)
+    with app.app_context():
+        usuario = Usuario(**{
+            'nome': f'Usuário de Teste {n}', 'username': f'teste{n}', 'email': f'teste{n}@exemplo.com',
+            'perfil': 'usuario', 'departamento': 'financeiro', 'status': 'ativo', 'senha_hash': '-',
+            **campos
+        })
+        db.session.add(usuario)
+        db.session.commit()
+        return usuario.id
+
+
+def gravar_por_fora(app, usuario_id, **campos):
+    """Grava uma transação direto no arquivo SQLite, como outro worker: nenhum evento do
+    ORM chega a este processo. Os textos das dimensões viram chaves como no ORM e o
+    carimbo de versão do usuário avança."""
+    import dimensoes
+    from extensions import db
+
+    with app.app_context():
+        caminho = db.engine.url.database
+    linha = {'descricao': 'Outro worker', 'tipo': 'despesa', 'status': 'pago', 'usuario_id': usuario_id, **campos}
+    conexao = sqlite3.connect(caminho)
+    with conexao:
+        for campo, (modelo, coluna) in dimensoes.DIMENSOES.items():
+            texto = linha.pop(campo, None)
+            if texto:
+                tabela, chave = modelo.__tablename__, dimensoes.chave(campo, texto)
+                conexao.execute(f'INSERT OR IGNORE INTO {tabela} (usuario_id, nome, chave) VALUES (?, ?, ?)',
+                                (usuario_id, texto, chave))
+                linha[coluna], = conexao.execute(f'SELECT id FROM {tabela} WHERE usuario_id = ? AND chave = ?',
+                                                 (usuario_id, chave)).fetchone()
+        conexao.execute(f'INSERT INTO transacoes ({", ".join(linha)}) VALUES ({", ".join("?" * len(linha))})',
+                        [v.isoformat() if hasattr(v, 'isoformat') else v for v in linha.values()])
+        conexao.execute('UPDATE versoes_usuario SET versao = versao + 1 WHERE usuario_id = ?', (usuario_id,))
+    conexao.close()
+
+
+def entrar(cliente, usuario_id):
+    """Sessão autenticada sem passar pelo /login (sem hash de senha nem throttle)"""
+    with cliente.session_transaction() as sessao:
+        sessao['_user_id'] = str(usuario_id)
+        sessao['_fresh'] = True
+    return cliente
+
+
+@pytest.fixture
+def usuario_id(app):
+    return criar_usuario(app)
+
+
+@pytest.fixture
+def cliente(app, usuario_id):
+    return entrar(app.test_client(), usuario_id)
+
+
+@pytest.fixture
+def cliente_admin(app):
+    return entrar(app.test_client(), criar_usuario(app, perfil='admin'))
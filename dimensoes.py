@@ -0,0 +1,358 @@
+"""
+Dimensões de Categoria, Fornecedor e Forma de Pagamento
+Os textos `categoria`, `fornecedor` e `forma_pagamento` das transações ficam em
+tabelas próprias por usuário (`categorias`, `fornecedores`, `formas_pagamento`) e a
+tabela transacoes guarda só a chave inteira (`categoria_id`, `fornecedor_id`,
+`forma_pagamento_id`). Fornecedores e formas de pagamento são normalizados: textos
+que só diferem em maiúsculas, acentos ou pontuação ("Empresa A", "empresa a.") caem
+na mesma linha, com o nome digitado da primeira vez. Categorias são códigos
+("fixas", "operacionais") e só perdem os espaços das pontas.
+
+Para a API nada muda: `Transacao.fornecedor` (e os outros dois) continua lendo e
+recebendo texto (veja models.py). O texto atribuído fica pendente no objeto e é
+resolvido antes de cada flush, com um cache por processo (texto normalizado → id):
+valor já visto não custa consulta; um novo custa uma consulta e um INSERT ...
+RETURNING. Leituras nunca criam chaves. Agrupamentos (ranking, comparativos,
+autocompletar) usam a chave e juntam o nome da dimensão.
+
+Bancos anteriores às dimensões guardavam os textos em colunas da própria tabela: a
+migração do esquema (migracoes.py) cria as linhas das dimensões, preenche as chaves
+e remove as colunas de texto, uma vez. Os arquivos frios continuam com os textos.
+
+    flask --app wsgi dimensoes codificar     (cria os fornecedores que só aparecem
+                                              nos arquivos frios)
+"""
+import functools
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from flask.cli import AppGroup
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+import inquilinos
+from extensions import db
+from models import ArquivoTransacoes, Transacao, Categoria, Fornecedor, FormaPagamento
+from textos import normalizar_texto
+
+
+# campo da transação -> (modelo da dimensão, coluna da chave); mesma lista de models.TEXTOS_DIMENSAO
+DIMENSOES = {
+    'categoria': (Categoria, 'categoria_id'),
+    'fornecedor': (Fornecedor, 'fornecedor_id'),
+    'forma_pagamento': (FormaPagamento, 'forma_pagamento_id'),
+}
+CHAVES_EM_CACHE = 50000
+RANKING_PADRAO = 10
+RANKING_MAXIMO = 100
+DIAS_RANKING_PADRAO = 365
+
+_cache = OrderedDict()  # (banco, inquilino, campo, usuario_id, chave) -> id
+_lock = threading.Lock()
+
+
+# ========== CHAVES ==========
+def chave(campo, texto):
+    """Texto normalizado que identifica o valor na dimensão ('' se vazio)"""
+    modelo, _ = DIMENSOES[campo]
+    if campo == 'categoria':
+        return (texto or '').strip()[:modelo.chave.type.length]
+    return normalizar_texto(texto)[:modelo.chave.type.length]
+
+
+def _prefixo():
+    return (str(db.engine.url), inquilinos.atual())
+
+
+def resolver(session, campo, usuario_id, textos):
+    """Ids da dimensão para os textos do usuário, criando os que faltam: {chave: id}
+
+    Os ids descobertos só entram no cache do processo quando a transação confirmar.
+    """
+    modelo, _ = DIMENSOES[campo]
+    prefixo = _prefixo()
+    por_chave = {}
+    for texto in textos:
+        c = chave(campo, texto)
+        if c:
+            por_chave.setdefault(c, texto.strip()[:modelo.nome.type.length])
+
+    ids, faltando = {}, []
+    with _lock:
+        for c in por_chave:
+            id_ = _cache.get((*prefixo, campo, usuario_id, c))
+            if id_ is None:
+                faltando.append(c)
+            else:
+                ids[c] = id_
+    if not faltando:
+        return ids
+
+    def buscar(chaves):
+        return dict(session.query(modelo.chave, modelo.id).filter(
+            modelo.usuario_id == usuario_id, modelo.chave.in_(chaves)
+        ).all())
+
+    with session.no_autoflush:
+        encontrados = buscar(faltando)
+        novos = [c for c in faltando if c not in encontrados]
+        if novos:
+            tabela = modelo.__table__
+            encontrados.update(session.execute(
+                insert(tabela).on_conflict_do_nothing().returning(tabela.c.chave, tabela.c.id),
+                [{'usuario_id': usuario_id, 'nome': por_chave[c], 'chave': c} for c in novos]
+            ).all())
+            if len(encontrados) < len(faltando):
+                # Outro processo criou a mesma chave entre a consulta e o INSERT
+                encontrados.update(buscar([c for c in novos if c not in encontrados]))
+    ids.update(encontrados)
+    session.info.setdefault('dimensoes_novas', {}).update(
+        {(*prefixo, campo, usuario_id, c): id_ for c, id_ in encontrados.items()}
+    )
+    return ids
+
+
+def id_de(campo, usuario_id, texto):
+    """Id da dimensão para o texto do usuário, sem criar (None se ainda não existe)"""
+    modelo, _ = DIMENSOES[campo]
+    c = chave(campo, texto)
+    if not c:
+        return None
+    entrada = (*_prefixo(), campo, usuario_id, c)
+    with _lock:
+        id_ = _cache.get(entrada)
+    if id_ is None:
+        id_ = db.session.query(modelo.id).filter(modelo.usuario_id == usuario_id, modelo.chave == c).scalar()
+        if id_ is not None:
+            with _lock:
+                _cache[entrada] = id_
+    return id_
+
+
+def codificar_linhas(session, usuario_id, linhas):
+    """Troca os textos das dimensões pelas chaves em linhas (dicts) gravadas sem o ORM"""
+    for campo, (_, coluna) in DIMENSOES.items():
+        ids = resolver(session, campo, usuario_id, [linha.get(campo) or '' for linha in linhas])
+        for linha in linhas:
+            linha[coluna] = ids.get(chave(campo, linha.pop(campo, None)))
+    return linhas
+
+
+@event.listens_for(Session, 'before_flush')
+def _codificar(session, contexto, instancias):
+    """Troca os textos atribuídos às transações novas ou alteradas pelas chaves das dimensões"""
+    pendentes = {}
+    for obj in (*session.new, *session.dirty):
+        textos = obj.__dict__.get('_textos_pendentes') if isinstance(obj, Transacao) else None
+        if not textos or obj.usuario_id is None:
+            continue
+        session.info.setdefault('dimensoes_objetos', set()).add(obj)
+        for campo, texto in textos.items():
+            pendentes.setdefault((campo, obj.usuario_id), []).append((obj, texto))
+
+    for (campo, usuario_id), itens in pendentes.items():
+        coluna = DIMENSOES[campo][1]
+        ids = resolver(session, campo, usuario_id, [texto or '' for _, texto in itens])
+        for obj, texto in itens:
+            setattr(obj, coluna, ids.get(chave(campo, texto)))
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _concluir(session, contexto):
+    """Depois do flush o texto vem da dimensão: descarta os pendentes e a linha antiga carregada"""
+    for obj in session.info.pop('dimensoes_objetos', ()):
+        textos = obj.__dict__.pop('_textos_pendentes', None) or {}
+        obj.__dict__.pop('_textos_anteriores', None)
+        if db.inspect(obj).persistent:
+            session.expire(obj, [f'dimensao_{campo}' for campo in textos])
+
+
+@event.listens_for(Transacao, 'expire')
+def _expirar(target, atributos):
+    # Alvo None: o objeto já foi coletado e a sessão expira só o estado
+    if atributos is None and target is not None:
+        target.__dict__.pop('_textos_pendentes', None)
+        target.__dict__.pop('_textos_anteriores', None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apos_commit(session):
+    novas = session.info.pop('dimensoes_novas', None)
+    if not novas:
+        return
+    with _lock:
+        _cache.update(novas)
+        while len(_cache) > CHAVES_EM_CACHE:
+            _cache.popitem(last=False)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _apos_rollback(session):
+    session.info.pop('dimensoes_novas', None)
+    session.info.pop('dimensoes_objetos', None)
+
+
+def _descartar():
+    _cache.clear()
+
+
+os.register_at_fork(after_in_child=_descartar)
+
+
+# ========== MIGRAÇÃO ==========
+def migrar_textos(conexao):
+    """Troca as colunas de texto antigas de transacoes pelas chaves das dimensões; retorna as colunas removidas
+
+    Cada valor distinto vira uma linha da dimensão (o nome é o primeiro texto
+    digitado), as chaves são preenchidas por um UPDATE e a coluna de texto é
+    removida. Chamada pela migração do esquema, na mesma transação.
+    """
+    existentes = {c['name'] for c in db.inspect(conexao).get_columns('transacoes')}
+    campos = [campo for campo in DIMENSOES if campo in existentes]
+    if not campos:
+        return []
+    # Poucos textos distintos e muitas linhas: cada um é normalizado uma vez só
+    conexao.connection.driver_connection.create_function(
+        'chave_dimensao', 2, functools.lru_cache(maxsize=65536)(chave), deterministic=True
+    )
+    for campo in campos:
+        modelo, coluna = DIMENSOES[campo]
+        tabela = modelo.__tablename__
+        conexao.execute(db.text(
+            f'INSERT OR IGNORE INTO {tabela} (usuario_id, nome, chave, data_criacao) '
+            f'SELECT usuario_id, substr(trim({campo}), 1, {modelo.nome.type.length}), '
+            f'chave_dimensao(:campo, {campo}), CURRENT_TIMESTAMP FROM transacoes '
+            f"WHERE {coluna} IS NULL AND chave_dimensao(:campo, {campo}) != '' ORDER BY id"
+        ), {'campo': campo})
+        conexao.execute(db.text(
+            f'UPDATE transacoes SET {coluna} = (SELECT d.id FROM {tabela} d WHERE d.usuario_id = transacoes.usuario_id '
+            f'AND d.chave = chave_dimensao(:campo, transacoes.{campo})) WHERE {coluna} IS NULL AND {campo} IS NOT NULL'
+        ), {'campo': campo})
+        conexao.execute(db.text(f'ALTER TABLE transacoes DROP COLUMN {campo}'))
+    return campos
+
+
+def codificar_arquivos():
+    """Cria as linhas de fornecedor que só aparecem nos arquivos frios; retorna quantos usuários
+
+    Arquivos gravados antes das dimensões guardam só o texto; sem a linha na
+    dimensão, o ranking os mostra pelo texto, sem id.
+    """
+    import arquivamento  # carregado só por quem lê os arquivos frios
+
+    usuarios = [u for u, in db.session.query(ArquivoTransacoes.usuario_id).distinct()]
+    for usuario_id in usuarios:
+        textos = {linha[8] for linha in arquivamento.linhas(usuario_id, None, None) if linha[8]}
+        if textos:
+            resolver(db.session, 'fornecedor', usuario_id, list(textos))
+            db.session.commit()
+    return len(usuarios)
+
+
+# ========== CONSULTAS ==========
+def listar_fornecedores(usuario_id, busca=None, limite=RANKING_MAXIMO):
+    """Fornecedores do usuário com a quantidade de transações, em ordem de nome"""
+    consulta = db.session.query(
+        Fornecedor.id, Fornecedor.nome, db.func.count(Transacao.id)
+    ).outerjoin(Transacao, db.and_(
+        Transacao.usuario_id == usuario_id, Transacao.fornecedor_id == Fornecedor.id
+    )).filter(
+        Fornecedor.usuario_id == usuario_id
+    )
+    if busca:
+        consulta = consulta.filter(Fornecedor.chave.contains(normalizar_texto(busca)))
+    linhas = consulta.group_by(Fornecedor.id, Fornecedor.nome).order_by(Fornecedor.chave).limit(limite).all()
+    return [{'id': id_, 'nome': nome, 'transacoes': quantidade} for id_, nome, quantidade in linhas]
+
+
+def ranking(usuario_id, inicio=None, fim=None, tipo='despesa', limite=RANKING_PADRAO):
+    """Top-N fornecedores por valor no período (padrão: últimos 12 meses), canceladas fora
+
+    Agrupa pela chave inteira; se o período alcançar a parte arquivada, soma também
+    as transações dos arquivos, casadas pelo texto normalizado com as chaves que já
+    existem. Não grava nada: fornecedor arquivado sem linha na dimensão aparece com
+    id None até `dimensoes codificar` criá-la.
+    """
+    fim = fim or date.today()
+    inicio = inicio or fim - timedelta(days=DIAS_RANKING_PADRAO)
+    totais = {
+        id_: [total or 0.0, quantidade]
+        for id_, total, quantidade in db.session.query(
+            Transacao.fornecedor_id, db.func.sum(Transacao.valor), db.func.count(Transacao.id)
+        ).filter(
+            Transacao.usuario_id == usuario_id,
+            Transacao.tipo == tipo,
+            Transacao.data >= inicio,
+            Transacao.data <= fim,
+            Transacao.status != 'cancelado',
+            Transacao.fornecedor_id != None
+        ).group_by(Transacao.fornecedor_id)
+    }
+    nomes = {}
+
+    corte = ArquivoTransacoes.corte(usuario_id)
+    if corte is not None and inicio <= corte:
+        import arquivamento  # carregado só por quem lê os arquivos frios
+
+        arquivados = {}
+        for linha in arquivamento.linhas(usuario_id, inicio, fim, tipo=tipo):
+            if linha[7] != 'cancelado' and linha[8]:
+                soma = arquivados.setdefault(chave('fornecedor', linha[8]), [0.0, 0, linha[8].strip()])
+                soma[0] += linha[2] or 0
+                soma[1] += 1
+        if arquivados:
+            existentes = dict(db.session.query(Fornecedor.chave, Fornecedor.id).filter(
+                Fornecedor.usuario_id == usuario_id, Fornecedor.chave.in_(list(arquivados))
+            ))
+            for c, (total, quantidade, texto) in arquivados.items():
+                # Sem linha na dimensão, o grupo fica identificado pela chave de texto
+                id_ = existentes.get(c, c)
+                if id_ == c:
+                    nomes[c] = texto
+                soma = totais.setdefault(id_, [0.0, 0])
+                soma[0] += total
+                soma[1] += quantidade
+
+    melhores = sorted(totais.items(), key=lambda item: (-item[1][0], str(item[0])))[:limite]
+    ids = [id_ for id_, _ in melhores if id_ not in nomes]
+    if ids:
+        nomes.update(db.session.query(Fornecedor.id, Fornecedor.nome).filter(Fornecedor.id.in_(ids)))
+    geral = sum(total for total, _ in totais.values())
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'tipo': tipo,
+        'total': round(geral, 2),
+        'fornecedores': [
+            {
+                'id': None if isinstance(id_, str) else id_,
+                'nome': nomes.get(id_),
+                'total': round(total, 2),
+                'transacoes': quantidade,
+                'participacao': round(total / geral, 4) if geral else 0.0
+            }
+            for id_, (total, quantidade) in melhores
+        ]
+    }
+
+
+# ========== FLASK ==========
+grupo = AppGroup('dimensoes', help='Dimensões de categoria, fornecedor e forma de pagamento')
+
+
+@grupo.command('codificar')
+def comando_codificar():
+    """Cria os fornecedores que só aparecem nos arquivos frios"""
+    total = 0
+    for nome in inquilinos.conhecidos() if inquilinos.roteador.ativo else [None]:
+        with inquilinos.usando(nome):
+            total += codificar_arquivos()
+    print(f'✅ Arquivos de {total} usuários codificados')
+
+
+def init_app(app):
+    """Registra o comando `dimensoes`"""
+    app.cli.add_command(grupo)
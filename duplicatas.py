@@ -0,0 +1,239 @@
+"""
+Detecção de Transações Duplicadas
+Cada transação guarda uma impressão (hash de usuário, valor em centavos, data,
+fornecedor e descrição normalizados) na coluna `impressao`, indexada junto com o
+usuário. Ao gravar transações novas, uma única consulta pelo índice acha as que já
+existem com a mesma impressão e a nova é marcada em `duplicata_de` com o id da mais
+antiga. Nada é recusado: a API só avisa, e o usuário pode desmarcar.
+
+A varredura em lote procura quase-duplicatas (descrição parecida, data próxima) sem
+comparar todos os pares: as transações são separadas em blocos pela chave (tipo,
+valor em centavos) e, dentro de cada bloco ordenado por data, só são comparadas as
+vizinhas dentro da janela de dias. Pares parecidos são unidos em grupos.
+
+    flask --app wsgi duplicatas indexar | varrer [--usuario ID] [--janela N] [--marcar]
+"""
+import hashlib
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import inquilinos
+from extensions import db
+from models import Usuario, Transacao
+from textos import normalizar_texto, similaridade
+
+
+JANELA_PADRAO = 3          # dias entre duas transações do mesmo bloco
+JANELA_MAXIMA = 60
+SIMILARIDADE_MINIMA = 0.85
+LOTE_INDEXACAO = 2000
+CAMPOS_IMPRESSAO = ('usuario_id', 'valor', 'data', 'fornecedor', 'descricao')
+REVISADA = 0               # duplicata_de de uma transação que o usuário confirmou não ser duplicata
+
+
+# ========== IMPRESSÃO ==========
+def impressao(usuario_id, valor, data, fornecedor, descricao):
+    """Hash (24 caracteres hex) dos campos que identificam um lançamento repetido"""
+    if usuario_id is None or valor is None or data is None:
+        return None
+    chave = '|'.join((
+        str(usuario_id), str(round(valor * 100)), data.isoformat(),
+        normalizar_texto(fornecedor), normalizar_texto(descricao)
+    ))
+    return hashlib.blake2b(chave.encode(), digest_size=12).hexdigest()
+
+
+def _impressao_de(transacao):
+    return impressao(*(getattr(transacao, campo) for campo in CAMPOS_IMPRESSAO))
+
+
+def _alterou_impressao(transacao):
+    return any(transacao.alterado(campo) for campo in CAMPOS_IMPRESSAO)
+
+
+@event.listens_for(Session, 'before_flush')
+def _marcar_novas(session, contexto, instancias):
+    """Calcula a impressão das transações gravadas e marca as novas que repetem uma existente
+
+    Uma consulta por flush, pelo índice (usuario_id, impressao). Repetições dentro do
+    mesmo flush (uma importação em lote) são agrupadas aqui e marcadas depois do
+    flush, quando a primeira já tem id.
+    """
+    novas = []
+    for obj in session.new:
+        if isinstance(obj, Transacao):
+            obj.impressao = _impressao_de(obj)
+            if obj.impressao and obj.duplicata_de is None:
+                novas.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Transacao) and _alterou_impressao(obj):
+            obj.impressao = _impressao_de(obj)
+    if not novas:
+        return
+
+    with session.no_autoflush:
+        existentes = dict(session.query(
+            Transacao.impressao, db.func.min(Transacao.id)
+        ).filter(
+            Transacao.usuario_id.in_({obj.usuario_id for obj in novas}),
+            Transacao.impressao.in_({obj.impressao for obj in novas})
+        ).group_by(Transacao.impressao).all())
+    no_flush = {}
+    for obj in novas:
+        obj.duplicata_de = existentes.get(obj.impressao)
+        if obj.duplicata_de is None:
+            no_flush.setdefault(obj.impressao, []).append(obj)
+    repetidas = [grupo for grupo in no_flush.values() if len(grupo) > 1]
+    if repetidas:
+        session.info.setdefault('duplicatas_no_flush', []).extend(repetidas)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _marcar_no_flush(session, contexto):
+    """Marca as repetições de um mesmo flush com o id da primeira (vai no próximo flush)"""
+    for grupo in session.info.pop('duplicatas_no_flush', ()):
+        original = min(obj.id for obj in grupo)
+        for obj in grupo:
+            if obj.id != original:
+                obj.duplicata_de = original
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_no_flush(session):
+    session.info.pop('duplicatas_no_flush', None)
+
+
+def indexar(lote=LOTE_INDEXACAO):
+    """Preenche a impressão das transações gravadas antes dela existir; retorna quantas"""
+    total = 0
+    while True:
+        linhas = db.session.query(Transacao.id, *(getattr(Transacao, c) for c in CAMPOS_IMPRESSAO)).filter(
+            Transacao.impressao == None
+        ).order_by(Transacao.id).limit(lote).all()
+        if not linhas:
+            return total
+        db.session.execute(db.update(Transacao), [
+            {'id': id_, 'impressao': impressao(*campos) or ''} for id_, *campos in linhas
+        ])
+        db.session.commit()
+        total += len(linhas)
+
+
+# ========== VARREDURA EM LOTE ==========
+def varrer(usuario_id, janela=JANELA_PADRAO, limiar=SIMILARIDADE_MINIMA):
+    """Grupos de quase-duplicatas do usuário
+
+    Retorna (grupos, comparacoes): cada grupo é uma lista de tuplas (id, data, valor,
+    tipo, descricao, fornecedor, duplicata_de) em ordem de id.
+    """
+    if not 0 <= janela <= JANELA_MAXIMA:
+        raise ValueError(f'A janela deve estar entre 0 e {JANELA_MAXIMA} dias')
+    linhas = db.session.query(
+        Transacao.id, Transacao.data, Transacao.valor, Transacao.tipo,
+        Transacao.descricao, Transacao.fornecedor, Transacao.duplicata_de
+    ).filter(Transacao.usuario_id == usuario_id).all()
+
+    blocos = {}
+    for linha in linhas:
+        id_, data, valor, tipo, descricao, fornecedor, _ = linha
+        blocos.setdefault((tipo, round((valor or 0) * 100)), []).append(
+            (data.toordinal(), id_, normalizar_texto(f'{descricao or ""} {fornecedor or ""}'))
+        )
+
+    pai = {}
+
+    def raiz(x):
+        while pai.get(x, x) != x:
+            pai[x] = pai.get(pai[x], pai[x])
+            x = pai[x]
+        return x
+
+    comparacoes = 0
+    for itens in blocos.values():
+        if len(itens) < 2:
+            continue
+        itens.sort()
+        for i, (dia, id_, texto) in enumerate(itens):
+            # Por índice: fatiar copiaria o resto do bloco para cada item
+            for j in range(i + 1, len(itens)):
+                outro_dia, outro_id, outro_texto = itens[j]
+                if outro_dia - dia > janela:
+                    break
+                comparacoes += 1
+                if texto == outro_texto or similaridade(texto, outro_texto) >= limiar:
+                    a, b = raiz(id_), raiz(outro_id)
+                    pai.setdefault(a, a)
+                    pai.setdefault(b, b)
+                    if a != b:
+                        pai[max(a, b)] = min(a, b)
+
+    grupos = {}
+    por_id = {linha[0]: tuple(linha) for linha in linhas}
+    for id_ in pai:
+        grupos.setdefault(raiz(id_), set()).add(id_)
+    return [
+        [por_id[i] for i in sorted(ids)] for _, ids in sorted(grupos.items())
+    ], comparacoes
+
+
+def marcar(grupos):
+    """Marca cada transação dos grupos como duplicata da mais antiga
+
+    Transações já marcadas (ou revisadas pelo usuário) ficam como estão; retorna quantas mudaram.
+    """
+    valores = [
+        {'id': linha[0], 'duplicata_de': grupo[0][0]}
+        for grupo in grupos for linha in grupo[1:] if linha[6] is None
+    ]
+    if valores:
+        db.session.execute(db.update(Transacao), valores)
+        db.session.commit()
+    return len(valores)
+
+
+# ========== FLASK ==========
+grupo = AppGroup('duplicatas', help='Detecção de transações duplicadas')
+
+
+@grupo.command('indexar')
+def comando_indexar():
+    """Calcula a impressão das transações que ainda não têm"""
+    total = 0
+    for nome in inquilinos.conhecidos() if inquilinos.roteador.ativo else [None]:
+        with inquilinos.usando(nome):
+            total += indexar()
+    print(f'✅ {total} transações indexadas')
+
+
+@grupo.command('varrer')
+@click.option('--usuario', type=int, help='Só este usuário')
+@click.option('--janela', type=int, default=JANELA_PADRAO, show_default=True, help='Dias entre duplicatas')
+@click.option('--marcar', 'marcar_grupos', is_flag=True, help='Grava duplicata_de nas transações encontradas')
+def comando_varrer(usuario, janela, marcar_grupos):
+    """Agrupa as quase-duplicatas de cada usuário"""
+    if not 0 <= janela <= JANELA_MAXIMA:
+        raise click.BadParameter(f'Use de 0 a {JANELA_MAXIMA} dias', param_hint='--janela')
+    filtros = [Usuario.id == usuario] if usuario is not None else []
+    total_grupos = total_comparacoes = marcadas = 0
+    for nome, usuarios in inquilinos.usuarios_por_inquilino(*filtros).items():
+        with inquilinos.usando(nome if inquilinos.roteador.ativo else None):
+            for uid in usuarios:
+                grupos, comparacoes = varrer(uid, janela)
+                total_grupos += len(grupos)
+                total_comparacoes += comparacoes
+                for g in grupos:
+                    print(f'usuário {uid:6}  ' + ', '.join(f'#{linha[0]}' for linha in g)
+                          + f'  {g[0][2]:.2f}  {g[0][4]}')
+                if marcar_grupos:
+                    marcadas += marcar(grupos)
+    print(f'✅ {total_grupos} grupos de possíveis duplicatas ({total_comparacoes} comparações)')
+    if marcar_grupos:
+        print(f'✅ {marcadas} transações marcadas')
+
+
+def init_app(app):
+    """Registra o comando `duplicatas`"""
+    app.cli.add_command(grupo)
@@ -0,0 +1,268 @@
+"""
+Barramento de Eventos
+Avisa as conexões SSE abertas de um usuário quando as transações dele mudam.
+
+Entre processos (workers do gunicorn) a entrega usa o próprio SQLite: cada escrita
+grava uma linha em `eventos` na mesma transação do dado alterado, e uma única
+thread por processo observa o `PRAGMA data_version` para ler só as linhas novas.
+Dashboards ociosos não geram nenhuma consulta além desse pragma. Com INQUILINOS=1
+os eventos ficam no arquivo de cada inquilino e a thread observa só os arquivos
+dos inquilinos com conexões abertas.
+
+Cada stream SSE prende uma thread do worker (gthread) enquanto está aberto, então
+o processo aceita no máximo EVENTOS_MAX_CONEXOES streams (o restante recebe 503 e o
+navegador passa a consultar por polling) e cada stream dura no máximo
+EVENTOS_DURACAO_MAXIMA segundos, depois do que o EventSource reconecta sozinho.
+Veja gunicorn.conf.py para o dimensionamento.
+
+A mesma publicação incrementa o carimbo de versão do usuário (`versoes_usuario`).
+Os caches por processo (previsão, comparativos) guardam a versão com que foram
+montados e a conferem antes de usar, então a escrita feita em outro worker também
+os invalida.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+import inquilinos
+import metricas
+from extensions import db
+from models import Transacao, RegraRecorrencia, Evento, VersaoUsuario
+from recorrencia import apenas_materializou
+
+
+INTERVALO_OBSERVACAO = 0.5  # segundos entre leituras do data_version
+RETENCAO_EVENTOS = timedelta(hours=1)
+TAMANHO_FILA = 100
+VERIFICACAO_PADRAO = 1.0  # segundos entre conferências do carimbo de versão por cache
+MAX_CONEXOES_PADRAO = 4  # streams SSE por processo (gunicorn.conf.py ajusta às threads)
+DURACAO_MAXIMA_PADRAO = 300  # segundos de cada stream SSE antes de o navegador reconectar
+
+
+class Barramento:
+    """Publicação/assinatura por usuário alimentada pela tabela `eventos`"""
+
+    def __init__(self):
+        self.app = None
+        self._assinantes = {}
+        self._inquilinos = {}  # usuario_id -> inquilino cujo arquivo traz os eventos dele
+        self._conexoes = 0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault(
+            'VERSOES_VERIFICACAO', float(os.environ.get('VERSOES_VERIFICACAO', VERIFICACAO_PADRAO))
+        )
+        app.config.setdefault(
+            'EVENTOS_MAX_CONEXOES', int(os.environ.get('EVENTOS_MAX_CONEXOES', MAX_CONEXOES_PADRAO))
+        )
+        app.config.setdefault(
+            'EVENTOS_DURACAO_MAXIMA', float(os.environ.get('EVENTOS_DURACAO_MAXIMA', DURACAO_MAXIMA_PADRAO))
+        )
+
+    def assinar(self, usuario_id, maximo=None):
+        """Registra uma fila que recebe os eventos do usuário (no inquilino ativo)
+
+        Retorna None se o processo já tem `maximo` conexões abertas.
+        """
+        fila = queue.Queue(maxsize=TAMANHO_FILA)
+        with self._lock:
+            if maximo is not None and self._conexoes >= maximo:
+                metricas.incrementar('sse_conexoes_recusadas_total')
+                return None
+            self._conexoes += 1
+            self._assinantes.setdefault(usuario_id, set()).add(fila)
+            self._inquilinos[usuario_id] = inquilinos.atual()
+        self._garantir_observador()
+        metricas.ajustar('sse_conexoes_abertas', 1)
+        return fila
+
+    def cancelar(self, usuario_id, fila):
+        with self._lock:
+            filas = self._assinantes.get(usuario_id)
+            if filas is None or fila not in filas:
+                return
+            filas.discard(fila)
+            self._conexoes -= 1
+            if not filas:
+                del self._assinantes[usuario_id]
+                self._inquilinos.pop(usuario_id, None)
+        metricas.ajustar('sse_conexoes_abertas', -1)
+        metricas.ajustar('eventos_fila_pendentes', -fila.qsize())
+
+    def aguardar(self, fila, timeout):
+        """Espera o próximo evento e descarta a rajada acumulada; False se expirou"""
+        try:
+            fila.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        consumidos = 1
+        while True:
+            try:
+                fila.get_nowait()
+            except queue.Empty:
+                break
+            consumidos += 1
+        metricas.ajustar('eventos_fila_pendentes', -consumidos)
+        return True
+
+    def _entregar(self, usuario_id, tipo):
+        with self._lock:
+            filas = list(self._assinantes.get(usuario_id, ()))
+        entregues = 0
+        for fila in filas:
+            try:
+                fila.put_nowait(tipo)
+                entregues += 1
+            except queue.Full:
+                pass  # a conexão já tem recálculo pendente
+        if entregues:
+            metricas.ajustar('eventos_fila_pendentes', entregues)
+
+    def _garantir_observador(self):
+        """Inicia a thread observadora uma vez por processo (inclusive após fork)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._observar, name='barramento-eventos', daemon=True).start()
+
+    def _observar(self):
+        observados = {}  # inquilino (None = banco principal) -> _Observador
+        try:
+            while True:
+                with self._lock:
+                    ativos = set(self._inquilinos.values()) if inquilinos.roteador.ativo else {None}
+                for nome in observados.keys() - ativos:
+                    observados.pop(nome).fechar()
+                for nome in ativos - observados.keys():
+                    with self.app.app_context():
+                        engine = db.engine if nome is None else inquilinos.roteador.engine(nome)
+                        observados[nome] = _Observador(engine.raw_connection())
+
+                time.sleep(INTERVALO_OBSERVACAO)
+                for observador in observados.values():
+                    for usuario_id, tipo in observador.novos():
+                        self._entregar(usuario_id, tipo)
+        except Exception as e:
+            self.app.logger.warning(f'Barramento de eventos interrompido: {e}')
+            with self._lock:
+                self._pid = None
+        finally:
+            for observador in observados.values():
+                observador.fechar()
+
+
+class _Observador:
+    """Lê as linhas novas de `eventos` de um arquivo quando o data_version muda"""
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.cursor = conexao.cursor()
+        self.cursor.execute('SELECT coalesce(max(id), 0) FROM eventos')
+        self.ultimo_id = self.cursor.fetchone()[0]
+        self.cursor.execute('PRAGMA data_version')
+        self.versao = self.cursor.fetchone()[0]
+        conexao.commit()
+        self.proxima_limpeza = time.monotonic()
+
+    def novos(self):
+        """[(usuario_id, tipo)] gravados desde a última leitura"""
+        self.cursor.execute('PRAGMA data_version')
+        atual = self.cursor.fetchone()[0]
+        if atual == self.versao:
+            return []
+        self.versao = atual
+
+        self.cursor.execute(
+            'SELECT id, usuario_id, tipo FROM eventos WHERE id > ? ORDER BY id', (self.ultimo_id,)
+        )
+        linhas = self.cursor.fetchall()
+        if linhas:
+            self.ultimo_id = linhas[-1][0]
+        self.conexao.commit()
+
+        if time.monotonic() >= self.proxima_limpeza:
+            limite = datetime.utcnow() - RETENCAO_EVENTOS
+            self.cursor.execute('DELETE FROM eventos WHERE data < ?', (limite.isoformat(' '),))
+            self.conexao.commit()
+            self.proxima_limpeza = time.monotonic() + RETENCAO_EVENTOS.total_seconds() / 6
+        return [(usuario_id, tipo) for _, usuario_id, tipo in linhas]
+
+    def fechar(self):
+        self.conexao.close()
+
+
+barramento = Barramento()
+
+
+def formatar_sse(nome, dados):
+    """Formata uma mensagem no protocolo Server-Sent Events"""
+    return f'event: {nome}\ndata: {json.dumps(dados)}\n\n'
+
+
+# ========== PUBLICAÇÃO ==========
+def publicar(session, usuarios):
+    """Grava um evento e incrementa a versão de cada usuário ainda sem evento na transação corrente
+
+    Chamado pelo flush; escritas em lote (UPDATE direto) chamam por conta própria.
+    """
+    publicados = session.info.setdefault('eventos_publicados', set())
+    usuarios = set(usuarios) - publicados
+    if not usuarios:
+        return
+
+    publicados.update(usuarios)
+    session.execute(Evento.__table__.insert(), [
+        {'usuario_id': u, 'tipo': 'transacoes', 'data': datetime.utcnow()} for u in usuarios
+    ])
+    gravadas = session.info.setdefault('versoes_usuario', {})
+    for usuario_id in usuarios:
+        gravadas[usuario_id] = session.execute(
+            insert(VersaoUsuario).values(usuario_id=usuario_id, versao=1).on_conflict_do_update(
+                index_elements=['usuario_id'], set_={'versao': VersaoUsuario.versao + 1}
+            ).returning(VersaoUsuario.versao)
+        ).scalar()
+
+
+def versao(usuario_id):
+    """Carimbo de versão confirmado dos dados do usuário (0 se nunca foram alterados)"""
+    return db.session.query(VersaoUsuario.versao).filter(VersaoUsuario.usuario_id == usuario_id).scalar() or 0
+
+
+def versoes_gravadas(session):
+    """{usuario_id: versão} gravados pela transação; os caches leem no after_commit"""
+    return session.info.get('versoes_usuario', {})
+
+
+@event.listens_for(Session, 'after_flush')
+def _publicar(session, contexto):
+    """Grava um evento por usuário afetado, na mesma transação da alteração"""
+    publicar(session, {
+        obj.usuario_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, (Transacao, RegraRecorrencia)) and obj.usuario_id is not None
+        and not (obj in session.dirty and isinstance(obj, RegraRecorrencia) and apenas_materializou(obj))
+    })
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _limpar(session):
+    session.info.pop('eventos_publicados', None)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _limpar_versoes(session, transacao):
+    # Depois de todos os after_commit, para que cada cache leia as versões na ordem que quiser
+    if transacao.parent is None:
+        session.info.pop('versoes_usuario', None)
@@ -3,10 +3,27 @@ Extensões do Flask
 Inicialização das extensões sem a aplicação
 """
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import LoginManager
 
+
+class SessaoRoteada(Session):
+    """Sessão que pergunta ao roteador de inquilinos qual engine usar (veja inquilinos.py)
+
+    Sem roteador (modo padrão) tudo vai para o banco principal.
+    """
+    roteador = None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and SessaoRoteada.roteador is not None:
+            engine = SessaoRoteada.roteador(mapper, clause)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
 # Inicializar extensões sem a aplicação
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': SessaoRoteada})
 login_manager = LoginManager()
 
 # Configurar login manager
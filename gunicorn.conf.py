@@ -0,0 +1,104 @@
+"""
+Configuração do Gunicorn
+Modo de worker escolhido pela variável GUNICORN_WORKER_CLASS:
+
+  gthread (padrão) - threads por processo; uma conexão lenta (SSE em /api/eventos,
+                     exportações em streaming) ocupa só uma thread, não o processo
+  gevent           - greenlets; milhares de conexões ociosas por processo
+                     (requer `pip install gevent`)
+  sync             - um pedido por processo, como o Procfile antigo
+
+Cada pedido tem o seu db.session: o Flask-SQLAlchemy escopa a sessão pelo contexto
+da aplicação, que é por thread (e por greenlet no gevent). Isso não torna o resto
+do processo seguro por si só: os caches em memória (previsão, comparativos,
+configurações, dimensões) e o barramento de eventos são compartilhados pelas
+threads e usam locks próprios, objetos do ORM não podem passar de um pedido para
+outro e o SQLite continua aceitando um escritor por vez entre todos os workers.
+Veja benchmarks/carga_workers.py para a verificação e a medição.
+"""
+import os
+import shutil
+import tempfile
+
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# gthread: pedidos simultâneos por processo (com threads > 1 o gunicorn
+# trocaria um worker sync por gthread, então só definimos no modo gthread)
+if worker_class == 'gthread':
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# gevent: conexões simultâneas por processo
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# SSE: cada stream de /api/eventos prende uma thread (gthread) ou um greenlet (gevent)
+# enquanto está aberto. Cada processo aceita no máximo EVENTOS_MAX_CONEXOES streams;
+# por padrão metade das threads, para que a outra metade sempre atenda os pedidos
+# comuns. Acima do limite a resposta é 503 e o navegador passa a polling. Cada stream
+# dura até EVENTOS_DURACAO_MAXIMA segundos (padrão 300) e o EventSource reconecta,
+# então as vagas giram. Capacidade de tempo real: workers x EVENTOS_MAX_CONEXOES
+# (padrão: 3 x 4 = 12 dashboards abertos em gthread; para mais, suba GUNICORN_THREADS
+# ou use gevent).
+if worker_class == 'gthread':
+    os.environ.setdefault('EVENTOS_MAX_CONEXOES', str(threads // 2))
+elif worker_class == 'gevent':
+    os.environ.setdefault('EVENTOS_MAX_CONEXOES', str(worker_connections // 2))
+else:
+    os.environ.setdefault('EVENTOS_MAX_CONEXOES', '0')  # sync: um stream travaria o processo inteiro
+
+# Em workers sync um stream longo trava o heartbeat; nos outros modos o timeout
+# só vale para workers realmente travados
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 10))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Processos: o SQLite serializa as escritas, então mais processos só ajudam nas
+# leituras; o padrão é CPUs + 1, até 3
+workers = int(os.environ.get('GUNICORN_WORKERS', min(3, (os.cpu_count() or 1) + 1)))
+
+# Carrega o app uma vez no master e faz fork dos workers (imports compartilhados
+# por copy-on-write). Threads de fundo e conexões só nascem depois do fork.
+# Desligado por padrão no gevent, cujo monkey patch precisa vir antes dos imports.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0' if worker_class == 'gevent' else '1') != '0'
+
+# Métricas: os workers gravam em METRICAS_DIR e o /metrics soma todos os arquivos.
+# O diretório é zerado a cada início do master; gauges de workers encerrados saem.
+os.environ.setdefault('METRICAS_DIR', os.path.join(tempfile.gettempdir(), 'sistema-financeiro-metricas'))
+
+
+def on_starting(server):
+    # Esquema e usuário admin: uma vez, no master, antes de qualquer worker
+    if os.environ.get('INICIALIZAR_BANCO', '1') != '0':
+        from app import create_app, inicializar_banco
+        from extensions import db
+
+        import inquilinos
+
+        app = create_app(inicializar=False)
+        inicializar_banco(app)
+        with app.app_context():
+            db.engine.dispose()
+        inquilinos.roteador.fechar()
+
+    # Variantes comprimidas de static/ e js/ (só regrava o que mudou)
+    if os.environ.get('COMPRESSAO', '1') != '0':
+        import compressao
+        compressao.precomprimir()
+
+    shutil.rmtree(os.environ['METRICAS_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['METRICAS_DIR'], exist_ok=True)
+
+
+def post_fork(server, worker):
+    # Com preload o worker herda o app do master: descarta conexões herdadas do pool
+    if server.cfg.preload_app:
+        from extensions import db
+        from wsgi import app
+
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    import metricas
+    metricas.encerrar_processo(worker.pid)
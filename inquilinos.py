@@ -0,0 +1,379 @@
+"""
+Banco por Inquilino
+Com INQUILINOS=1, os dados financeiros de cada empresa/departamento (transações,
+recorrências, centros de custo, precificação, relatórios, notificações e eventos)
+ficam em um SQLite próprio em INQUILINOS_DIR. Usuários, configurações, auditoria e
+backups continuam no banco principal, que funciona como catálogo.
+
+O inquilino do pedido vem do departamento do usuário logado. A sessão escolhe a
+engine pela tabela consultada: catálogo no banco principal, dados no arquivo do
+inquilino ativo. Cada arquivo tem o próprio lock de escrita, então a vazão de
+escrita cresce com o número de inquilinos em vez de serializar em um só arquivo.
+
+As engines abertas ficam em um LRU de INQUILINOS_ENGINES_MAXIMO entradas; um
+arquivo novo recebe o esquema na primeira abertura. Administração, em paralelo
+sobre todos os arquivos:
+
+    flask --app wsgi inquilinos listar | criar NOME... | migrar | backup | distribuir
+"""
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+import click
+import sqlalchemy as sa
+from flask import g
+from flask.cli import AppGroup
+from flask_login import current_user
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.util import find_tables
+
+import metricas
+from extensions import db, SessaoRoteada
+from migracoes import atualizar_esquema
+from models import Usuario
+
+
+INQUILINO_PADRAO = 'padrao'
+ENGINES_MAXIMO_PADRAO = 32
+NOME_VALIDO = re.compile(r'^[a-z0-9][a-z0-9_-]{0,49}$')
+
+# Tabelas que ficam no arquivo do inquilino; as demais ficam no catálogo
+TABELAS_INQUILINO = frozenset({
+    'transacoes', 'regras_recorrencia', 'centros_custo', 'calculos_precificacao',
+    'relatorios', 'notificacoes', 'eventos', 'versoes_usuario', 'arquivos_transacoes', 'resumos_arquivados',
+    'frequencias_categoria', 'categorias', 'fornecedores', 'formas_pagamento'
+})
+# Copiadas do banco principal pelo `distribuir` (eventos e carimbos de versão são efêmeros)
+TABELAS_DISTRIBUIDAS = ('centros_custo', 'categorias', 'fornecedores', 'formas_pagamento', 'transacoes',
+                        'regras_recorrencia', 'notificacoes', 'calculos_precificacao', 'relatorios',
+                        'arquivos_transacoes', 'resumos_arquivados', 'frequencias_categoria')
+
+_atual = ContextVar('inquilino', default=None)
+
+
+class SemInquilino(RuntimeError):
+    """Tabela de dados acessada sem inquilino ativo (nunca cai no banco principal)"""
+
+
+# ========== INQUILINO ATIVO ==========
+def nome_inquilino(departamento):
+    """'Financeiro SP' -> 'financeiro-sp'; sem departamento -> 'padrao'"""
+    texto = unicodedata.normalize('NFKD', departamento or '').encode('ascii', 'ignore').decode().lower()
+    return re.sub(r'[^a-z0-9]+', '-', texto).strip('-')[:50] or INQUILINO_PADRAO
+
+
+def inquilino_de(usuario):
+    return nome_inquilino(usuario.departamento)
+
+
+def atual():
+    return _atual.get()
+
+
+@contextmanager
+def usando(nome):
+    """Roteia as tabelas de dados para o inquilino `nome` dentro do bloco"""
+    token = _atual.set(nome)
+    try:
+        yield
+    finally:
+        _atual.reset(token)
+
+
+def usuarios_por_inquilino(*filtros):
+    """{inquilino: [ids]} dos usuários do catálogo que passam pelos filtros"""
+    grupos = {}
+    for usuario_id, departamento in db.session.query(Usuario.id, Usuario.departamento).filter(*filtros):
+        grupos.setdefault(nome_inquilino(departamento), []).append(usuario_id)
+    return grupos
+
+
+# ========== ROTEADOR ==========
+def _tabela_de(mapper, clause):
+    if mapper is not None:
+        return sa.inspect(mapper).local_table
+    if clause is not None:
+        for tabela in find_tables(clause, include_crud=True):
+            if tabela.name in TABELAS_INQUILINO:
+                return tabela
+    return None
+
+
+def criar_esquema(engine):
+    """Cria/atualiza as tabelas de dados em um arquivo de inquilino"""
+    tabelas = [t for t in db.metadata.sorted_tables if t.name in TABELAS_INQUILINO]
+    try:
+        db.metadata.create_all(engine, tables=tabelas)
+    except OperationalError:
+        # Outro processo criou as mesmas tabelas ao mesmo tempo: confere de novo
+        db.metadata.create_all(engine, tables=tabelas)
+    atualizar_esquema(engine, tabelas)
+
+
+class Roteador:
+    """Engines por inquilino em um LRU limitado, compartilhado pelas threads do processo"""
+
+    def __init__(self):
+        self.ativo = False
+        self.pasta = None
+        self.maximo = ENGINES_MAXIMO_PADRAO
+        self.opcoes = {}
+        self._engines = OrderedDict()
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._descartar)
+
+    def configurar(self, ativo, pasta, maximo, opcoes):
+        self.ativo, self.pasta, self.maximo, self.opcoes = ativo, pasta, maximo, opcoes
+        self.fechar()
+
+    def _descartar(self):
+        # Conexões herdadas do master não são fechadas no filho (como no post_fork do gunicorn)
+        for engine in self._engines.values():
+            engine.dispose(close=False)
+        self._engines = OrderedDict()
+
+    def fechar(self):
+        with self._lock:
+            engines, self._engines = self._engines, OrderedDict()
+        for engine in engines.values():
+            engine.dispose()
+            metricas.ajustar('inquilinos_engines_abertas', -1)
+
+    def caminho(self, nome):
+        if not NOME_VALIDO.match(nome or ''):
+            raise ValueError(f'Nome de inquilino inválido: {nome}')
+        return os.path.join(self.pasta, f'{nome}.db')
+
+    def existentes(self):
+        """Inquilinos com arquivo criado"""
+        if not os.path.isdir(self.pasta):
+            return []
+        return sorted(n[:-3] for n in os.listdir(self.pasta) if n.endswith('.db') and NOME_VALIDO.match(n[:-3]))
+
+    def engine(self, nome):
+        """Engine do inquilino; abre (e cria o esquema, se o arquivo é novo) na primeira vez"""
+        with self._lock:
+            engine = self._engines.get(nome)
+            if engine is not None:
+                self._engines.move_to_end(nome)
+                return engine
+
+        caminho = self.caminho(nome)
+        novo = not os.path.exists(caminho)
+        os.makedirs(self.pasta, exist_ok=True)
+        engine = sa.create_engine(f'sqlite:///{caminho}', **self.opcoes)
+        if novo:
+            criar_esquema(engine)
+
+        descartadas = []
+        with self._lock:
+            existente = self._engines.get(nome)
+            if existente is not None:
+                descartadas.append(engine)  # outra thread abriu antes
+                engine = existente
+            else:
+                self._engines[nome] = engine
+                metricas.ajustar('inquilinos_engines_abertas', 1)
+                while len(self._engines) > self.maximo:
+                    descartadas.append(self._engines.popitem(last=False)[1])
+                    metricas.ajustar('inquilinos_engines_abertas', -1)
+        # Conexões em uso pela engine despejada continuam válidas até serem devolvidas
+        for antiga in descartadas:
+            antiga.dispose()
+        return engine
+
+    def engine_para(self, mapper, clause):
+        """get_bind da sessão: engine do inquilino ativo para tabelas de dados, None para o catálogo"""
+        tabela = _tabela_de(mapper, clause)
+        if tabela is None or tabela.name not in TABELAS_INQUILINO:
+            return None
+        nome = _atual.get()
+        if nome is None:
+            raise SemInquilino(f'Tabela {tabela.name} acessada sem inquilino ativo')
+        return self.engine(nome)
+
+
+roteador = Roteador()
+
+
+# ========== ADMINISTRAÇÃO ==========
+def conhecidos():
+    """Inquilinos com arquivo ou com usuários no catálogo"""
+    return sorted(set(roteador.existentes()) | set(usuarios_por_inquilino()))
+
+
+def em_paralelo(funcao, nomes, paralelo=None):
+    """{nome: resultado ou exceção} de funcao(nome) para cada inquilino, em threads"""
+    if not nomes:
+        return {}
+    with ThreadPoolExecutor(paralelo or min(8, len(nomes))) as pool:
+        futuros = {nome: pool.submit(funcao, nome) for nome in nomes}
+    resultados = {}
+    for nome, futuro in futuros.items():
+        try:
+            resultados[nome] = futuro.result()
+        except Exception as e:
+            resultados[nome] = e
+    return resultados
+
+
+def migrar(nome):
+    criar_esquema(roteador.engine(nome))
+    return os.path.getsize(roteador.caminho(nome))
+
+
+def copiar(nome, destino):
+    """Backup consistente com o arquivo em uso (API de backup do SQLite)"""
+    origem = sqlite3.connect(roteador.caminho(nome))
+    alvo = sqlite3.connect(os.path.join(destino, f'{nome}.db'))
+    try:
+        with alvo:
+            origem.backup(alvo)
+    finally:
+        alvo.close()
+        origem.close()
+    return os.path.getsize(os.path.join(destino, f'{nome}.db'))
+
+
+def distribuir(nome, usuarios, principal):
+    """Copia para o arquivo do inquilino as linhas dos seus usuários no banco principal
+
+    Mantém os ids (INSERT OR IGNORE), então pode ser repetido. Centros de custo são
+    copiados inteiros para todos os inquilinos. Devolve {tabela: linhas copiadas}.
+    """
+    roteador.engine(nome)  # garante o arquivo e o esquema
+    conexao = sqlite3.connect(roteador.caminho(nome), timeout=30)
+    try:
+        conexao.execute('ATTACH DATABASE ? AS principal', (principal,))
+        marcadores = ','.join('?' * len(usuarios))
+        copiadas = {}
+        with conexao:
+            for tabela in TABELAS_DISTRIBUIDAS:
+                destino = [c[1] for c in conexao.execute(f'PRAGMA main.table_info({tabela})')]
+                origem = {c[1] for c in conexao.execute(f'PRAGMA principal.table_info({tabela})')}
+                colunas = ', '.join(c for c in destino if c in origem)
+                if not colunas:
+                    continue
+                filtro, parametros = ('', []) if 'usuario_id' not in origem else (
+                    f' WHERE usuario_id IN ({marcadores})', usuarios
+                )
+                cursor = conexao.execute(
+                    f'INSERT OR IGNORE INTO main.{tabela} ({colunas}) '
+                    f'SELECT {colunas} FROM principal.{tabela}{filtro}', parametros
+                )
+                copiadas[tabela] = cursor.rowcount
+        conexao.execute('DETACH DATABASE principal')
+        return copiadas
+    finally:
+        conexao.close()
+
+
+def _imprimir(resultados, formatar):
+    falhas = 0
+    for nome, resultado in resultados.items():
+        if isinstance(resultado, Exception):
+            falhas += 1
+            print(f'❌ {nome}: {resultado}')
+        else:
+            print(f'✅ {nome}: {formatar(resultado)}')
+    if falhas:
+        raise SystemExit(1)
+
+
+grupo = AppGroup('inquilinos', help='Bancos por inquilino (INQUILINOS=1)')
+
+
+@grupo.command('listar')
+def comando_listar():
+    """Inquilinos, usuários e tamanho dos arquivos"""
+    grupos = usuarios_por_inquilino()
+    for nome in conhecidos():
+        caminho = roteador.caminho(nome)
+        tamanho = f'{os.path.getsize(caminho) / 1024:.0f} KB' if os.path.exists(caminho) else 'sem arquivo'
+        print(f'{nome:30} {len(grupos.get(nome, [])):6} usuários  {tamanho}')
+
+
+@grupo.command('criar')
+@click.argument('nomes', nargs=-1)
+@click.option('--paralelo', type=int, help='Arquivos processados ao mesmo tempo')
+def comando_criar(nomes, paralelo):
+    """Cria os arquivos dos inquilinos indicados (padrão: todos os do catálogo)"""
+    nomes = [nome_inquilino(n) for n in nomes] or conhecidos()
+    _imprimir(em_paralelo(migrar, nomes, paralelo), lambda tamanho: f'{tamanho / 1024:.0f} KB')
+
+
+@grupo.command('migrar')
+@click.option('--paralelo', type=int, help='Arquivos processados ao mesmo tempo')
+def comando_migrar(paralelo):
+    """Aplica o esquema atual (tabelas, colunas e índices novos) em todos os arquivos"""
+    _imprimir(em_paralelo(migrar, roteador.existentes(), paralelo), lambda _: 'esquema em dia')
+
+
+@grupo.command('backup')
+@click.option('--destino', help='Pasta do backup (padrão: instance/backups/inquilinos-DATA)')
+@click.option('--paralelo', type=int, help='Arquivos processados ao mesmo tempo')
+def comando_backup(destino, paralelo):
+    """Copia todos os arquivos de inquilino, em paralelo, sem parar o servidor"""
+    destino = destino or os.path.join(
+        os.path.dirname(roteador.pasta), 'backups', f'inquilinos-{datetime.now():%Y%m%d_%H%M%S}'
+    )
+    os.makedirs(destino, exist_ok=True)
+    resultados = em_paralelo(lambda nome: copiar(nome, destino), roteador.existentes(), paralelo)
+    _imprimir(resultados, lambda tamanho: f'{tamanho / 1024:.0f} KB em {destino}')
+
+
+@grupo.command('distribuir')
+@click.option('--remover', is_flag=True, help='Apaga do banco principal as linhas copiadas')
+@click.option('--paralelo', type=int, help='Arquivos processados ao mesmo tempo')
+def comando_distribuir(remover, paralelo):
+    """Move os dados do banco principal para os arquivos dos inquilinos (rode com o servidor parado)"""
+    principal = db.engine.url.database
+    grupos = usuarios_por_inquilino()
+    resultados = em_paralelo(lambda nome: distribuir(nome, grupos[nome], principal), list(grupos), paralelo)
+    _imprimir(resultados, lambda copiadas: ', '.join(f'{t} {n}' for t, n in copiadas.items()))
+
+    if remover:
+        with db.engine.begin() as conexao:
+            for tabela in reversed(TABELAS_DISTRIBUIDAS):
+                if 'usuario_id' in db.metadata.tables[tabela].columns:
+                    conexao.execute(db.metadata.tables[tabela].delete())
+        print('✅ Dados removidos do banco principal')
+
+
+# ========== FLASK ==========
+def init_app(app):
+    """Liga o roteamento por inquilino (INQUILINOS=1) e registra o comando de administração"""
+    app.config.setdefault('INQUILINOS', os.environ.get('INQUILINOS', '0') != '0')
+    app.config.setdefault(
+        'INQUILINOS_DIR', os.environ.get('INQUILINOS_DIR') or os.path.join(app.instance_path, 'inquilinos')
+    )
+    app.config.setdefault(
+        'INQUILINOS_ENGINES_MAXIMO', int(os.environ.get('INQUILINOS_ENGINES_MAXIMO', ENGINES_MAXIMO_PADRAO))
+    )
+    ativo = app.config['INQUILINOS']
+    roteador.configurar(ativo, app.config['INQUILINOS_DIR'], app.config['INQUILINOS_ENGINES_MAXIMO'],
+                        app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    SessaoRoteada.roteador = roteador.engine_para if ativo else None
+    app.cli.add_command(grupo)
+
+    if not ativo:
+        return
+
+    @app.before_request
+    def _definir_inquilino():
+        if current_user.is_authenticated:
+            g.token_inquilino = _atual.set(inquilino_de(current_user))
+
+    @app.teardown_request
+    def _liberar_inquilino(exc):
+        token = g.pop('token_inquilino', None)
+        if token is not None:
+            _atual.reset(token)
@@ -0,0 +1,153 @@
+"""
+Instrumentação SQL
+Conta, por pedido, as consultas executadas, o tempo gasto no banco e as formas de
+comando repetidas (sinal típico de N+1), a partir dos eventos do engine do SQLAlchemy.
+
+- Server-Timing com os números do pedido (modo debug ou SQL_SERVER_TIMING)
+- log das consultas acima de SQL_CONSULTA_LENTA_MS
+- aviso de possível N+1 quando a mesma forma se repete SQL_LIMIAR_REPETICAO vezes
+- orçamento de consultas por rota (@orcamento_consultas), que derruba o pedido
+  em testes (SQL_IMPOR_ORCAMENTO, padrão app.testing) e só avisa em produção
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger('sql')
+
+_ESPACOS = re.compile(r'\s+')
+_LISTA_IN = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+_config = {'lenta_ms': 200.0}
+_coletores = threading.local()
+
+
+class OrcamentoConsultasExcedido(AssertionError):
+    """Rota executou mais consultas do que o orçamento declarado"""
+
+
+class EstatisticasSQL:
+    """Consultas de um pedido (ou de um bloco contar_consultas)"""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo = 0.0
+        self.formas = Counter()
+
+    def registrar(self, forma, duracao):
+        self.consultas += 1
+        self.tempo += duracao
+        self.formas[forma] += 1
+
+    def repetidas(self, limiar):
+        """Formas executadas pelo menos `limiar` vezes, da mais repetida para a menos"""
+        return [(forma, n) for forma, n in self.formas.most_common() if n >= limiar]
+
+
+def forma_da_consulta(sql):
+    """Normaliza o comando: espaços, listas IN e literais viram um marcador só"""
+    sql = _LISTA_IN.sub('(?)', sql)
+    sql = _LITERAIS.sub('?', sql)
+    return _ESPACOS.sub(' ', sql).strip()
+
+
+# ========== EVENTOS DO ENGINE ==========
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes(conn, cursor, sql, parametros, contexto, executemany):
+    conn.info.setdefault('inicio_consulta', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _depois(conn, cursor, sql, parametros, contexto, executemany):
+    inicio = conn.info.get('inicio_consulta')
+    if not inicio:
+        return
+    duracao = time.perf_counter() - inicio.pop()
+
+    if duracao * 1000 >= _config['lenta_ms']:
+        logger.warning('Consulta lenta (%.1f ms): %s', duracao * 1000, _ESPACOS.sub(' ', sql)[:500])
+
+    destinos = list(getattr(_coletores, 'pilha', ()))
+    if has_request_context() and 'sql' in g:
+        destinos.append(g.sql)
+    if destinos:
+        forma = forma_da_consulta(sql)
+        for estatisticas in destinos:
+            estatisticas.registrar(forma, duracao)
+
+
+# ========== API ==========
+def orcamento_consultas(limite):
+    """Declara o número máximo de consultas por pedido da rota"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return f(*args, **kwargs)
+        decorated_function.orcamento_consultas = limite
+        return decorated_function
+    return decorator
+
+
+@contextmanager
+def contar_consultas():
+    """Conta as consultas executadas no bloco (útil em testes e benchmarks)"""
+    estatisticas = EstatisticasSQL()
+    pilha = _coletores.__dict__.setdefault('pilha', [])
+    pilha.append(estatisticas)
+    try:
+        yield estatisticas
+    finally:
+        pilha.remove(estatisticas)
+
+
+def init_app(app):
+    """Liga a contagem por pedido e os relatórios ao fim de cada pedido"""
+    app.config.setdefault('SQL_CONSULTA_LENTA_MS', float(os.environ.get('SQL_CONSULTA_LENTA_MS', 200)))
+    app.config.setdefault('SQL_LIMIAR_REPETICAO', int(os.environ.get('SQL_LIMIAR_REPETICAO', 5)))
+    app.config.setdefault('SQL_SERVER_TIMING', None)  # None: segue app.debug
+    app.config.setdefault('SQL_IMPOR_ORCAMENTO', None)  # None: segue app.testing
+    _config['lenta_ms'] = app.config['SQL_CONSULTA_LENTA_MS']
+
+    @app.before_request
+    def _iniciar_contagem():
+        g.sql = EstatisticasSQL()
+
+    @app.after_request
+    def _relatar_consultas(response):
+        estatisticas = g.pop('sql', None)
+        if estatisticas is None:
+            return response
+
+        repetidas = estatisticas.repetidas(app.config['SQL_LIMIAR_REPETICAO'])
+        for forma, n in repetidas:
+            logger.warning('Possível N+1 em %s: %dx %s', request.endpoint, n, forma[:300])
+
+        server_timing = app.config['SQL_SERVER_TIMING']
+        if server_timing or (server_timing is None and app.debug):
+            response.headers.add(
+                'Server-Timing',
+                f'sql;desc="{estatisticas.consultas} consultas, {len(repetidas)} repetidas";'
+                f'dur={estatisticas.tempo * 1000:.1f}'
+            )
+
+        view = app.view_functions.get(request.endpoint)
+        limite = getattr(view, 'orcamento_consultas', None)
+        if limite is not None and estatisticas.consultas > limite:
+            mensagem = f'{request.endpoint} executou {estatisticas.consultas} consultas (orçamento: {limite})'
+            impor = app.config['SQL_IMPOR_ORCAMENTO']
+            if impor or (impor is None and app.testing):
+                raise OrcamentoConsultasExcedido(mensagem)
+            logger.warning(mensagem)
+
+        return response
@@ -0,0 +1,318 @@
+"""
+Métricas no Formato Prometheus
+Contadores, gauges e histogramas gravados em arquivos mapeados em memória, um par
+de arquivos por processo em METRICAS_DIR. O /metrics soma os arquivos de todos os
+workers do gunicorn, então os números são globais e não do worker que atendeu.
+
+Registrar um valor é uma busca em dicionário e um struct.pack_into no mmap (sem
+chamadas de sistema), barato o bastante para ficar ligado em produção.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+
+BALDES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BALDES_VARREDURA = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0)
+TAMANHO_INICIAL = 64 * 1024
+
+METRICAS = {
+    'http_requests_total': ('counter', 'Pedidos atendidos por endpoint, método e status'),
+    'http_request_duration_seconds': ('histogram', 'Latência dos pedidos por endpoint'),
+    'http_requests_in_flight': ('gauge', 'Pedidos em andamento (inclui streams SSE abertos)'),
+    'db_pool_checkouts_total': ('counter', 'Conexões retiradas do pool do SQLAlchemy'),
+    'db_pool_conexoes_em_uso': ('gauge', 'Conexões do pool em uso'),
+    'cache_consultas_total': ('counter', 'Consultas aos caches em memória por resultado'),
+    'eventos_fila_pendentes': ('gauge', 'Eventos entregues às conexões SSE e ainda não processados'),
+    'sse_conexoes_abertas': ('gauge', 'Conexões SSE assinando o barramento de eventos'),
+    'sse_conexoes_recusadas_total': ('counter', 'Conexões SSE recusadas pelo limite do processo (cliente usa polling)'),
+    'notificacoes_varredura_segundos': ('histogram', 'Duração da varredura de vencimentos'),
+    'login_tentativas_total': ('counter', 'Tentativas de login por resultado'),
+    'login_hash_pendentes': ('gauge', 'Hashes de senha em execução ou na fila'),
+    'inquilinos_engines_abertas': ('gauge', 'Engines de bancos por inquilino abertas no processo'),
+}
+BALDES = {
+    'http_request_duration_seconds': BALDES_LATENCIA,
+    'notificacoes_varredura_segundos': BALDES_VARREDURA,
+}
+
+
+# ========== ARQUIVOS POR PROCESSO ==========
+class _ArquivoMetricas:
+    """Valores float64 de um processo em um arquivo mapeado em memória
+
+    Layout: 8 bytes com o total usado, seguidos de entradas
+    [tamanho da chave (4 bytes)][chave utf-8, alinhada em 8][valor float64].
+    A entrada é escrita antes de o total ser atualizado, então um leitor nunca
+    vê uma entrada pela metade.
+    """
+
+    def __init__(self, caminho):
+        self._fd = os.open(caminho, os.O_RDWR | os.O_CREAT, 0o644)
+        tamanho = max(os.fstat(self._fd).st_size, TAMANHO_INICIAL)
+        os.ftruncate(self._fd, tamanho)
+        self._mm = mmap.mmap(self._fd, tamanho)
+        self._usado = struct.unpack_from('Q', self._mm, 0)[0] or 8
+        self._posicoes = {chave: posicao for chave, posicao, _ in _entradas(self._mm, self._usado)}
+
+    def _posicao(self, chave):
+        posicao = self._posicoes.get(chave)
+        if posicao is not None:
+            return posicao
+
+        codificada = chave.encode('utf-8')
+        cabecalho = 4 + len(codificada)
+        cabecalho += -cabecalho % 8
+        if self._usado + cabecalho + 8 > len(self._mm):
+            novo = max(len(self._mm) * 2, self._usado + cabecalho + 8)
+            os.ftruncate(self._fd, novo)
+            self._mm.close()
+            self._mm = mmap.mmap(self._fd, novo)
+
+        struct.pack_into(f'I{len(codificada)}s', self._mm, self._usado, len(codificada), codificada)
+        posicao = self._usado + cabecalho
+        struct.pack_into('d', self._mm, posicao, 0.0)
+        self._usado = posicao + 8
+        struct.pack_into('Q', self._mm, 0, self._usado)
+        self._posicoes[chave] = posicao
+        return posicao
+
+    def somar(self, chave, valor):
+        posicao = self._posicao(chave)
+        struct.pack_into('d', self._mm, posicao, struct.unpack_from('d', self._mm, posicao)[0] + valor)
+
+    def definir(self, chave, valor):
+        struct.pack_into('d', self._mm, self._posicao(chave), valor)
+
+
+def _entradas(dados, usado):
+    posicao = 8
+    while posicao < usado:
+        tamanho = struct.unpack_from('I', dados, posicao)[0]
+        chave = bytes(dados[posicao + 4:posicao + 4 + tamanho]).decode('utf-8')
+        cabecalho = 4 + tamanho
+        cabecalho += -cabecalho % 8
+        valor_em = posicao + cabecalho
+        yield chave, valor_em, struct.unpack_from('d', dados, valor_em)[0]
+        posicao = valor_em + 8
+
+
+def _ler_arquivo(caminho):
+    with open(caminho, 'rb') as arquivo:
+        dados = arquivo.read()
+    if len(dados) < 8:
+        return []
+    usado = min(struct.unpack_from('Q', dados, 0)[0], len(dados))
+    return [(chave, valor) for chave, _, valor in _entradas(dados, usado)]
+
+
+def diretorio():
+    """Diretório compartilhado pelos workers (METRICAS_DIR ou um temporário do processo pai)"""
+    caminho = os.environ.get('METRICAS_DIR') or os.path.join(
+        tempfile.gettempdir(), f'sistema-financeiro-metricas-{os.getppid()}')
+    os.makedirs(caminho, exist_ok=True)
+    return caminho
+
+
+_lock = threading.Lock()
+_arquivos = {}
+
+
+def _apos_fork():
+    """Cada worker abre os próprios arquivos depois do fork"""
+    global _lock
+    _lock = threading.Lock()
+    _arquivos.clear()
+
+
+os.register_at_fork(after_in_child=_apos_fork)
+
+
+def _arquivo(tipo):
+    """Arquivo do processo atual para contadores ('contador') ou gauges ('gauge')"""
+    arquivo = _arquivos.get(tipo)
+    if arquivo is None:
+        arquivo = _arquivos[tipo] = _ArquivoMetricas(os.path.join(diretorio(), f'{tipo}_{os.getpid()}.db'))
+    return arquivo
+
+
+@lru_cache(maxsize=4096)
+def _chave(nome, rotulos=()):
+    return json.dumps([nome, rotulos], ensure_ascii=False)
+
+
+# ========== REGISTRO ==========
+def incrementar(nome, valor=1.0, **rotulos):
+    chave = _chave(nome, tuple(sorted(rotulos.items())))
+    with _lock:
+        _arquivo('contador').somar(chave, valor)
+
+
+def ajustar(nome, valor, **rotulos):
+    """Soma (ou subtrai) de um gauge"""
+    chave = _chave(nome, tuple(sorted(rotulos.items())))
+    with _lock:
+        _arquivo('gauge').somar(chave, valor)
+
+
+def definir(nome, valor, **rotulos):
+    chave = _chave(nome, tuple(sorted(rotulos.items())))
+    with _lock:
+        _arquivo('gauge').definir(chave, valor)
+
+
+def observar(nome, valor, **rotulos):
+    """Registra um valor no histograma (um único balde por observação; o acumulado é feito na leitura)"""
+    baldes = BALDES[nome]
+    rotulos = tuple(sorted(rotulos.items()))
+    indice = bisect_left(baldes, valor)
+    limite = str(baldes[indice]) if indice < len(baldes) else '+Inf'
+    with _lock:
+        arquivo = _arquivo('contador')
+        arquivo.somar(_chave(nome + '_bucket', rotulos + (('le', limite),)), 1)
+        arquivo.somar(_chave(nome + '_sum', rotulos), valor)
+        arquivo.somar(_chave(nome + '_count', rotulos), 1)
+
+
+def encerrar_processo(pid):
+    """Descarta os gauges de um worker encerrado (os contadores continuam somando)"""
+    try:
+        os.remove(os.path.join(diretorio(), f'gauge_{pid}.db'))
+    except OSError:
+        pass
+
+
+# ========== LEITURA E EXPOSIÇÃO ==========
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def coletar():
+    """Soma os valores de todos os processos; gauges de processos mortos são descartados"""
+    pasta = diretorio()
+    totais = {}
+    for nome_arquivo in os.listdir(pasta):
+        tipo, _, resto = nome_arquivo.partition('_')
+        if not resto.endswith('.db') or not resto[:-3].isdigit():
+            continue
+        caminho = os.path.join(pasta, nome_arquivo)
+        if tipo == 'gauge' and not _processo_vivo(int(resto[:-3])):
+            encerrar_processo(int(resto[:-3]))
+            continue
+        try:
+            entradas = _ler_arquivo(caminho)
+        except OSError:
+            continue
+        for chave, valor in entradas:
+            totais[chave] = totais.get(chave, 0.0) + valor
+    return totais
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(rotulos):
+    if not rotulos:
+        return ''
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in rotulos) + '}'
+
+
+def _formatar_valor(valor):
+    return str(int(valor)) if valor == int(valor) else repr(valor)
+
+
+def exposicao(totais=None):
+    """Texto no formato de exposição do Prometheus (0.0.4)"""
+    totais = coletar() if totais is None else totais
+    series = {}
+    for chave, valor in totais.items():
+        nome, rotulos = json.loads(chave)
+        series.setdefault(nome, []).append((tuple(tuple(r) for r in rotulos), valor))
+
+    linhas = []
+    for nome, (tipo, ajuda) in METRICAS.items():
+        linhas.append(f'# HELP {nome} {ajuda}')
+        linhas.append(f'# TYPE {nome} {tipo}')
+        if tipo != 'histogram':
+            for rotulos, valor in sorted(series.get(nome, [])):
+                linhas.append(f'{nome}{_formatar_rotulos(rotulos)} {_formatar_valor(valor)}')
+            continue
+
+        # Baldes gravados individualmente: acumula aqui, emitindo todos os limites
+        baldes = {}
+        for rotulos, valor in series.get(nome + '_bucket', []):
+            base = tuple(r for r in rotulos if r[0] != 'le')
+            baldes.setdefault(base, {})[dict(rotulos)['le']] = valor
+        somas = dict(series.get(nome + '_sum', []))
+        limites = [str(b) for b in BALDES[nome]] + ['+Inf']
+        for base in sorted(baldes):
+            acumulado = 0
+            for limite in limites:
+                acumulado += baldes[base].get(limite, 0)
+                linhas.append(f'{nome}_bucket{_formatar_rotulos(base + (("le", limite),))} {_formatar_valor(acumulado)}')
+            linhas.append(f'{nome}_sum{_formatar_rotulos(base)} {_formatar_valor(somas.get(base, 0.0))}')
+            linhas.append(f'{nome}_count{_formatar_rotulos(base)} {_formatar_valor(acumulado)}')
+    return '\n'.join(linhas) + '\n'
+
+
+# ========== POOL DE CONEXÕES ==========
+@event.listens_for(Pool, 'checkout')
+def _checkout(conexao_dbapi, registro, proxy):
+    incrementar('db_pool_checkouts_total')
+    ajustar('db_pool_conexoes_em_uso', 1)
+
+
+@event.listens_for(Pool, 'checkin')
+def _checkin(conexao_dbapi, registro):
+    ajustar('db_pool_conexoes_em_uso', -1)
+
+
+# ========== FLASK ==========
+def init_app(app):
+    """Mede cada pedido e registra o endpoint /metrics"""
+
+    @app.before_request
+    def _iniciar_medicao():
+        g.metricas_inicio = time.perf_counter()
+        ajustar('http_requests_in_flight', 1)
+
+    @app.after_request
+    def _registrar_pedido(response):
+        inicio = g.get('metricas_inicio')
+        if inicio is not None:
+            endpoint = request.endpoint or 'nao_encontrado'
+            incrementar('http_requests_total', endpoint=endpoint, metodo=request.method,
+                        status=str(response.status_code))
+            observar('http_request_duration_seconds', time.perf_counter() - inicio, endpoint=endpoint)
+        return response
+
+    @app.teardown_request
+    def _finalizar_medicao(exc):
+        # Em respostas em streaming o teardown só ocorre quando o stream termina
+        if g.pop('metricas_inicio', None) is not None:
+            ajustar('http_requests_in_flight', -1)
+
+    def metrics():
+        token = app.config.get('METRICAS_TOKEN') or os.environ.get('METRICAS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Não autorizado\n', status=401, mimetype='text/plain')
+        return Response(exposicao(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
@@ -0,0 +1,35 @@
+"""
+Migrações leves do esquema
+O db.create_all() só cria tabelas novas; aqui adicionamos colunas e índices
+novos dos modelos às tabelas que já existem no banco. Os textos que viraram
+dimensões saem da tabela transacoes (veja dimensoes.migrar_textos).
+"""
+from extensions import db
+
+
+def atualizar_esquema(engine=None, tabelas=None):
+    """Adiciona às tabelas existentes as colunas e índices que faltam
+
+    Padrão: todas as tabelas do banco principal; os bancos por inquilino passam a
+    própria engine e só as tabelas de dados (veja inquilinos.py).
+    """
+    engine = engine or db.engine
+    inspector = db.inspect(engine)
+
+    with engine.begin() as conn:
+        for tabela in tabelas or db.metadata.sorted_tables:
+            if not inspector.has_table(tabela.name):
+                continue
+
+            existentes = {c['name'] for c in inspector.get_columns(tabela.name)}
+            for coluna in tabela.columns:
+                if coluna.name not in existentes:
+                    tipo = coluna.type.compile(dialect=engine.dialect)
+                    conn.execute(db.text(f'ALTER TABLE {tabela.name} ADD COLUMN {coluna.name} {tipo}'))
+
+            for indice in tabela.indexes:
+                indice.create(conn, checkfirst=True)
+
+            if tabela.name == 'transacoes':
+                import dimensoes  # importa inquilinos, que importa este módulo
+                dimensoes.migrar_textos(conn)
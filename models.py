@@ -3,11 +3,17 @@ Modelos de Dados do Sistema Financeiro
 Centralização de todos os modelos em um único arquivo
 """
 from flask_login import UserMixin
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm.attributes import flag_dirty
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from extensions import db, login_manager
 
 
+STATUS_ABERTOS = ('pendente', 'atrasado')  # contas ainda não pagas nem canceladas
+TEXTOS_DIMENSAO = ('categoria', 'fornecedor', 'forma_pagamento')  # texto -> chave da dimensão (dimensoes.py)
+
+
 @login_manager.user_loader
 def load_user(user_id):
     return Usuario.query.get(int(user_id))
@@ -16,6 +22,10 @@ def load_user(user_id):
 class Usuario(db.Model, UserMixin):
     """Modelo de Usuário do Sistema"""
     __tablename__ = 'usuarios'
+    __table_args__ = (
+        # Listagem do admin: ORDER BY nome com LIMIT lê só a página pedida
+        db.Index('ix_usuarios_nome', 'nome'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
@@ -37,25 +47,202 @@ class Usuario(db.Model, UserMixin):
         return check_password_hash(self.senha_hash, senha)
 
 
+def _texto_da_dimensao(campo):
+    """Texto de categoria, fornecedor ou forma de pagamento, gravado só como chave da dimensão
+
+    Lido, é o nome da linha da dimensão (ou o texto atribuído, até o flush); atribuído,
+    fica pendente no objeto e dimensoes.py o troca pela chave antes do flush. Em
+    consultas é a subconsulta do nome pela chave.
+    """
+    def ler(self):
+        pendentes = self.__dict__.get('_textos_pendentes')
+        if pendentes and campo in pendentes:
+            return pendentes[campo]
+        linha = getattr(self, f'dimensao_{campo}')
+        return linha.nome if linha is not None else None
+
+    def gravar(self, texto):
+        if db.inspect(self).persistent:
+            anteriores = self.__dict__.setdefault('_textos_anteriores', {})
+            if campo not in anteriores:
+                anteriores[campo] = ler(self)
+        self.__dict__.setdefault('_textos_pendentes', {})[campo] = texto
+        flag_dirty(self)
+
+    def expressao(cls):
+        modelo = getattr(cls, f'dimensao_{campo}').property.mapper.class_
+        return db.select(modelo.nome).where(modelo.id == getattr(cls, f'{campo}_id')).scalar_subquery().label(campo)
+
+    return hybrid_property(ler, gravar, expr=expressao)
+
+
 class Transacao(db.Model):
     """Modelo de Transação Financeira"""
     __tablename__ = 'transacoes'
+    __table_args__ = (
+        # Varredura de vencimentos por usuário (contas pendentes por data de vencimento)
+        db.Index('ix_transacoes_usuario_status_vencimento', 'usuario_id', 'status', 'data_vencimento'),
+        # Checagem de duplicatas na gravação (mesma impressão do mesmo usuário)
+        db.Index('ix_transacoes_usuario_impressao', 'usuario_id', 'impressao'),
+        # Ranking e agrupamento por fornecedor pela chave inteira (dimensoes.py)
+        db.Index('ix_transacoes_usuario_fornecedor', 'usuario_id', 'fornecedor_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     descricao = db.Column(db.String(200), nullable=False)
     valor = db.Column(db.Float, nullable=False)
     data = db.Column(db.Date, nullable=False)
     data_vencimento = db.Column(db.Date)
-    categoria = db.Column(db.String(50), nullable=False)
     tipo = db.Column(db.String(20), nullable=False)  # 'despesa' ou 'receita'
     status = db.Column(db.String(20), default='pendente')
-    fornecedor = db.Column(db.String(100))
-    forma_pagamento = db.Column(db.String(50))
     observacoes = db.Column(db.Text)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    categoria_id = db.Column(db.Integer, db.ForeignKey('categorias.id'))
+    fornecedor_id = db.Column(db.Integer, db.ForeignKey('fornecedores.id'))
+    forma_pagamento_id = db.Column(db.Integer, db.ForeignKey('formas_pagamento.id'))
     centro_custo_id = db.Column(db.Integer, db.ForeignKey('centros_custo.id'))
+    recorrencia_id = db.Column(db.Integer, index=True)  # regras_recorrencia.id (modelo ou ocorrência)
+    impressao = db.Column(db.String(24))  # hash de usuário, valor, data, fornecedor e descrição (duplicatas.py)
+    duplicata_de = db.Column(db.Integer)  # id da transação igual mais antiga; 0 = revisada, não é duplicata
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
     data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Textos pelas dimensões: a tabela guarda só as chaves inteiras
+    dimensao_categoria = db.relationship('Categoria', lazy='joined')
+    dimensao_fornecedor = db.relationship('Fornecedor', lazy='joined')
+    dimensao_forma_pagamento = db.relationship('FormaPagamento', lazy='joined')
+    categoria = _texto_da_dimensao('categoria')
+    fornecedor = _texto_da_dimensao('fornecedor')
+    forma_pagamento = _texto_da_dimensao('forma_pagamento')
+    
+    def alterado(self, campo):
+        """Se o campo mudou e ainda não foi gravado (textos das dimensões inclusive)"""
+        if campo in TEXTOS_DIMENSAO:
+            return campo in self.__dict__.get('_textos_pendentes', ())
+        return db.inspect(self).attrs[campo].history.has_changes()
+    
+    def anterior(self, campo):
+        """Valor do campo antes das alterações ainda não gravadas"""
+        if campo in TEXTOS_DIMENSAO:
+            anteriores = self.__dict__.get('_textos_anteriores')
+            return anteriores[campo] if anteriores and campo in anteriores else getattr(self, campo)
+        historico = db.inspect(self).attrs[campo].history
+        return historico.deleted[0] if historico.deleted else getattr(self, campo)
+
+
+class Categoria(db.Model):
+    """Categoria do usuário; o texto é a própria chave ("fixas", "operacionais")"""
+    __tablename__ = 'categorias'
+    __table_args__ = (
+        db.UniqueConstraint('usuario_id', 'chave', name='uq_categorias_usuario_chave'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    nome = db.Column(db.String(50), nullable=False)
+    chave = db.Column(db.String(50), nullable=False)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Fornecedor(db.Model):
+    """Fornecedor do usuário; textos que só diferem em maiúsculas, acentos ou pontuação viram o mesmo"""
+    __tablename__ = 'fornecedores'
+    __table_args__ = (
+        db.UniqueConstraint('usuario_id', 'chave', name='uq_fornecedores_usuario_chave'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    nome = db.Column(db.String(100), nullable=False)  # como foi digitado da primeira vez
+    chave = db.Column(db.String(100), nullable=False)  # texto normalizado
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class FormaPagamento(db.Model):
+    """Forma de pagamento do usuário, normalizada como o fornecedor"""
+    __tablename__ = 'formas_pagamento'
+    __table_args__ = (
+        db.UniqueConstraint('usuario_id', 'chave', name='uq_formas_pagamento_usuario_chave'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    nome = db.Column(db.String(50), nullable=False)
+    chave = db.Column(db.String(50), nullable=False)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class RegraRecorrencia(db.Model):
+    """Modelo de Regra de Recorrência (gera ocorrências a partir de uma transação modelo)"""
+    __tablename__ = 'regras_recorrencia'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    transacao_id = db.Column(db.Integer, db.ForeignKey('transacoes.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False, index=True)
+    frequencia = db.Column(db.String(20), nullable=False)  # 'mensal', 'semanal' ou 'personalizada'
+    intervalo = db.Column(db.Integer, default=1)
+    unidade = db.Column(db.String(10))  # 'dias', 'semanas' ou 'meses' (só na personalizada)
+    data_inicio = db.Column(db.Date, nullable=False)
+    data_fim = db.Column(db.Date)
+    materializada_ate = db.Column(db.Date)  # ocorrências até esta data já foram persistidas
+    ativa = db.Column(db.Boolean, default=True)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    transacao = db.relationship('Transacao', foreign_keys=[transacao_id])
+
+
+class ArquivoTransacoes(db.Model):
+    """Arquivo frio de transações de um usuário em um ano (veja arquivamento.py)"""
+    __tablename__ = 'arquivos_transacoes'
+    __table_args__ = (
+        db.UniqueConstraint('usuario_id', 'ano', name='uq_arquivos_transacoes_usuario_ano'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    ano = db.Column(db.Integer, nullable=False)
+    quantidade = db.Column(db.Integer, nullable=False)
+    tamanho = db.Column(db.Integer)
+    arquivado_ate = db.Column(db.Date, nullable=False)  # meses até esta data estão no arquivo
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @classmethod
+    def corte(cls, usuario_id):
+        """Última data coberta pelos arquivos do usuário (None se nada foi arquivado)"""
+        return db.session.query(db.func.max(cls.arquivado_ate)).filter(cls.usuario_id == usuario_id).scalar()
+
+
+class ResumoArquivado(db.Model):
+    """Totais mensais das transações arquivadas, para somas sem abrir os arquivos"""
+    __tablename__ = 'resumos_arquivados'
+    __table_args__ = (
+        db.Index('ix_resumos_arquivados_usuario_mes', 'usuario_id', 'mes'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    mes = db.Column(db.String(7), nullable=False)  # 'AAAA-MM'
+    tipo = db.Column(db.String(20), nullable=False)
+    categoria = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20))
+    centro_custo_id = db.Column(db.Integer)
+    total = db.Column(db.Float, nullable=False, default=0)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
+
+class FrequenciaCategoria(db.Model):
+    """Quantas transações do usuário com o token (palavra da descrição ou fornecedor) caíram em cada categoria"""
+    __tablename__ = 'frequencias_categoria'
+    __table_args__ = (
+        db.UniqueConstraint('usuario_id', 'tipo', 'token', 'categoria', name='uq_frequencias_categoria'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)
+    token = db.Column(db.String(100), nullable=False)
+    categoria = db.Column(db.String(50), nullable=False)
+    contagem = db.Column(db.Integer, nullable=False, default=0)
 
 
 class CentroCusto(db.Model):
@@ -111,29 +298,25 @@ class Relatorio(db.Model):
 
 
 class Configuracao(db.Model):
-    """Modelo de Configuração do Sistema"""
+    """Modelo de Configuração Global do Sistema (leia e grave pelo módulo configuracoes)"""
     __tablename__ = 'configuracoes'
     
     id = db.Column(db.Integer, primary_key=True)
     chave = db.Column(db.String(100), unique=True, nullable=False)
     valor = db.Column(db.Text)
+
+
+class ConfiguracaoUsuario(db.Model):
+    """Modelo de Configuração por Usuário (sobrescreve a global da mesma chave)"""
+    __tablename__ = 'configuracoes_usuario'
+    __table_args__ = (
+        db.UniqueConstraint('usuario_id', 'chave', name='uq_configuracoes_usuario_chave'),
+    )
     
-    @staticmethod
-    def get(chave, default=None):
-        """Obtém uma configuração"""
-        config = Configuracao.query.filter_by(chave=chave).first()
-        return config.valor if config else default
-    
-    @staticmethod
-    def set(chave, valor):
-        """Define uma configuração"""
-        config = Configuracao.query.filter_by(chave=chave).first()
-        if config:
-            config.valor = valor
-        else:
-            config = Configuracao(chave=chave, valor=valor)
-            db.session.add(config)
-        db.session.commit()
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False)
+    chave = db.Column(db.String(100), nullable=False)
+    valor = db.Column(db.Text)
 
 
 class LogAuditoria(db.Model):
@@ -159,3 +342,50 @@ class Backup(db.Model):
     tamanho = db.Column(db.Integer)
     protegido = db.Column(db.Boolean, default=False)
     data = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Notificacao(db.Model):
+    """Modelo de Notificação de Vencimento (pré-calculada pela varredura periódica)"""
+    __tablename__ = 'notificacoes'
+    __table_args__ = (
+        db.UniqueConstraint('transacao_id', 'tipo', name='uq_notificacoes_transacao_tipo'),
+        db.Index('ix_notificacoes_usuario_id', 'usuario_id', 'id'),
+        db.Index('ix_notificacoes_usuario_lida', 'usuario_id', 'lida'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    transacao_id = db.Column(db.Integer, db.ForeignKey('transacoes.id', ondelete='CASCADE'), nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)  # 'vencida' ou 'a_vencer'
+    mensagem = db.Column(db.String(300), nullable=False)
+    valor = db.Column(db.Float)
+    data_vencimento = db.Column(db.Date)
+    lida = db.Column(db.Boolean, default=False, nullable=False)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Evento(db.Model):
+    """Modelo de Evento de Alteração (barramento entre processos para o SSE)"""
+    __tablename__ = 'eventos'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    tipo = db.Column(db.String(50), nullable=False)
+    data = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class Trava(db.Model):
+    """Modelo de Trava com Prazo (elege um único processo para uma tarefa periódica)"""
+    __tablename__ = 'travas'
+    
+    nome = db.Column(db.String(50), primary_key=True)
+    dono = db.Column(db.String(100), nullable=False)  # host:pid do processo que a detém
+    expira_em = db.Column(db.DateTime, nullable=False)
+
+
+class VersaoUsuario(db.Model):
+    """Modelo de Carimbo de Versão (incrementado a cada transação que altera os dados do usuário)"""
+    __tablename__ = 'versoes_usuario'
+    
+    usuario_id = db.Column(db.Integer, primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,212 @@
+"""
+Notificações de Vencimento
+Uma varredura periódica pré-calcula os avisos de contas vencidas e a vencer,
+de modo que o feed (/api/notificacoes) seja apenas uma leitura indexada.
+
+Todo worker tem a thread da varredura, mas só o que detém a trava `varredura`
+(tabela `travas`) varre; os demais só tentam assumi-la, e assumem quando o dono
+deixa de renová-la (processo encerrado ou travado).
+"""
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.sqlite import insert
+
+import inquilinos
+import metricas
+from extensions import db
+from models import Usuario, Transacao, Notificacao, Trava
+from recorrencia import materializar_vencidas
+
+
+DIAS_AVISO = 3
+TRAVA_VARREDURA = 'varredura'
+
+
+def _mensagem(tipo_aviso, transacao):
+    """Texto exibido no feed"""
+    conta = 'A receber' if transacao.tipo == 'receita' else 'A pagar'
+    vencimento = transacao.data_vencimento.strftime('%d/%m/%Y')
+    if tipo_aviso == 'vencida':
+        return f'{conta}: {transacao.descricao} venceu em {vencimento}'
+    return f'{conta}: {transacao.descricao} vence em {vencimento}'
+
+
+def varrer_usuario(usuario_id, hoje=None, dias_aviso=DIAS_AVISO):
+    """Gera as notificações de um usuário usando o índice (usuario_id, status, data_vencimento)"""
+    hoje = hoje or datetime.now().date()
+    limite = hoje + timedelta(days=dias_aviso)
+
+    pendentes = db.session.query(
+        Transacao.id, Transacao.descricao, Transacao.valor, Transacao.tipo, Transacao.data_vencimento
+    ).filter(
+        Transacao.usuario_id == usuario_id,
+        Transacao.status == 'pendente',
+        Transacao.data_vencimento != None,
+        Transacao.data_vencimento <= limite
+    ).all()
+
+    linhas = []
+    vigentes = {}  # transacao_id -> (tipo, vencimento) do aviso que vale hoje
+    for transacao in pendentes:
+        tipo_aviso = 'vencida' if transacao.data_vencimento < hoje else 'a_vencer'
+        vigentes[transacao.id] = (tipo_aviso, transacao.data_vencimento)
+        linhas.append({
+            'usuario_id': usuario_id,
+            'transacao_id': transacao.id,
+            'tipo': tipo_aviso,
+            'mensagem': _mensagem(tipo_aviso, transacao),
+            'valor': transacao.valor,
+            'data_vencimento': transacao.data_vencimento,
+            'lida': False,
+            'data_criacao': datetime.utcnow()
+        })
+
+    # Avisos não lidos de contas que já foram pagas (ou excluídas) deixam de valer
+    ainda_pendentes = db.session.query(Transacao.id).filter(
+        Transacao.usuario_id == usuario_id,
+        Transacao.status == 'pendente'
+    )
+    removidas = Notificacao.query.filter(
+        Notificacao.usuario_id == usuario_id,
+        Notificacao.lida == False,
+        ~Notificacao.transacao_id.in_(ainda_pendentes)
+    ).delete(synchronize_session=False)
+
+    # De contas ainda pendentes, sai todo aviso (lido ou não) cujo tipo ou vencimento
+    # não vale mais: o 'a_vencer' que virou 'vencida', o de um vencimento alterado
+    obsoletas = [
+        id for id, transacao_id, tipo, vencimento in db.session.query(
+            Notificacao.id, Notificacao.transacao_id, Notificacao.tipo, Notificacao.data_vencimento
+        ).filter(
+            Notificacao.usuario_id == usuario_id,
+            Notificacao.transacao_id.in_(ainda_pendentes)
+        ).all()
+        if vigentes.get(transacao_id) != (tipo, vencimento)
+    ]
+    if obsoletas:
+        removidas += Notificacao.query.filter(Notificacao.id.in_(obsoletas)).delete(synchronize_session=False)
+
+    if linhas:
+        # Aviso que continua valendo mantém o estado de lido; texto e valor seguem a conta
+        comando = insert(Notificacao)
+        db.session.execute(comando.on_conflict_do_update(
+            index_elements=['transacao_id', 'tipo'],
+            set_={'mensagem': comando.excluded.mensagem, 'valor': comando.excluded.valor}
+        ), linhas)
+    db.session.commit()
+    return len(linhas), removidas
+
+
+def varrer_vencimentos(hoje=None, dias_aviso=DIAS_AVISO):
+    """Varre todos os usuários ativos, inquilino a inquilino; cada consulta usa o índice por usuário
+
+    As ocorrências de recorrências que venceram são gravadas aqui, antes dos avisos,
+    para que as leituras (dashboard, listagem, análises) nunca escrevam no banco.
+    """
+    total = 0
+    for nome, usuarios in inquilinos.usuarios_por_inquilino(Usuario.status == 'ativo').items():
+        with inquilinos.usando(nome if inquilinos.roteador.ativo else None):
+            for usuario_id in usuarios:
+                materializar_vencidas(usuario_id, hoje)
+                varrer_usuario(usuario_id, hoje, dias_aviso)
+        total += len(usuarios)
+    return total
+
+
+def assumir_trava(nome, dono, duracao):
+    """Assume (ou renova) a trava se ela está livre, vencida ou já é do `dono`; faz commit
+
+    Um único UPSERT condicional: entre processos concorrentes só um vence.
+    """
+    agora = datetime.utcnow()
+    comando = insert(Trava).values(nome=nome, dono=dono, expira_em=agora + duracao)
+    resultado = db.session.execute(comando.on_conflict_do_update(
+        index_elements=['nome'],
+        set_={'dono': comando.excluded.dono, 'expira_em': comando.excluded.expira_em},
+        where=(Trava.dono == dono) | (Trava.expira_em < agora)
+    ))
+    db.session.commit()
+    return resultado.rowcount == 1
+
+
+def iniciar_varredura(app):
+    """Agenda a varredura periódica em uma thread de fundo de cada processo
+
+    A thread só sobe no primeiro pedido atendido pelo processo: um app carregado
+    no master do gunicorn (preload_app) não leva thread nem conexões para o fork.
+    A cada rodada a thread renova a trava da varredura; sem ela, não varre. A trava
+    vale três intervalos, então um dono encerrado é substituído nesse prazo.
+    """
+    parar = threading.Event()
+    lock = threading.Lock()
+    iniciada_em = {'pid': None}
+
+    def executar(intervalo):
+        dono = f'{socket.gethostname()}:{os.getpid()}'
+        duracao = timedelta(seconds=3 * intervalo)
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            varreu = False
+            with app.app_context():
+                try:
+                    if assumir_trava(TRAVA_VARREDURA, dono, duracao):
+                        varrer_vencimentos(dias_aviso=app.config.get('NOTIFICACOES_DIAS_AVISO', DIAS_AVISO))
+                        varreu = True
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.warning(f'Falha na varredura de notificações: {e}')
+                finally:
+                    db.session.remove()
+            if varreu:
+                metricas.observar('notificacoes_varredura_segundos', time.perf_counter() - inicio)
+            parar.wait(intervalo)
+
+    @app.before_request
+    def _garantir_varredura():
+        if iniciada_em['pid'] == os.getpid():
+            return
+        with lock:
+            if iniciada_em['pid'] == os.getpid():
+                return
+            iniciada_em['pid'] = os.getpid()
+        intervalo = app.config.get('NOTIFICACOES_INTERVALO', 300)
+        if intervalo:
+            threading.Thread(target=executar, args=(intervalo,), name='varredura-notificacoes',
+                             daemon=True).start()
+        elif not app.testing:
+            # Sem a varredura, ocorrências vencidas só viram transações pelo comando
+            app.logger.warning('Varredura desligada (NOTIFICACOES_INTERVALO=0): agende '
+                               '`flask recorrencias materializar` para gravar as recorrências vencidas')
+
+    return parar
+
+
+def listar(usuario_id, cursor=None, limite=20, apenas_nao_lidas=False):
+    """Página do feed em ordem decrescente de id; o cursor é o último id recebido"""
+    query = Notificacao.query.filter(Notificacao.usuario_id == usuario_id)
+    if apenas_nao_lidas:
+        query = query.filter(Notificacao.lida == False)
+    if cursor:
+        query = query.filter(Notificacao.id < cursor)
+
+    itens = query.order_by(Notificacao.id.desc()).limit(limite + 1).all()
+    proximo = itens[limite - 1].id if len(itens) > limite else None
+    return itens[:limite], proximo
+
+
+def contar_nao_lidas(usuario_id):
+    return Notificacao.query.filter_by(usuario_id=usuario_id, lida=False).count()
+
+
+def marcar_lidas(usuario_id, ids=None):
+    """Marca como lidas as notificações indicadas (ou todas, se ids for None)"""
+    query = Notificacao.query.filter(Notificacao.usuario_id == usuario_id, Notificacao.lida == False)
+    if ids is not None:
+        query = query.filter(Notificacao.id.in_(ids))
+    alteradas = query.update({Notificacao.lida: True}, synchronize_session=False)
+    db.session.commit()
+    return alteradas
@@ -0,0 +1,187 @@
+"""
+Perfilador por Amostragem
+Enquanto um pedido selecionado é atendido, uma thread auxiliar lê a pilha da
+thread do pedido em intervalo fixo (sys._current_frames) e, ao final, grava as
+pilhas no formato "collapsed" (uma linha `a;b;c contagem`), aceito por
+flamegraph.pl, speedscope e similares. Não depende de serviço externo.
+
+Um pedido é perfilado quando:
+- traz o cabeçalho X-Perfilar e o usuário é admin (ou o valor é PERFILADOR_TOKEN), ou
+- o perfilador está ligado pelo admin e o pedido cai na fração sorteada.
+
+Desligado, o custo por pedido é uma comparação com o estado em cache.
+Requer workers com threads reais (sync ou gthread); no gevent os pedidos são
+greenlets e não aparecem em sys._current_frames.
+"""
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+from flask_login import current_user
+
+import configuracoes
+
+
+CHAVE_CONFIGURACAO = 'perfilador'
+INTERVALO_PADRAO_MS = 5
+MAXIMO_ARQUIVOS = 200
+ENDPOINTS_IGNORADOS = {'transacoes.api_eventos', 'metrics', 'static'}
+NOME_VALIDO = re.compile(r'^[\w.-]+\.txt$')
+
+ESTADO_PADRAO = {'ativo': False, 'fracao': 0.01, 'intervalo_ms': INTERVALO_PADRAO_MS, 'endpoints': []}
+
+class Amostrador(threading.Thread):
+    """Coleta a pilha de uma thread a cada `intervalo` segundos"""
+
+    def __init__(self, alvo, intervalo):
+        super().__init__(name='perfilador', daemon=True)
+        self.alvo = alvo
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.alvo)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f'{os.path.basename(codigo.co_filename)}:{codigo.co_name}')
+                frame = frame.f_back
+            if pilha:
+                self.pilhas[';'.join(reversed(pilha))] += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+        return self.pilhas
+
+
+# ========== ESTADO (LIGADO PELO ADMIN) ==========
+def obter_estado():
+    """Estado atual, do snapshot de configurações (vale para todos os workers)"""
+    return dict(ESTADO_PADRAO, **(configuracoes.obter(CHAVE_CONFIGURACAO) or {}))
+
+
+def salvar_estado(dados):
+    """Valida e grava o estado; levanta ValueError com mensagem para o usuário"""
+    estado = obter_estado()
+    if 'ativo' in dados:
+        estado['ativo'] = bool(dados['ativo'])
+    if 'fracao' in dados:
+        fracao = float(dados['fracao'])
+        if not 0 < fracao <= 1:
+            raise ValueError('fracao deve estar entre 0 e 1')
+        estado['fracao'] = fracao
+    if 'intervalo_ms' in dados:
+        intervalo = int(dados['intervalo_ms'])
+        if not 1 <= intervalo <= 1000:
+            raise ValueError('intervalo_ms deve estar entre 1 e 1000')
+        estado['intervalo_ms'] = intervalo
+    if 'endpoints' in dados:
+        if not isinstance(dados['endpoints'], list):
+            raise ValueError('endpoints deve ser uma lista')
+        estado['endpoints'] = [str(e) for e in dados['endpoints']]
+
+    configuracoes.definir({CHAVE_CONFIGURACAO: estado}, escopos=('interno',))
+    return estado
+
+
+# ========== ARQUIVOS ==========
+def diretorio(app):
+    caminho = app.config.get('PERFIS_DIR') or os.path.join(app.instance_path, 'perfis')
+    os.makedirs(caminho, exist_ok=True)
+    return caminho
+
+
+def gravar(app, pilhas, endpoint, duracao):
+    """Grava as pilhas em formato collapsed e mantém só os MAXIMO_ARQUIVOS mais recentes"""
+    pasta = diretorio(app)
+    nome = f'{datetime.now():%Y%m%d_%H%M%S_%f}_{endpoint}_{os.getpid()}_{duracao * 1000:.0f}ms.txt'
+    with open(os.path.join(pasta, nome), 'w', encoding='utf-8') as arquivo:
+        for pilha, contagem in pilhas.most_common():
+            arquivo.write(f'{pilha} {contagem}\n')
+
+    arquivos = sorted(n for n in os.listdir(pasta) if NOME_VALIDO.match(n))
+    for antigo in arquivos[:-MAXIMO_ARQUIVOS]:
+        try:
+            os.remove(os.path.join(pasta, antigo))
+        except OSError:
+            pass
+    return nome
+
+
+def listar(app, limite=100):
+    """Perfis gravados, do mais recente para o mais antigo"""
+    pasta = diretorio(app)
+    perfis = []
+    for nome in sorted((n for n in os.listdir(pasta) if NOME_VALIDO.match(n)), reverse=True)[:limite]:
+        partes = nome[:-4].split('_')
+        info = os.stat(os.path.join(pasta, nome))
+        perfis.append({
+            'nome': nome,
+            'data': datetime.strptime('_'.join(partes[:3]), '%Y%m%d_%H%M%S_%f').isoformat(),
+            'endpoint': '_'.join(partes[3:-2]),
+            'pid': int(partes[-2]),
+            'duracao_ms': int(partes[-1][:-2]),
+            'tamanho': info.st_size
+        })
+    return perfis
+
+
+# ========== FLASK ==========
+def _selecionar(app):
+    """Decide se o pedido atual deve ser perfilado; devolve o intervalo em segundos ou None"""
+    if request.endpoint in ENDPOINTS_IGNORADOS:
+        return None
+
+    cabecalho = request.headers.get('X-Perfilar')
+    if cabecalho is not None:
+        token = app.config['PERFILADOR_TOKEN']
+        autorizado = (token and cabecalho == token) or (
+            current_user.is_authenticated and current_user.perfil == 'admin'
+        )
+        if autorizado:
+            return obter_estado()['intervalo_ms'] / 1000
+
+    estado = obter_estado()
+    if not estado['ativo']:
+        return None
+    if estado['endpoints'] and request.endpoint not in estado['endpoints']:
+        return None
+    if random.random() >= estado['fracao']:
+        return None
+    return estado['intervalo_ms'] / 1000
+
+
+def init_app(app):
+    """Liga a seleção e a coleta de perfis ao ciclo de cada pedido"""
+    app.config.setdefault('PERFILADOR_TOKEN', os.environ.get('PERFILADOR_TOKEN'))
+
+    @app.before_request
+    def _iniciar_perfil():
+        intervalo = _selecionar(app)
+        if intervalo is None:
+            return
+        amostrador = Amostrador(threading.get_ident(), intervalo)
+        amostrador.start()
+        g.perfil = (amostrador, time.perf_counter())
+
+    @app.teardown_request
+    def _finalizar_perfil(exc):
+        perfil = g.pop('perfil', None)
+        if perfil is None:
+            return
+        amostrador, inicio = perfil
+        pilhas = amostrador.parar()
+        if pilhas:
+            try:
+                gravar(app, pilhas, request.endpoint or 'desconhecido', time.perf_counter() - inicio)
+            except OSError as e:
+                app.logger.warning(f'Falha ao gravar perfil: {e}')
@@ -0,0 +1,359 @@
+"""
+Previsão de Fluxo de Caixa
+Projeta o saldo dos próximos dias a partir das contas pendentes (data_vencimento),
+das regras de recorrência e dos padrões mensais aprendidos do histórico.
+
+O resultado base fica em cache por usuário e é atualizado de forma incremental
+pelos eventos de escrita de Transacao, sem recalcular tudo a cada alteração.
+
+Uma entrada publicada no cache nunca é alterada: o commit monta uma cópia com as
+alterações e troca a entrada sob o lock, então quem já leu a entrada calcula sobre
+um estado consistente. Cada entrada guarda o carimbo de versão do usuário (veja
+eventos.py) e o confere no máximo a cada VERSOES_VERIFICACAO segundos; escritas de
+outros workers mudam o carimbo e a entrada é remontada.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import eventos
+import metricas
+from extensions import db
+from models import Transacao, RegraRecorrencia, ResumoArquivado
+from recorrencia import INICIO_DAS_REGRAS, apenas_materializou, fim_do_mes, projetar_ocorrencias, somar_meses
+
+
+HORIZONTE_MAXIMO = 365  # dias
+MESES_HISTORICO = 6
+MESES_MINIMOS_PADRAO = 3
+GRANULARIDADES = ('diaria', 'semanal')
+
+_cache = {}
+_lock = threading.Lock()
+
+
+# ========== CONSTRUÇÃO DO CACHE ==========
+def _base_pendentes(usuario_id, hoje, horizonte):
+    """Saldo realizado e contas pendentes agregadas por data (entradas, saídas)"""
+    saldo = 0.0
+    for tipo, total in db.session.query(Transacao.tipo, db.func.sum(Transacao.valor)).filter(
+        Transacao.usuario_id == usuario_id,
+        Transacao.status == 'pago'
+    ).group_by(Transacao.tipo).all():
+        saldo += _assinado(tipo, total or 0)
+    # Pagamentos já arquivados entram pelos totais mensais, sem abrir os arquivos
+    for tipo, total in db.session.query(ResumoArquivado.tipo, db.func.sum(ResumoArquivado.total)).filter(
+        ResumoArquivado.usuario_id == usuario_id,
+        ResumoArquivado.status == 'pago'
+    ).group_by(ResumoArquivado.tipo).all():
+        saldo += _assinado(tipo, total or 0)
+
+    data_ref = db.func.coalesce(Transacao.data_vencimento, Transacao.data)
+    entradas, saidas = {}, {}
+    for tipo, data, total in db.session.query(Transacao.tipo, data_ref, db.func.sum(Transacao.valor)).filter(
+        Transacao.usuario_id == usuario_id,
+        Transacao.status == 'pendente',
+        data_ref <= horizonte
+    ).group_by(Transacao.tipo, data_ref).all():
+        # Contas vencidas e não pagas entram no primeiro dia da previsão
+        data = max(_como_data(data), hoje)
+        destino = entradas if tipo == 'receita' else saidas
+        destino[data] = destino.get(data, 0.0) + (total or 0)
+
+    return saldo, entradas, saidas
+
+
+def _padroes_historico(usuario_id, hoje):
+    """Transações que se repetem todo mês no histórico e não têm regra de recorrência"""
+    inicio = somar_meses(hoje.replace(day=1), -MESES_HISTORICO)
+    mes = db.func.strftime('%Y-%m', Transacao.data)
+
+    return db.session.query(
+        Transacao.tipo,
+        db.func.count(db.distinct(mes)),
+        db.func.avg(Transacao.valor),
+        db.func.avg(db.cast(db.func.strftime('%d', Transacao.data), db.Integer)),
+        db.func.max(Transacao.data)
+    ).filter(
+        Transacao.usuario_id == usuario_id,
+        Transacao.recorrencia_id == None,
+        Transacao.status != 'cancelado',
+        Transacao.data >= inicio
+    ).group_by(
+        db.func.lower(Transacao.descricao), Transacao.tipo
+    ).having(db.func.count(db.distinct(mes)) >= MESES_MINIMOS_PADRAO).all()
+
+
+def _projecoes(usuario_id, hoje, horizonte):
+    """Entradas e saídas futuras vindas de recorrências e de padrões aprendidos"""
+    entradas, saidas = {}, {}
+
+    def somar(tipo, data, valor):
+        destino = entradas if tipo == 'receita' else saidas
+        destino[data] = destino.get(data, 0.0) + valor
+
+    # Ocorrências já vencidas que a varredura ainda não gravou contam como pendentes de hoje
+    for ocorrencia in projetar_ocorrencias(usuario_id, INICIO_DAS_REGRAS, horizonte):
+        data = datetime.strptime(ocorrencia['data'], '%Y-%m-%d').date()
+        somar(ocorrencia['tipo'], max(data, hoje), ocorrencia['valor'])
+
+    for tipo, _, valor_medio, dia_medio, ultima in _padroes_historico(usuario_id, hoje):
+        ultima = _como_data(ultima)
+        dia = int(round(dia_medio or 1))
+        meses = 1
+        while True:
+            base = somar_meses(ultima.replace(day=1), meses)
+            data = base.replace(day=min(dia, fim_do_mes(base).day))
+            if data > horizonte:
+                break
+            if data > hoje:
+                somar(tipo, data, valor_medio or 0)
+            meses += 1
+
+    return entradas, saidas
+
+
+def _construir(usuario_id, hoje):
+    """Monta a entrada de cache de um usuário"""
+    # Lida antes dos dados: uma escrita no meio da montagem deixa a entrada já vencida
+    versao = eventos.versao(usuario_id)
+    horizonte = hoje + timedelta(days=HORIZONTE_MAXIMO)
+    saldo, entradas, saidas = _base_pendentes(usuario_id, hoje, horizonte)
+    agora = time.monotonic()
+    return {
+        'hoje': hoje,
+        'horizonte': horizonte,
+        'criado_em': agora,
+        'versao': versao,
+        'verificado_em': agora,
+        'saldo_inicial': saldo,
+        'entradas': entradas,
+        'saidas': saidas,
+        'projecoes': _projecoes(usuario_id, hoje, horizonte)
+    }
+
+
+def _publicar(usuario_id, anterior, entrada):
+    """Troca a entrada do usuário se ninguém a trocou desde `anterior` (None = sem entrada)"""
+    with _lock:
+        atual = _cache.get(usuario_id)
+        if atual is anterior or atual is None or atual['versao'] < entrada['versao']:
+            _cache[usuario_id] = entrada
+
+
+def _entrada(usuario_id):
+    """Obtém (ou reconstrói) a entrada de cache válida do usuário; nunca alterada depois de lida"""
+    hoje = datetime.now().date()
+    ttl = current_app.config.get('PREVISAO_CACHE_TTL', 300)
+    intervalo = current_app.config.get('VERSOES_VERIFICACAO', eventos.VERIFICACAO_PADRAO)
+
+    with _lock:
+        entrada = _cache.get(usuario_id)
+    agora = time.monotonic()
+    valida = (
+        entrada is not None
+        and entrada['hoje'] == hoje
+        and agora - entrada['criado_em'] < ttl
+    )
+    if valida and agora - entrada['verificado_em'] >= intervalo:
+        valida = eventos.versao(usuario_id) == entrada['versao']
+        if valida:
+            anterior, entrada = entrada, dict(entrada, verificado_em=agora)
+            _publicar(usuario_id, anterior, entrada)
+
+    if valida and entrada['projecoes'] is not None:
+        metricas.incrementar('cache_consultas_total', cache='previsao', resultado='acerto')
+        return entrada
+
+    if valida:
+        metricas.incrementar('cache_consultas_total', cache='previsao', resultado='parcial')
+        anterior, entrada = entrada, dict(entrada, projecoes=_projecoes(usuario_id, hoje, entrada['horizonte']))
+        _publicar(usuario_id, anterior, entrada)
+        return entrada
+
+    metricas.incrementar('cache_consultas_total', cache='previsao', resultado='falha')
+    anterior, entrada = entrada, _construir(usuario_id, hoje)
+    _publicar(usuario_id, anterior, entrada)
+    return entrada
+
+
+# ========== CÁLCULO DA SÉRIE ==========
+def prever_fluxo(usuario_id, dias=30, granularidade='diaria'):
+    """Calcula a série de saldos previstos para os próximos `dias`
+
+    Entradas e saídas são acumuladas em vetores sobre o eixo de datas e o saldo é
+    a soma acumulada desses vetores, sem consultas por dia.
+    """
+    dias = max(1, min(int(dias), HORIZONTE_MAXIMO))
+    entrada = _entrada(usuario_id)
+    hoje = entrada['hoje']
+
+    entradas = [0.0] * (dias + 1)
+    saidas = [0.0] * (dias + 1)
+    proj_entradas, proj_saidas = entrada['projecoes']
+    for vetor, origens in ((entradas, (entrada['entradas'], proj_entradas)),
+                           (saidas, (entrada['saidas'], proj_saidas))):
+        for origem in origens:
+            for data, valor in origem.items():
+                indice = (data - hoje).days
+                if 0 <= indice <= dias:
+                    vetor[indice] += valor
+
+    saldo_inicial = entrada['saldo_inicial']
+    saldos = list(accumulate(
+        (e - s for e, s in zip(entradas, saidas)), initial=saldo_inicial
+    ))[1:]
+
+    passo = 7 if granularidade == 'semanal' else 1
+    serie = []
+    for inicio in range(0, dias + 1, passo):
+        fim = min(inicio + passo, dias + 1)
+        serie.append({
+            'data': (hoje + timedelta(days=inicio)).isoformat(),
+            'entradas': round(sum(entradas[inicio:fim]), 2),
+            'saidas': round(sum(saidas[inicio:fim]), 2),
+            'saldo': round(saldos[fim - 1], 2)
+        })
+
+    menor = min(range(len(saldos)), key=saldos.__getitem__)
+    return {
+        'saldo_inicial': round(saldo_inicial, 2),
+        'saldo_final': round(saldos[-1], 2),
+        'menor_saldo': {
+            'data': (hoje + timedelta(days=menor)).isoformat(),
+            'saldo': round(saldos[menor], 2)
+        },
+        'serie': serie
+    }
+
+
+# ========== ATUALIZAÇÃO INCREMENTAL ==========
+def _assinado(tipo, valor):
+    return valor if tipo == 'receita' else -valor
+
+
+def _como_data(valor):
+    if isinstance(valor, str):
+        return datetime.strptime(valor[:10], '%Y-%m-%d').date()
+    if isinstance(valor, datetime):
+        return valor.date()
+    return valor
+
+
+def _estado(target, anterior=False):
+    """Estado (usuario, tipo, status, valor, data de referência) atual ou anterior ao flush"""
+    atributos = db.inspect(target).attrs
+
+    def ler(nome):
+        historico = atributos[nome].history
+        if anterior and historico.deleted:
+            return historico.deleted[0]
+        return getattr(target, nome)
+
+    return (
+        ler('usuario_id'), ler('tipo'), ler('status'), ler('valor') or 0,
+        ler('data_vencimento') or ler('data'), ler('recorrencia_id')
+    )
+
+
+def _aplicar(entrada, estado, sinal):
+    """Soma (sinal=1) ou retira (sinal=-1) a contribuição de uma transação na cópia `entrada`"""
+    _, tipo, status, valor, data, recorrencia_id = estado
+
+    if recorrencia_id is not None:
+        # Ocorrência gravada deixa de ser projetada: refaz só as projeções
+        entrada['projecoes'] = None
+
+    if status == 'pago':
+        entrada['saldo_inicial'] += sinal * _assinado(tipo, valor)
+    elif status == 'pendente' and data is not None and data <= entrada['horizonte']:
+        data = max(data, entrada['hoje'])
+        destino = entrada['entradas'] if tipo == 'receita' else entrada['saidas']
+        destino[data] = destino.get(data, 0.0) + sinal * valor
+
+
+def _registrar(session, antes, depois):
+    session.info.setdefault('previsao_alteracoes', []).append((antes, depois))
+
+
+def _atualizada(entrada, contribuicoes, versao, regra_alterada):
+    """Cópia da entrada com as contribuições (estado, sinal) aplicadas e a versão do commit"""
+    nova = dict(entrada, versao=versao, entradas=dict(entrada['entradas']), saidas=dict(entrada['saidas']))
+    if regra_alterada:
+        nova['projecoes'] = None
+    for estado, sinal in contribuicoes:
+        _aplicar(nova, estado, sinal)
+    return nova
+
+
+@event.listens_for(Transacao, 'after_insert')
+def _apos_inserir(mapper, connection, target):
+    _registrar(db.inspect(target).session, None, _estado(target))
+
+
+@event.listens_for(Transacao, 'after_update')
+def _apos_atualizar(mapper, connection, target):
+    _registrar(db.inspect(target).session, _estado(target, anterior=True), _estado(target))
+
+
+@event.listens_for(Transacao, 'after_delete')
+def _apos_excluir(mapper, connection, target):
+    _registrar(db.inspect(target).session, _estado(target, anterior=True), None)
+
+
+def descartar_no_commit(session, usuario_id):
+    """Descarta o cache do usuário quando a transação confirmar (escritas em lote, sem eventos do ORM)"""
+    session.info.setdefault('previsao_descartar', set()).add(usuario_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apos_commit(session):
+    descartar = session.info.pop('previsao_descartar', None) or set()
+    alteracoes = session.info.pop('previsao_alteracoes', None) or []
+    regras = session.info.pop('previsao_regras', None) or set()
+    versoes = eventos.versoes_gravadas(session)
+    por_usuario = {usuario_id: [] for usuario_id in (*versoes, *regras)}
+    for antes, depois in alteracoes:
+        for estado, sinal in ((antes, -1), (depois, 1)):
+            if estado is not None:
+                por_usuario.setdefault(estado[0], []).append((estado, sinal))
+    if not por_usuario and not descartar:
+        return
+
+    with _lock:
+        for usuario_id, mudancas in por_usuario.items():
+            entrada = _cache.get(usuario_id)
+            if entrada is None:
+                continue
+            versao = versoes.get(usuario_id)
+            # Só dá para aplicar em cima da versão imediatamente anterior à deste commit
+            if usuario_id in descartar or versao is None or entrada['versao'] != versao - 1:
+                del _cache[usuario_id]
+            else:
+                _cache[usuario_id] = _atualizada(entrada, mudancas, versao, usuario_id in regras)
+        for usuario_id in descartar:
+            _cache.pop(usuario_id, None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _apos_rollback(session):
+    session.info.pop('previsao_alteracoes', None)
+    session.info.pop('previsao_descartar', None)
+    session.info.pop('previsao_regras', None)
+
+
+@event.listens_for(RegraRecorrencia, 'after_insert')
+@event.listens_for(RegraRecorrencia, 'after_delete')
+def _apos_alterar_regra(mapper, connection, target):
+    db.inspect(target).session.info.setdefault('previsao_regras', set()).add(target.usuario_id)
+
+
+@event.listens_for(RegraRecorrencia, 'after_update')
+def _apos_atualizar_regra(mapper, connection, target):
+    if not apenas_materializou(target):
+        _apos_alterar_regra(mapper, connection, target)
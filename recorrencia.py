@@ -0,0 +1,314 @@
+"""
+Transações Recorrentes
+Ocorrências são projetadas sob demanda a partir das regras de recorrência e só
+são gravadas no banco quando vencem ou quando o usuário edita uma delas.
+
+As leituras nunca gravam: toda ocorrência depois de `materializada_ate` (inclusive
+as que já venceram) é projetada. Quem grava as vencidas é a varredura periódica
+(veja notificacoes.py), em um único processo, ou o comando abaixo, para rodar pelo
+cron quando a varredura está desligada (NOTIFICACOES_INTERVALO=0).
+
+    flask --app wsgi recorrencias materializar [--ate AAAA-MM-DD]
+"""
+import calendar
+from datetime import date, datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.orm import contains_eager, joinedload
+
+import inquilinos
+from extensions import db
+from models import Usuario, Transacao, RegraRecorrencia
+
+
+FREQUENCIAS = ('mensal', 'semanal', 'personalizada')
+UNIDADES = ('dias', 'semanas', 'meses')  # só na frequência personalizada
+INICIO_DAS_REGRAS = date.min  # projeção "desde sempre": começa em materializada_ate de cada regra
+
+
+# ========== CÁLCULO DE DATAS ==========
+def somar_meses(data, meses):
+    """Soma meses a uma data, ajustando o dia ao fim do mês quando necessário"""
+    total = data.year * 12 + data.month - 1 + meses
+    ano, mes = divmod(total, 12)
+    dia = min(data.day, calendar.monthrange(ano, mes + 1)[1])
+    return date(ano, mes + 1, dia)
+
+
+def fim_do_mes(data):
+    """Último dia do mês da data"""
+    return data.replace(day=calendar.monthrange(data.year, data.month)[1])
+
+
+def _passo(regra):
+    """Retorna o passo da regra como (dias, meses)"""
+    intervalo = regra.intervalo or 1
+    if regra.frequencia == 'mensal':
+        return 0, intervalo
+    if regra.frequencia == 'semanal':
+        return 7 * intervalo, 0
+    if regra.unidade == 'meses':
+        return 0, intervalo
+    if regra.unidade == 'semanas':
+        return 7 * intervalo, 0
+    return intervalo, 0
+
+
+def datas_ocorrencias(regra, inicio, fim):
+    """Gera as datas de ocorrência da regra no intervalo [inicio, fim]
+
+    A ocorrência 0 é a própria transação modelo, por isso a geração começa em 1.
+    """
+    if regra.data_fim and regra.data_fim < fim:
+        fim = regra.data_fim
+
+    dias, meses = _passo(regra)
+
+    # Salta direto para a primeira ocorrência do intervalo em vez de iterar desde o início
+    if meses:
+        delta = (inicio.year - regra.data_inicio.year) * 12 + inicio.month - regra.data_inicio.month
+        n = max(1, delta // meses)
+    else:
+        n = max(1, (inicio - regra.data_inicio).days // dias)
+
+    while True:
+        if meses:
+            data = somar_meses(regra.data_inicio, n * meses)
+        else:
+            data = regra.data_inicio + timedelta(days=n * dias)
+        if data > fim:
+            break
+        if data >= inicio:
+            yield data
+        n += 1
+
+
+# ========== PROJEÇÃO ==========
+def _ocorrencia(regra, data):
+    """Monta a ocorrência projetada no mesmo formato da API de transações"""
+    modelo = regra.transacao
+    vencimento = None
+    if modelo.data_vencimento:
+        vencimento = data + (modelo.data_vencimento - modelo.data)
+
+    return {
+        'id': None,
+        'descricao': modelo.descricao,
+        'valor': modelo.valor,
+        'data': data.isoformat(),
+        'data_vencimento': vencimento.isoformat() if vencimento else None,
+        'categoria': modelo.categoria,
+        'tipo': modelo.tipo,
+        'status': 'pendente',
+        'fornecedor': modelo.fornecedor,
+        'forma_pagamento': modelo.forma_pagamento,
+        'observacoes': modelo.observacoes,
+        'recorrencia_id': regra.id,
+        'duplicata_de': None,
+        'projetada': True
+    }
+
+
+def projetar_ocorrencias(usuario_id, inicio, fim, tipo=None):
+    """Lista as ocorrências ainda não gravadas das regras do usuário no intervalo"""
+    if inicio > fim:
+        return []
+
+    query = RegraRecorrencia.query.join(RegraRecorrencia.transacao).options(
+        contains_eager(RegraRecorrencia.transacao)
+    ).filter(
+        RegraRecorrencia.usuario_id == usuario_id,
+        RegraRecorrencia.ativa == True,
+        RegraRecorrencia.data_inicio <= fim,
+        db.or_(RegraRecorrencia.data_fim == None, RegraRecorrencia.data_fim >= inicio)
+    )
+    if tipo:
+        query = query.filter(Transacao.tipo == tipo)
+    regras = query.all()
+    if not regras:
+        return []
+
+    # Ocorrências futuras que já foram editadas (e portanto gravadas)
+    gravadas = set(db.session.query(Transacao.recorrencia_id, Transacao.data).filter(
+        Transacao.usuario_id == usuario_id,
+        Transacao.recorrencia_id.in_([r.id for r in regras]),
+        Transacao.data >= inicio,
+        Transacao.data <= fim
+    ).all())
+
+    ocorrencias = []
+    for regra in regras:
+        inicio_regra = inicio
+        if regra.materializada_ate and regra.materializada_ate >= inicio_regra:
+            inicio_regra = regra.materializada_ate + timedelta(days=1)
+        for data in datas_ocorrencias(regra, inicio_regra, fim):
+            if (regra.id, data) not in gravadas:
+                ocorrencias.append(_ocorrencia(regra, data))
+
+    return ocorrencias
+
+
+# ========== MATERIALIZAÇÃO ==========
+def _gravar(regra, data):
+    """Cria a transação de uma ocorrência a partir do modelo da regra"""
+    modelo = regra.transacao
+    vencimento = None
+    if modelo.data_vencimento:
+        vencimento = data + (modelo.data_vencimento - modelo.data)
+
+    transacao = Transacao(
+        descricao=modelo.descricao,
+        valor=modelo.valor,
+        data=data,
+        data_vencimento=vencimento,
+        tipo=modelo.tipo,
+        status='pendente',
+        observacoes=modelo.observacoes,
+        # Mesmas linhas das dimensões do modelo: o texto não precisa ser resolvido de novo
+        dimensao_categoria=modelo.dimensao_categoria,
+        dimensao_fornecedor=modelo.dimensao_fornecedor,
+        dimensao_forma_pagamento=modelo.dimensao_forma_pagamento,
+        usuario_id=regra.usuario_id,
+        centro_custo_id=modelo.centro_custo_id,
+        recorrencia_id=regra.id
+    )
+    db.session.add(transacao)
+    return transacao
+
+
+def materializar_vencidas(usuario_id, ate=None):
+    """Grava as ocorrências que já venceram (data <= ate) e ainda não existem no banco"""
+    ate = ate or datetime.now().date()
+
+    regras = RegraRecorrencia.query.options(joinedload(RegraRecorrencia.transacao)).filter(
+        RegraRecorrencia.usuario_id == usuario_id,
+        RegraRecorrencia.ativa == True,
+        db.or_(RegraRecorrencia.materializada_ate == None, RegraRecorrencia.materializada_ate < ate)
+    ).all()
+
+    criadas = 0
+    for regra in regras:
+        inicio = (regra.materializada_ate or regra.data_inicio) + timedelta(days=1)
+        gravadas = {d for (d,) in db.session.query(Transacao.data).filter(
+            Transacao.recorrencia_id == regra.id,
+            Transacao.data >= inicio,
+            Transacao.data <= ate
+        ).all()}
+        for data in datas_ocorrencias(regra, inicio, ate):
+            if data not in gravadas:
+                _gravar(regra, data)
+                criadas += 1
+        regra.materializada_ate = ate
+
+    if regras:
+        db.session.commit()
+    return criadas
+
+
+def materializar_ocorrencia(regra, data):
+    """Retorna a transação gravada de uma ocorrência, criando-a se necessário (ex.: edição)
+
+    A ocorrência nova só vai para o banco com flush; o commit (ou o rollback, se a
+    edição for recusada) fica com quem chamou.
+    """
+    transacao = Transacao.query.filter_by(recorrencia_id=regra.id, data=data).first()
+    if transacao:
+        return transacao
+
+    # Ocorrências já materializadas e depois excluídas não voltam a existir
+    if regra.materializada_ate and data <= regra.materializada_ate:
+        return None
+    if data not in set(datas_ocorrencias(regra, data, data)):
+        return None
+
+    transacao = _gravar(regra, data)
+    db.session.flush()
+    return transacao
+
+
+def apenas_materializou(regra):
+    """True se a única alteração pendente da regra é o avanço de `materializada_ate`
+
+    Esse avanço não muda o que é projetado: as ocorrências gravadas entram no banco
+    como Transacao, que já avisam os caches e o SSE por conta própria.
+    """
+    alterados = {atributo.key for atributo in db.inspect(regra).attrs if atributo.history.has_changes()}
+    return alterados <= {'materializada_ate'}
+
+
+# ========== PAGINAÇÃO ==========
+def mesclar_pagina(query, projetadas, offset, limite, serializar):
+    """Pagina a consulta (ordenada por data desc) intercalando as ocorrências projetadas
+
+    Em vez de carregar todas as transações, conta as gravadas por data a partir da
+    menor data projetada para saber a posição global de cada ocorrência projetada.
+    """
+    ordenada = query.order_by(Transacao.data.desc(), Transacao.id.desc())
+    if not projetadas:
+        return [serializar(t) for t in ordenada.offset(offset).limit(limite).all()]
+
+    projetadas = sorted(projetadas, key=lambda o: o['data'], reverse=True)
+    menor = date.fromisoformat(projetadas[-1]['data'])
+    contagens = query.with_entities(Transacao.data, db.func.count()).filter(
+        Transacao.data >= menor
+    ).group_by(Transacao.data).order_by(Transacao.data.desc()).all()
+
+    # Posição global de cada projetada (em empate de data, a projetada vem primeiro)
+    posicoes = {}
+    a_frente = 0
+    i = 0
+    for indice, ocorrencia in enumerate(projetadas):
+        data = date.fromisoformat(ocorrencia['data'])
+        while i < len(contagens) and contagens[i][0] > data:
+            a_frente += contagens[i][1]
+            i += 1
+        posicoes[indice + a_frente] = ocorrencia
+
+    antes = sum(1 for p in posicoes if p < offset)
+    na_pagina = sum(1 for p in posicoes if offset <= p < offset + limite)
+
+    gravadas = []
+    if limite - na_pagina > 0:
+        gravadas = ordenada.offset(offset - antes).limit(limite - na_pagina).all()
+
+    pagina = []
+    gravadas = iter(gravadas)
+    for posicao in range(offset, offset + limite):
+        if posicao in posicoes:
+            pagina.append(posicoes[posicao])
+            continue
+        transacao = next(gravadas, None)
+        if transacao is None:
+            if any(p > posicao for p in posicoes):
+                continue
+            break
+        pagina.append(serializar(transacao))
+
+    return pagina
+
+
+# ========== FLASK ==========
+def materializar_todas(ate=None):
+    """Grava as ocorrências vencidas de todos os usuários ativos, inquilino a inquilino; retorna quantas"""
+    criadas = 0
+    for nome, usuarios in inquilinos.usuarios_por_inquilino(Usuario.status == 'ativo').items():
+        with inquilinos.usando(nome if inquilinos.roteador.ativo else None):
+            for usuario_id in usuarios:
+                criadas += materializar_vencidas(usuario_id, ate)
+    return criadas
+
+
+grupo = AppGroup('recorrencias', help='Transações recorrentes')
+
+
+@grupo.command('materializar')
+@click.option('--ate', type=click.DateTime(formats=['%Y-%m-%d']), help='Última data gravada (padrão: hoje)')
+def comando_materializar(ate):
+    """Grava as ocorrências vencidas sem depender da varredura de notificações"""
+    print(f'✅ {materializar_todas(ate.date() if ate else None)} ocorrências gravadas')
+
+
+def init_app(app):
+    """Registra o comando `recorrencias`"""
+    app.cli.add_command(grupo)
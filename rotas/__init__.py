@@ -0,0 +1,35 @@
+"""
+Rotas da API em Blueprints
+Cada área é um módulo importado só quando habilitado na implantação. A variável
+BLUEPRINTS (nomes separados por vírgula, padrão: todos) escolhe as áreas; um pool
+só de API com BLUEPRINTS=transacoes,precificacao sobe sem carregar relatórios,
+exportações, backup e administração.
+"""
+import importlib
+import os
+
+
+BLUEPRINTS = ('transacoes', 'precificacao', 'analise', 'relatorios', 'admin')
+
+
+def habilitados(valor=None):
+    """Nomes dos blueprints habilitados a partir de uma lista ou da variável BLUEPRINTS"""
+    if valor is None:
+        valor = os.environ.get('BLUEPRINTS', '')
+    if isinstance(valor, str):
+        valor = [nome.strip() for nome in valor.split(',') if nome.strip()]
+    nomes = list(valor) or list(BLUEPRINTS)
+    desconhecidos = [nome for nome in nomes if nome not in BLUEPRINTS]
+    if desconhecidos:
+        raise ValueError(f'Blueprints desconhecidos: {", ".join(desconhecidos)} (disponíveis: {", ".join(BLUEPRINTS)})')
+    return nomes
+
+
+def registrar_blueprints(app, nomes=None):
+    """Importa e registra apenas os blueprints habilitados"""
+    nomes = habilitados(nomes)
+    for nome in nomes:
+        modulo = importlib.import_module(f'rotas.{nome}')
+        app.register_blueprint(modulo.bp)
+    app.config['BLUEPRINTS'] = nomes
+    return nomes
@@ -0,0 +1,447 @@
+"""
+Rotas de Administração
+Usuários, logs e exportação de auditoria, backup e perfilador (apenas admin).
+"""
+from flask import Blueprint, current_app, request, jsonify, Response, stream_with_context, send_from_directory
+from flask_login import login_required, current_user
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Usuario, LogAuditoria, Backup
+from instrumentacao import orcamento_consultas
+from autenticacao import Sobrecarga, definir_senha
+from rotas.comum import admin_required
+import perfilador
+import configuracoes
+
+bp = Blueprint('admin', __name__)
+
+COLUNAS_USUARIO = ('id', 'nome', 'username', 'email', 'perfil', 'departamento', 'status')
+FILTROS_USUARIO = ('perfil', 'status', 'departamento')
+LIMITE_USUARIOS_PADRAO = 50
+LIMITE_USUARIOS_MAXIMO = 200
+
+
+def _pagina_de_usuarios():
+    """Página de usuários pedida na query string: (resposta, None) ou (None, mensagem de erro)
+
+    Filtros exatos (perfil, status, departamento), `busca` em nome/usuário/e-mail,
+    `pagina`/`limite` e `campos` (subconjunto de COLUNAS_USUARIO). Só as colunas
+    pedidas são lidas, como tuplas, sem objetos ORM.
+    """
+    try:
+        pagina = int(request.args.get('pagina', 1))
+        limite = int(request.args.get('limite', LIMITE_USUARIOS_PADRAO))
+        if pagina < 1 or not 1 <= limite <= LIMITE_USUARIOS_MAXIMO:
+            raise ValueError
+    except ValueError:
+        return None, f'Paginação inválida (pagina >= 1, limite de 1 a {LIMITE_USUARIOS_MAXIMO})'
+    
+    campos = [c for c in request.args.get('campos', '').split(',') if c] or list(COLUNAS_USUARIO)
+    invalidos = [c for c in campos if c not in COLUNAS_USUARIO]
+    if invalidos:
+        return None, f'Campos inválidos: {", ".join(invalidos)}'
+    if 'id' not in campos:
+        campos.insert(0, 'id')
+    
+    query = db.session.query(*(getattr(Usuario, c) for c in campos))
+    for filtro in FILTROS_USUARIO:
+        valor = request.args.get(filtro)
+        if valor and valor != 'todos':
+            query = query.filter(getattr(Usuario, filtro) == valor)
+    busca = request.args.get('busca', '').strip()
+    if busca:
+        termo = f'%{busca}%'
+        query = query.filter(
+            Usuario.nome.ilike(termo) | Usuario.username.ilike(termo) | Usuario.email.ilike(termo)
+        )
+    
+    total = query.order_by(None).count()
+    linhas = query.order_by(Usuario.nome, Usuario.id).offset((pagina - 1) * limite).limit(limite).all()
+    return {
+        'success': True,
+        'usuarios': [dict(zip(campos, linha)) for linha in linhas],
+        'total': total,
+        'paginas': max(1, (total + limite - 1) // limite),
+        'pagina_atual': pagina
+    }, None
+
+
+# API Auditoria - Exportar (CORREÇÃO: Erro 404)
+@bp.route("/api/auditoria/exportar", methods=["GET"])
+@login_required
+@admin_required
+def api_auditoria_exportar():
+    try:
+        dias = int(request.args.get("dias", 7))
+        formato = request.args.get("formato", "csv")
+        
+        data_limite = datetime.utcnow() - timedelta(days=dias)
+        
+        if formato == "csv":
+            import csv
+            import io
+            
+            # Nome do usuário vem no mesmo SELECT; as linhas são lidas em lotes
+            linhas = db.session.query(
+                LogAuditoria.id, LogAuditoria.data, Usuario.nome, LogAuditoria.acao, LogAuditoria.detalhes
+            ).outerjoin(Usuario, Usuario.id == LogAuditoria.usuario_id).filter(
+                LogAuditoria.data >= data_limite
+            ).order_by(LogAuditoria.data.desc()).execution_options(yield_per=500)
+            
+            @stream_with_context
+            def gerar():
+                si = io.StringIO()
+                cw = csv.writer(si)
+                cw.writerow(["ID", "Data", "Usuário", "Ação", "Detalhes"])
+                for i, (id_log, data, nome, acao, detalhes) in enumerate(linhas, 1):
+                    cw.writerow([id_log, data.isoformat(), nome or 'Desconhecido', acao, detalhes])
+                    if i % 500 == 0:
+                        yield si.getvalue()
+                        si.seek(0)
+                        si.truncate()
+                yield si.getvalue()
+            
+            output = Response(gerar(), mimetype="text/csv")
+            output.headers["Content-Disposition"] = f"attachment; filename=auditoria_{dias}dias.csv"
+            return output
+        
+        # Adicionar lógica para outros formatos (PDF, Excel) aqui
+        
+        return jsonify({"success": False, "message": "Formato de exportação inválido."}), 400
+        
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Erro ao exportar auditoria: {str(e)}"}), 500
+
+
+# API Admin - Logs de Auditoria (CORRIGIDO: Problema #1 - Importação)
+@bp.route("/api/admin/logs")
+@login_required
+@admin_required
+@orcamento_consultas(3)
+def api_admin_logs():
+    try:
+        dias = int(request.args.get('dias', 7))
+        acao = request.args.get('acao', 'todas')
+        usuario_id = request.args.get('usuario_id')
+        
+        data_limite = datetime.utcnow() - timedelta(days=dias)
+        
+        query = LogAuditoria.query.filter(LogAuditoria.data >= data_limite)
+        
+        if acao != 'todas':
+            query = query.filter_by(acao=acao)
+            
+        if usuario_id and usuario_id != 'todos':
+            query = query.filter_by(usuario_id=usuario_id)
+            
+        # Nome do usuário pelo join: só os usuários dos logs listados são lidos
+        logs = query.outerjoin(Usuario, Usuario.id == LogAuditoria.usuario_id).add_columns(
+            Usuario.nome
+        ).order_by(LogAuditoria.data.desc()).limit(100).all()
+        
+        return jsonify({
+            'success': True,
+            'logs': [{
+                'id': l.id,
+                'acao': l.acao,
+                'recurso': l.recurso,
+                'detalhes': l.detalhes,
+                'ip': l.ip,
+                'data': l.data.isoformat(),
+                'usuario_id': l.usuario_id,
+                'usuario_nome': nome or 'Desconhecido'
+            } for l, nome in logs]
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao buscar logs: {str(e)}'}), 500
+
+
+# API Admin - Backups (CORRIGIDO: Problema #1 - Importação)
+@bp.route('/api/backup', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def api_admin_backups():
+    try:
+        if request.method == 'GET':
+            backups = Backup.query.order_by(Backup.data.desc()).all()
+            
+            return jsonify({
+                'success': True,
+                'backups': [{
+                    'id': b.id,
+                    'descricao': b.descricao,
+                    'tamanho': b.tamanho or 0,
+                    'protegido': b.protegido,
+                    'data': b.data.isoformat()
+                } for b in backups]
+            })
+        
+        elif request.method == 'POST':
+            dados = request.json
+            acao = dados.get('acao')
+            
+            if acao == 'criar':
+                # Simulação de criação de backup
+                backup = Backup(
+                    descricao=dados.get('descricao', f'Backup Manual - {datetime.now().strftime("%Y-%m-%d %H:%M")}'),
+                    tamanho=1024 * 1024 * 5,  # 5MB simulado
+                    protegido=bool(dados.get('senha'))
+                )
+                db.session.add(backup)
+                db.session.commit()
+                return jsonify({'success': True, 'message': 'Backup criado com sucesso!'})
+            
+            elif acao == 'restaurar':
+                # Simulação de restauração
+                return jsonify({'success': True, 'message': 'Restauração iniciada com sucesso!'})
+            
+            elif acao == 'excluir':
+                # Simulação de exclusão
+                backup = Backup.query.get(dados.get('id'))
+                if backup:
+                    db.session.delete(backup)
+                    db.session.commit()
+                    return jsonify({'success': True, 'message': 'Backup excluído com sucesso!'})
+                else:
+                    return jsonify({'success': False, 'message': 'Backup não encontrado.'}), 404
+            
+            else:
+                return jsonify({'success': False, 'message': 'Ação inválida.'}), 400
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao processar backup: {str(e)}'}), 500
+
+
+# API Admin - Usuários (CORRIGIDO:    # API Admin - Usuário Individual (CORREÇÃO: Erro 404)
+@bp.route('/api/admin/usuarios/<int:id>', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_usuario_get(id):
+    try:
+        usuario = Usuario.query.get(id)
+        if not usuario:
+            return jsonify({'success': False, 'message': 'Usuário não encontrado'}), 404
+        
+        return jsonify({
+            'success': True,
+            'usuario': {
+                'id': usuario.id,
+                'nome': usuario.nome,
+                'email': usuario.email,
+                'perfil': usuario.perfil,
+                'status': usuario.status
+            }
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao buscar usuário: {str(e)}'}), 500
+
+
+# API Admin - Usuários (GET, POST) (CORREÇÃO: Erro 404)
+@bp.route('/api/admin/usuarios', methods=['GET', 'POST'])
+@login_required
+@admin_required
+@orcamento_consultas(4)
+def api_admin_usuarios():
+    try:
+        if request.method == 'GET':
+            resposta, erro = _pagina_de_usuarios()
+            if erro:
+                return jsonify({'success': False, 'message': erro}), 400
+            return jsonify(resposta)
+        
+        elif request.method == 'POST':
+            dados = request.json
+            
+            # Validação
+            if not all(key in dados for key in ['nome', 'email', 'senha', 'perfil']):
+                return jsonify({'success': False, 'message': 'Campos obrigatórios faltando.'}), 400
+            
+            if Usuario.query.filter_by(email=dados['email']).first():
+                return jsonify({'success': False, 'message': 'E-mail já cadastrado.'}), 400
+            
+            # Criação
+            usuario = Usuario(
+                nome=dados['nome'],
+                email=dados['email'],
+                perfil=dados['perfil'],
+                status=dados.get('status', 'ativo')
+            )
+            definir_senha(usuario, dados['senha'])
+            
+            db.session.add(usuario)
+            db.session.commit()
+            
+            return jsonify({'success': True, 'message': 'Usuário criado com sucesso!'})
+            
+    except Sobrecarga:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Servidor ocupado, tente novamente em instantes.'}), 503
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao acessar usuários: {str(e)}'}), 500
+
+
+# API Admin - Usuário Individual (PUT, DELETE) (CORREÇÃO: Funcionalidade)
+@bp.route('/api/admin/usuarios/<int:id>', methods=['PUT', 'DELETE'])
+@login_required
+@admin_required
+def api_admin_usuario_put_delete(id):
+    try:
+        usuario = Usuario.query.get(id)
+        if not usuario:
+            return jsonify({'success': False, 'message': 'Usuário não encontrado'}), 404
+
+        if request.method == 'PUT':
+            dados = request.json
+            
+            # Atualização
+            if 'nome' in dados:
+                usuario.nome = dados['nome']
+            if 'perfil' in dados:
+                usuario.perfil = dados['perfil']
+            if 'status' in dados:
+                usuario.status = dados['status']
+            if 'senha' in dados and dados['senha']:
+                definir_senha(usuario, dados['senha'])
+            
+            db.session.commit()
+            return jsonify({'success': True, 'message': 'Usuário atualizado com sucesso!'})
+
+        elif request.method == 'DELETE':
+            if usuario.id == current_user.id:
+                return jsonify({'success': False, 'message': 'Você não pode excluir seu próprio usuário.'}), 400
+            
+            configuracoes.excluir_usuario(usuario.id)
+            db.session.delete(usuario)
+            db.session.commit()
+            return jsonify({'success': True, 'message': 'Usuário excluído com sucesso!'})
+
+    except Sobrecarga:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Servidor ocupado, tente novamente em instantes.'}), 503
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao processar usuário: {str(e)}'}), 500
+
+
+# API Admin - Backup
+@bp.route('/api/admin/backup', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def api_admin_backup():
+    try:
+        if request.method == 'GET':
+            resposta, erro = _pagina_de_usuarios()
+            if erro:
+                return jsonify({'success': False, 'message': erro}), 400
+            return jsonify(resposta)
+        
+        elif request.method == 'POST':
+            dados = request.json
+            
+            # Validação robusta
+            campos_obrigatorios = ['nome', 'username', 'email', 'senha', 'perfil']
+            for campo in campos_obrigatorios:
+                if campo not in dados or not dados[campo]:
+                    return jsonify({
+                        'success': False, 
+                        'message': f'Campo obrigatório faltando ou vazio: {campo}'
+                    }), 400
+            
+            # Validar e-mail
+            if '@' not in dados['email']:
+                return jsonify({'success': False, 'message': 'E-mail inválido'}), 400
+            
+            # Verificar duplicação
+            if Usuario.query.filter_by(email=dados['email']).first():
+                return jsonify({'success': False, 'message': 'E-mail já cadastrado.'}), 400
+            
+            if Usuario.query.filter_by(username=dados['username']).first():
+                return jsonify({'success': False, 'message': 'Nome de usuário já cadastrado.'}), 400
+            
+            # Validar perfil
+            if dados['perfil'] not in ['admin', 'usuario', 'gerente']:
+                return jsonify({'success': False, 'message': 'Perfil inválido'}), 400
+            
+            # Criação do usuário
+            novo_usuario = Usuario(
+                nome=dados['nome'],
+                username=dados['username'],
+                email=dados['email'],
+                perfil=dados['perfil'],
+                departamento=dados.get('departamento', ''),
+                status=dados.get('status', 'ativo')
+            )
+            definir_senha(novo_usuario, dados['senha'])
+            
+            db.session.add(novo_usuario)
+            db.session.commit()
+            
+            return jsonify({'success': True, 'message': 'Usuário criado com sucesso!'})
+            
+    except Sobrecarga:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Servidor ocupado, tente novamente em instantes.'}), 503
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao processar usuário: {str(e)}'}), 500
+
+
+# API Admin - Configurações globais (padrão de todos os usuários)
+@bp.route('/api/admin/configuracoes', methods=['GET', 'PUT'])
+@login_required
+@admin_required
+def api_admin_configuracoes():
+    try:
+        if request.method == 'PUT':
+            try:
+                configuracoes.definir(request.json or {})
+            except ValueError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
+            return jsonify({'success': True, 'message': 'Configurações salvas com sucesso!'})
+        
+        return jsonify({'success': True, 'configuracao': configuracoes.valores(escopos=('usuario', 'global'))})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao acessar configurações: {str(e)}'}), 500
+
+
+# API Admin - Perfilador (perfis de pedidos em formato collapsed)
+@bp.route('/api/admin/perfilador', methods=['GET', 'PUT'])
+@login_required
+@admin_required
+def api_admin_perfilador():
+    try:
+        if request.method == 'PUT':
+            try:
+                estado = perfilador.salvar_estado(request.json or {})
+            except (TypeError, ValueError) as e:
+                return jsonify({'success': False, 'message': f'Dados inválidos: {str(e)}'}), 400
+            return jsonify({'success': True, 'estado': estado, 'message': 'Perfilador atualizado!'})
+        
+        return jsonify({'success': True, 'estado': perfilador.obter_estado()})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao acessar perfilador: {str(e)}'}), 500
+
+
+@bp.route('/api/admin/perfis', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_perfis():
+    try:
+        limite = min(int(request.args.get('limite', 100)), perfilador.MAXIMO_ARQUIVOS)
+        return jsonify({'success': True, 'perfis': perfilador.listar(current_app, limite)})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao listar perfis: {str(e)}'}), 500
+
+
+@bp.route('/api/admin/perfis/<nome>', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_perfis_download(nome):
+    if not perfilador.NOME_VALIDO.match(nome):
+        return jsonify({'success': False, 'message': 'Perfil não encontrado'}), 404
+    return send_from_directory(perfilador.diretorio(current_app), nome, as_attachment=True, mimetype='text/plain')
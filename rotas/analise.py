@@ -0,0 +1,167 @@
+"""
+Rotas de Análise
+Indicadores, comparativos por período, previsão de fluxo de caixa, ranking de
+fornecedores e exportação de análises.
+"""
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify, make_response
+from flask_login import login_required, current_user
+
+from previsao import GRANULARIDADES, HORIZONTE_MAXIMO, prever_fluxo
+from comparativos import DIMENSOES, JANELA_PADRAO, comparar
+from instrumentacao import orcamento_consultas
+import dimensoes
+
+bp = Blueprint('analise', __name__)
+
+
+# API Análise
+@bp.route('/api/analise/indicadores')
+@login_required
+def api_analise_indicadores():
+    return jsonify({
+        'success': True,
+        'liquidez': {
+            'corrente': 1.5,
+            'seca': 1.2,
+            'geral': 1.8,
+            'imediata': 0.3
+        },
+        'rentabilidade': {
+            'roa': 12.5,
+            'roe': 18.2,
+            'margem_bruta': 35.4,
+            'margem_liquida': 15.8
+        }
+    })
+
+
+# API Previsão - Fluxo de caixa projetado a partir das contas pendentes
+@bp.route('/api/previsao/fluxo-caixa')
+@login_required
+@orcamento_consultas(8)
+def api_previsao_fluxo_caixa():
+    try:
+        try:
+            dias = int(request.args.get('dias', 30))
+            if dias < 1 or dias > HORIZONTE_MAXIMO:
+                raise ValueError
+        except (ValueError, TypeError):
+            return jsonify({
+                'success': False,
+                'message': f'Número de dias inválido (1 a {HORIZONTE_MAXIMO})'
+            }), 400
+        
+        granularidade = request.args.get('granularidade', 'diaria')
+        if granularidade not in GRANULARIDADES:
+            return jsonify({'success': False, 'message': 'Granularidade inválida'}), 400
+        
+        previsao = prever_fluxo(current_user.id, dias, granularidade)
+        
+        return jsonify({'success': True, 'dias': dias, 'granularidade': granularidade, **previsao})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao calcular previsão: {str(e)}'}), 500
+
+
+# API Análise - Comparativos por período (MoM/YoY por tipo, categoria e centro de custo)
+@bp.route('/api/analise/comparativo')
+@login_required
+@orcamento_consultas(8)
+def api_analise_comparativo():
+    try:
+        dimensao = request.args.get('dimensao')
+        if dimensao and dimensao not in DIMENSOES:
+            return jsonify({'success': False, 'message': f'Dimensão inválida (use: {", ".join(DIMENSOES)})'}), 400
+        try:
+            janela = int(request.args.get('janela', JANELA_PADRAO))
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Janela inválida'}), 400
+        
+        try:
+            resultado = comparar(
+                current_user.id, request.args.get('inicio'), request.args.get('fim'),
+                request.args.get('granularidade', 'mensal'), janela
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        if dimensao:
+            resultado = dict(resultado, dimensoes={dimensao: resultado['dimensoes'][dimensao]})
+        return jsonify({'success': True, **resultado})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao calcular comparativo: {str(e)}'}), 500
+
+
+# API Fornecedores - Fornecedores do usuário (com busca pelo nome)
+@bp.route('/api/fornecedores')
+@login_required
+@orcamento_consultas(2)
+def api_fornecedores():
+    try:
+        fornecedores = dimensoes.listar_fornecedores(current_user.id, request.args.get('busca'))
+        return jsonify({'success': True, 'fornecedores': fornecedores})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao listar fornecedores: {str(e)}'}), 500
+
+
+# API Fornecedores - Top-N por valor no período (agrupado pela chave do fornecedor)
+@bp.route('/api/fornecedores/ranking')
+@login_required
+@orcamento_consultas(6)  # período arquivado: corte, o arquivo do ano e as chaves dos fornecedores
+def api_fornecedores_ranking():
+    try:
+        try:
+            inicio, fim = (
+                datetime.strptime(request.args[nome], '%Y-%m-%d').date() if request.args.get(nome) else None
+                for nome in ('inicio', 'fim')
+            )
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Data inválida. Use o formato YYYY-MM-DD'}), 400
+        try:
+            limite = int(request.args.get('limite', dimensoes.RANKING_PADRAO))
+            if not 1 <= limite <= dimensoes.RANKING_MAXIMO:
+                raise ValueError
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': f'Limite inválido (1 a {dimensoes.RANKING_MAXIMO})'
+            }), 400
+        tipo = request.args.get('tipo', 'despesa')
+        if tipo not in ('despesa', 'receita'):
+            return jsonify({'success': False, 'message': 'Tipo inválido'}), 400
+        
+        resultado = dimensoes.ranking(current_user.id, inicio, fim, tipo, limite)
+        return jsonify({'success': True, **resultado})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao calcular ranking: {str(e)}'}), 500
+
+
+# API Análise - Exportar
+@bp.route('/api/analise/exportar', methods=['POST'])
+@login_required
+def api_analise_exportar():
+    try:
+        dados = request.json
+        formato = dados.get('formato', 'pdf')
+        
+        # Lógica de exportação (simulada)
+        if formato == 'pdf':
+            response = make_response("Conteúdo do Relatório de Análise em PDF (Simulado)")
+            response.headers['Content-Type'] = 'application/pdf'
+            response.headers['Content-Disposition'] = 'attachment; filename=analise_exportada.pdf'
+            return response
+        elif formato == 'excel':
+            response = make_response("Conteúdo do Relatório de Análise em Excel (Simulado)")
+            response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            response.headers['Content-Disposition'] = 'attachment; filename=analise_exportada.xlsx'
+            return response
+        else:
+            return jsonify({'success': False, 'message': 'Formato de exportação inválido.'}), 400
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao exportar análise: {str(e)}'}), 500
@@ -0,0 +1,60 @@
+"""
+Auxiliares compartilhados pelas rotas
+"""
+from flask import flash, redirect, url_for
+from flask_login import current_user
+from datetime import datetime
+from functools import wraps
+
+from extensions import db
+from models import Transacao
+from recorrencia import fim_do_mes, projetar_ocorrencias
+
+
+# ========== DECORATORS ==========
+def admin_required(f):
+    """Decorator para rotas que requerem permissão de administrador"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or current_user.perfil != 'admin':
+            flash('Acesso negado. Permissões de administrador necessárias.', 'danger')
+            return redirect(url_for('dashboard'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# ========== SERIALIZAÇÃO ==========
+def transacao_para_dict(t):
+    """Serializa uma transação no formato usado pelas APIs"""
+    return {
+        'id': t.id,
+        'descricao': t.descricao,
+        'valor': t.valor,
+        'data': t.data.isoformat(),
+        'data_vencimento': t.data_vencimento.isoformat() if t.data_vencimento else None,
+        'categoria': t.categoria,
+        'tipo': t.tipo,
+        'status': t.status,
+        'fornecedor': t.fornecedor,
+        'forma_pagamento': t.forma_pagamento,
+        'observacoes': t.observacoes,
+        'recorrencia_id': t.recorrencia_id,
+        'duplicata_de': t.duplicata_de
+    }
+
+
+def totais_do_mes(usuario_id):
+    """Retorna (despesas, receitas) do mês atual, incluindo as recorrências ainda projetadas"""
+    hoje = datetime.now().date()
+    inicio_mes = hoje.replace(day=1)
+    
+    totais = dict(db.session.query(Transacao.tipo, db.func.sum(Transacao.valor)).filter(
+        Transacao.usuario_id == usuario_id,
+        Transacao.data >= inicio_mes
+    ).group_by(Transacao.tipo).all())
+    
+    # Ocorrências recorrentes do mês ainda não gravadas (as já vencidas também, até a varredura gravá-las)
+    for ocorrencia in projetar_ocorrencias(usuario_id, inicio_mes, fim_do_mes(hoje)):
+        totais[ocorrencia['tipo']] = (totais.get(ocorrencia['tipo']) or 0) + ocorrencia['valor']
+    
+    return totais.get('despesa') or 0, totais.get('receita') or 0
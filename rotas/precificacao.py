@@ -0,0 +1,57 @@
+"""
+Rotas de Precificação
+Cálculo de preço de venda, markup e margens.
+"""
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+
+bp = Blueprint('precificacao', __name__)
+
+
+# API Precificação
+@bp.route('/api/precificacao/calcular', methods=['POST'])
+@login_required
+def api_precificacao_calcular():
+    try:
+        dados = request.json
+        
+        # Validar e converter valores
+        try:
+            cp = float(dados.get('custo_produto', 0))
+            custos_pct = float(dados.get('custos_adicionais_pct', 0))
+            mult = float(dados.get('multiplicador', 1))
+            imp_pct = float(dados.get('impostos_pct', 0))
+            com_pct = float(dados.get('comissao_pct', 0))
+            desc_pct = float(dados.get('desconto_pct', 0))
+        except (ValueError, TypeError):
+            return jsonify({'success': False, 'message': 'Valores inválidos fornecidos'}), 400
+        
+        # Cálculos
+        ct = cp * (1 + custos_pct / 100)
+        pv = ct * mult
+        pf = pv * (1 - desc_pct / 100)
+        enc = pf * ((imp_pct + com_pct) / 100)
+        lucro = pf - enc - ct
+        
+        # Markups e margens
+        mk_bruto = (pv / ct) if ct > 0 else 0
+        mk_liquido = (lucro / ct) if ct > 0 else 0
+        margem_bruta = ((pv - ct) / pv * 100) if pv > 0 else 0
+        margem_liquida = ((pf - ct - enc) / pf * 100) if pf > 0 else 0
+        
+        return jsonify({
+            'success': True,
+            'resultados': {
+                'custo_total': round(ct, 2),
+                'preco_venda': round(pv, 2),
+                'preco_final': round(pf, 2),
+                'lucro_unidade': round(lucro, 2),
+                'markup_bruto': round(mk_bruto, 2),
+                'markup_liquido': round(mk_liquido, 2),
+                'margem_bruta': round(margem_bruta, 1),
+                'margem_liquida': round(margem_liquida, 1)
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro no cálculo: {str(e)}'}), 400
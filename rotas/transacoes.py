@@ -0,0 +1,777 @@
+"""
+Rotas de Transações
+Dashboard, CRUD de transações, recorrências, notificações e o stream SSE.
+É o núcleo da API usado pelas telas do dia a dia.
+"""
+from flask import Blueprint, current_app, request, jsonify, Response, stream_with_context
+from flask_login import login_required, current_user
+from datetime import datetime
+import time
+
+from extensions import db
+from models import Transacao, RegraRecorrencia, Notificacao, ArquivoTransacoes
+from sqlalchemy.orm import joinedload
+
+from recorrencia import (
+    FREQUENCIAS, UNIDADES, INICIO_DAS_REGRAS, projetar_ocorrencias, materializar_ocorrencia, mesclar_pagina
+)
+from eventos import barramento, formatar_sse
+from instrumentacao import orcamento_consultas
+from rotas.comum import transacao_para_dict, totais_do_mes
+from serializacao import FORMATOS, COLUNAS_TRANSACAO, linha_para_dict, linha_para_lista, colunar, resposta_json
+import notificacoes
+import conciliacao
+import duplicatas
+import categorizacao
+import autocompletar
+import dimensoes
+
+bp = Blueprint('transacoes', __name__)
+
+
+# API Dashboard
+@bp.route('/api/dashboard/estatisticas')
+@login_required
+@orcamento_consultas(8)
+def api_estatisticas():
+    despesas_mes, receitas_mes = totais_do_mes(current_user.id)
+    
+    # Removida a criação automática de transações de exemplo para que o Dashboard comece zerado.
+    # Se o usuário quiser dados de exemplo, ele deve adicioná-los manualmente.
+    # Os cálculos já estão filtrados por current_user.id, garantindo a exclusividade dos dados.
+    
+    return jsonify({
+        'success': True,
+        'estatisticas': {
+            'despesas_mes': float(despesas_mes),
+            'receitas_mes': float(receitas_mes),
+            'saldo_mes': float(receitas_mes - despesas_mes)
+        }
+    })
+
+
+# API Eventos - Server-Sent Events com as variações das estatísticas do usuário
+@bp.route('/api/eventos')
+@login_required
+def api_eventos():
+    usuario_id = current_user.id
+    # Cada stream prende uma thread do worker: acima do limite o navegador usa polling
+    fila = barramento.assinar(usuario_id, current_app.config['EVENTOS_MAX_CONEXOES'])
+    if fila is None:
+        resposta = jsonify({'success': False, 'message': 'Limite de conexões em tempo real atingido'})
+        resposta.headers['Retry-After'] = '60'
+        return resposta, 503
+    keepalive = current_app.config.get('EVENTOS_KEEPALIVE', 15)
+    limite = time.monotonic() + current_app.config['EVENTOS_DURACAO_MAXIMA']
+    
+    def estatisticas():
+        despesas_mes, receitas_mes = totais_do_mes(usuario_id)
+        # Encerra a transação de leitura para não segurar o banco entre eventos
+        db.session.remove()
+        return {
+            'despesas_mes': float(despesas_mes),
+            'receitas_mes': float(receitas_mes),
+            'saldo_mes': float(receitas_mes - despesas_mes)
+        }
+    
+    @stream_with_context
+    def gerar():
+        try:
+            anteriores = estatisticas()
+            yield 'retry: 5000\n\n'
+            yield formatar_sse('estatisticas', {'estatisticas': anteriores, 'completo': True})
+            
+            # Duração limitada: a thread volta ao pool e o EventSource reconecta após o retry
+            while True:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                # Uma rajada de alterações gera um único recálculo
+                if not barramento.aguardar(fila, min(keepalive, restante)):
+                    yield ': keepalive\n\n'
+                    continue
+                
+                atuais = estatisticas()
+                delta = {k: v for k, v in atuais.items() if anteriores.get(k) != v}
+                anteriores = atuais
+                yield formatar_sse('estatisticas', {
+                    'estatisticas': delta,
+                    'completo': False,
+                    'transacoes_alteradas': True
+                })
+        finally:
+            barramento.cancelar(usuario_id, fila)
+    
+    resposta = Response(gerar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Cliente que desiste antes do primeiro evento não chega ao finally do gerador
+    resposta.call_on_close(lambda: barramento.cancelar(usuario_id, fila))
+    return resposta
+
+
+# API Transações - GET (CORRIGIDO: Problema #3 e #7)
+@bp.route('/api/transacoes', methods=['GET'])
+@login_required
+@orcamento_consultas(12)
+def api_transacoes_get():
+    try:
+        # Parâmetros com valores padrão
+        tipo = request.args.get('tipo', 'despesa')
+        categoria = request.args.get('categoria', 'todas')
+        status = request.args.get('status', 'todas')
+        pagina = int(request.args.get('pagina', 1))
+        limite = int(request.args.get('limite', 20))
+        busca = request.args.get('busca', '')
+        data_inicio_str = request.args.get('data_inicio')
+        data_fim_str = request.args.get('data_fim')
+        formato = request.args.get('formato', 'objetos')
+        if formato not in FORMATOS:
+            return jsonify({'success': False, 'message': f'Formato inválido. Use: {", ".join(FORMATOS)}'}), 400
+        
+        # Construir query
+        query = Transacao.query.filter_by(usuario_id=current_user.id, tipo=tipo)
+        
+        # Aplicar filtros
+        if categoria != 'todas':
+            # Filtra pela chave da dimensão; categoria ainda sem registro não tem transações
+            query = query.filter(Transacao.categoria_id == dimensoes.id_de('categoria', current_user.id, categoria))
+        
+        if status != 'todas':
+            query = query.filter_by(status=status)
+            
+        if busca:
+            query = query.filter(
+                (Transacao.descricao.ilike(f'%{busca}%')) | 
+                (Transacao.fornecedor.ilike(f'%{busca}%'))
+            )
+        
+        # CORREÇÃO: Aplicar filtro de período apenas se as datas forem fornecidas
+        data_inicio = None
+        data_fim = None
+        
+        if data_inicio_str:
+            try:
+                data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
+                query = query.filter(Transacao.data >= data_inicio)
+            except ValueError:
+                pass  # Ignorar data inválida
+                
+        if data_fim_str:
+            try:
+                data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
+                query = query.filter(Transacao.data <= data_fim)
+            except ValueError:
+                pass  # Ignorar data inválida
+        
+        # Ocorrências recorrentes ainda não gravadas: as futuras só quando o período pedido
+        # alcança o futuro; as já vencidas aparecem como projetadas até a varredura gravá-las
+        hoje = datetime.now().date()
+        termo = busca.lower()
+        ocorrencias = projetar_ocorrencias(current_user.id, data_inicio or INICIO_DAS_REGRAS, data_fim or hoje, tipo)
+        projetadas = [
+            o for o in ocorrencias
+            if (categoria == 'todas' or o['categoria'] == categoria)
+            and (status == 'todas' or o['status'] == status)
+            and (not termo or termo in (o['descricao'] or '').lower()
+                 or termo in (o['fornecedor'] or '').lower())
+        ]
+        
+        # Transações arquivadas só entram quando o período pedido alcança o arquivo (e só
+        # então o módulo de arquivamento é carregado)
+        arquivado_ate = None
+        arquivadas = []
+        if data_inicio:
+            arquivado_ate = ArquivoTransacoes.corte(current_user.id)
+            if arquivado_ate and data_inicio <= arquivado_ate:
+                import arquivamento
+
+                arquivadas = arquivamento.linhas(
+                    current_user.id, data_inicio, data_fim, tipo,
+                    None if categoria == 'todas' else categoria,
+                    None if status == 'todas' else status, busca
+                )
+            else:
+                arquivado_ate = None
+        
+        # Calcular estatísticas totais para o período/tipo
+        # Se não houver filtro de data, usar o mês atual
+        if not data_inicio:
+            hoje = datetime.now().date()
+            data_inicio = hoje.replace(day=1)
+        if not data_fim:
+            data_fim = datetime.now().date()
+        
+        total_valor = db.session.query(db.func.sum(Transacao.valor)).filter(
+            Transacao.usuario_id == current_user.id,
+            Transacao.tipo == tipo,
+            Transacao.data >= data_inicio,
+            Transacao.data <= data_fim
+        ).scalar() or 0
+        # O total usa as mesmas ocorrências (sem os filtros da listagem), sem projetar de novo
+        total_valor += sum(o['valor'] for o in ocorrencias if o['data'] >= data_inicio.isoformat())
+        if arquivado_ate:
+            total_valor += arquivamento.somar(current_user.id, tipo, data_inicio, data_fim, arquivado_ate)
+        
+        # Calcular receitas e despesas totais do mês (para os cards)
+        total_despesas_mes, total_receitas_mes = totais_do_mes(current_user.id)
+        
+        # Ordenar e paginar (intercalando as ocorrências projetadas)
+        # Só as colunas da API, como tuplas: sem objetos ORM nem identity map
+        total = query.count() + len(projetadas) + len(arquivadas)
+        offset = (pagina - 1) * limite
+        serializar = linha_para_lista if formato == 'colunar' else linha_para_dict
+        if arquivado_ate:
+            transacoes = arquivamento.mesclar_arquivadas(
+                query.with_entities(*COLUNAS_TRANSACAO), projetadas, arquivadas, arquivado_ate,
+                offset, limite, serializar
+            )
+        else:
+            transacoes = mesclar_pagina(query.with_entities(*COLUNAS_TRANSACAO), projetadas, offset, limite, serializar)
+        if formato == 'colunar':
+            transacoes = colunar(transacoes)
+        
+        # Calcular estatísticas
+        estatisticas = {
+            'total': float(total_valor),
+            'receitas': float(total_receitas_mes),
+            'despesas': float(total_despesas_mes),
+            'quantidade': total
+        }
+        
+        return resposta_json({
+            'success': True,
+            'despesas': transacoes,  # Renomeado para 'despesas' para compatibilidade com o frontend
+            'estatisticas': estatisticas,
+            'total': total,
+            'paginas': max(1, (total + limite - 1) // limite),
+            'pagina_atual': pagina
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+# API Transações - POST (CORRIGIDO: Problema #6 - Validação)
+@bp.route('/api/transacoes', methods=['POST'])
+@login_required
+@orcamento_consultas(13)  # categoria, fornecedor e forma de pagamento novos: 2 consultas cada; carimbo de versão: 1
+def api_transacoes_post():
+    try:
+        dados = request.json
+        
+        # Validar dados obrigatórios
+        campos_obrigatorios = ['descricao', 'valor', 'data', 'categoria']
+        for campo in campos_obrigatorios:
+            if campo not in dados or not dados[campo]:
+                return jsonify({
+                    'success': False, 
+                    'message': f'Campo obrigatório faltando ou vazio: {campo}'
+                }), 400
+        
+        # Validar e converter valor
+        try:
+            valor = float(dados['valor'])
+            if valor <= 0:
+                return jsonify({
+                    'success': False, 
+                    'message': 'O valor deve ser maior que zero'
+                }), 400
+        except (ValueError, TypeError):
+            return jsonify({
+                'success': False, 
+                'message': 'Valor inválido. Deve ser um número'
+            }), 400
+        
+        # Validar e converter data
+        try:
+            data = datetime.strptime(dados['data'], '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+            return jsonify({
+                'success': False, 
+                'message': 'Data inválida. Use o formato YYYY-MM-DD'
+            }), 400
+        
+        # Validar data de vencimento (se fornecida)
+        data_vencimento = None
+        if dados.get('data_vencimento'):
+            try:
+                data_vencimento = datetime.strptime(dados['data_vencimento'], '%Y-%m-%d').date()
+            except (ValueError, TypeError):
+                return jsonify({
+                    'success': False, 
+                    'message': 'Data de vencimento inválida. Use o formato YYYY-MM-DD'
+                }), 400
+        
+        # Criar transação
+        transacao = Transacao(
+            descricao=dados['descricao'],
+            valor=valor,
+            data=data,
+            data_vencimento=data_vencimento,
+            categoria=dados['categoria'],
+            tipo=dados.get('tipo', 'despesa'),
+            status=dados.get('status', 'pendente'),
+            fornecedor=dados.get('fornecedor', ''),
+            forma_pagamento=dados.get('forma_pagamento', ''),
+            observacoes=dados.get('observacoes', ''),
+            usuario_id=current_user.id
+        )
+        
+        db.session.add(transacao)
+        db.session.flush()
+        # Lidos antes do commit: depois dele o objeto expira e seria recarregado com mais uma consulta
+        id, duplicata_de = transacao.id, transacao.duplicata_de
+        db.session.commit()
+        
+        # Duplicatas não são recusadas: a resposta avisa qual transação já existe
+        if duplicata_de:
+            return jsonify({
+                'success': True,
+                'message': f'Transação criada, mas parece repetir a transação #{duplicata_de}.',
+                'id': id,
+                'duplicata_de': duplicata_de
+            })
+        
+        return jsonify({
+            'success': True,
+            'message': 'Transação criada com sucesso!',
+            'id': id
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao criar transação: {str(e)}'}), 400
+
+
+# API Conciliação - Casa um extrato bancário (JSON ou CSV) com as transações em aberto
+@bp.route('/api/conciliacao', methods=['POST'])
+@login_required
+def api_conciliacao():
+    try:
+        if 'arquivo' in request.files:
+            opcoes = request.form
+            try:
+                linhas = conciliacao.ler_csv(request.files['arquivo'].read())
+            except ValueError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
+        else:
+            opcoes = request.get_json(silent=True) or {}
+            linhas = opcoes.get('linhas')
+        
+        try:
+            janela = int(opcoes.get('janela_dias', conciliacao.JANELA_PADRAO))
+        except (ValueError, TypeError):
+            return jsonify({'success': False, 'message': 'Janela de dias inválida'}), 400
+        try:
+            linhas = conciliacao.validar(linhas)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        aplicar = str(opcoes.get('aplicar', True)).lower() not in ('0', 'false', 'nao', 'não')
+        
+        try:
+            resultado = conciliacao.conciliar(current_user.id, linhas, janela, aplicar)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        # Linhas sem transação costumam virar lançamentos novos: já vão com a categoria provável
+        categorizacao.categorizar(current_user.id, resultado['nao_conciliadas'])
+        
+        return resposta_json({'success': True, **resultado})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao conciliar extrato: {str(e)}'}), 500
+
+
+# API Duplicatas - Grupos de possíveis transações repetidas do usuário
+@bp.route('/api/transacoes/duplicatas', methods=['GET'])
+@login_required
+@orcamento_consultas(2)
+def api_duplicatas():
+    try:
+        try:
+            janela = int(request.args.get('janela_dias', duplicatas.JANELA_PADRAO))
+            grupos, comparacoes = duplicatas.varrer(current_user.id, janela)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': f'Janela de dias inválida (0 a {duplicatas.JANELA_MAXIMA})'
+            }), 400
+        
+        campos = ('id', 'data', 'valor', 'tipo', 'descricao', 'fornecedor', 'duplicata_de')
+        return resposta_json({
+            'success': True,
+            'grupos': [[dict(zip(campos, linha)) for linha in grupo] for grupo in grupos],
+            'comparacoes': comparacoes
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao buscar duplicatas: {str(e)}'}), 500
+
+
+# API Autocompletar - Fornecedores e descrições parecidos com o texto digitado (tolera erros)
+@bp.route('/api/transacoes/autocompletar')
+@login_required
+@orcamento_consultas(4)  # carimbo de versão: 1
+def api_autocompletar():
+    try:
+        campo = request.args.get('campo') or None
+        if campo is not None and campo not in autocompletar.CAMPOS:
+            return jsonify({'success': False, 'message': 'Campo inválido (use fornecedor ou descricao)'}), 400
+        try:
+            limite = int(request.args.get('limite', autocompletar.SUGESTOES_PADRAO))
+            if not 1 <= limite <= autocompletar.SUGESTOES_MAXIMAS:
+                raise ValueError
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': f'Limite inválido (1 a {autocompletar.SUGESTOES_MAXIMAS})'
+            }), 400
+        
+        sugestoes = autocompletar.sugerir(current_user.id, request.args.get('q', ''), limite, campo)
+        return jsonify({'success': True, 'sugestoes': sugestoes})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao autocompletar: {str(e)}'}), 500
+
+
+# API Categorias - Sugestão pela descrição/fornecedor (GET) ou para várias linhas de uma importação (POST)
+@bp.route('/api/categorias/sugestao', methods=['GET', 'POST'])
+@login_required
+@orcamento_consultas(3)
+def api_categorias_sugestao():
+    try:
+        if request.method == 'POST':
+            linhas = (request.get_json(silent=True) or {}).get('linhas')
+            if not isinstance(linhas, list) or not all(isinstance(linha, dict) for linha in linhas):
+                return jsonify({'success': False, 'message': 'Envie as linhas a categorizar'}), 400
+            return resposta_json({'success': True, 'linhas': categorizacao.categorizar(current_user.id, linhas)})
+        
+        sugestoes = categorizacao.sugerir(
+            current_user.id,
+            request.args.get('descricao', ''),
+            request.args.get('fornecedor'),
+            request.args.get('tipo', 'despesa')
+        )
+        return jsonify({'success': True, 'sugestoes': sugestoes})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao sugerir categoria: {str(e)}'}), 500
+
+
+# API Transações - GET Individual (Buscar por ID)
+@bp.route('/api/transacoes/<int:id>', methods=['GET'])
+@login_required
+@orcamento_consultas(3)
+def api_transacoes_get_individual(id):
+    try:
+        transacao = Transacao.query.filter_by(id=id, usuario_id=current_user.id).first()
+        if not transacao:
+            return jsonify({'success': False, 'message': 'Transação não encontrada'}), 404
+        
+        return jsonify({
+            'success': True,
+            'transacao': transacao_para_dict(transacao)
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao buscar transação: {str(e)}'}), 500
+
+
+def _aplicar_edicao(transacao, dados):
+    """Aplica na transação os campos enviados no PUT; retorna a mensagem de erro ou None
+
+    Nada é confirmado aqui: em caso de erro quem chamou desfaz a sessão.
+    """
+    if not isinstance(dados, dict):
+        return 'Envie um objeto JSON com os campos da transação'
+    
+    # Atualizar campos com validação
+    if 'descricao' in dados:
+        transacao.descricao = dados['descricao']
+    
+    if 'valor' in dados:
+        try:
+            valor = float(dados['valor'])
+            if valor <= 0:
+                return 'O valor deve ser maior que zero'
+            transacao.valor = valor
+        except (ValueError, TypeError):
+            return 'Valor inválido'
+    
+    if 'data' in dados:
+        try:
+            transacao.data = datetime.strptime(dados['data'], '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+            return 'Data inválida'
+    
+    if 'data_vencimento' in dados:
+        if dados['data_vencimento']:
+            try:
+                transacao.data_vencimento = datetime.strptime(dados['data_vencimento'], '%Y-%m-%d').date()
+            except (ValueError, TypeError):
+                return 'Data de vencimento inválida'
+        else:
+            transacao.data_vencimento = None
+    
+    if 'categoria' in dados:
+        transacao.categoria = dados['categoria']
+    if 'tipo' in dados:
+        transacao.tipo = dados['tipo']
+    if 'status' in dados:
+        transacao.status = dados['status']
+    if 'fornecedor' in dados:
+        transacao.fornecedor = dados['fornecedor']
+    if 'forma_pagamento' in dados:
+        transacao.forma_pagamento = dados['forma_pagamento']
+    if 'observacoes' in dados:
+        transacao.observacoes = dados['observacoes']
+    if 'duplicata_de' in dados and not dados['duplicata_de']:
+        # O usuário confirmou que não é duplicata; a varredura em lote não marca de novo
+        transacao.duplicata_de = duplicatas.REVISADA
+    return None
+
+
+# API Transações - PUT (Atualizar)
+@bp.route('/api/transacoes/<int:id>', methods=['PUT'])
+@login_required
+@orcamento_consultas(13)  # categoria, fornecedor e forma de pagamento novos: 2 consultas cada; carimbo de versão: 1
+def api_transacoes_put(id):
+    try:
+        transacao = Transacao.query.filter_by(id=id, usuario_id=current_user.id).first()
+        if not transacao:
+            return jsonify({'success': False, 'message': 'Transação não encontrada'}), 404
+        
+        erro = _aplicar_edicao(transacao, request.json)
+        if erro:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': erro}), 400
+        
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Transação atualizada com sucesso!'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao atualizar transação: {str(e)}'}), 400
+
+
+# API Transações - DELETE
+@bp.route('/api/transacoes/<int:id>', methods=['DELETE'])
+@login_required
+@orcamento_consultas(8)
+def api_transacoes_delete(id):
+    try:
+        transacao = Transacao.query.filter_by(id=id, usuario_id=current_user.id).first()
+        if not transacao:
+            return jsonify({'success': False, 'message': 'Transação não encontrada'}), 404
+        
+        # Excluir o modelo encerra a recorrência (ocorrências já gravadas permanecem)
+        RegraRecorrencia.query.filter_by(transacao_id=transacao.id).delete()
+        Notificacao.query.filter_by(transacao_id=transacao.id).delete()
+        
+        db.session.delete(transacao)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Transação excluída com sucesso!'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao excluir transação: {str(e)}'}), 400
+
+
+# API Recorrências - Criar regra a partir de uma transação modelo
+@bp.route('/api/transacoes/<int:id>/recorrencia', methods=['POST'])
+@login_required
+def api_recorrencia_criar(id):
+    try:
+        transacao = Transacao.query.filter_by(id=id, usuario_id=current_user.id).first()
+        if not transacao:
+            return jsonify({'success': False, 'message': 'Transação não encontrada'}), 404
+        
+        if RegraRecorrencia.query.filter_by(transacao_id=transacao.id, ativa=True).first():
+            return jsonify({'success': False, 'message': 'Transação já possui recorrência ativa'}), 400
+        
+        dados = request.json or {}
+        
+        frequencia = dados.get('frequencia', 'mensal')
+        if frequencia not in FREQUENCIAS:
+            return jsonify({'success': False, 'message': 'Frequência inválida'}), 400
+        
+        # Mensal e semanal já dizem a unidade; ela só é gravada na personalizada
+        unidade = None
+        if frequencia == 'personalizada':
+            unidade = dados.get('unidade', 'dias')
+            if unidade not in UNIDADES:
+                return jsonify({'success': False, 'message': 'Unidade inválida'}), 400
+        
+        try:
+            intervalo = int(dados.get('intervalo', 1))
+            if intervalo < 1:
+                raise ValueError
+        except (ValueError, TypeError):
+            return jsonify({'success': False, 'message': 'Intervalo inválido'}), 400
+        
+        data_fim = None
+        if dados.get('data_fim'):
+            try:
+                data_fim = datetime.strptime(dados['data_fim'], '%Y-%m-%d').date()
+            except (ValueError, TypeError):
+                return jsonify({'success': False, 'message': 'Data final inválida. Use o formato YYYY-MM-DD'}), 400
+        
+        regra = RegraRecorrencia(
+            transacao_id=transacao.id,
+            usuario_id=current_user.id,
+            frequencia=frequencia,
+            intervalo=intervalo,
+            unidade=unidade,
+            data_inicio=transacao.data,
+            data_fim=data_fim,
+            materializada_ate=transacao.data
+        )
+        db.session.add(regra)
+        db.session.flush()
+        transacao.recorrencia_id = regra.id
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Recorrência criada com sucesso!', 'id': regra.id})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao criar recorrência: {str(e)}'}), 400
+
+
+# API Recorrências - Listar
+@bp.route('/api/recorrencias', methods=['GET'])
+@login_required
+@orcamento_consultas(3)
+def api_recorrencias_get():
+    try:
+        regras = RegraRecorrencia.query.options(joinedload(RegraRecorrencia.transacao)).filter_by(
+            usuario_id=current_user.id, ativa=True
+        ).order_by(RegraRecorrencia.data_criacao.desc()).all()
+        
+        return jsonify({
+            'success': True,
+            'recorrencias': [{
+                'id': r.id,
+                'transacao_id': r.transacao_id,
+                'descricao': r.transacao.descricao,
+                'valor': r.transacao.valor,
+                'frequencia': r.frequencia,
+                'intervalo': r.intervalo,
+                'unidade': r.unidade if r.frequencia == 'personalizada' else None,
+                'data_inicio': r.data_inicio.isoformat(),
+                'data_fim': r.data_fim.isoformat() if r.data_fim else None
+            } for r in regras]
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao buscar recorrências: {str(e)}'}), 500
+
+
+# API Recorrências - Encerrar (ocorrências já gravadas permanecem)
+@bp.route('/api/recorrencias/<int:id>', methods=['DELETE'])
+@login_required
+def api_recorrencias_delete(id):
+    try:
+        regra = RegraRecorrencia.query.filter_by(id=id, usuario_id=current_user.id).first()
+        if not regra:
+            return jsonify({'success': False, 'message': 'Recorrência não encontrada'}), 404
+        
+        regra.ativa = False
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Recorrência encerrada com sucesso!'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao encerrar recorrência: {str(e)}'}), 400
+
+
+# API Recorrências - Editar uma ocorrência projetada (grava a ocorrência e aplica a edição)
+@bp.route('/api/recorrencias/<int:id>/ocorrencias/<data>', methods=['PUT'])
+@login_required
+def api_recorrencias_ocorrencia_put(id, data):
+    try:
+        regra = RegraRecorrencia.query.filter_by(id=id, usuario_id=current_user.id, ativa=True).first()
+        if not regra:
+            return jsonify({'success': False, 'message': 'Recorrência não encontrada'}), 404
+        
+        try:
+            data = datetime.strptime(data, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Data inválida. Use o formato YYYY-MM-DD'}), 400
+        
+        # A ocorrência gravada e a edição entram no mesmo commit; edição recusada não deixa linha
+        transacao = materializar_ocorrencia(regra, data)
+        if not transacao:
+            return jsonify({'success': False, 'message': 'Ocorrência não encontrada'}), 404
+        
+        erro = _aplicar_edicao(transacao, request.json)
+        if erro:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': erro}), 400
+        
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Ocorrência atualizada com sucesso!', 'id': transacao.id})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao editar ocorrência: {str(e)}'}), 400
+
+
+# API Notificações - Feed de contas vencidas e a vencer (paginação por cursor)
+@bp.route('/api/notificacoes', methods=['GET'])
+@login_required
+@orcamento_consultas(4)
+def api_notificacoes_get():
+    try:
+        try:
+            cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+            limite = min(max(int(request.args.get('limite', 20)), 1), 100)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Parâmetros de paginação inválidos'}), 400
+        
+        apenas_nao_lidas = request.args.get('nao_lidas') in ('1', 'true')
+        itens, proximo_cursor = notificacoes.listar(current_user.id, cursor, limite, apenas_nao_lidas)
+        
+        return jsonify({
+            'success': True,
+            'notificacoes': [{
+                'id': n.id,
+                'transacao_id': n.transacao_id,
+                'tipo': n.tipo,
+                'mensagem': n.mensagem,
+                'valor': n.valor,
+                'data_vencimento': n.data_vencimento.isoformat() if n.data_vencimento else None,
+                'lida': n.lida,
+                'data_criacao': n.data_criacao.isoformat() if n.data_criacao else None
+            } for n in itens],
+            'nao_lidas': notificacoes.contar_nao_lidas(current_user.id),
+            'proximo_cursor': proximo_cursor
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao buscar notificações: {str(e)}'}), 500
+
+
+# API Notificações - Marcar como lidas (lista de ids ou todas)
+@bp.route('/api/notificacoes/lidas', methods=['POST'])
+@login_required
+def api_notificacoes_lidas():
+    try:
+        dados = request.json or {}
+        ids = None
+        if not dados.get('todas'):
+            ids = dados.get('ids')
+            if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                return jsonify({'success': False, 'message': 'Informe a lista de ids ou todas=true'}), 400
+        
+        alteradas = notificacoes.marcar_lidas(current_user.id, ids)
+        return jsonify({'success': True, 'message': f'{alteradas} notificação(ões) marcada(s) como lida(s).'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao marcar notificações: {str(e)}'}), 400
@@ -0,0 +1,71 @@
+"""
+Serialização Compacta de Listas
+Listas grandes (ex.: /api/transacoes com limite=1000) são lidas como tuplas só
+com as colunas da API, sem montar objetos ORM nem passar pelo identity map, e
+codificadas com orjson quando instalado (`pip install orjson`); sem ele, usa o
+json da biblioteca padrão em modo compacto.
+
+Formatos de lista (parâmetro `formato`):
+- objetos (padrão): [{"id": 1, "descricao": "...", ...}, ...]
+- colunar: {"campos": ["id", "descricao", ...], "linhas": [[1, "...", ...], ...]}
+  Os nomes dos campos vão uma vez só; ocorrências projetadas têm id null.
+"""
+import json
+from datetime import date
+
+from flask import current_app
+
+from models import Transacao
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+FORMATOS = ('objetos', 'colunar')
+
+# Mesma ordem e nomes de transacao_para_dict
+CAMPOS_TRANSACAO = (
+    'id', 'descricao', 'valor', 'data', 'data_vencimento', 'categoria', 'tipo',
+    'status', 'fornecedor', 'forma_pagamento', 'observacoes', 'recorrencia_id',
+    'duplicata_de'
+)
+COLUNAS_TRANSACAO = tuple(getattr(Transacao, campo) for campo in CAMPOS_TRANSACAO)
+
+
+# ========== LINHAS ==========
+def linha_para_dict(linha):
+    """Linha (tupla) de COLUNAS_TRANSACAO no formato objeto; datas ficam para o codificador"""
+    return dict(zip(CAMPOS_TRANSACAO, linha))
+
+
+def linha_para_lista(linha):
+    return tuple(linha)
+
+
+def colunar(itens, campos=CAMPOS_TRANSACAO):
+    """Agrupa linhas (tuplas) e dicts já montados (ex.: ocorrências projetadas) no formato colunar"""
+    return {
+        'campos': campos,
+        'linhas': [item if isinstance(item, tuple) else tuple(item.get(c) for c in campos) for item in itens]
+    }
+
+
+# ========== CODIFICAÇÃO ==========
+def _padrao(valor):
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f'Tipo não serializável: {type(valor).__name__}')
+
+
+def codificar(dados):
+    """Codifica em JSON compacto (bytes UTF-8); datas viram AAAA-MM-DD"""
+    if orjson is not None:
+        return orjson.dumps(dados)
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':'), default=_padrao).encode('utf-8')
+
+
+def resposta_json(dados, status=200):
+    """Equivalente a jsonify usando o codificador rápido"""
+    return current_app.response_class(codificar(dados), status=status, mimetype='application/json')
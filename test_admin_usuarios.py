@@ -0,0 +1,60 @@
+"""
+Listagem de Usuários do Admin
+Filtros exatos, busca, paginação estável por nome e projeção de colunas em
+GET /api/admin/usuarios.
+"""
+import itertools
+
+import pytest
+
+from conftest import criar_usuario
+
+
+_departamentos = itertools.count(1)
+
+
+@pytest.fixture
+def departamento(app):
+    """Departamento exclusivo do teste, com cinco usuários (um gerente, um inativo)"""
+    nome = f'departamento-{next(_departamentos)}'
+    for i, (perfil, status) in enumerate((('usuario', 'ativo'), ('gerente', 'ativo'), ('usuario', 'inativo'),
+                                          ('usuario', 'ativo'), ('usuario', 'ativo'))):
+        criar_usuario(app, nome=f'{nome} pessoa {5 - i}', departamento=nome, perfil=perfil, status=status)
+    return nome
+
+
+def _listar(cliente, **parametros):
+    resposta = cliente.get('/api/admin/usuarios', query_string=parametros)
+    return resposta.status_code, resposta.get_json()
+
+
+def test_paginas_cobrem_o_filtro_em_ordem_de_nome(cliente_admin, departamento):
+    vistos = []
+    for pagina in (1, 2, 3):
+        status, dados = _listar(cliente_admin, departamento=departamento, limite=2, pagina=pagina)
+        assert status == 200
+        assert (dados['total'], dados['paginas'], dados['pagina_atual']) == (5, 3, pagina)
+        vistos += [u['nome'] for u in dados['usuarios']]
+
+    assert vistos == [f'{departamento} pessoa {n}' for n in range(1, 6)]
+    assert _listar(cliente_admin, departamento=departamento, limite=2, pagina=4)[1]['usuarios'] == []
+
+
+def test_filtros_busca_e_campos(cliente_admin, departamento):
+    _, gerentes = _listar(cliente_admin, departamento=departamento, perfil='gerente')
+    assert [u['nome'] for u in gerentes['usuarios']] == [f'{departamento} pessoa 4']
+
+    _, ativos = _listar(cliente_admin, departamento=departamento, status='ativo', perfil='todos')
+    assert ativos['total'] == 4
+
+    _, busca = _listar(cliente_admin, busca=f'{departamento} PESSOA 2')
+    assert [u['nome'] for u in busca['usuarios']] == [f'{departamento} pessoa 2']
+
+    _, projetados = _listar(cliente_admin, departamento=departamento, campos='nome,email', limite=1)
+    assert set(projetados['usuarios'][0]) == {'id', 'nome', 'email'}
+
+
+def test_parametros_invalidos_e_acesso(cliente, cliente_admin):
+    for parametros in ({'pagina': 0}, {'limite': 500}, {'limite': 'abc'}, {'campos': 'nome,senha_hash'}):
+        assert _listar(cliente_admin, **parametros)[0] == 400, parametros
+    assert cliente.get('/api/admin/usuarios').status_code == 302  # não admin volta ao dashboard
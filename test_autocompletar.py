@@ -0,0 +1,51 @@
+"""
+Autocompletar
+O filtro de campo vale antes da escolha dos candidatos, e escritas de outro worker
+são vistas pelo carimbo de versão do usuário.
+"""
+from datetime import date
+
+import autocompletar
+from conftest import gravar_por_fora
+
+
+HOJE = date.today()
+
+
+def _lancar(cliente, descricao, fornecedor):
+    cliente.post('/api/transacoes', json={
+        'descricao': descricao, 'valor': '10', 'data': HOJE.isoformat(), 'categoria': 'operacionais',
+        'fornecedor': fornecedor
+    })
+
+
+def _sugestoes(cliente, q, **parametros):
+    resposta = cliente.get('/api/transacoes/autocompletar', query_string={'q': q, **parametros})
+    return [s['texto'] for s in resposta.get_json()['sugestoes']]
+
+
+def test_filtro_de_campo_nao_perde_o_fornecedor_para_descricoes(cliente):
+    # Mais descrições que vagas de candidatos, todas com mais trigramas em comum que o fornecedor
+    for i in range(autocompletar.CANDIDATOS + 8):
+        _lancar(cliente, f'Kalunga compra {i}', 'Loja')
+    _lancar(cliente, 'Outra coisa', 'Kalunga')
+
+    assert _sugestoes(cliente, 'kalunga compra', campo='fornecedor') == ['Kalunga']
+    assert 'Kalunga' not in _sugestoes(cliente, 'kalunga compra', campo='descricao')
+
+
+def test_escrita_de_outro_worker_invalida_pelo_carimbo(app, cliente, usuario_id, monkeypatch):
+    _lancar(cliente, 'Material', 'Papelaria Central')
+    assert _sugestoes(cliente, 'papelaria') == ['Papelaria Central']
+
+    gravar_por_fora(app, usuario_id, valor=40, data=HOJE, categoria='operacionais', fornecedor='Papelaria Norte')
+
+    assert _sugestoes(cliente, 'papelaria') == ['Papelaria Central']  # dentro do intervalo de verificação
+    monkeypatch.setitem(app.config, 'VERSOES_VERIFICACAO', 0)
+    assert sorted(_sugestoes(cliente, 'papelaria')) == ['Papelaria Central', 'Papelaria Norte']
+
+    # Escrita local avança a versão do índice junto com o carimbo: continua valendo
+    _lancar(cliente, 'Material', 'Papelaria Sul')
+    entrada = autocompletar._cache[usuario_id]
+    assert len(_sugestoes(cliente, 'papelaria')) == 3
+    assert autocompletar._cache[usuario_id] is entrada
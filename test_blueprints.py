@@ -0,0 +1,38 @@
+"""
+Blueprints por Implantação
+Cada pool importa só as áreas da API habilitadas e os subsistemas delas. Roda em
+outro processo: a sessão de testes já importou tudo.
+"""
+import json
+import os
+import subprocess
+import sys
+
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+SUBSISTEMAS = ('arquivamento', 'comparativos', 'perfilador', 'duplicatas', 'autocompletar', 'rotas.admin')
+
+
+def _carregados(tmp_path, blueprints):
+    codigo = (
+        'import json, sys\n'
+        'from app import create_app\n'
+        'app = create_app(inicializar=False)\n'
+        f'print(json.dumps([sorted(app.blueprints), [m for m in {SUBSISTEMAS!r} if m in sys.modules]]))\n'
+    )
+    ambiente = {**os.environ, 'BLUEPRINTS': blueprints, 'DATABASE_URL': f'sqlite:///{tmp_path / "pool.db"}'}
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, env=ambiente,
+                           capture_output=True, text=True, check=True).stdout
+    return json.loads(saida.splitlines()[-1])
+
+
+def test_pool_de_transacoes_nao_carrega_as_outras_areas(tmp_path):
+    blueprints, carregados = _carregados(tmp_path, 'transacoes')
+    assert blueprints == ['transacoes']
+    assert carregados == ['duplicatas', 'autocompletar']
+
+
+def test_pool_de_administracao_carrega_o_arquivamento(tmp_path):
+    blueprints, carregados = _carregados(tmp_path, 'relatorios,admin')
+    assert blueprints == ['admin', 'relatorios']
+    assert carregados == ['arquivamento', 'perfilador', 'rotas.admin']
@@ -0,0 +1,51 @@
+"""
+Sugestão de Categoria
+As contagens acompanham as escritas pelo ORM; a consulta nunca grava, e histórico
+gravado por fora só entra pelo `categorias reconstruir`.
+"""
+from datetime import date
+
+import categorizacao
+from conftest import gravar_por_fora
+
+
+HOJE = date.today()
+
+
+def _sugestoes(cliente, descricao, fornecedor=None):
+    resposta = cliente.get('/api/categorias/sugestao', query_string={
+        'descricao': descricao, **({'fornecedor': fornecedor} if fornecedor else {})
+    })
+    assert resposta.status_code == 200
+    return [s['categoria'] for s in resposta.get_json()['sugestoes']]
+
+
+def test_escritas_pelo_orm_ensinam_a_categoria(cliente):
+    for descricao in ('Conta de energia', 'Energia elétrica sede'):
+        cliente.post('/api/transacoes', json={
+            'descricao': descricao, 'valor': '300', 'data': HOJE.isoformat(), 'categoria': 'fixas',
+            'fornecedor': 'Companhia Elétrica'
+        })
+    assert _sugestoes(cliente, 'energia loja') == ['fixas']
+
+
+def test_consulta_nao_reconstroi_o_historico(app, cliente, usuario_id):
+    from models import FrequenciaCategoria
+
+    for i in range(3):
+        gravar_por_fora(app, usuario_id, descricao=f'Anúncio patrocinado {i}', valor=50, data=HOJE,
+                        categoria='marketing')
+
+    def frequencias():
+        with app.app_context():
+            return FrequenciaCategoria.query.filter_by(usuario_id=usuario_id).count()
+
+    assert _sugestoes(cliente, 'anuncio') == []
+    assert _sugestoes(cliente, 'anuncio') == []
+    assert frequencias() == 0
+    assert usuario_id in categorizacao._cache  # o índice vazio também fica em cache
+
+    with app.app_context():
+        assert categorizacao.reconstruir_usuario(usuario_id) == 3
+    assert frequencias() > 0
+    assert _sugestoes(cliente, 'anuncio') == ['marketing']
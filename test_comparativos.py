@@ -0,0 +1,50 @@
+"""
+Cache dos Comparativos por Período
+Escritas locais descartam só as entradas do mês alterado; escritas de outro worker
+são vistas pelo carimbo de versão do usuário.
+"""
+from datetime import date
+
+import comparativos
+from conftest import gravar_por_fora
+
+
+HOJE = date.today()
+
+
+def _despesas(cliente, url='/api/analise/comparativo?dimensao=tipo'):
+    series = cliente.get(url).get_json()['dimensoes']['tipo']
+    return next((s['total'] for s in series if s['chave'] == 'despesa'), 0)
+
+
+def _lancar(cliente, valor):
+    return cliente.post('/api/transacoes', json={
+        'descricao': 'Material', 'valor': str(valor), 'data': HOJE.isoformat(), 'categoria': 'operacionais'
+    }).get_json()['id']
+
+
+def test_escrita_local_descarta_so_o_mes_alterado(cliente, usuario_id):
+    _lancar(cliente, 100)
+    assert _despesas(cliente) == 100
+    passado = '/api/analise/comparativo?dimensao=tipo&inicio=2001-01&fim=2001-12'
+    assert _despesas(cliente, passado) == 0
+    versao = comparativos._cache[usuario_id]['versao']
+
+    _lancar(cliente, 30)
+
+    do_usuario = comparativos._cache[usuario_id]
+    assert do_usuario['versao'] == versao + 1
+    assert len(do_usuario['entradas']) == 1  # só a de 2001 continua valendo
+    assert _despesas(cliente) == 130
+
+
+def test_escrita_de_outro_worker_invalida_pelo_carimbo(app, cliente, usuario_id, monkeypatch):
+    _lancar(cliente, 100)
+    assert _despesas(cliente) == 100
+
+    gravar_por_fora(app, usuario_id, valor=40, data=HOJE, categoria='operacionais')
+
+    monkeypatch.setitem(app.config, 'VERSOES_VERIFICACAO', 3600)
+    assert _despesas(cliente) == 100
+    monkeypatch.setitem(app.config, 'VERSOES_VERIFICACAO', 0)
+    assert _despesas(cliente) == 140
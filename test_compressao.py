@@ -0,0 +1,67 @@
+"""
+Compressão de Respostas
+Negociação pelo Accept-Encoding (gzip sempre disponível; zstd e brotli são
+opcionais), respostas pequenas sem compressão, streams comprimidos por pedaço e
+arquivos estáticos pré-comprimidos.
+"""
+import gzip
+import json
+from datetime import date
+
+import compressao
+
+
+def _lancamentos(cliente, quantidade=20):
+    for i in range(quantidade):
+        cliente.post('/api/transacoes', json={
+            'descricao': f'Material de escritório {i}', 'valor': '35.90', 'data': date.today().isoformat(),
+            'categoria': 'operacionais', 'fornecedor': 'Papelaria XYZ'
+        })
+
+
+def test_negociacao_pelo_accept_encoding(cliente):
+    _lancamentos(cliente)
+    url = '/api/transacoes?limite=50'
+
+    comprimida = cliente.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in comprimida.headers['Vary']
+    dados = json.loads(gzip.decompress(comprimida.data))
+    assert len(dados['despesas']) == 20
+
+    for cabecalho in ({}, {'Accept-Encoding': 'identity'}, {'Accept-Encoding': 'gzip;q=0'}):
+        resposta = cliente.get(url, headers=cabecalho)
+        assert 'Content-Encoding' not in resposta.headers, cabecalho
+        assert resposta.get_json() == dados
+
+
+def test_resposta_pequena_sai_como_esta(cliente):
+    resposta = cliente.get('/api/fornecedores', headers={'Accept-Encoding': 'gzip'})
+    assert len(resposta.data) < 1024
+    assert 'Content-Encoding' not in resposta.headers
+    assert 'Accept-Encoding' in resposta.headers['Vary']
+
+
+def test_stream_comprimido_por_pedaco(cliente_admin):
+    resposta = cliente_admin.get('/api/auditoria/exportar?dias=30&formato=csv', headers={'Accept-Encoding': 'gzip'})
+    assert resposta.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in resposta.headers
+    assert gzip.decompress(resposta.data).decode().splitlines()[0].startswith('ID,')
+
+
+def test_estatico_pre_comprimido(app, cliente, tmp_path, monkeypatch):
+    conteudo = 'body { color: #333; }\n' * 200
+    (tmp_path / 'tema.css').write_text(conteudo)
+    (tmp_path / 'pequeno.css').write_text('a {}\n')
+    assert compressao.precomprimir([str(tmp_path)]) == len(compressao.codificacoes_disponiveis())
+    assert compressao.precomprimir([str(tmp_path)]) == 0  # variantes em dia não são refeitas
+    monkeypatch.setattr(app, 'static_folder', str(tmp_path))
+
+    resposta = cliente.get('/static/tema.css', headers={'Accept-Encoding': 'gzip'})
+    assert (resposta.headers['Content-Encoding'], resposta.mimetype) == ('gzip', 'text/css')
+    assert gzip.decompress(resposta.data).decode() == conteudo
+    resposta.close()
+
+    resposta = cliente.get('/static/tema.css')
+    assert 'Content-Encoding' not in resposta.headers and resposta.data.decode() == conteudo
+    resposta.close()
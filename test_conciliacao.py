@@ -0,0 +1,80 @@
+"""
+Conciliação Bancária
+Cada linha do extrato casa com uma transação em aberto do mesmo valor dentro da
+janela de datas; as casadas viram pagas (a menos que aplicar=false).
+"""
+import io
+from datetime import date, timedelta
+
+
+HOJE = date.today()
+
+
+def _aberta(cliente, descricao, valor, dias=0, tipo='despesa'):
+    data = (HOJE + timedelta(days=dias)).isoformat()
+    return cliente.post('/api/transacoes', json={
+        'descricao': descricao, 'valor': str(valor), 'data': data, 'data_vencimento': data,
+        'categoria': 'fixas' if tipo == 'despesa' else 'vendas', 'tipo': tipo, 'status': 'pendente'
+    }).get_json()['id']
+
+
+def _status(cliente, id):
+    return cliente.get(f'/api/transacoes/{id}').get_json()['transacao']['status']
+
+
+def _linha(valor, dias=0, descricao=''):
+    return {'data': (HOJE + timedelta(days=dias)).isoformat(), 'valor': valor, 'descricao': descricao}
+
+
+def test_casa_pelo_valor_dentro_da_janela_e_marca_paga(cliente):
+    luz = _aberta(cliente, 'Conta de luz', 100)
+    venda = _aberta(cliente, 'Venda balcão', 500, tipo='receita')
+
+    dados = cliente.post('/api/conciliacao', json={'linhas': [
+        _linha(-100, 1, 'PAG CONTA LUZ'),
+        _linha(500, 10, 'TED recebida'),
+        _linha(-77, 0, 'Tarifa')
+    ]}).get_json()
+
+    assert [(c['linha'], c['transacao_id'], c['diferenca_dias']) for c in dados['conciliadas']] == [(1, luz, -1)]
+    assert [(n['linha'], n['motivo']) for n in dados['nao_conciliadas']] == [
+        (2, 'fora_da_janela'), (3, 'valor_nao_encontrado')]
+    assert dados['transacoes_sem_extrato'] == [venda]
+    assert dados['marcadas_pagas'] == 1
+    assert (_status(cliente, luz), _status(cliente, venda)) == ('pago', 'pendente')
+
+
+def test_cada_transacao_casa_com_uma_linha_so(cliente):
+    aluguel = _aberta(cliente, 'Aluguel sala', 1500)
+    internet = _aberta(cliente, 'Internet', 1500, dias=2)
+
+    dados = cliente.post('/api/conciliacao', json={'aplicar': False, 'linhas': [
+        _linha(-1500, 2, 'Internet fibra'),
+        _linha(-1500, 0, 'Aluguel'),
+        _linha(-1500, 1, 'Aluguel')
+    ]}).get_json()
+
+    assert {c['linha']: c['transacao_id'] for c in dados['conciliadas']} == {1: internet, 2: aluguel}
+    assert [n['motivo'] for n in dados['nao_conciliadas']] == ['fora_da_janela']
+    assert dados['marcadas_pagas'] == 0
+    assert _status(cliente, aluguel) == 'pendente'
+
+
+def test_extrato_csv_em_formato_brasileiro(cliente):
+    id = _aberta(cliente, 'Fornecedor de papel', '1234.56')
+    csv = f'Data;Descrição;Valor\n{HOJE:%d/%m/%Y};Papelaria;-1.234,56\n'.encode()
+
+    dados = cliente.post('/api/conciliacao', data={'arquivo': (io.BytesIO(csv), 'extrato.csv')},
+                         content_type='multipart/form-data').get_json()
+
+    assert [c['transacao_id'] for c in dados['conciliadas']] == [id]
+    assert _status(cliente, id) == 'pago'
+
+
+def test_extrato_invalido(cliente):
+    assert cliente.post('/api/conciliacao', json={'linhas': []}).status_code == 400
+    assert cliente.post('/api/conciliacao', json={'linhas': [_linha('abc')]}).status_code == 400
+    assert cliente.post('/api/conciliacao', json={'linhas': [_linha(-10)], 'janela_dias': 99}).status_code == 400
+    csv = io.BytesIO(b'quando,quanto\n2024-01-01,10\n')
+    assert cliente.post('/api/conciliacao', data={'arquivo': (csv, 'extrato.csv')},
+                        content_type='multipart/form-data').status_code == 400
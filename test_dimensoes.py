@@ -0,0 +1,124 @@
+"""
+Dimensões de Categoria, Fornecedor e Forma de Pagamento
+Variações do mesmo texto caem numa chave só, filtros e edições passam pela chave,
+a migração troca as colunas de texto antigas pelas chaves, o ranking não grava nada
+e fornecedores que só existem nos arquivos frios ganham chave pelo comando.
+"""
+from datetime import date, timedelta
+
+
+HOJE = date.today()
+ANTIGA = date(HOJE.year - 2, 3, 10)
+
+
+def _lancar(cliente, fornecedor, valor, dias=0):
+    return cliente.post('/api/transacoes', json={
+        'descricao': 'Compra', 'valor': str(valor), 'data': (HOJE - timedelta(days=dias)).isoformat(),
+        'categoria': 'operacionais', 'fornecedor': fornecedor, 'status': 'pago'
+    }).get_json()['id']
+
+
+def _fornecedores(app, usuario_id):
+    from models import Fornecedor
+
+    with app.app_context():
+        return Fornecedor.query.filter_by(usuario_id=usuario_id).count()
+
+
+def test_variacoes_do_texto_agrupam_na_mesma_chave(cliente):
+    _lancar(cliente, 'Empresa A', 100)
+    _lancar(cliente, 'empresa a.', 50, dias=3)
+    _lancar(cliente, 'EMPRESA  A', 25, dias=400)  # fora do período padrão
+    _lancar(cliente, 'Papelaria B', 80)
+
+    lista = cliente.get('/api/fornecedores').get_json()['fornecedores']
+    assert [(f['nome'], f['transacoes']) for f in lista] == [('Empresa A', 3), ('Papelaria B', 1)]
+    assert [f['nome'] for f in cliente.get('/api/fornecedores?busca=papel').get_json()['fornecedores']] == [
+        'Papelaria B']
+
+    dados = cliente.get('/api/fornecedores/ranking').get_json()
+    assert [(f['nome'], f['total'], f['transacoes']) for f in dados['fornecedores']] == [
+        ('Empresa A', 150, 2), ('Papelaria B', 80, 1)]
+    assert dados['total'] == 230
+    assert cliente.get('/api/fornecedores/ranking?limite=0').status_code == 400
+    assert cliente.get('/api/fornecedores/ranking?inicio=ontem').status_code == 400
+
+
+def test_categoria_e_edicao_pela_chave(app, cliente, usuario_id):
+    from models import Categoria
+
+    id = _lancar(cliente, 'Empresa A', 100)
+    _lancar(cliente, 'Empresa A', 30)
+    cliente.put(f'/api/transacoes/{id}', json={'categoria': ' fixas', 'fornecedor': 'Gráfica C'})
+
+    listar = lambda **filtros: cliente.get('/api/transacoes', query_string=filtros).get_json()['despesas']
+    assert [(t['categoria'], t['fornecedor']) for t in listar(categoria='fixas')] == [('fixas', 'Gráfica C')]
+    assert len(listar(categoria='operacionais')) == 1
+    assert listar(categoria='nenhuma') == []
+    assert [t['fornecedor'] for t in listar(busca='gráfica')] == ['Gráfica C']
+    with app.app_context():
+        assert sorted(c.nome for c in Categoria.query.filter_by(usuario_id=usuario_id)) == ['fixas', 'operacionais']
+
+
+def test_migracao_troca_os_textos_pelas_chaves(tmp_path):
+    from extensions import db
+    from migracoes import atualizar_esquema
+    from models import Categoria, Fornecedor, FormaPagamento, Transacao
+
+    # Tabela no formato anterior às dimensões: os textos repetidos em cada linha
+    engine = db.create_engine(f'sqlite:///{tmp_path / "antigo.db"}')
+    with engine.begin() as conexao:
+        conexao.exec_driver_sql(
+            'CREATE TABLE transacoes (id INTEGER PRIMARY KEY, descricao VARCHAR(200), valor FLOAT, data DATE, '
+            'categoria VARCHAR(50), tipo VARCHAR(20), status VARCHAR(20), fornecedor VARCHAR(100), '
+            'forma_pagamento VARCHAR(50), usuario_id INTEGER)'
+        )
+        conexao.exec_driver_sql(
+            'INSERT INTO transacoes (descricao, valor, data, categoria, tipo, status, fornecedor, forma_pagamento, '
+            "usuario_id) VALUES ('a', 10, '2024-01-05', 'fixas', 'despesa', 'pago', 'Empresa A', 'PIX', 1), "
+            "('b', 20, '2024-01-06', 'fixas', 'despesa', 'pago', 'empresa a.', NULL, 1), "
+            "('c', 30, '2024-01-07', 'fixas', 'despesa', 'pago', 'Empresa A', 'pix', 2)"
+        )
+    db.metadata.create_all(engine, tables=[Categoria.__table__, Fornecedor.__table__, FormaPagamento.__table__])
+    atualizar_esquema(engine, [Transacao.__table__])
+
+    colunas = {c['name'] for c in db.inspect(engine).get_columns('transacoes')}
+    assert not colunas & {'categoria', 'fornecedor', 'forma_pagamento'}
+    with engine.connect() as conexao:
+        linhas = conexao.exec_driver_sql(
+            'SELECT t.usuario_id, c.nome, f.nome, p.nome FROM transacoes t JOIN categorias c ON c.id = t.categoria_id '
+            'JOIN fornecedores f ON f.id = t.fornecedor_id LEFT JOIN formas_pagamento p ON p.id = t.forma_pagamento_id '
+            'ORDER BY t.id'
+        ).all()
+    assert [tuple(linha) for linha in linhas] == [
+        (1, 'fixas', 'Empresa A', 'PIX'), (1, 'fixas', 'Empresa A', None), (2, 'fixas', 'Empresa A', 'pix')]
+    atualizar_esquema(engine, [Transacao.__table__])  # de novo: nada a migrar
+    engine.dispose()
+
+
+def test_ranking_com_arquivo_nao_grava_e_migracao_cria_a_chave(app, cliente, usuario_id):
+    import arquivamento
+    import dimensoes
+
+    _lancar(cliente, 'Empresa A', 100, dias=(HOJE - ANTIGA).days)
+    with app.app_context():
+        assert arquivamento.arquivar_usuario(usuario_id, date(HOJE.year - 1, 1, 1)) == 1
+        # Linha arquivada antes das dimensões: só o texto, sem chave
+        destino = arquivamento.caminho(usuario_id, ANTIGA.year)
+        linhas = arquivamento.abrir(usuario_id, ANTIGA.year).todas()
+        arquivamento.gravar_colunas(destino, linhas + [dict(
+            linhas[0], id=linhas[0]['id'] + 10 ** 6, descricao='Antiga', valor=40.0, fornecedor='Gráfica C',
+            fornecedor_id=None
+        )])
+
+    antes = _fornecedores(app, usuario_id)
+    url = f'/api/fornecedores/ranking?inicio={ANTIGA.year}-01-01'
+    ranking = cliente.get(url).get_json()['fornecedores']
+    assert [(f['nome'], f['total']) for f in ranking] == [('Empresa A', 100), ('Gráfica C', 40)]
+    assert ranking[0]['id'] is not None and ranking[1]['id'] is None
+    assert _fornecedores(app, usuario_id) == antes
+
+    with app.app_context():
+        dimensoes.codificar_arquivos()
+    assert _fornecedores(app, usuario_id) == antes + 1
+    assert all(f['id'] is not None for f in cliente.get(url).get_json()['fornecedores'])
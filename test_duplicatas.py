@@ -0,0 +1,66 @@
+"""
+Transações Duplicadas
+A gravação marca repetições exatas; a varredura agrupa quase-duplicatas e só
+compara vizinhas dentro da janela de dias.
+"""
+from datetime import date, timedelta
+
+
+HOJE = date.today()
+
+
+def _lancar(cliente, descricao, dias=0, valor='89.90', fornecedor='Vivo'):
+    return cliente.post('/api/transacoes', json={
+        'descricao': descricao, 'valor': valor, 'data': (HOJE - timedelta(days=dias)).isoformat(),
+        'categoria': 'fixas', 'fornecedor': fornecedor
+    }).get_json()
+
+
+def test_repeticao_exata_e_marcada_na_gravacao(cliente):
+    primeira = _lancar(cliente, 'Internet fibra')
+    segunda = _lancar(cliente, 'INTERNET  fibra')  # mesma impressão após normalizar
+
+    assert 'duplicata_de' not in primeira
+    assert segunda['duplicata_de'] == primeira['id']
+    assert 'duplicata_de' not in _lancar(cliente, 'Internet fibra', dias=1)
+
+
+def test_varredura_agrupa_so_dentro_da_janela(cliente):
+    a = _lancar(cliente, 'Internet fibra óptica')['id']
+    b = _lancar(cliente, 'Internet fibra optica', dias=2)['id']
+    _lancar(cliente, 'Internet fibra óptica', dias=20)
+    _lancar(cliente, 'Internet fibra óptica', valor='99.90')  # outro bloco (valor)
+
+    dados = cliente.get('/api/transacoes/duplicatas?janela_dias=3').get_json()
+
+    assert [[t['id'] for t in grupo] for grupo in dados['grupos']] == [sorted([a, b])]
+    # Ordenado por data, o bloco de 89,90 só compara o par de dias 0 e 2; o de 20 dias para o laço
+    assert dados['comparacoes'] == 1
+
+
+def test_janela_invalida(cliente):
+    assert cliente.get('/api/transacoes/duplicatas?janela_dias=999').status_code == 400
+    assert cliente.get('/api/transacoes/duplicatas?janela_dias=abc').status_code == 400
+
+
+def test_importacao_em_lote_marca_repeticoes_do_mesmo_flush(app, usuario_id):
+    from extensions import db
+    from models import Transacao
+
+    def linha(descricao, valor=250.0):
+        return Transacao(descricao=descricao, valor=valor, data=HOJE, categoria='operacionais', tipo='despesa',
+                         status='pago', fornecedor='Gráfica', usuario_id=usuario_id)
+
+    with app.app_context():
+        lote = [linha('Cartões de visita'), linha('Panfletos'), linha('CARTÕES DE VISITA'),
+                linha('Cartões de visita.'), linha('Cartões de visita', 99.0)]
+        db.session.add_all(lote)
+        db.session.commit()
+        primeira = lote[0].id
+        assert [t.duplicata_de for t in lote] == [None, None, primeira, primeira, None]
+
+        # Lote seguinte: a repetição de uma já gravada aponta para ela, não para a do lote
+        novo = [linha('Panfletos'), linha('Panfletos')]
+        db.session.add_all(novo)
+        db.session.commit()
+        assert [t.duplicata_de for t in novo] == [lote[1].id, lote[1].id]
@@ -0,0 +1,33 @@
+"""
+Stream SSE (/api/eventos)
+Cada stream prende uma thread do worker: o processo recusa conexões acima de
+EVENTOS_MAX_CONEXOES e cada stream termina depois de EVENTOS_DURACAO_MAXIMA.
+"""
+from conftest import criar_usuario, entrar
+
+
+def test_conexoes_acima_do_limite_recebem_503(app, cliente, monkeypatch):
+    monkeypatch.setitem(app.config, 'EVENTOS_MAX_CONEXOES', 1)
+    outro = entrar(app.test_client(), criar_usuario(app))
+
+    aberta = cliente.get('/api/eventos', buffered=False)
+    assert aberta.status_code == 200
+
+    recusada = outro.get('/api/eventos')
+    assert recusada.status_code == 503
+    assert recusada.headers['Retry-After']
+
+    # Fechar o stream (mesmo antes do primeiro evento) libera a vaga
+    aberta.close()
+    liberada = outro.get('/api/eventos', buffered=False)
+    assert liberada.status_code == 200
+    liberada.close()
+
+
+def test_stream_termina_na_duracao_maxima(app, cliente, monkeypatch):
+    monkeypatch.setitem(app.config, 'EVENTOS_DURACAO_MAXIMA', 0.2)
+
+    corpo = cliente.get('/api/eventos').get_data(as_text=True)
+
+    assert corpo.startswith('retry: 5000')
+    assert 'event: estatisticas' in corpo
@@ -0,0 +1,118 @@
+"""
+Notificações de Vencimento
+Varredura (avisos que deixam de valer saem), feed paginado por cursor, marcação
+de lidas e a trava que elege um único processo para varrer.
+"""
+from datetime import date, timedelta
+
+import notificacoes
+from conftest import criar_usuario, entrar
+
+
+HOJE = date.today()
+
+
+def _conta(cliente, vencimento, descricao='Aluguel'):
+    return cliente.post('/api/transacoes', json={
+        'descricao': descricao, 'valor': '100', 'data': HOJE.isoformat(),
+        'data_vencimento': vencimento.isoformat(), 'categoria': 'fixas'
+    }).get_json()['id']
+
+
+def _varrer(app, usuario_id, hoje=HOJE):
+    with app.app_context():
+        notificacoes.varrer_usuario(usuario_id, hoje)
+
+
+def _feed(cliente, **parametros):
+    return cliente.get('/api/notificacoes', query_string=parametros).get_json()
+
+
+def test_a_vencer_vira_vencida_sem_deixar_o_aviso_antigo(app, cliente, usuario_id):
+    _conta(cliente, HOJE + timedelta(days=1))
+    _varrer(app, usuario_id)
+    assert [n['tipo'] for n in _feed(cliente)['notificacoes']] == ['a_vencer']
+
+    _varrer(app, usuario_id, HOJE + timedelta(days=2))
+    assert [n['tipo'] for n in _feed(cliente)['notificacoes']] == ['vencida']
+
+
+def test_vencimento_alterado_substitui_o_aviso(app, cliente, usuario_id):
+    id = _conta(cliente, HOJE + timedelta(days=2))
+    _varrer(app, usuario_id)
+
+    cliente.put(f'/api/transacoes/{id}', json={'data_vencimento': (HOJE + timedelta(days=30)).isoformat()})
+    _varrer(app, usuario_id)
+    assert _feed(cliente)['notificacoes'] == []
+
+    novo = HOJE + timedelta(days=1)
+    cliente.put(f'/api/transacoes/{id}', json={'data_vencimento': novo.isoformat(), 'valor': '120'})
+    _varrer(app, usuario_id)
+    aviso, = _feed(cliente)['notificacoes']
+    assert (aviso['data_vencimento'], aviso['valor'], aviso['lida']) == (novo.isoformat(), 120, False)
+
+
+def test_aviso_que_continua_valendo_mantem_lida(app, cliente, usuario_id):
+    _conta(cliente, HOJE + timedelta(days=1))
+    _varrer(app, usuario_id)
+    cliente.post('/api/notificacoes/lidas', json={'todas': True})
+
+    _varrer(app, usuario_id)
+
+    assert [n['lida'] for n in _feed(cliente)['notificacoes']] == [True]
+
+
+def test_feed_paginado_por_cursor(app, cliente, usuario_id):
+    for i in range(5):
+        _conta(cliente, HOJE - timedelta(days=i), descricao=f'Conta {i}')
+    _varrer(app, usuario_id)
+
+    vistos, cursor = [], None
+    while True:
+        pagina = _feed(cliente, limite=2, **({'cursor': cursor} if cursor else {}))
+        assert len(pagina['notificacoes']) <= 2
+        vistos += [n['id'] for n in pagina['notificacoes']]
+        cursor = pagina['proximo_cursor']
+        if cursor is None:
+            break
+
+    assert len(vistos) == len(set(vistos)) == 5
+    assert vistos == sorted(vistos, reverse=True)
+    assert _feed(cliente)['nao_lidas'] == 5
+    assert cliente.get('/api/notificacoes?limite=abc').status_code == 400
+
+
+def test_marcar_lidas_por_id_e_todas(app, cliente, usuario_id):
+    for i in range(3):
+        _conta(cliente, HOJE - timedelta(days=i))
+    _varrer(app, usuario_id)
+    ids = [n['id'] for n in _feed(cliente)['notificacoes']]
+
+    # Notificações de outro usuário não são alteradas
+    outro_id = criar_usuario(app)
+    outro = entrar(app.test_client(), outro_id)
+    _conta(outro, HOJE)
+    _varrer(app, outro_id)
+    assert outro.post('/api/notificacoes/lidas', json={'ids': ids}).status_code == 200
+    assert _feed(cliente)['nao_lidas'] == 3
+
+    assert cliente.post('/api/notificacoes/lidas', json={'ids': ids[:1]}).status_code == 200
+    assert _feed(cliente)['nao_lidas'] == 2
+    assert [n['id'] for n in _feed(cliente, nao_lidas=1)['notificacoes']] == ids[1:]
+
+    assert cliente.post('/api/notificacoes/lidas', json={'todas': True}).status_code == 200
+    assert _feed(cliente)['nao_lidas'] == 0
+    assert _feed(outro)['nao_lidas'] == 1
+    assert cliente.post('/api/notificacoes/lidas', json={'ids': 'todas'}).status_code == 400
+
+
+def test_trava_elege_um_unico_processo(contexto):
+    minuto = timedelta(minutes=1)
+    assert notificacoes.assumir_trava('teste', 'host:1', minuto)
+    assert not notificacoes.assumir_trava('teste', 'host:2', minuto)
+    assert notificacoes.assumir_trava('teste', 'host:1', minuto)  # o dono renova
+
+    # Dono que parou de renovar perde a trava quando ela vence
+    assert notificacoes.assumir_trava('teste', 'host:1', -minuto)
+    assert notificacoes.assumir_trava('teste', 'host:2', minuto)
+    assert not notificacoes.assumir_trava('teste', 'host:1', minuto)
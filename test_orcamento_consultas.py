@@ -0,0 +1,130 @@
+"""
+Orçamento de Consultas das Rotas
+Toda rota com @orcamento_consultas é chamada com o cliente de testes sobre uma base
+com transações, fornecedores, recorrências e notificações; com app.testing o
+pedido que passar do orçamento levanta OrcamentoConsultasExcedido e o teste falha.
+Uma rota nova com orçamento precisa entrar em PEDIDOS.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import criar_usuario, entrar
+from instrumentacao import OrcamentoConsultasExcedido
+
+
+HOJE = date.today()
+
+# endpoint -> [(método, url, corpo JSON)]; {id} é uma transação do usuário e {regra} uma recorrência
+PEDIDOS = {
+    'transacoes.api_estatisticas': [('GET', '/api/dashboard/estatisticas', None)],
+    'transacoes.api_transacoes_get': [
+        ('GET', '/api/transacoes', None),
+        ('GET', '/api/transacoes?formato=colunar&busca=conta', None),
+        ('GET', f'/api/transacoes?data_inicio={HOJE - timedelta(days=90)}&data_fim={HOJE + timedelta(days=90)}',
+         None),
+    ],
+    'transacoes.api_transacoes_post': [
+        # Pior caso: fornecedor e forma de pagamento que o usuário nunca usou
+        ('POST', '/api/transacoes', {
+            'descricao': 'Licença anual', 'valor': '990', 'data': HOJE.isoformat(), 'categoria': 'operacionais',
+            'fornecedor': 'Fornecedor Inédito', 'forma_pagamento': 'Cheque'
+        }),
+    ],
+    'transacoes.api_duplicatas': [('GET', '/api/transacoes/duplicatas', None)],
+    'transacoes.api_autocompletar': [
+        ('GET', '/api/transacoes/autocompletar?q=energia', None),
+        ('GET', '/api/transacoes/autocompletar?q=cemgi&campo=fornecedor', None),
+    ],
+    'transacoes.api_categorias_sugestao': [
+        ('GET', '/api/categorias/sugestao?descricao=conta de energia&fornecedor=CEMIG', None),
+        ('POST', '/api/categorias/sugestao', {'linhas': [{'descricao': 'Internet'}, {'descricao': 'Aluguel'}]}),
+    ],
+    'transacoes.api_transacoes_get_individual': [('GET', '/api/transacoes/{id}', None)],
+    'transacoes.api_transacoes_put': [
+        ('PUT', '/api/transacoes/{id}', {'valor': '321.5', 'fornecedor': 'Outro Fornecedor',
+                                        'forma_pagamento': 'Boleto Bancário'}),
+    ],
+    'transacoes.api_transacoes_delete': [('DELETE', '/api/transacoes/{id}', None)],
+    'transacoes.api_recorrencias_get': [('GET', '/api/recorrencias', None)],
+    'transacoes.api_notificacoes_get': [
+        ('GET', '/api/notificacoes', None),
+        ('GET', '/api/notificacoes?nao_lidas=1&limite=1', None),
+    ],
+    'admin.api_admin_logs': [('GET', '/api/admin/logs?dias=30', None)],
+    'admin.api_admin_usuarios': [
+        ('GET', '/api/admin/usuarios', None),
+        ('GET', '/api/admin/usuarios?perfil=admin&busca=teste&campos=id,nome', None),
+    ],
+    'analise.api_previsao_fluxo_caixa': [
+        ('GET', '/api/previsao/fluxo-caixa', None),
+        ('GET', '/api/previsao/fluxo-caixa?dias=90&granularidade=semanal', None),
+    ],
+    'analise.api_analise_comparativo': [
+        ('GET', '/api/analise/comparativo', None),
+        ('GET', '/api/analise/comparativo?granularidade=trimestral&dimensao=categoria', None),
+    ],
+    'analise.api_fornecedores': [('GET', '/api/fornecedores?busca=cemig', None)],
+    'analise.api_fornecedores_ranking': [('GET', '/api/fornecedores/ranking', None)],
+}
+
+
+@pytest.fixture
+def base(app):
+    """Admin com histórico: vários fornecedores, contas vencidas e a vencer, duas recorrências"""
+    import notificacoes
+    from extensions import db
+    from models import LogAuditoria
+
+    usuario_id = criar_usuario(app, perfil='admin')
+    cliente = entrar(app.test_client(), usuario_id)
+    ids = []
+    for i, (descricao, fornecedor, dias) in enumerate([
+        ('Conta de energia', 'CEMIG', -40), ('Conta de energia', 'CEMIG', -10), ('Internet fibra', 'Vivo', -5),
+        ('Aluguel', 'Imobiliária Centro', 2), ('Material de escritório', 'Kalunga', 20),
+    ]):
+        resposta = cliente.post('/api/transacoes', json={
+            'descricao': descricao, 'valor': str(100 + i), 'data': (HOJE + timedelta(days=dias)).isoformat(),
+            'data_vencimento': (HOJE + timedelta(days=dias)).isoformat(), 'categoria': 'fixas',
+            'fornecedor': fornecedor, 'forma_pagamento': 'Pix'
+        })
+        ids.append(resposta.get_json()['id'])
+    regras = [
+        cliente.post(f'/api/transacoes/{ids[i]}/recorrencia', json={'frequencia': 'mensal'}).get_json()['id']
+        for i in (0, 2)
+    ]
+    with app.app_context():
+        notificacoes.varrer_usuario(usuario_id)
+        db.session.add_all([LogAuditoria(acao='login', usuario_id=usuario_id) for _ in range(3)])
+        db.session.commit()
+    return cliente, {'id': ids[-1], 'regra': regras[0]}
+
+
+def test_todas_as_rotas_com_orcamento_estao_cobertas(app):
+    com_orcamento = {
+        endpoint for endpoint, view in app.view_functions.items()
+        if getattr(view, 'orcamento_consultas', None) is not None
+    }
+    assert com_orcamento == set(PEDIDOS)
+
+
+@pytest.mark.parametrize('endpoint', sorted(PEDIDOS))
+def test_rota_dentro_do_orcamento(base, endpoint):
+    cliente, ids = base
+    for metodo, url, corpo in PEDIDOS[endpoint]:
+        resposta = cliente.open(url.format(**ids), method=metodo, json=corpo)
+        assert resposta.status_code == 200, resposta.get_data(as_text=True)
+
+
+def test_rota_acima_do_orcamento_derruba_o_pedido(app, base, monkeypatch):
+    cliente, _ = base
+    monkeypatch.setattr(app.view_functions['transacoes.api_estatisticas'], 'orcamento_consultas', 1)
+    with pytest.raises(OrcamentoConsultasExcedido):
+        cliente.get('/api/dashboard/estatisticas')
+
+
+def test_orcamento_so_avisa_fora_dos_testes(app, base, monkeypatch):
+    cliente, _ = base
+    monkeypatch.setattr(app.view_functions['transacoes.api_estatisticas'], 'orcamento_consultas', 1)
+    monkeypatch.setitem(app.config, 'SQL_IMPOR_ORCAMENTO', False)
+    assert cliente.get('/api/dashboard/estatisticas').status_code == 200
@@ -0,0 +1,93 @@
+"""
+Cache da Previsão de Fluxo de Caixa
+Entradas publicadas não são alteradas (o commit troca por uma cópia), escritas de
+outro worker são vistas pelo carimbo de versão e o avanço de `materializada_ate`
+não invalida as projeções.
+"""
+from datetime import date, datetime, timedelta
+
+import previsao
+from conftest import gravar_por_fora
+
+
+HOJE = date.today()
+
+
+def _saidas(cliente):
+    serie = cliente.get('/api/previsao/fluxo-caixa?dias=30').get_json()['serie']
+    return round(sum(ponto['saidas'] for ponto in serie), 2)
+
+
+def _transacao(cliente, valor, dias=5):
+    data = (HOJE + timedelta(days=dias)).isoformat()
+    return cliente.post('/api/transacoes', json={
+        'descricao': 'Fornecedor', 'valor': str(valor), 'data': data, 'data_vencimento': data,
+        'categoria': 'operacionais'
+    }).get_json()['id']
+
+
+def test_commit_troca_a_entrada_sem_alterar_a_publicada(cliente, usuario_id):
+    id = _transacao(cliente, 100)
+    assert _saidas(cliente) == 100
+    publicada = previsao._cache[usuario_id]
+    saidas_publicadas = dict(publicada['saidas'])
+
+    assert cliente.put(f'/api/transacoes/{id}', json={'valor': '250'}).status_code == 200
+
+    assert publicada['saidas'] == saidas_publicadas
+    atual = previsao._cache[usuario_id]
+    assert atual is not publicada and atual['versao'] == publicada['versao'] + 1
+    assert _saidas(cliente) == 250
+
+
+def test_escrita_de_outro_worker_invalida_pelo_carimbo(app, cliente, usuario_id, monkeypatch):
+    _transacao(cliente, 100)
+    assert _saidas(cliente) == 100
+
+    gravar_por_fora(app, usuario_id, valor=40, data=HOJE, data_vencimento=HOJE, categoria='operacionais',
+                    status='pendente')
+
+    monkeypatch.setitem(app.config, 'VERSOES_VERIFICACAO', 3600)
+    assert _saidas(cliente) == 100  # dentro do intervalo de verificação o cache vale
+    monkeypatch.setitem(app.config, 'VERSOES_VERIFICACAO', 0)
+    assert _saidas(cliente) == 140
+
+
+def test_avancar_materializada_ate_nao_invalida_projecoes(app, cliente, usuario_id):
+    from extensions import db
+    from models import RegraRecorrencia
+
+    id = _transacao(cliente, 100, dias=-1)
+    regra_id = cliente.post(f'/api/transacoes/{id}/recorrencia', json={'frequencia': 'semanal'}).get_json()['id']
+    _saidas(cliente)
+    entrada = previsao._cache[usuario_id]
+    assert entrada['projecoes'] is not None
+
+    with app.app_context():
+        regra = db.session.get(RegraRecorrencia, regra_id)
+        regra.materializada_ate = HOJE - timedelta(days=1)
+        db.session.commit()
+
+    assert previsao._cache[usuario_id] is entrada
+
+    with app.app_context():
+        regra = db.session.get(RegraRecorrencia, regra_id)
+        regra.data_fim = datetime.now().date() + timedelta(days=10)
+        db.session.commit()
+
+    atual = previsao._cache[usuario_id]
+    assert atual['projecoes'] is None and atual['versao'] == entrada['versao'] + 1
+
+
+def test_canceladas_nao_viram_padrao(app, cliente, usuario_id):
+    from recorrencia import somar_meses
+
+    for meses, status in ((1, 'pago'), (2, 'cancelado'), (3, 'pago'), (4, 'cancelado')):
+        cliente.post('/api/transacoes', json={
+            'descricao': 'Mensalidade', 'valor': '80', 'data': somar_meses(HOJE, -meses).isoformat(),
+            'categoria': 'fixas', 'status': status
+        })
+
+    with app.app_context():
+        # Só dois meses contam; as canceladas completariam os três do padrão
+        assert previsao._padroes_historico(usuario_id, HOJE) == []
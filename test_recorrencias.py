@@ -0,0 +1,103 @@
+"""
+Recorrências
+Leituras não gravam ocorrências (só a varredura periódica), a edição de uma
+ocorrência projetada é gravada num único commit e a unidade só existe na
+frequência personalizada.
+"""
+from datetime import date, timedelta
+
+from recorrencia import somar_meses
+
+
+HOJE = date.today()
+
+
+def _transacao(cliente, dias, **campos):
+    data = (HOJE + timedelta(days=dias)).isoformat()
+    resposta = cliente.post('/api/transacoes', json={
+        'descricao': 'Assinatura', 'valor': '50', 'data': data, 'data_vencimento': data,
+        'categoria': 'fixas', **campos
+    })
+    return resposta.get_json()['id']
+
+
+def _gravadas(app, regra_id):
+    from extensions import db
+    from models import RegraRecorrencia, Transacao
+
+    with app.app_context():
+        regra = db.session.get(RegraRecorrencia, regra_id)
+        return regra.materializada_ate, Transacao.query.filter_by(recorrencia_id=regra_id).count()
+
+
+def test_leituras_projetam_vencidas_sem_gravar(app, cliente):
+    id = _transacao(cliente, -70)
+    regra = cliente.post(f'/api/transacoes/{id}/recorrencia', json={'frequencia': 'mensal'}).get_json()['id']
+    antes = _gravadas(app, regra)
+
+    for url in ('/dashboard', '/api/dashboard/estatisticas', '/api/transacoes?limite=50',
+                '/api/previsao/fluxo-caixa', '/api/analise/comparativo'):
+        assert cliente.get(url).status_code == 200, url
+    assert _gravadas(app, regra) == antes
+
+    # As ocorrências vencidas aparecem projetadas na listagem
+    transacoes = cliente.get('/api/transacoes?limite=50').get_json()['despesas']
+    projetadas = [t for t in transacoes if t.get('projetada')]
+    assert len(projetadas) >= 2
+
+
+def test_varredura_grava_ocorrencias_vencidas(app, cliente, usuario_id):
+    import notificacoes
+
+    id = _transacao(cliente, -70)
+    regra = cliente.post(f'/api/transacoes/{id}/recorrencia', json={'frequencia': 'mensal'}).get_json()['id']
+
+    with app.app_context():
+        notificacoes.varrer_vencimentos()
+    materializada_ate, total = _gravadas(app, regra)
+
+    assert materializada_ate == HOJE
+    assert total == 1 + sum(1 for meses in (1, 2, 3) if somar_meses(HOJE - timedelta(days=70), meses) <= HOJE)
+
+
+def test_edicao_recusada_nao_grava_a_ocorrencia(app, cliente):
+    id = _transacao(cliente, 1)
+    regra = cliente.post(f'/api/transacoes/{id}/recorrencia', json={'frequencia': 'mensal'}).get_json()['id']
+    data = somar_meses(HOJE + timedelta(days=1), 1).isoformat()
+    antes = _gravadas(app, regra)
+
+    resposta = cliente.put(f'/api/recorrencias/{regra}/ocorrencias/{data}', json={'valor': 'abc'})
+    assert resposta.status_code == 400
+    assert _gravadas(app, regra) == antes
+
+    resposta = cliente.put(f'/api/recorrencias/{regra}/ocorrencias/{data}', json={'valor': '75'})
+    assert resposta.status_code == 200
+    transacao = cliente.get(f'/api/transacoes/{resposta.get_json()["id"]}').get_json()['transacao']
+    assert transacao['valor'] == 75
+    assert _gravadas(app, regra)[1] == antes[1] + 1
+
+
+def test_unidade_so_na_frequencia_personalizada(cliente):
+    mensal = _transacao(cliente, 0)
+    personalizada = _transacao(cliente, 0)
+    assert cliente.post(f'/api/transacoes/{mensal}/recorrencia',
+                        json={'frequencia': 'mensal', 'unidade': 'semanas'}).status_code == 200
+    assert cliente.post(f'/api/transacoes/{personalizada}/recorrencia',
+                        json={'frequencia': 'personalizada', 'intervalo': 10}).status_code == 200
+    assert cliente.post(f'/api/transacoes/{_transacao(cliente, 0)}/recorrencia',
+                        json={'frequencia': 'personalizada', 'unidade': 'anos'}).status_code == 400
+
+    unidades = {r['transacao_id']: r['unidade'] for r in cliente.get('/api/recorrencias').get_json()['recorrencias']}
+    assert unidades == {mensal: None, personalizada: 'dias'}
+
+
+def test_comando_grava_vencidas_sem_a_varredura(app, cliente):
+    id = _transacao(cliente, -40)
+    regra = cliente.post(f'/api/transacoes/{id}/recorrencia', json={'frequencia': 'semanal'}).get_json()['id']
+
+    resultado = app.test_cli_runner().invoke(args=['recorrencias', 'materializar'])
+
+    assert resultado.exit_code == 0, resultado.output
+    materializada_ate, total = _gravadas(app, regra)
+    assert materializada_ate == HOJE
+    assert total == 1 + 40 // 7
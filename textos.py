@@ -0,0 +1,24 @@
+"""
+Normalização de Textos Livres
+Descrições, fornecedores e formas de pagamento são digitados de jeitos diferentes
+("Empresa A", "empresa a."); a conciliação, as duplicatas, as dimensões, a
+categorização e o autocompletar comparam a forma normalizada.
+"""
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sem acentos e só letras, dígitos e espaços simples"""
+    texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode().lower()
+    return re.sub(r'[^a-z0-9]+', ' ', texto).strip()
+
+
+def similaridade(a, b):
+    """Semelhança (0 a 1) entre duas descrições já normalizadas"""
+    if not a or not b:
+        return 0.0
+    if a in b or b in a:
+        return 1.0
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
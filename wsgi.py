@@ -1,11 +1,14 @@
 # wsgi.py
 # Arquivo de entrada para servidores WSGI (como Gunicorn)
 
-from app import create_app
+from app import create_app, inicializar_banco
 
-# Cria a instância da aplicação
-app = create_app()
+# Cria a instância da aplicação. O esquema e o usuário admin não são tocados aqui:
+# o master do gunicorn faz isso uma única vez antes do fork (gunicorn.conf.py),
+# ou rode `flask --app wsgi inicializar-banco` antes de subir o servidor.
+app = create_app(inicializar=False)
 
 if __name__ == "__main__":
     # Executa o servidor de desenvolvimento se o arquivo for executado diretamente
+    inicializar_banco(app)
     app.run(debug=True)